@@ -4,3 +4,5 @@ class DispatchTaxiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Dispatch_taxi'
 
+    def ready(self):
+        from . import signals
@@ -0,0 +1,49 @@
+import hashlib
+from functools import wraps
+
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+
+from taxi_shared.queries import sum_versions, version_keys
+from .models import TableVersion
+from .sharding import city_code
+
+VIEW_CACHE_TIMEOUT = 600
+
+
+def data_version(*models):
+    """Строка версий таблиц: меняется при любом изменении данных этих моделей.
+
+    Версии у каждой базы свои, поэтому строка начинается с кода города.
+    """
+    tables = [model._meta.db_table for model in models]
+    rows = TableVersion.objects.filter(table_name__in=version_keys(tables)).values_list('table_name', 'version')
+    versions = sum_versions(rows, tables)
+    return city_code() + ':' + '-'.join(str(versions[table]) for table in tables)
+
+
+def cache_view_on_versions(*models):
+    """Кэширует GET-ответ представления, пока не изменились данные моделей.
+
+    Ответы с флеш-сообщениями не кэшируются и из кэша не отдаются,
+    чтобы сообщения не терялись и не показывались повторно.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or get_messages(request):
+                return view(request, *args, **kwargs)
+
+            version = data_version(*models)
+            path_hash = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            key = f"view:{view.__name__}:{version}:{path_hash}"
+            response = cache.get(key)
+            if response is not None:
+                return response
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response, VIEW_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
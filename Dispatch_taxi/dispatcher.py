@@ -0,0 +1,142 @@
+"""Передача запланированных заказов в работу к времени подачи.
+
+Диспетчер - один долгоживущий процесс (команда run_dispatcher). Он
+загружает запланированные заказы одним запросом по частичному индексу
+order_scheduled_pickup_idx в очередь срабатываний (min-куча) и спит в
+select() на LISTEN-соединении ровно до ближайшего срабатывания. Новые,
+перенесенные и отмененные заказы приходят через NOTIFY order_events, так
+что таблица заказов не опрашивается. Единственность диспетчера
+обеспечивается advisory-блокировкой.
+"""
+import json
+import logging
+import select
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from taxi_shared.scheduling import DispatchQueue
+from .middleware import current_actor
+from .models import Order
+from .sharding import atomic, connection
+from .signals import ORDER_EVENTS_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+DISPATCHER_LOCK_KEY = 4610046
+# Потолок сна: раз в столько секунд цикл просыпается, даже если срабатываний нет
+MAX_WAIT_SECONDS = 30
+RETRY_SECONDS = 10
+RECONNECT_SECONDS = 5
+
+
+def lead_time():
+    return timedelta(minutes=settings.DISPATCH_LEAD_MINUTES)
+
+
+def fire_time(pickup_at):
+    return (pickup_at - lead_time()).timestamp()
+
+
+def load_pending(queue):
+    pending = (Order.objects.filter(status='scheduled', pickup_at__isnull=False)
+               .order_by('pickup_at').values_list('id', 'pickup_at'))
+    for order_id, pickup_at in pending.iterator(chunk_size=2000):
+        queue.schedule(order_id, fire_time(pickup_at))
+    return len(queue)
+
+
+def apply_event(queue, payload):
+    """Обновляет очередь по событию из канала order_events."""
+    pickup_at = parse_datetime(payload['pickup_at']) if payload.get('pickup_at') else None
+    if payload.get('event') != 'deleted' and payload.get('status') == 'scheduled' and pickup_at:
+        queue.schedule(payload['order_id'], fire_time(pickup_at))
+    else:
+        queue.cancel(payload['order_id'])
+
+
+def dispatch_order(order_id):
+    """Переводит заказ в работу. Возвращает новый момент срабатывания, если подачу перенесли."""
+    with atomic():
+        order = Order.objects.select_for_update().filter(pk=order_id).first()
+        if order is None or order.status != 'scheduled' or order.pickup_at is None:
+            return None
+        fire_at = fire_time(order.pickup_at)
+        if fire_at > time.time():
+            return fire_at
+        order.status = 'in_progress'
+        order.dispatched_at = timezone.now()
+        order.save()
+    logger.info('Заказ %s передан в работу (подача %s)', order_id, order.pickup_at)
+    return None
+
+
+def fire_due(queue):
+    for order_id, _ in queue.pop_due(time.time()):
+        try:
+            reschedule_at = dispatch_order(order_id)
+        except Exception as e:
+            logger.error('Не удалось передать в работу заказ %s: %s', order_id, e)
+            reschedule_at = time.time() + RETRY_SECONDS
+        if reschedule_at is not None:
+            queue.schedule(order_id, reschedule_at)
+
+
+def open_listener(lock_key, *channels):
+    """Отдельное соединение для долгоживущего процесса: LISTEN и advisory-блокировка
+    (единственный экземпляр процесса) живут столько же, сколько оно."""
+    listener = connection.get_new_connection(connection.get_connection_params())
+    listener.autocommit = True
+    with listener.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_lock(%s)', [lock_key])
+        for channel in channels:
+            cursor.execute(f'LISTEN {channel}')
+    return listener
+
+
+def wait_for_notifies(listener, next_fire):
+    """Спит до момента next_fire (timestamp или None) или до прихода уведомления.
+    True, если уведомления пришли."""
+    timeout = MAX_WAIT_SECONDS if next_fire is None else min(MAX_WAIT_SECONDS, next_fire - time.time())
+    if timeout > 0 and select.select([listener], [], [], timeout) == ([], [], []):
+        return False
+    listener.poll()
+    return bool(listener.notifies)
+
+
+def serve(listener):
+    queue = DispatchQueue()
+    # Подписка оформлена до загрузки: заказы, измененные во время загрузки,
+    # придут событиями и перекроют прочитанное
+    logger.info('Диспетчер запущен, запланированных заказов: %s', load_pending(queue))
+    while True:
+        fire_due(queue)
+        if not wait_for_notifies(listener, queue.next_fire()):
+            continue
+        while listener.notifies:
+            notify = listener.notifies.pop(0)
+            try:
+                apply_event(queue, json.loads(notify.payload))
+            except (ValueError, KeyError):
+                logger.warning('Некорректное событие заказа: %s', notify.payload)
+
+
+def run_dispatcher():
+    if connection.vendor != 'postgresql':
+        raise RuntimeError('Диспетчеру запланированных заказов нужен PostgreSQL (LISTEN/NOTIFY)')
+    current_actor.set('dispatcher')
+    while True:
+        listener = None
+        try:
+            listener = open_listener(DISPATCHER_LOCK_KEY, ORDER_EVENTS_CHANNEL)
+            serve(listener)
+        except Exception as e:
+            logger.error('Ошибка диспетчера запланированных заказов: %s', e)
+            time.sleep(RECONNECT_SECONDS)
+        finally:
+            if listener is not None:
+                listener.close()
+            connection.close()
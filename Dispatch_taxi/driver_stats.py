@@ -0,0 +1,211 @@
+import logging
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+
+from taxi_shared.order_history import TRACKED_FIELDS, replay
+from .models import DriverDailyStats, DriverStats, Order, OrderEvent, Tariff, Vehicle
+from .sharding import atomic
+
+logger = logging.getLogger(__name__)
+
+STAT_FIELDS = ('orders_total', 'orders_completed', 'orders_cancelled', 'km_driven', 'revenue')
+
+
+def order_state(order):
+    """Снимок отслеживаемых полей заказа."""
+    return {field: getattr(order, field) for field in TRACKED_FIELDS}
+
+
+def order_contribution(state, drivers=None, costs=None):
+    """Вклад одного заказа в показатели: (driver_id, дата, приращения) или None.
+
+    Водитель и выручка берутся из зафиксированных в заказе driver_id и price.
+    Для старых событий журнала, где их нет, они вычисляются по машине и
+    тарифу: drivers и costs - заранее загруженные словари vehicle_id -> driver_id
+    и tariff_id -> стоимость км; без них значения читаются из базы.
+    """
+    if not state or not state.get('vehicle_id'):
+        return None
+    if 'driver_id' in state:
+        driver_id = state['driver_id']
+    elif drivers is not None:
+        driver_id = drivers.get(state['vehicle_id'])
+    else:
+        driver_id = Vehicle.all_objects.filter(pk=state['vehicle_id']).values_list('driver_id', flat=True).first()
+    if not driver_id:
+        return None
+
+    status = state.get('status')
+    completed = status == 'completed'
+    deltas = {
+        'orders_total': 1,
+        'orders_completed': 1 if completed else 0,
+        'orders_cancelled': 1 if status == 'cancelled' else 0,
+        'km_driven': Decimal('0'),
+        'revenue': Decimal('0'),
+    }
+    if completed and state.get('range'):
+        distance = Decimal(str(state['range']))
+        deltas['km_driven'] = distance
+        if 'price' in state:
+            deltas['revenue'] = Decimal(str(state['price'] or 0))
+        elif state.get('tariff_id'):
+            if costs is not None:
+                cost_for_km = costs.get(state['tariff_id'])
+            else:
+                cost_for_km = Tariff.all_objects.filter(pk=state['tariff_id']).values_list(
+                    'cost_for_km', flat=True).first()
+            deltas['revenue'] = distance * (cost_for_km or 0)
+
+    order_time = state.get('order_time') or timezone.now()
+    if isinstance(order_time, str):
+        order_time = datetime.fromisoformat(order_time)
+    return driver_id, timezone.localdate(order_time), deltas
+
+
+def stat_updates(model, deltas):
+    # Счетчики не уходят ниже нуля, даже если вычитается больше, чем было
+    # прибавлено (показатели, собранные до фиксации водителя в заказе)
+    return {
+        name: Greatest(F(name) + value, Value(0), output_field=model._meta.get_field(name))
+        for name, value in deltas.items()
+    }
+
+
+def apply_contribution(contribution, sign):
+    if contribution is None:
+        return
+    driver_id, day, deltas = contribution
+    deltas = {name: sign * value for name, value in deltas.items()}
+
+    updates = stat_updates(DriverStats, deltas)
+    if not DriverStats.objects.filter(driver_id=driver_id).update(**updates):
+        DriverStats.objects.get_or_create(driver_id=driver_id)
+        DriverStats.objects.filter(driver_id=driver_id).update(**updates)
+
+    updates = stat_updates(DriverDailyStats, deltas)
+    if not DriverDailyStats.objects.filter(driver_id=driver_id, date=day).update(**updates):
+        DriverDailyStats.objects.get_or_create(driver_id=driver_id, date=day)
+        DriverDailyStats.objects.filter(driver_id=driver_id, date=day).update(**updates)
+
+
+def order_changed(previous_state, new_state):
+    """Пересчитывает показатели по разнице между старым и новым состоянием заказа."""
+    if previous_state == new_state:
+        return
+    with atomic():
+        apply_contribution(order_contribution(previous_state), -1)
+        apply_contribution(order_contribution(new_state), 1)
+
+
+def orders_changed(transitions):
+    """Пересчет показателей по пачке изменений [(старое, новое состояние)]:
+    приращения суммируются, и на каждого водителя и день - одно обновление."""
+    # Машины и тарифы нужны только состояниям без зафиксированных водителя и стоимости
+    legacy = [state for pair in transitions for state in pair if state and 'driver_id' not in state]
+    vehicle_ids = {state['vehicle_id'] for state in legacy if state.get('vehicle_id')}
+    tariff_ids = {state['tariff_id'] for state in legacy if state.get('tariff_id')}
+    drivers = dict(Vehicle.all_objects.filter(pk__in=vehicle_ids).values_list('pk', 'driver_id'))
+    costs = dict(Tariff.all_objects.filter(pk__in=tariff_ids).values_list('pk', 'cost_for_km'))
+    totals = {}
+    for previous_state, new_state in transitions:
+        for state, sign in ((previous_state, -1), (new_state, 1)):
+            contribution = order_contribution(state, drivers, costs)
+            if contribution is None:
+                continue
+            driver_id, day, deltas = contribution
+            values = totals.setdefault((driver_id, day), {name: 0 for name in STAT_FIELDS})
+            for name, value in deltas.items():
+                values[name] += sign * value
+    with atomic():
+        for (driver_id, day), deltas in totals.items():
+            if any(deltas.values()):
+                apply_contribution((driver_id, day, deltas), 1)
+
+
+def driver_scorecard(driver_id, days=30):
+    stats = DriverStats.objects.filter(driver_id=driver_id).first()
+    since = timezone.localdate() - timedelta(days=days)
+    daily = DriverDailyStats.objects.filter(driver_id=driver_id, date__gte=since)
+    return stats, list(daily)
+
+
+def rebuild_driver_stats():
+    """Полный пересчет показателей по всем заказам (для истории до включения счетчиков)."""
+    completed = Q(status='completed')
+    rows = Order.objects.filter(vehicle__isnull=False, driver__isnull=False).annotate(
+        day=TruncDate('order_time')
+    ).values('driver_id', 'day').annotate(
+        orders_total=Count('id'),
+        orders_completed=Count('id', filter=completed),
+        orders_cancelled=Count('id', filter=Q(status='cancelled')),
+        km_driven=Sum('range', filter=completed),
+        revenue=Sum('price', filter=completed & Q(range__gt=0)),
+    ).order_by()
+
+    daily = {
+        (row['driver_id'], row['day']): {name: row[name] or 0 for name in STAT_FIELDS}
+        for row in rows
+    }
+    return store_driver_stats(daily)
+
+
+def replay_order_states(until=None, partial=None):
+    """Состояния заказов, восстановленные по журналу событий (на момент until).
+
+    В поток попадают и заархивированные заказы, которых уже нет в таблице.
+    Удаленные заказы отдаются со state=None, заказы без события создания
+    пропускаются и попадают в список partial.
+    """
+    events = OrderEvent.objects.order_by('order_id', 'id')
+    if until is not None:
+        events = events.filter(occurred_at__lte=until)
+    stream = events.values_list('order_id', 'event_type', 'changes').iterator(chunk_size=5000)
+    yield from replay(stream, partial)
+
+
+def rebuild_driver_stats_from_events():
+    """Пересчет показателей водителей из журнала событий заказов."""
+    drivers = dict(Vehicle.all_objects.values_list('pk', 'driver_id'))
+    costs = dict(Tariff.all_objects.values_list('pk', 'cost_for_km'))
+    daily = {}
+    partial = []
+    for order_id, state in replay_order_states(partial=partial):
+        contribution = order_contribution(state, drivers, costs)
+        if contribution is None:
+            continue
+        driver_id, day, deltas = contribution
+        values = daily.setdefault((driver_id, day), {name: 0 for name in STAT_FIELDS})
+        for name, value in deltas.items():
+            values[name] += value
+    if partial:
+        logger.warning('Пропущены заказы без события создания в журнале: %s (например, %s)',
+                       len(partial), partial[:10])
+    return store_driver_stats(daily)
+
+
+def store_driver_stats(daily):
+    """Заменяет показатели водителей. daily: (driver_id, дата) -> значения."""
+    totals = {}
+    for (driver_id, day), values in daily.items():
+        driver_totals = totals.setdefault(driver_id, {name: 0 for name in STAT_FIELDS})
+        for name in STAT_FIELDS:
+            driver_totals[name] += values[name]
+
+    with atomic():
+        DriverDailyStats.objects.all().delete()
+        DriverStats.objects.all().delete()
+        DriverStats.objects.bulk_create(
+            [DriverStats(driver_id=driver_id, **values) for driver_id, values in totals.items()],
+            batch_size=1000
+        )
+        DriverDailyStats.objects.bulk_create(
+            [DriverDailyStats(driver_id=driver_id, date=day, **values)
+             for (driver_id, day), values in daily.items()],
+            batch_size=1000
+        )
+    return len(totals), len(daily)
@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from taxi_shared.eta import ZoneGrid, build_matrix, fetch_trip_history, get_matrix, save_matrix
+from .sharding import city_file, connection
+
+
+def refresh_eta_matrix():
+    """Пересобирает матрицу по завершенным поездкам за ETA_HISTORY_DAYS."""
+    since = timezone.now() - timedelta(days=settings.ETA_HISTORY_DAYS)
+    with connection.cursor() as cursor:
+        trips = fetch_trip_history(cursor, since)
+    grid = ZoneGrid(*settings.ETA_GRID_BBOX, cell_km=settings.ETA_GRID_CELL_KM)
+    matrix, count = build_matrix(trips, grid, settings.ETA_BUCKET_HOURS)
+    save_matrix(city_file(settings.ETA_MATRIX_PATH), matrix, grid, settings.ETA_BUCKET_HOURS, count)
+    return {'trips': count, 'zones': grid.zone_count}
+
+
+def located(orders):
+    return [o for o in orders if o.vehicle and o.vehicle.lat is not None and o.pickup_lat is not None]
+
+
+def attach_pickup_etas(orders):
+    """Проставляет order.eta_min (минуты до подачи назначенной машины) одним вызовом."""
+    matrix = get_matrix(city_file(settings.ETA_MATRIX_PATH))
+    targets = located(o for o in orders if o.status == 'in_progress')
+    if matrix is None or not targets:
+        return
+    minutes = matrix.eta_pairs(
+        np.array([o.vehicle.lat for o in targets]), np.array([o.vehicle.lon for o in targets]),
+        np.array([o.pickup_lat for o in targets]), np.array([o.pickup_lon for o in targets])
+    )
+    for order, value in zip(targets, minutes):
+        order.eta_min = round(float(value))
+
+
+def nearest_vehicle_etas(order, vehicles, limit=5):
+    """[(машина, минуты)] для ближайших по времени подачи машин."""
+    matrix = get_matrix(city_file(settings.ETA_MATRIX_PATH))
+    vehicles = [v for v in vehicles if v.lat is not None]
+    if matrix is None or order.pickup_lat is None or not vehicles:
+        return []
+    minutes = matrix.eta_table(
+        np.array([v.lat for v in vehicles]), np.array([v.lon for v in vehicles]),
+        np.array([order.pickup_lat]), np.array([order.pickup_lon])
+    )[:, 0]
+    best = np.argsort(minutes)[:limit]
+    return [(vehicles[i], round(float(minutes[i]))) for i in best]
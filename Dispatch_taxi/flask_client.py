@@ -1,13 +1,21 @@
 import requests
+from django.conf import settings
+
+from .sharding import city_code
 
 
 class FlaskAPIClient:
     BASE_URL = 'http://localhost:5003'
 
+    @staticmethod
+    def city_headers():
+        # API работает с базой того же города, что и запрос диспетчерской
+        return {'X-City': city_code()}
+
     @classmethod
     def get_statistics(cls):
         try:
-            response = requests.get(f"{cls.BASE_URL}/api/taxi/statistics", timeout=5)
+            response = requests.get(f"{cls.BASE_URL}/api/taxi/statistics", headers=cls.city_headers(), timeout=5)
             if response.status_code == 200:
                 return response.json()
         except requests.exceptions.ConnectionError as e:
@@ -28,6 +36,7 @@ class FlaskAPIClient:
             response = requests.get(
                 f"{cls.BASE_URL}/api/taxi/orders",
                 params=params,
+                headers=cls.city_headers(),
                 timeout=5
             )
 
@@ -50,6 +59,13 @@ class FlaskAPIClient:
                 'error': str(e)
             }
 
+    @classmethod
+    def order_events_url(cls):
+        # EventSource не умеет заголовки - город передается параметром.
+        # Лента обслуживается пулом gevent, адрес которого может отличаться
+        base_url = settings.FLASK_STREAM_URL or cls.BASE_URL
+        return f"{base_url}/api/taxi/orders/stream?city={city_code()}"
+
     @classmethod
     def test_connection(cls):
         try:
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.utils import timezone
+
+from taxi_shared.forecast import DemandModel, refresh_model
+from .sharding import city_file, connection
+
+
+def refresh_demand_model():
+    """Дочитывает новые заказы в модель спроса и сохраняет ее для API."""
+    path = city_file(settings.FORECAST_STATE_PATH)
+    model = DemandModel.load(path, settings.FORECAST_HISTORY_WEEKS)
+    with connection.cursor() as cursor:
+        added = refresh_model(model, cursor, timezone.now())
+    if added or model.start_week is None:
+        model.save(path)
+    return {'orders': added, 'last_id': model.last_id}
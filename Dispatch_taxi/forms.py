@@ -1,6 +1,15 @@
+from datetime import timedelta
+from decimal import Decimal
+
 from django import forms
+from django.conf import settings
 from django.core.exceptions import ValidationError
-from .models import Driver, DriverInfo, Vehicle, Order, Customer, Tariff, Operator
+from django.utils import timezone
+from taxi_shared.zones import validate_polygon
+from .models import (Driver, DriverInfo, Vehicle, Order, Customer, Tariff, Operator, Zone,
+                     ShiftSchedule, ShiftOverride)
+from .routing import ROUTE_POINT_FIELDS, order_route
+from .zones import resolve_zone_id
 
 class DriverForm(forms.ModelForm):
     class Meta:
@@ -139,7 +148,7 @@ class OrderForm(forms.ModelForm):
     class Meta:
         model = Order
         fields = '__all__'
-        exclude = ['order_time', 'operator']
+        exclude = ['order_time', 'operator', 'route_duration', 'pickup_zone']
         widgets = {
             'customer': forms.Select(attrs={'class': 'form-control'}),
             'vehicle': forms.Select(attrs={'class': 'form-control'}),
@@ -150,4 +159,107 @@ class OrderForm(forms.ModelForm):
                 'min': 0
             }),
             'status': forms.Select(attrs={'class': 'form-control'}),
+            'pickup_lat': forms.NumberInput(attrs={'class': 'form-control', 'step': 'any'}),
+            'pickup_lon': forms.NumberInput(attrs={'class': 'form-control', 'step': 'any'}),
+            'dropoff_lat': forms.NumberInput(attrs={'class': 'form-control', 'step': 'any'}),
+            'dropoff_lon': forms.NumberInput(attrs={'class': 'form-control', 'step': 'any'}),
+            'pickup_at': forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'},
+                                             format='%Y-%m-%dT%H:%M'),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Дистанцию можно не вводить, если указаны точки маршрута
+        self.fields['range'].required = False
+
+    def clean(self):
+        cleaned_data = super().clean()
+        points = [cleaned_data.get(name) for name in ROUTE_POINT_FIELDS]
+        self.instance.pickup_zone_id = None
+        # Время в пути относится к маршруту по точкам: без маршрута его нет
+        self.instance.route_duration = None
+        # Дистанцию, введенную вручную, маршрут не перезаписывает. Старая
+        # дистанция заказа считается ручной, пока не менялись точки маршрута
+        points_changed = any(name in self.changed_data for name in ROUTE_POINT_FIELDS)
+        manual_range = cleaned_data.get('range') is not None and (
+            'range' in self.changed_data or not points_changed)
+        if all(point is not None for point in points):
+            self.instance.pickup_zone_id = resolve_zone_id(points[0], points[1])
+            route = order_route(*points)
+            if route is not None:
+                self.instance.route_duration = round(route.duration_min)
+                if not manual_range:
+                    cleaned_data['range'] = Decimal(str(round(route.distance_km, 1)))
+            elif cleaned_data.get('range') is None:
+                raise ValidationError('Не удалось построить маршрут, укажите дистанцию вручную')
+        elif any(point is not None for point in points):
+            raise ValidationError('Укажите обе точки маршрута полностью или не указывайте их')
+        if cleaned_data.get('range') is None:
+            self.add_error('range', 'Укажите дистанцию или точки маршрута')
+        self.clean_schedule(cleaned_data)
+        return cleaned_data
+
+    def clean_schedule(self, cleaned_data):
+        pickup_at = cleaned_data.get('pickup_at')
+        status = cleaned_data.get('status')
+        if status == 'scheduled' and pickup_at is None:
+            self.add_error('pickup_at', 'Для запланированного заказа укажите время подачи')
+            return
+        # Заказ, который еще не передавался в работу, с подачей позже времени
+        # упреждения ждет диспетчера отложенных заказов
+        lead = timedelta(minutes=settings.DISPATCH_LEAD_MINUTES)
+        if (pickup_at and status in ('scheduled', 'in_progress') and self.instance.dispatched_at is None
+                and pickup_at - lead > timezone.now()):
+            cleaned_data['status'] = 'scheduled'
+
+class ZoneForm(forms.ModelForm):
+    class Meta:
+        model = Zone
+        fields = ['name', 'kind', 'polygon', 'priority', 'price_multiplier', 'is_active']
+        widgets = {
+            'name': forms.TextInput(attrs={'class': 'form-control'}),
+            'kind': forms.Select(attrs={'class': 'form-control'}),
+            'polygon': forms.Textarea(attrs={
+                'class': 'form-control',
+                'rows': 6,
+                'placeholder': '[[55.75, 37.60], [55.76, 37.62], [55.74, 37.63]]'
+            }),
+            'priority': forms.NumberInput(attrs={'class': 'form-control', 'min': 0}),
+            'price_multiplier': forms.NumberInput(attrs={
+                'class': 'form-control',
+                'step': 0.01,
+                'min': 0
+            }),
+        }
+
+    def clean_polygon(self):
+        try:
+            return validate_polygon(self.cleaned_data.get('polygon'))
+        except ValueError as e:
+            raise ValidationError(str(e))
+
+class ShiftScheduleForm(forms.ModelForm):
+    class Meta:
+        model = ShiftSchedule
+        fields = ['driver', 'weekday', 'start_time', 'end_time', 'valid_from', 'valid_until']
+        widgets = {
+            'driver': forms.Select(attrs={'class': 'form-control'}),
+            'weekday': forms.Select(attrs={'class': 'form-control'}),
+            'start_time': forms.TimeInput(attrs={'class': 'form-control', 'type': 'time'}, format='%H:%M'),
+            'end_time': forms.TimeInput(attrs={'class': 'form-control', 'type': 'time'}, format='%H:%M'),
+            'valid_from': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}, format='%Y-%m-%d'),
+            'valid_until': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}, format='%Y-%m-%d'),
+        }
+
+class ShiftOverrideForm(forms.ModelForm):
+    class Meta:
+        model = ShiftOverride
+        fields = ['driver', 'date', 'kind', 'start_time', 'end_time', 'comment']
+        widgets = {
+            'driver': forms.Select(attrs={'class': 'form-control'}),
+            'date': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}, format='%Y-%m-%d'),
+            'kind': forms.Select(attrs={'class': 'form-control'}),
+            'start_time': forms.TimeInput(attrs={'class': 'form-control', 'type': 'time'}, format='%H:%M'),
+            'end_time': forms.TimeInput(attrs={'class': 'form-control', 'type': 'time'}, format='%H:%M'),
+            'comment': forms.TextInput(attrs={'class': 'form-control'}),
         }
@@ -0,0 +1,180 @@
+import csv
+import logging
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .driver_stats import rebuild_driver_stats, rebuild_driver_stats_from_events
+from .eta import refresh_eta_matrix
+from .forecast import refresh_demand_model
+from .models import Job, Order
+from .purge import purge_object
+from .sharding import atomic, city_file
+from .sweeper import SWEEP_BATCH_SIZE, sweep_stale_orders
+from .workload import rebuild_operator_workload
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+RETRY_BASE_DELAY = 10
+STALE_JOB_TIMEOUT = timedelta(minutes=30)
+
+
+def job(kind):
+    """Регистрирует функцию-обработчик задачи. Обработчик получает payload."""
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, payload=None, delay=None, max_attempts=3):
+    if kind not in HANDLERS:
+        raise ValueError(f'Неизвестный тип задачи: {kind}')
+    run_after = timezone.now() + (delay or timedelta(0))
+    return Job.objects.create(kind=kind, payload=payload or {}, run_after=run_after, max_attempts=max_attempts)
+
+
+def claim_job(worker_id):
+    """Забирает одну готовую задачу. SKIP LOCKED не дает двум воркерам взять одну строку."""
+    with atomic():
+        job_obj = Job.objects.select_for_update(skip_locked=True).filter(
+            status='queued',
+            run_after__lte=timezone.now()
+        ).order_by('run_after', 'id').first()
+        if job_obj is None:
+            return None
+        job_obj.status = 'running'
+        job_obj.attempts += 1
+        job_obj.locked_by = worker_id
+        job_obj.locked_at = timezone.now()
+        job_obj.save(update_fields=['status', 'attempts', 'locked_by', 'locked_at', 'updated_at'])
+    return job_obj
+
+
+def execute_job(job_obj):
+    handler = HANDLERS.get(job_obj.kind)
+    try:
+        if handler is None:
+            raise ValueError(f'Нет обработчика для задачи {job_obj.kind}')
+        result = handler(job_obj.payload)
+    except Exception as e:
+        logger.error('Задача #%s (%s) завершилась ошибкой: %s', job_obj.pk, job_obj.kind, e)
+        job_obj.error = traceback.format_exc()
+        if job_obj.attempts < job_obj.max_attempts:
+            job_obj.status = 'queued'
+            job_obj.run_after = timezone.now() + timedelta(seconds=RETRY_BASE_DELAY * 2 ** job_obj.attempts)
+        else:
+            job_obj.status = 'failed'
+    else:
+        job_obj.status = 'done'
+        job_obj.result = result
+        job_obj.error = ''
+    job_obj.locked_by = ''
+    job_obj.save(update_fields=['status', 'result', 'error', 'run_after', 'locked_by', 'updated_at'])
+    return job_obj
+
+
+def requeue_stale_jobs():
+    """Возвращает в очередь задачи, чей воркер пропал, не завершив их."""
+    return Job.objects.filter(
+        status='running',
+        locked_at__lt=timezone.now() - STALE_JOB_TIMEOUT
+    ).update(status='queued', locked_by='', run_after=timezone.now())
+
+
+def run_worker(worker_id=None, poll_interval=1.0, exit_when_empty=False):
+    worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+    logger.info('Воркер %s запущен', worker_id)
+    processed = 0
+    last_stale_check = 0
+    while True:
+        if time.monotonic() - last_stale_check > 60:
+            requeue_stale_jobs()
+            last_stale_check = time.monotonic()
+
+        job_obj = claim_job(worker_id)
+        if job_obj is None:
+            if exit_when_empty:
+                return processed
+            time.sleep(poll_interval)
+            continue
+        execute_job(job_obj)
+        processed += 1
+
+
+@job('purge_deleted')
+def purge_deleted(payload):
+    return purge_object(payload['model'], payload['id'])
+
+
+@job('rebuild_driver_stats')
+def rebuild_driver_stats_job(payload):
+    if payload.get('from_events'):
+        drivers, days = rebuild_driver_stats_from_events()
+    else:
+        drivers, days = rebuild_driver_stats()
+    return {'drivers': drivers, 'days': days}
+
+
+@job('rebuild_operator_workload')
+def rebuild_operator_workload_job(payload):
+    return rebuild_operator_workload()
+
+
+@job('refresh_eta_matrix')
+def refresh_eta_matrix_job(payload):
+    result = refresh_eta_matrix()
+    if payload.get('repeat'):
+        # Задача сама ставит следующий запуск: пересборка идет по расписанию
+        enqueue('refresh_eta_matrix', payload, delay=timedelta(minutes=settings.ETA_REFRESH_MINUTES))
+    return result
+
+
+@job('refresh_demand_model')
+def refresh_demand_model_job(payload):
+    # Модель обновляет только эта задача: воркер берет ее через SKIP LOCKED,
+    # поэтому заказы не учитываются дважды, а файл пишет один процесс
+    result = refresh_demand_model()
+    if payload.get('repeat'):
+        enqueue('refresh_demand_model', payload, delay=timedelta(minutes=settings.FORECAST_REFRESH_MINUTES))
+    return result
+
+
+@job('sweep_stale_orders')
+def sweep_stale_orders_job(payload):
+    result = sweep_stale_orders(batch_size=payload.get('batch_size', SWEEP_BATCH_SIZE))
+    if payload.get('repeat'):
+        enqueue('sweep_stale_orders', payload, delay=timedelta(minutes=settings.STALE_SWEEP_MINUTES))
+    return result
+
+
+@job('export_orders')
+def export_orders(payload):
+    export_dir = city_file(os.path.join(settings.BASE_DIR, 'output', 'exports'))
+    os.makedirs(export_dir, exist_ok=True)
+    path = os.path.join(export_dir, f"orders_{timezone.now():%Y%m%d_%H%M%S}.csv")
+
+    orders = Order.objects.all()
+    if payload.get('status'):
+        orders = orders.filter(status=payload['status'])
+    rows = orders.values_list(
+        'id', 'order_time', 'status', 'customer__full_name', 'vehicle__license_plate',
+        'tariff__name', 'tariff__cost_for_km', 'range', 'operator__full_name'
+    ).order_by('id')
+
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'order_time', 'status', 'customer', 'vehicle',
+                         'tariff', 'cost_for_km', 'range', 'operator'])
+        for row in rows.iterator(chunk_size=2000):
+            writer.writerow(row)
+            count += 1
+    return {'path': path, 'orders': count}
@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from Dispatch_taxi.models import Order
+from Dispatch_taxi.purge import archive_and_delete_orders, fetch_order_rows
+from Dispatch_taxi.sharding import city_file
+from taxi_shared.archive import STATUS_CODES, compact_partitions
+
+
+class Command(BaseCommand):
+    help = 'Переносит завершенные и отмененные заказы старше заданного срока в колоночный архив'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365,
+                            help='Архивировать заказы старше указанного числа дней')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только посчитать заказы, ничего не переносить')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        batch_size = options['batch_size']
+        queryset = Order.objects.filter(
+            status__in=list(STATUS_CODES),
+            order_time__lt=cutoff
+        )
+
+        if options['dry_run']:
+            self.stdout.write(f'Будет заархивировано заказов: {queryset.count()}')
+            return
+
+        total = 0
+        while True:
+            # Сначала пишем файлы, потом удаляем: повторный запуск после сбоя
+            # не потеряет заказы, а дубликаты id архив отбрасывает сам
+            rows = fetch_order_rows(queryset, batch_size)
+            if not rows:
+                break
+            total += archive_and_delete_orders(rows)
+            self.stdout.write(f'Заархивировано {total} заказов...')
+
+        # Каждая пачка легла отдельной частью; сливаем части в файлы месяцев
+        compacted = compact_partitions(city_file(settings.ORDER_ARCHIVE_DIR))
+        if compacted:
+            self.stdout.write(f'Сжато месяцев архива: {compacted}')
+        self.stdout.write(self.style.SUCCESS(f'Готово. Перенесено в архив: {total}'))
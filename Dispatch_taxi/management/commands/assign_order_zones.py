@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from Dispatch_taxi.models import Order
+from Dispatch_taxi.zones import ASSIGN_BATCH_SIZE, assign_pickup_zones, zone_index
+
+
+class Command(BaseCommand):
+    help = 'Определяет зону подачи для заказов с координатами (после импорта или изменения зон)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Пересчитать зону у всех заказов, а не только у заказов без зоны')
+        parser.add_argument('--batch-size', type=int, default=ASSIGN_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        queryset = Order.objects.all()
+        if not options['all']:
+            queryset = queryset.filter(pickup_zone__isnull=True)
+        zones = len(zone_index())
+        updated = assign_pickup_zones(queryset, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Зон в индексе: {zones}, обновлено заказов: {updated}'))
@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from Dispatch_taxi.sharding import city_file
+from taxi_shared.routing import build_graph
+
+
+class Command(BaseCommand):
+    help = 'Собирает граф дорог из CSV-выгрузки OSM для расчета дистанции заказов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('nodes', help='CSV вершин: id, lat, lon')
+        parser.add_argument('edges', help='CSV ребер: source, target, length_m, speed_kmh, oneway')
+        parser.add_argument('--output', default=city_file(settings.ROAD_GRAPH_PATH),
+                            help='По умолчанию - граф города TAXI_CITY')
+        parser.add_argument('--landmarks', type=int, default=16,
+                            help='Число ориентиров для эвристики ALT')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        nodes, edges, landmarks = build_graph(
+            options['nodes'], options['edges'], options['output'], options['landmarks']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Граф сохранен в {options["output"]}: вершин {nodes}, ребер {edges}, '
+            f'ориентиров {landmarks} ({time.monotonic() - started:.1f} с)'
+        ))
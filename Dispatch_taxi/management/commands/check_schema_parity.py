@@ -0,0 +1,28 @@
+import sys
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from taxi_shared.schema import compare_schemas, django_schema, sqlalchemy_schema
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает модели Django и модели SQLAlchemy из flask_app'
+
+    def handle(self, *args, **options):
+        flask_dir = str(settings.BASE_DIR / 'flask_app')
+        if flask_dir not in sys.path:
+            sys.path.insert(0, flask_dir)
+        from extentions import db
+        import models  # noqa: F401 - регистрирует таблицы в db.metadata
+
+        django_tables = django_schema(apps.get_app_config('Dispatch_taxi').get_models())
+        sqlalchemy_tables = sqlalchemy_schema(db.metadata.tables.values())
+
+        problems = compare_schemas(django_tables, sqlalchemy_tables)
+        if problems:
+            for problem in problems:
+                self.stderr.write(problem)
+            raise CommandError(f'Расхождений в схеме: {len(problems)}')
+        self.stdout.write(self.style.SUCCESS(f'Схемы совпадают ({len(django_tables)} таблиц)'))
@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from Dispatch_taxi.models import Order
+from Dispatch_taxi.sharding import connection
+from Dispatch_taxi.partitions import (duplicate_order_ids, ensure_order_partitions, list_order_partitions,
+                                     scanned_partitions)
+
+
+class Command(BaseCommand):
+    help = 'Создает будущие месячные секции таблицы заказов и проверяет отсечение секций'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3)
+        parser.add_argument('--explain', action='store_true',
+                            help='Проверить по EXPLAIN, что недельный запрос читает не все секции')
+        parser.add_argument('--check-ids', action='store_true',
+                            help='Проверить, что id заказов не повторяются в разных секциях')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Секционирование доступно только для PostgreSQL')
+
+        created = ensure_order_partitions(options['months_ahead'])
+        self.stdout.write(f'Создано новых секций: {created}')
+
+        partitions = list_order_partitions()
+        for name, bound in partitions:
+            self.stdout.write(f'  {name}: {bound}')
+
+        if options['check_ids']:
+            duplicates = duplicate_order_ids()
+            if duplicates:
+                raise CommandError(f'Повторяющиеся id заказов: {", ".join(map(str, duplicates))}')
+            self.stdout.write(self.style.SUCCESS('id заказов уникальны'))
+
+        if options['explain']:
+            # Окно с верхней границей: без нее запрос законно читает и все будущие секции
+            now = timezone.now()
+            scanned = scanned_partitions(Order.objects.filter(order_time__gte=now - timedelta(days=7),
+                                                              order_time__lt=now))
+            self.stdout.write(f'Недельный запрос читает секции: {", ".join(scanned)}')
+            if len(partitions) > 2 and len(scanned) >= len(partitions):
+                raise CommandError('Отсечение секций не сработало: запрос читает все секции')
+            self.stdout.write(self.style.SUCCESS('Отсечение секций работает'))
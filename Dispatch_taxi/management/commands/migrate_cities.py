@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from Dispatch_taxi.partitions import ensure_order_partitions
+from Dispatch_taxi.sharding import database_alias, use_city
+
+
+class Command(BaseCommand):
+    help = 'Применяет миграции и создает секции заказов в базах всех городов (TAXI_CITIES)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--city', action='append', choices=list(settings.CITIES),
+                            help='Только указанные города (можно повторять)')
+
+    def handle(self, *args, **options):
+        for city in options['city'] or settings.CITIES:
+            alias = database_alias(city)
+            self.stdout.write(f'Город {city} (база {settings.DATABASES[alias]["NAME"]})')
+            # Миграции с данными и значения по умолчанию (город строки)
+            # должны видеть город своей базы, а не процесса
+            with use_city(city):
+                call_command('migrate', database=alias, verbosity=options['verbosity'])
+                created = ensure_order_partitions()
+            self.stdout.write(self.style.SUCCESS(f'  новых секций заказов: {created}'))
@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from Dispatch_taxi.purge import PURGE_BATCH_SIZE, purge_expired
+from Dispatch_taxi.sharding import city_file
+from taxi_shared.archive import compact_partitions
+
+
+class Command(BaseCommand):
+    help = 'Окончательно удаляет мягко удаленные записи и их заказы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.SOFT_DELETE_PURGE_DAYS,
+                            help='Удалять записи, помеченные удаленными раньше указанного числа дней')
+        parser.add_argument('--batch-size', type=int, default=PURGE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        purged = purge_expired(timedelta(days=options['days']), options['batch_size'])
+        for model_name, count in purged.items():
+            self.stdout.write(f'{model_name}: {count}')
+        compact_partitions(city_file(settings.ORDER_ARCHIVE_DIR))
+        self.stdout.write(self.style.SUCCESS(f'Удалено записей: {sum(purged.values())}'))
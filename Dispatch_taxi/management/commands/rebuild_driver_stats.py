@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from Dispatch_taxi.driver_stats import rebuild_driver_stats, rebuild_driver_stats_from_events
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает показатели водителей по всей истории заказов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from-events', action='store_true',
+                            help='Восстановить показатели по журналу событий, включая архивные заказы')
+
+    def handle(self, *args, **options):
+        if options['from_events']:
+            drivers, days = rebuild_driver_stats_from_events()
+        else:
+            drivers, days = rebuild_driver_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f'Показатели пересчитаны: водителей {drivers}, записей по дням {days}'
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from Dispatch_taxi.workload import rebuild_operator_workload
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает число открытых заказов операторов по таблице заказов'
+
+    def handle(self, *args, **options):
+        result = rebuild_operator_workload()
+        self.stdout.write(self.style.SUCCESS(
+            f'Нагрузка пересчитана: операторов {result["operators"]}, открытых заказов {result["open_orders"]}'
+        ))
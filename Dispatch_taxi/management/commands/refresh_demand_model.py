@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from Dispatch_taxi.forecast import refresh_demand_model
+from Dispatch_taxi.jobs import enqueue
+from Dispatch_taxi.models import Job
+
+
+class Command(BaseCommand):
+    help = 'Дочитывает новые заказы в модель прогноза спроса'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schedule', action='store_true',
+                            help='Поставить периодическое обновление в очередь фоновых задач')
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            if Job.objects.filter(kind='refresh_demand_model', status__in=['queued', 'running']).exists():
+                self.stdout.write('Обновление уже запланировано')
+                return
+            job = enqueue('refresh_demand_model', {'repeat': True})
+            self.stdout.write(self.style.SUCCESS(f'Запланирована задача #{job.pk}'))
+            return
+
+        result = refresh_demand_model()
+        self.stdout.write(self.style.SUCCESS(
+            f'Модель обновлена: новых заказов {result["orders"]}, водяной знак {result["last_id"]}'
+        ))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from Dispatch_taxi.eta import refresh_eta_matrix
+from Dispatch_taxi.jobs import enqueue
+from Dispatch_taxi.models import Job
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает матрицу времени в пути между зонами по истории поездок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schedule', action='store_true',
+                            help='Поставить периодическую пересборку в очередь фоновых задач')
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            if Job.objects.filter(kind='refresh_eta_matrix', status__in=['queued', 'running']).exists():
+                self.stdout.write('Пересборка уже запланирована')
+                return
+            job = enqueue('refresh_eta_matrix', {'repeat': True})
+            self.stdout.write(self.style.SUCCESS(f'Запланирована задача #{job.pk}'))
+            return
+
+        result = refresh_eta_matrix()
+        self.stdout.write(self.style.SUCCESS(
+            f'Матрица пересобрана: поездок {result["trips"]}, зон {result["zones"]}'
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from Dispatch_taxi.dispatcher import run_dispatcher
+
+
+class Command(BaseCommand):
+    help = 'Передает запланированные заказы в работу к времени подачи'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Диспетчер запланированных заказов запущен')
+        run_dispatcher()
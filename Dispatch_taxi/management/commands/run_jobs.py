@@ -0,0 +1,39 @@
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from Dispatch_taxi.jobs import run_worker
+
+
+def worker_process(poll_interval, exit_when_empty):
+    # Каждому процессу нужно собственное соединение с БД
+    connections.close_all()
+    run_worker(poll_interval=poll_interval, exit_when_empty=exit_when_empty)
+
+
+class Command(BaseCommand):
+    help = 'Запускает воркеры фоновых задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='Число процессов-воркеров')
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--once', action='store_true', help='Выйти, когда очередь опустеет')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        if workers == 1:
+            processed = run_worker(poll_interval=options['poll_interval'], exit_when_empty=options['once'])
+            self.stdout.write(self.style.SUCCESS(f'Обработано задач: {processed}'))
+            return
+
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=worker_process, args=(options['poll_interval'], options['once']))
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f'Запущено воркеров: {workers}')
+        for process in processes:
+            process.join()
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from Dispatch_taxi.offers import run_offer_coordinator
+
+
+class Command(BaseCommand):
+    help = 'Предлагает открытые заказы водителям и назначает машину принявшего'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Координатор предложений запущен')
+        run_offer_coordinator()
@@ -0,0 +1,68 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Dispatch_taxi.simulation import city_scenario, historical_scenario
+from taxi_shared.simulation import simulate_many
+
+DEFAULT_POLICIES = [
+    'nearest:least_loaded:none',
+    'longest_idle:least_loaded:none',
+    'nearest:round_robin:none',
+    'nearest:least_loaded:free_share',
+]
+
+COLUMNS = [
+    ('policy', 'Политики'),
+    ('served', 'Обслужено'),
+    ('no_vehicle', 'Без машины'),
+    ('declined', 'Отказ от цены'),
+    ('wait_mean_min', 'Ожидание, мин'),
+    ('wait_p90_min', 'p90, мин'),
+    ('utilization', 'Загрузка'),
+    ('revenue', 'Выручка'),
+    ('operator_peak_load', 'Пик оператора'),
+    ('seconds', 'Счет, с'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Прогоняет поток заказов через модель парка с разными политиками диспетчеризации'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Исторический день YYYY-MM-DD; без него - синтетический сценарий')
+        parser.add_argument('--orders', type=int, default=100000, help='Заказов в синтетическом сценарии')
+        parser.add_argument('--vehicles', type=int, help='Машин в парке (по умолчанию 5000 или все с координатами)')
+        parser.add_argument('--operators', type=int, help='Операторов (по умолчанию 50 или все)')
+        parser.add_argument('--policy', action='append', dest='policies',
+                            help='Набор политик машина:оператор:наценка, можно несколько раз')
+        parser.add_argument('--patience', type=float, default=10, help='Сколько минут клиент ждет машину')
+        parser.add_argument('--elasticity', type=float, default=1.0,
+                            help='Чувствительность клиентов к наценке')
+        parser.add_argument('--workers', type=int, help='Процессов для параллельного счета политик')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        params = {'patience_minutes': options['patience'], 'elasticity': options['elasticity'],
+                  'seed': options['seed']}
+        try:
+            if options['date']:
+                scenario, skipped = historical_scenario(
+                    date.fromisoformat(options['date']), options['vehicles'], options['operators'], **params
+                )
+                if skipped:
+                    self.stdout.write(f'Пропущено заказов без точки подачи: {skipped}')
+            else:
+                scenario = city_scenario(options['orders'], options['vehicles'] or 5000,
+                                         options['operators'] or 50, **params)
+            reports = simulate_many(scenario, options['policies'] or DEFAULT_POLICIES, options['workers'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f'Заказов: {len(scenario)}, машин: {len(scenario.vehicle_lat)}, '
+                          f'операторов: {scenario.operators}')
+        rows = [[title for _, title in COLUMNS]]
+        rows += [[str(report[key]) for key, _ in COLUMNS] for report in reports]
+        widths = [max(len(row[i]) for row in rows) for i in range(len(COLUMNS))]
+        for row in rows:
+            self.stdout.write('  '.join(value.ljust(width) for value, width in zip(row, widths)))
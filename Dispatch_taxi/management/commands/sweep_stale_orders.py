@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from Dispatch_taxi.sweeper import SWEEP_BATCH_SIZE, stale_cutoffs, stale_orders, sweep_stale_orders
+
+
+class Command(BaseCommand):
+    help = 'Отменяет заказы, зависшие в открытом статусе дольше STALE_ORDER_TIMEOUTS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=SWEEP_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только посчитать зависшие заказы, ничего не менять')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            for status, cutoff in stale_cutoffs().items():
+                self.stdout.write(f'{status}: зависших заказов {stale_orders(status, cutoff).count()}')
+            return
+
+        report = sweep_stale_orders(batch_size=max(1, options['batch_size']))
+        for status, count in report['by_status'].items():
+            self.stdout.write(f'{status}: отменено {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово. Отменено заказов: {report["orders"]}, пачек: {report["batches"]}, '
+            f'за {report["seconds"]} с'
+        ))
@@ -0,0 +1,49 @@
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from .sharding import current_city
+
+current_actor = ContextVar('current_actor', default='system')
+
+
+class CityMiddleware:
+    """Направляет запрос в базу выбранного города.
+
+    Город выбирается параметром ?city= и запоминается в сессии.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        city = request.GET.get('city') or request.session.get('city')
+        if city not in settings.CITIES:
+            city = settings.TAXI_CITY
+        if len(settings.CITIES) > 1 and request.session.get('city') != city:
+            request.session['city'] = city
+        request.city = city
+        token = current_city.set(city)
+        try:
+            return self.get_response(request)
+        finally:
+            current_city.reset(token)
+
+
+class CurrentActorMiddleware:
+    """Запоминает, кто выполняет запрос, для журнала событий заказов."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            actor = user.get_username()
+        else:
+            actor = f"anonymous@{request.META.get('REMOTE_ADDR', '')}"
+        token = current_actor.set(actor)
+        try:
+            return self.get_response(request)
+        finally:
+            current_actor.reset(token)
@@ -0,0 +1,139 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:40
+#
+# Переводит таблицу заказов на декларативное секционирование PostgreSQL по
+# месяцам order_time. Схема модели Order для Django не меняется, поэтому
+# миграция состоит только из SQL и выполняется лишь на PostgreSQL.
+
+from django.db import migrations
+
+
+ENSURE_PARTITIONS_FUNCTION = '''
+CREATE OR REPLACE FUNCTION dispatch_taxi_ensure_order_partitions(start_month date, end_month date)
+RETURNS integer AS $$
+DECLARE
+    month_start date := date_trunc('month', start_month)::date;
+    partition_name text;
+    created integer := 0;
+BEGIN
+    WHILE month_start <= end_month LOOP
+        partition_name := format('Dispatch_taxi_order_%s', to_char(month_start, 'YYYY_MM'));
+        IF to_regclass(format('%I', partition_name)) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF "Dispatch_taxi_order" FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, (month_start + interval '1 month')::date
+            );
+            created := created + 1;
+        END IF;
+        month_start := (month_start + interval '1 month')::date;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+'''
+
+FORWARD_SQL = [
+    'ALTER TABLE "Dispatch_taxi_order" RENAME TO "Dispatch_taxi_order_heap"',
+    'ALTER TABLE "Dispatch_taxi_order_heap" RENAME CONSTRAINT "Dispatch_taxi_order_pkey" TO "Dispatch_taxi_order_heap_pkey"',
+    'CREATE SEQUENCE "Dispatch_taxi_order_id_part_seq" AS bigint',
+    '''
+    CREATE TABLE "Dispatch_taxi_order" (
+        "id" bigint NOT NULL DEFAULT nextval('"Dispatch_taxi_order_id_part_seq"'),
+        "order_time" timestamp with time zone NOT NULL,
+        "range" numeric(3, 1) NOT NULL,
+        "status" varchar(15) NOT NULL,
+        "customer_id" bigint NULL
+            REFERENCES "Dispatch_taxi_customer" ("id") DEFERRABLE INITIALLY DEFERRED,
+        "operator_id" bigint NOT NULL
+            REFERENCES "Dispatch_taxi_operator" ("id") DEFERRABLE INITIALLY DEFERRED,
+        "tariff_id" bigint NULL
+            REFERENCES "Dispatch_taxi_tariff" ("id") DEFERRABLE INITIALLY DEFERRED,
+        "vehicle_id" bigint NULL
+            REFERENCES "Dispatch_taxi_vehicle" ("id") DEFERRABLE INITIALLY DEFERRED,
+        PRIMARY KEY ("id", "order_time")
+    ) PARTITION BY RANGE ("order_time")
+    ''',
+    'ALTER SEQUENCE "Dispatch_taxi_order_id_part_seq" OWNED BY "Dispatch_taxi_order"."id"',
+    'CREATE TABLE "Dispatch_taxi_order_default" PARTITION OF "Dispatch_taxi_order" DEFAULT',
+    ENSURE_PARTITIONS_FUNCTION,
+    '''
+    SELECT dispatch_taxi_ensure_order_partitions(
+        COALESCE((SELECT min("order_time") FROM "Dispatch_taxi_order_heap"), now())::date,
+        (now() + interval '3 months')::date
+    )
+    ''',
+    '''
+    INSERT INTO "Dispatch_taxi_order"
+        ("id", "order_time", "range", "status", "customer_id", "operator_id", "tariff_id", "vehicle_id")
+    SELECT "id", "order_time", "range", "status", "customer_id", "operator_id", "tariff_id", "vehicle_id"
+    FROM "Dispatch_taxi_order_heap"
+    ''',
+    '''
+    SELECT setval('"Dispatch_taxi_order_id_part_seq"',
+                  COALESCE((SELECT max("id") FROM "Dispatch_taxi_order"), 0) + 1, false)
+    ''',
+    'DROP TABLE "Dispatch_taxi_order_heap"',
+    'CREATE INDEX "Dispatch_taxi_order_order_time_idx" ON "Dispatch_taxi_order" ("order_time")',
+    'CREATE INDEX "Dispatch_taxi_order_status_time_idx" ON "Dispatch_taxi_order" ("status", "order_time")',
+    'CREATE INDEX "Dispatch_taxi_order_customer_id_idx" ON "Dispatch_taxi_order" ("customer_id")',
+    'CREATE INDEX "Dispatch_taxi_order_operator_id_idx" ON "Dispatch_taxi_order" ("operator_id")',
+    'CREATE INDEX "Dispatch_taxi_order_tariff_id_idx" ON "Dispatch_taxi_order" ("tariff_id")',
+    'CREATE INDEX "Dispatch_taxi_order_vehicle_id_idx" ON "Dispatch_taxi_order" ("vehicle_id")',
+]
+
+REVERSE_SQL = [
+    'ALTER TABLE "Dispatch_taxi_order" RENAME TO "Dispatch_taxi_order_partitioned"',
+    'ALTER TABLE "Dispatch_taxi_order_partitioned" RENAME CONSTRAINT "Dispatch_taxi_order_pkey" TO "Dispatch_taxi_order_partitioned_pkey"',
+    '''
+    CREATE TABLE "Dispatch_taxi_order" (
+        "id" bigint NOT NULL PRIMARY KEY GENERATED BY DEFAULT AS IDENTITY,
+        "order_time" timestamp with time zone NOT NULL,
+        "range" numeric(3, 1) NOT NULL,
+        "status" varchar(15) NOT NULL,
+        "customer_id" bigint NULL
+            REFERENCES "Dispatch_taxi_customer" ("id") DEFERRABLE INITIALLY DEFERRED,
+        "operator_id" bigint NOT NULL
+            REFERENCES "Dispatch_taxi_operator" ("id") DEFERRABLE INITIALLY DEFERRED,
+        "tariff_id" bigint NULL
+            REFERENCES "Dispatch_taxi_tariff" ("id") DEFERRABLE INITIALLY DEFERRED,
+        "vehicle_id" bigint NULL
+            REFERENCES "Dispatch_taxi_vehicle" ("id") DEFERRABLE INITIALLY DEFERRED
+    )
+    ''',
+    '''
+    INSERT INTO "Dispatch_taxi_order"
+        ("id", "order_time", "range", "status", "customer_id", "operator_id", "tariff_id", "vehicle_id")
+    OVERRIDING SYSTEM VALUE
+    SELECT "id", "order_time", "range", "status", "customer_id", "operator_id", "tariff_id", "vehicle_id"
+    FROM "Dispatch_taxi_order_partitioned"
+    ''',
+    '''
+    SELECT setval(pg_get_serial_sequence('"Dispatch_taxi_order"', 'id'),
+                  COALESCE((SELECT max("id") FROM "Dispatch_taxi_order"), 0) + 1, false)
+    ''',
+    'DROP TABLE "Dispatch_taxi_order_partitioned" CASCADE',
+    'DROP FUNCTION IF EXISTS dispatch_taxi_ensure_order_partitions(date, date)',
+    'CREATE INDEX "Dispatch_taxi_order_customer_id_idx" ON "Dispatch_taxi_order" ("customer_id")',
+    'CREATE INDEX "Dispatch_taxi_order_operator_id_idx" ON "Dispatch_taxi_order" ("operator_id")',
+    'CREATE INDEX "Dispatch_taxi_order_tariff_id_idx" ON "Dispatch_taxi_order" ("tariff_id")',
+    'CREATE INDEX "Dispatch_taxi_order_vehicle_id_idx" ON "Dispatch_taxi_order" ("vehicle_id")',
+]
+
+
+def run_sql(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement, params=None)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dispatch_taxi', '0003_tableversion'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sql(FORWARD_SQL), run_sql(REVERSE_SQL)),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dispatch_taxi', '0004_partition_order_by_month'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='operator',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='Dispatch_taxi.operator', verbose_name='Оператор'),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate
+
+STAT_FIELDS = ('orders_total', 'orders_completed', 'orders_cancelled', 'km_driven', 'revenue')
+
+
+def fill_stats(apps, schema_editor):
+    """Показатели по уже существующим заказам: дальше их ведут сигналы."""
+    alias = schema_editor.connection.alias
+    Order = apps.get_model('Dispatch_taxi', 'Order')
+    DriverStats = apps.get_model('Dispatch_taxi', 'DriverStats')
+    DriverDailyStats = apps.get_model('Dispatch_taxi', 'DriverDailyStats')
+    completed = Q(status='completed')
+    rows = Order.objects.using(alias).filter(vehicle__driver__isnull=False).annotate(
+        day=TruncDate('order_time')
+    ).values('vehicle__driver_id', 'day').annotate(
+        orders_total=Count('id'),
+        orders_completed=Count('id', filter=completed),
+        orders_cancelled=Count('id', filter=Q(status='cancelled')),
+        km_driven=Sum('range', filter=completed),
+        revenue=Sum(ExpressionWrapper(F('range') * F('tariff__cost_for_km'),
+                                      output_field=DecimalField(max_digits=14, decimal_places=2)),
+                    filter=completed),
+    ).order_by()
+
+    daily = []
+    totals = {}
+    for row in rows:
+        driver_id = row['vehicle__driver_id']
+        values = {name: row[name] or 0 for name in STAT_FIELDS}
+        daily.append(DriverDailyStats(driver_id=driver_id, date=row['day'], **values))
+        driver_totals = totals.setdefault(driver_id, {name: 0 for name in STAT_FIELDS})
+        for name in STAT_FIELDS:
+            driver_totals[name] += values[name]
+    DriverStats.objects.using(alias).bulk_create(
+        [DriverStats(driver_id=driver_id, **values) for driver_id, values in totals.items()], batch_size=1000
+    )
+    DriverDailyStats.objects.using(alias).bulk_create(daily, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dispatch_taxi', '0005_alter_order_operator'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DriverStats',
+            fields=[
+                ('driver', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='Dispatch_taxi.driver', verbose_name='Водитель')),
+                ('orders_total', models.PositiveIntegerField(default=0, verbose_name='Всего заказов')),
+                ('orders_completed', models.PositiveIntegerField(default=0, verbose_name='Завершено заказов')),
+                ('orders_cancelled', models.PositiveIntegerField(default=0, verbose_name='Отменено заказов')),
+                ('km_driven', models.DecimalField(decimal_places=1, default=0, max_digits=12, verbose_name='Пробег по заказам')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Показатели водителя',
+                'verbose_name_plural': 'Показатели водителей',
+            },
+        ),
+        migrations.CreateModel(
+            name='DriverDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('orders_total', models.PositiveIntegerField(default=0, verbose_name='Всего заказов')),
+                ('orders_completed', models.PositiveIntegerField(default=0, verbose_name='Завершено заказов')),
+                ('orders_cancelled', models.PositiveIntegerField(default=0, verbose_name='Отменено заказов')),
+                ('km_driven', models.DecimalField(decimal_places=1, default=0, max_digits=10, verbose_name='Пробег по заказам')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Выручка')),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='Dispatch_taxi.driver', verbose_name='Водитель')),
+            ],
+            options={
+                'verbose_name': 'Показатели водителя за день',
+                'verbose_name_plural': 'Показатели водителей по дням',
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('driver', 'date'), name='unique_driver_daily_stats')],
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-19 14:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dispatch_taxi', '0007_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Удален'),
+        ),
+        migrations.AddField(
+            model_name='driver',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Удален'),
+        ),
+        migrations.AddField(
+            model_name='operator',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Удален'),
+        ),
+        migrations.AddField(
+            model_name='tariff',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Удален'),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Удален'),
+        ),
+    ]
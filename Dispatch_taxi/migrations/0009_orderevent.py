@@ -0,0 +1,103 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:20
+
+from datetime import date, datetime
+from decimal import Decimal
+
+import django.utils.timezone
+from django.db import migrations, models
+
+EVENT_CREATED = 1
+
+# Запрет UPDATE/DELETE на уровне базы: журнал событий только дополняется
+FORWARD_SQL = [
+    '''
+    CREATE OR REPLACE FUNCTION dispatch_taxi_order_event_append_only() RETURNS trigger AS $$
+    BEGIN
+        RAISE EXCEPTION 'Журнал событий заказов только дополняется';
+    END;
+    $$ LANGUAGE plpgsql
+    ''',
+    '''
+    CREATE TRIGGER "Dispatch_taxi_orderevent_append_only"
+        BEFORE UPDATE OR DELETE ON "Dispatch_taxi_orderevent"
+        FOR EACH ROW EXECUTE FUNCTION dispatch_taxi_order_event_append_only()
+    ''',
+]
+
+REVERSE_SQL = [
+    'DROP TRIGGER IF EXISTS "Dispatch_taxi_orderevent_append_only" ON "Dispatch_taxi_orderevent"',
+    'DROP FUNCTION IF EXISTS dispatch_taxi_order_event_append_only()',
+]
+
+
+# Снимок заказа в журнале (pickup_at появился позже, в 0016)
+SNAPSHOT_FIELDS = ('customer_id', 'vehicle_id', 'tariff_id', 'operator_id', 'status', 'range', 'order_time')
+BACKFILL_BATCH_SIZE = 2000
+
+
+def to_json_value(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def backfill_created_events(apps, schema_editor):
+    """Событие 'создан' с полным снимком для каждого существующего заказа,
+    иначе журнал начинался бы с изменений без исходного состояния."""
+    alias = schema_editor.connection.alias
+    Order = apps.get_model('Dispatch_taxi', 'Order')
+    OrderEvent = apps.get_model('Dispatch_taxi', 'OrderEvent')
+    rows = Order.objects.using(alias).order_by('id').values_list('id', *SNAPSHOT_FIELDS)
+    batch = []
+    for row in rows.iterator(chunk_size=BACKFILL_BATCH_SIZE):
+        order_id, values = row[0], row[1:]
+        changes = {field: [None, to_json_value(value)]
+                   for field, value in zip(SNAPSHOT_FIELDS, values) if value is not None}
+        # order_time - время создания заказа
+        batch.append(OrderEvent(order_id=order_id, event_type=EVENT_CREATED, occurred_at=values[-1],
+                                actor='', changes=changes))
+        if len(batch) >= BACKFILL_BATCH_SIZE:
+            OrderEvent.objects.using(alias).bulk_create(batch)
+            batch = []
+    if batch:
+        OrderEvent.objects.using(alias).bulk_create(batch)
+
+
+def run_sql(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement, params=None)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dispatch_taxi', '0008_soft_delete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.BigIntegerField(verbose_name='Заказ')),
+                ('event_type', models.PositiveSmallIntegerField(choices=[(1, 'Создан'), (2, 'Изменен'), (3, 'Смена статуса'), (4, 'Удален')], verbose_name='Событие')),
+                ('occurred_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время')),
+                ('actor', models.CharField(blank=True, default='', max_length=150, verbose_name='Кто изменил')),
+                ('changes', models.JSONField(default=dict, verbose_name='Изменения')),
+            ],
+            options={
+                'verbose_name': 'Событие заказа',
+                'verbose_name_plural': 'События заказов',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['order_id', 'id'], name='order_event_order_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_created_events, migrations.RunPython.noop),
+        migrations.RunPython(run_sql(FORWARD_SQL), run_sql(REVERSE_SQL)),
+    ]
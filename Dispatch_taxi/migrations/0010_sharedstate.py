@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:45
+
+from django.db import migrations, models
+
+
+def set_unlogged(unlogged):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        mode = 'UNLOGGED' if unlogged else 'LOGGED'
+        # Состояние восстановимо, WAL для него не нужен
+        schema_editor.execute(f'ALTER TABLE "Dispatch_taxi_sharedstate" SET {mode}', params=None)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dispatch_taxi', '0009_orderevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SharedState',
+            fields=[
+                ('key', models.CharField(max_length=250, primary_key=True, serialize=False, verbose_name='Ключ')),
+                ('value', models.BinaryField(default=b'', verbose_name='Значение')),
+                ('counter', models.BigIntegerField(default=0, verbose_name='Счетчик')),
+                ('expires_at', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Истекает')),
+            ],
+            options={
+                'verbose_name': 'Общее состояние API',
+                'verbose_name_plural': 'Общее состояние API',
+            },
+        ),
+        migrations.RunPython(set_unlogged(True), set_unlogged(False)),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dispatch_taxi', '0010_sharedstate'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='range',
+            field=models.DecimalField(decimal_places=1, max_digits=5, verbose_name='Дистанция поездки'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='pickup_lat',
+            field=models.FloatField(blank=True, null=True, verbose_name='Широта подачи'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='pickup_lon',
+            field=models.FloatField(blank=True, null=True, verbose_name='Долгота подачи'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='dropoff_lat',
+            field=models.FloatField(blank=True, null=True, verbose_name='Широта назначения'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='dropoff_lon',
+            field=models.FloatField(blank=True, null=True, verbose_name='Долгота назначения'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='route_duration',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Время в пути, мин'),
+        ),
+    ]
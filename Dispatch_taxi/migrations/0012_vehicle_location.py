@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dispatch_taxi', '0011_order_route'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicle',
+            name='lat',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Широта'),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='lon',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Долгота'),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='location_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Координаты обновлены'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:40
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dispatch_taxi', '0012_vehicle_location'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Zone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Название')),
+                ('kind', models.CharField(choices=[('district', 'Район'), ('airport', 'Аэропорт'), ('station', 'Вокзал'), ('other', 'Другое')], default='district', max_length=15, verbose_name='Тип зоны')),
+                ('polygon', models.JSONField(verbose_name='Граница')),
+                ('priority', models.PositiveSmallIntegerField(default=0, help_text='При пересечении зон выбирается зона с большим приоритетом', verbose_name='Приоритет')),
+                ('price_multiplier', models.DecimalField(decimal_places=2, default=Decimal('1.00'), max_digits=4, verbose_name='Коэффициент цены')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Активна')),
+            ],
+            options={
+                'verbose_name': 'Зона',
+                'verbose_name_plural': 'Зоны',
+                'ordering': ['-priority', 'name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='pickup_zone',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to='Dispatch_taxi.zone', verbose_name='Зона подачи'),
+        ),
+    ]
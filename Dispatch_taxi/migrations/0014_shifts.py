@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-19 18:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dispatch_taxi', '0013_zone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShiftSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Понедельник'), (1, 'Вторник'), (2, 'Среда'), (3, 'Четверг'), (4, 'Пятница'), (5, 'Суббота'), (6, 'Воскресенье')], verbose_name='День недели')),
+                ('start_time', models.TimeField(verbose_name='Начало смены')),
+                ('end_time', models.TimeField(help_text='Если раньше начала, смена заканчивается на следующий день', verbose_name='Конец смены')),
+                ('valid_from', models.DateField(blank=True, null=True, verbose_name='Действует с')),
+                ('valid_until', models.DateField(blank=True, null=True, verbose_name='Действует по')),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shift_schedules', to='Dispatch_taxi.driver', verbose_name='Водитель')),
+            ],
+            options={
+                'verbose_name': 'Смена по расписанию',
+                'verbose_name_plural': 'Расписание смен',
+                'ordering': ['weekday', 'start_time'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ShiftOverride',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True, verbose_name='Дата')),
+                ('kind', models.CharField(choices=[('off', 'Выходной'), ('extra', 'Дополнительная смена')], max_length=10, verbose_name='Тип')),
+                ('start_time', models.TimeField(blank=True, null=True, verbose_name='Начало смены')),
+                ('end_time', models.TimeField(blank=True, null=True, verbose_name='Конец смены')),
+                ('comment', models.CharField(blank=True, default='', max_length=200, verbose_name='Комментарий')),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shift_overrides', to='Dispatch_taxi.driver', verbose_name='Водитель')),
+            ],
+            options={
+                'verbose_name': 'Исключение из расписания',
+                'verbose_name_plural': 'Исключения из расписания',
+                'ordering': ['date', 'start_time'],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-19 18:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_workload(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    Operator = apps.get_model('Dispatch_taxi', 'Operator')
+    Order = apps.get_model('Dispatch_taxi', 'Order')
+    OperatorWorkload = apps.get_model('Dispatch_taxi', 'OperatorWorkload')
+    open_orders = dict(
+        Order.objects.using(alias).filter(status='in_progress').values('operator_id')
+        .annotate(count=models.Count('id')).values_list('operator_id', 'count')
+    )
+    OperatorWorkload.objects.using(alias).bulk_create([
+        OperatorWorkload(operator_id=pk, open_orders=open_orders.get(pk, 0))
+        for pk in Operator.objects.using(alias).values_list('pk', flat=True)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dispatch_taxi', '0014_shifts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OperatorWorkload',
+            fields=[
+                ('operator', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='workload', serialize=False, to='Dispatch_taxi.operator', verbose_name='Оператор')),
+                ('open_orders', models.PositiveIntegerField(default=0, verbose_name='Открытых заказов')),
+                ('is_online', models.BooleanField(default=False, verbose_name='На линии')),
+                ('last_seen_at', models.DateTimeField(blank=True, null=True, verbose_name='Последняя активность')),
+                ('last_assigned_at', models.DateTimeField(blank=True, null=True, verbose_name='Последнее назначение')),
+            ],
+            options={
+                'verbose_name': 'Нагрузка оператора',
+                'verbose_name_plural': 'Нагрузка операторов',
+                'indexes': [models.Index(fields=['is_online', 'open_orders'], name='operator_workload_online_idx')],
+            },
+        ),
+        migrations.RunPython(fill_workload, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-19 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dispatch_taxi', '0015_operatorworkload'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('scheduled', 'Запланирован'), ('in_progress', 'В процессе'), ('completed', 'Завершен'), ('cancelled', 'Отменен')], max_length=15, verbose_name='Статус'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='pickup_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Время подачи'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='dispatched_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Передан в работу'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status', 'scheduled')), fields=['pickup_at'], name='order_scheduled_pickup_idx'),
+        ),
+    ]
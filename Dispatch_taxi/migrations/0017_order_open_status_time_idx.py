@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-19 19:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dispatch_taxi', '0016_order_pickup_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status', 'in_progress')), fields=['status', 'order_time'], name='order_open_status_time_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-19 20:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dispatch_taxi', '0017_order_open_status_time_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DriverOffer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.BigIntegerField(verbose_name='Заказ')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает ответа'), ('accepted', 'Принято'), ('declined', 'Отклонено'), ('expired', 'Истекло'), ('withdrawn', 'Отозвано')], default='pending', max_length=10, verbose_name='Статус')),
+                ('offered_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Предложено')),
+                ('expires_at', models.DateTimeField(verbose_name='Действует до')),
+                ('responded_at', models.DateTimeField(blank=True, null=True, verbose_name='Ответ водителя')),
+                ('vehicle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='offers', to='Dispatch_taxi.vehicle', verbose_name='Автомобиль')),
+            ],
+            options={
+                'verbose_name': 'Предложение заказа',
+                'verbose_name_plural': 'Предложения заказов',
+                'ordering': ['-offered_at'],
+                'indexes': [models.Index(fields=['order_id', 'status'], name='offer_order_status_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status', 'accepted')), fields=('order_id',), name='offer_one_accepted_per_order'), models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('order_id',), name='offer_one_pending_per_order'), models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('vehicle',), name='offer_one_pending_per_vehicle')],
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.8 on 2026-10-19 21:05
+
+import Dispatch_taxi.sharding
+from django.conf import settings
+from django.db import migrations, models
+
+CITY_MODELS = ('customer', 'driver', 'operator', 'order', 'tariff', 'vehicle', 'zone')
+
+
+def fill_city(apps, schema_editor):
+    # Строки получают город той базы, в которой лежат, а не процесса миграции
+    alias = schema_editor.connection.alias
+    city = settings.DEFAULT_CITY if alias == 'default' else alias
+    for name in CITY_MODELS:
+        model = apps.get_model('Dispatch_taxi', name)
+        model.objects.using(alias).exclude(city=city).update(city=city)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dispatch_taxi', '0018_driveroffer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='city',
+            field=models.CharField(default=Dispatch_taxi.sharding.city_code, editable=False, max_length=20, verbose_name='Город'),
+        ),
+        migrations.AddField(
+            model_name='driver',
+            name='city',
+            field=models.CharField(default=Dispatch_taxi.sharding.city_code, editable=False, max_length=20, verbose_name='Город'),
+        ),
+        migrations.AddField(
+            model_name='operator',
+            name='city',
+            field=models.CharField(default=Dispatch_taxi.sharding.city_code, editable=False, max_length=20, verbose_name='Город'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='city',
+            field=models.CharField(default=Dispatch_taxi.sharding.city_code, editable=False, max_length=20, verbose_name='Город'),
+        ),
+        migrations.AddField(
+            model_name='tariff',
+            name='city',
+            field=models.CharField(default=Dispatch_taxi.sharding.city_code, editable=False, max_length=20, verbose_name='Город'),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='city',
+            field=models.CharField(default=Dispatch_taxi.sharding.city_code, editable=False, max_length=20, verbose_name='Город'),
+        ),
+        migrations.AddField(
+            model_name='zone',
+            name='city',
+            field=models.CharField(default=Dispatch_taxi.sharding.city_code, editable=False, max_length=20, verbose_name='Город'),
+        ),
+        migrations.RunPython(fill_city, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.8 on 2026-10-19 21:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F, OuterRef, Q, Subquery
+from django.utils import timezone
+
+
+EVENT_UPDATED = 2
+BATCH_SIZE = 2000
+
+
+def fill_driver_price(apps, schema_editor):
+    """Для существующих заказов - текущий водитель машины и стоимость по тарифу.
+    Журнал получает событие с этими значениями, чтобы восстановление
+    показателей по нему совпадало с таблицей."""
+    alias = schema_editor.connection.alias
+    Order = apps.get_model('Dispatch_taxi', 'Order')
+    OrderEvent = apps.get_model('Dispatch_taxi', 'OrderEvent')
+    Vehicle = apps.get_model('Dispatch_taxi', 'Vehicle')
+    Tariff = apps.get_model('Dispatch_taxi', 'Tariff')
+    cost_for_km = Subquery(Tariff.objects.using(alias).filter(pk=OuterRef('tariff_id')).values('cost_for_km')[:1])
+    Order.objects.using(alias).update(
+        driver_id=Subquery(Vehicle.objects.using(alias).filter(pk=OuterRef('vehicle_id')).values('driver_id')[:1]),
+        price=ExpressionWrapper(F('range') * cost_for_km,
+                                output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+    )
+
+    now = timezone.now()
+    rows = Order.objects.using(alias).filter(Q(driver_id__isnull=False) | Q(price__isnull=False)).order_by('id')
+    batch = []
+    for order_id, driver_id, price in rows.values_list('id', 'driver_id', 'price').iterator(chunk_size=BATCH_SIZE):
+        changes = {}
+        if driver_id is not None:
+            changes['driver_id'] = [None, driver_id]
+        if price is not None:
+            changes['price'] = [None, str(price)]
+        batch.append(OrderEvent(order_id=order_id, event_type=EVENT_UPDATED, occurred_at=now, actor='',
+                                changes=changes))
+        if len(batch) >= BATCH_SIZE:
+            OrderEvent.objects.using(alias).bulk_create(batch)
+            batch = []
+    if batch:
+        OrderEvent.objects.using(alias).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dispatch_taxi', '0019_city'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='driver',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to='Dispatch_taxi.driver', verbose_name='Водитель'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=12, null=True, verbose_name='Стоимость'),
+        ),
+        migrations.RunPython(fill_driver_price, migrations.RunPython.noop),
+    ]
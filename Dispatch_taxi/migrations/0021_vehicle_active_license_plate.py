@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-19 21:55
+
+import Dispatch_taxi.models
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def delete_orphan_vehicles(apps, schema_editor):
+    # Машины водителей, удаленных до каскадного удаления, тоже считаются удаленными
+    alias = schema_editor.connection.alias
+    Driver = apps.get_model('Dispatch_taxi', 'Driver')
+    Vehicle = apps.get_model('Dispatch_taxi', 'Vehicle')
+    Vehicle.objects.using(alias).filter(deleted_at__isnull=True, driver__deleted_at__isnull=False).update(
+        deleted_at=Subquery(Driver.objects.using(alias).filter(pk=OuterRef('driver_id')).values('deleted_at')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dispatch_taxi', '0020_order_driver_price'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_orphan_vehicles, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='vehicle',
+            name='license_plate',
+            field=models.CharField(max_length=15, validators=[Dispatch_taxi.models.validate_license_plate], verbose_name='Номерной знак'),
+        ),
+        migrations.AddConstraint(
+            model_name='vehicle',
+            constraint=models.UniqueConstraint(condition=models.Q(('deleted_at__isnull', True)), fields=('license_plate',), name='vehicle_active_license_plate', violation_error_message='Автомобиль с таким номерным знаком уже есть'),
+        ),
+    ]
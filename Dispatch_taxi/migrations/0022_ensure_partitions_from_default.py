@@ -0,0 +1,73 @@
+# Generated by Django 5.2.8 on 2026-10-19 22:10
+#
+# Секцию месяца нельзя создать, пока в секции DEFAULT лежат строки этого
+# месяца: CREATE TABLE ... PARTITION OF падает на проверке DEFAULT. Новая
+# версия функции в этом случае отсоединяет DEFAULT, создает секцию,
+# переносит в нее строки месяца и присоединяет DEFAULT обратно - все в
+# одной транзакции.
+
+from django.db import migrations
+
+
+ENSURE_PARTITIONS_FUNCTION = '''
+CREATE OR REPLACE FUNCTION dispatch_taxi_ensure_order_partitions(start_month date, end_month date)
+RETURNS integer AS $$
+DECLARE
+    month_start date := date_trunc('month', start_month)::date;
+    month_end date;
+    partition_name text;
+    created integer := 0;
+BEGIN
+    WHILE month_start <= end_month LOOP
+        month_end := (month_start + interval '1 month')::date;
+        partition_name := format('Dispatch_taxi_order_%s', to_char(month_start, 'YYYY_MM'));
+        IF to_regclass(format('%I', partition_name)) IS NULL THEN
+            IF EXISTS (SELECT 1 FROM "Dispatch_taxi_order_default"
+                       WHERE "order_time" >= month_start AND "order_time" < month_end) THEN
+                ALTER TABLE "Dispatch_taxi_order" DETACH PARTITION "Dispatch_taxi_order_default";
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF "Dispatch_taxi_order" FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month_start, month_end
+                );
+                -- Пока DEFAULT отсоединена, строки через родителя попадают в новую секцию
+                WITH moved AS (
+                    DELETE FROM "Dispatch_taxi_order_default"
+                    WHERE "order_time" >= month_start AND "order_time" < month_end
+                    RETURNING *
+                )
+                INSERT INTO "Dispatch_taxi_order" SELECT * FROM moved;
+                ALTER TABLE "Dispatch_taxi_order" ATTACH PARTITION "Dispatch_taxi_order_default" DEFAULT;
+            ELSE
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF "Dispatch_taxi_order" FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month_start, month_end
+                );
+            END IF;
+            created := created + 1;
+        END IF;
+        month_start := month_end;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+'''
+
+
+def run_sql(statement):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        schema_editor.execute(statement, params=None)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dispatch_taxi', '0021_vehicle_active_license_plate'),
+    ]
+
+    operations = [
+        # Откат оставляет новую версию: она совместима со старой по сигнатуре
+        migrations.RunPython(run_sql(ENSURE_PARTITIONS_FUNCTION), migrations.RunPython.noop),
+    ]
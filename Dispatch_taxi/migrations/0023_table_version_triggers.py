@@ -0,0 +1,103 @@
+# Generated by Django 5.2.8 on 2026-10-19 22:30
+#
+# Версии таблиц на PostgreSQL повышает триггер, а не сигналы Django: так
+# их повышают и записи через Flask API и сырой SQL. Триггер отложенный
+# (DEFERRABLE INITIALLY DEFERRED) и срабатывает при коммите, один раз за
+# транзакцию на ключ (флаг в set_config), а строку пишет в один из слотов
+# "<ключ>#<pg_backend_pid() % 8>" (см. VERSION_SLOTS в taxi_shared/queries.py).
+# Строка версии блокируется только на время коммита и только для записей
+# из того же слота.
+
+from django.db import migrations
+
+
+VERSIONED_TABLES = [
+    'Dispatch_taxi_driver',
+    'Dispatch_taxi_driverinfo',
+    'Dispatch_taxi_shiftschedule',
+    'Dispatch_taxi_shiftoverride',
+    'Dispatch_taxi_vehicle',
+    'Dispatch_taxi_customer',
+    'Dispatch_taxi_tariff',
+    'Dispatch_taxi_operator',
+    'Dispatch_taxi_zone',
+    'Dispatch_taxi_order',
+    'Dispatch_taxi_driverstats',
+    'Dispatch_taxi_driverdailystats',
+]
+
+BUMP_FUNCTION = '''
+CREATE OR REPLACE FUNCTION dispatch_taxi_bump_version(version_key text)
+RETURNS void AS $$
+DECLARE
+    guard text := 'taxi.bumped_' || md5(version_key);
+BEGIN
+    IF current_setting(guard, true) = '1' THEN
+        RETURN;
+    END IF;
+    PERFORM set_config(guard, '1', true);
+    INSERT INTO "Dispatch_taxi_tableversion" (table_name, version)
+    VALUES (version_key || '#' || (pg_backend_pid() % 8), 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = "Dispatch_taxi_tableversion".version + 1;
+    -- Воркеры Flask сбрасывают версию ключа в памяти по этому сигналу
+    PERFORM pg_notify('api_invalidate', json_build_object('ns', 'table_versions', 'key', version_key)::text);
+END;
+$$ LANGUAGE plpgsql;
+'''
+
+TRIGGER_FUNCTION = '''
+CREATE OR REPLACE FUNCTION dispatch_taxi_table_changed()
+RETURNS trigger AS $$
+BEGIN
+    PERFORM dispatch_taxi_bump_version(TG_ARGV[0]);
+    -- Секции заказов наследуют триггер, поэтому имя таблицы берется из аргумента
+    IF TG_ARGV[0] = 'Dispatch_taxi_order' THEN
+        IF TG_OP <> 'INSERT' THEN
+            PERFORM dispatch_taxi_bump_version('Dispatch_taxi_order:status=' || OLD.status);
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            PERFORM dispatch_taxi_bump_version('Dispatch_taxi_order:status=' || NEW.status);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+'''
+
+
+def trigger_name(table):
+    return f'{table}_version'
+
+
+FORWARD_SQL = [BUMP_FUNCTION, TRIGGER_FUNCTION] + [
+    f'CREATE CONSTRAINT TRIGGER "{trigger_name(table)}" AFTER INSERT OR UPDATE OR DELETE ON "{table}" '
+    f"DEFERRABLE INITIALLY DEFERRED FOR EACH ROW EXECUTE FUNCTION dispatch_taxi_table_changed('{table}')"
+    for table in VERSIONED_TABLES
+]
+
+REVERSE_SQL = [
+    f'DROP TRIGGER IF EXISTS "{trigger_name(table)}" ON "{table}"' for table in VERSIONED_TABLES
+] + [
+    'DROP FUNCTION IF EXISTS dispatch_taxi_table_changed()',
+    'DROP FUNCTION IF EXISTS dispatch_taxi_bump_version(text)',
+]
+
+
+def run_sql(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement, params=None)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dispatch_taxi', '0022_ensure_partitions_from_default'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sql(FORWARD_SQL), run_sql(REVERSE_SQL)),
+    ]
@@ -1,8 +1,13 @@
-from django.db import models
+import json
+import threading
+
+from django.db import connections, models, transaction
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from decimal import Decimal
 from urllib.parse import urlparse
+from .sharding import atomic, city_code, database_alias
 
 
 def validate_phone(value):
@@ -31,15 +36,47 @@ def validate_url(value):
         if not all([parsed.scheme, parsed.netloc]):
             raise ValidationError(_('Введите корректный URL (например: https://example.com/image.jpg)'))
 
-class Driver(models.Model):
+class ActiveManager(models.Manager):
+    """Менеджер по умолчанию: скрывает мягко удаленные записи."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+class CityModel(models.Model):
+    """Запись знает свой город: каждая база хранит один город (см. sharding.py),
+    а код в строке сохраняется при выгрузках и переносе данных между базами."""
+    city = models.CharField(max_length=20, default=city_code, editable=False, verbose_name='Город')
+
+    class Meta:
+        abstract = True
+
+class SoftDeleteModel(models.Model):
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True, verbose_name='Удален')
+
+    class Meta:
+        abstract = True
+
+    def soft_delete(self):
+        self.deleted_at = timezone.now()
+        self.save(update_fields=['deleted_at'])
+
+class Driver(CityModel, SoftDeleteModel):
     full_name = models.CharField(max_length=100, verbose_name='ФИО')
     phone = models.CharField(max_length=12,verbose_name='Телефон',validators=[validate_phone])
 
-    objects = models.Manager()
+    objects = ActiveManager()
+    all_objects = models.Manager()
     class Meta:
         verbose_name = 'Водитель'
         verbose_name_plural = 'Водители'
 
+    def soft_delete(self):
+        # Как и при окончательном удалении, машины водителя удаляются вместе с ним
+        with atomic():
+            super().soft_delete()
+            for vehicle in self.vehicles.all():
+                vehicle.soft_delete()
+
     def __str__(self):
         return f"{self.full_name}"
 
@@ -70,7 +107,70 @@ class DriverInfo(models.Model):
     def has_photo(self):
         return bool(self.photo)
 
-class Vehicle(models.Model):
+class ShiftSchedule(models.Model):
+    WEEKDAY_CHOICES = [
+        (0, 'Понедельник'),
+        (1, 'Вторник'),
+        (2, 'Среда'),
+        (3, 'Четверг'),
+        (4, 'Пятница'),
+        (5, 'Суббота'),
+        (6, 'Воскресенье'),
+    ]
+    driver = models.ForeignKey(Driver, on_delete=models.CASCADE, related_name='shift_schedules', verbose_name='Водитель')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES, verbose_name='День недели')
+    start_time = models.TimeField(verbose_name='Начало смены')
+    end_time = models.TimeField(verbose_name='Конец смены',
+                                help_text='Если раньше начала, смена заканчивается на следующий день')
+    valid_from = models.DateField(null=True, blank=True, verbose_name='Действует с')
+    valid_until = models.DateField(null=True, blank=True, verbose_name='Действует по')
+
+    objects = models.Manager()
+
+    class Meta:
+        verbose_name = 'Смена по расписанию'
+        verbose_name_plural = 'Расписание смен'
+        ordering = ['weekday', 'start_time']
+
+    def __str__(self):
+        return f"{self.driver}: {self.get_weekday_display()} {self.start_time:%H:%M}-{self.end_time:%H:%M}"
+
+    def clean(self):
+        if self.start_time == self.end_time:
+            raise ValidationError(_('Начало и конец смены совпадают'))
+        if self.valid_from and self.valid_until and self.valid_until < self.valid_from:
+            raise ValidationError(_('Дата окончания раньше даты начала'))
+
+class ShiftOverride(models.Model):
+    KIND_CHOICES = [
+        ('off', 'Выходной'),
+        ('extra', 'Дополнительная смена'),
+    ]
+    driver = models.ForeignKey(Driver, on_delete=models.CASCADE, related_name='shift_overrides', verbose_name='Водитель')
+    date = models.DateField(db_index=True, verbose_name='Дата')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, verbose_name='Тип')
+    start_time = models.TimeField(null=True, blank=True, verbose_name='Начало смены')
+    end_time = models.TimeField(null=True, blank=True, verbose_name='Конец смены')
+    comment = models.CharField(max_length=200, blank=True, default='', verbose_name='Комментарий')
+
+    objects = models.Manager()
+
+    class Meta:
+        verbose_name = 'Исключение из расписания'
+        verbose_name_plural = 'Исключения из расписания'
+        ordering = ['date', 'start_time']
+
+    def __str__(self):
+        return f"{self.driver}: {self.date:%d.%m.%Y} {self.get_kind_display()}"
+
+    def clean(self):
+        if self.kind == 'extra':
+            if self.start_time is None or self.end_time is None:
+                raise ValidationError(_('Для дополнительной смены укажите начало и конец'))
+            if self.start_time == self.end_time:
+                raise ValidationError(_('Начало и конец смены совпадают'))
+
+class Vehicle(CityModel, SoftDeleteModel):
 
     COLORS = [
         ('white', 'Белый'),
@@ -85,25 +185,40 @@ class Vehicle(models.Model):
                                related_name='vehicles', blank=True, verbose_name='Водитель')
     brand = models.CharField(max_length=50, verbose_name='Марка')
     model = models.CharField(max_length=50, verbose_name='Модель')
-    license_plate = models.CharField(max_length=15,verbose_name='Номерной знак',unique=True,validators=[validate_license_plate])
+    license_plate = models.CharField(max_length=15,verbose_name='Номерной знак',validators=[validate_license_plate])
     color = models.CharField(max_length=20,choices=COLORS,verbose_name='Цвет')
     year = models.PositiveIntegerField(verbose_name='Год выпуска')
     mileage = models.PositiveIntegerField(verbose_name='Пробег')
+    # Последние координаты от водительского приложения (POST /api/taxi/vehicles/<id>/location)
+    lat = models.FloatField(null=True, blank=True, editable=False, verbose_name='Широта')
+    lon = models.FloatField(null=True, blank=True, editable=False, verbose_name='Долгота')
+    location_updated_at = models.DateTimeField(null=True, blank=True, editable=False,
+                                               verbose_name='Координаты обновлены')
 
-    objects = models.Manager()
+    objects = ActiveManager()
+    all_objects = models.Manager()
 
     class Meta:
         verbose_name = 'Автомобиль'
         verbose_name_plural = 'Автомобили'
+        constraints = [
+            # Номер уникален среди действующих машин: удаленная машина не мешает
+            # завести новую с тем же номером, а форма проверяет это условие,
+            # а не ловит IntegrityError
+            models.UniqueConstraint(fields=['license_plate'], condition=models.Q(deleted_at__isnull=True),
+                                    name='vehicle_active_license_plate',
+                                    violation_error_message='Автомобиль с таким номерным знаком уже есть'),
+        ]
 
     def __str__(self):
         return f"{self.brand} {self.model} ({self.license_plate})"
 
-class Customer(models.Model):
+class Customer(CityModel, SoftDeleteModel):
     full_name = models.CharField(max_length=100, verbose_name='ФИО')
     phone = models.CharField(max_length=12,verbose_name='Телефон',validators=[validate_phone])
 
-    objects = models.Manager()
+    objects = ActiveManager()
+    all_objects = models.Manager()
     class Meta:
         verbose_name = 'Клиент'
         verbose_name_plural = 'Клиенты'
@@ -111,11 +226,12 @@ class Customer(models.Model):
     def __str__(self):
         return f"{self.full_name}"
 
-class Tariff(models.Model):
+class Tariff(CityModel, SoftDeleteModel):
     name = models.CharField(max_length=100, verbose_name='ФИО')
     cost_for_km = models.DecimalField(max_digits=8, decimal_places=2, verbose_name='Стоимость за км')
 
-    objects = models.Manager()
+    objects = ActiveManager()
+    all_objects = models.Manager()
     class Meta:
         verbose_name = 'Тариф'
         verbose_name_plural = 'Тарифы'
@@ -123,11 +239,12 @@ class Tariff(models.Model):
     def __str__(self):
         return f"{self.name} - {self.cost_for_km} руб/км"
 
-class Operator (models.Model):
+class Operator(CityModel, SoftDeleteModel):
     full_name = models.CharField(max_length=100, verbose_name='ФИО')
     phone = models.CharField(max_length=12,verbose_name='Телефон',validators=[validate_phone])
 
-    objects = models.Manager()
+    objects = ActiveManager()
+    all_objects = models.Manager()
     class Meta:
         verbose_name = 'Оператор'
         verbose_name_plural = 'Операторы'
@@ -135,8 +252,63 @@ class Operator (models.Model):
     def __str__(self):
         return f"{self.full_name}"
 
-class Order(models.Model):
+class OperatorWorkload(models.Model):
+    operator = models.OneToOneField(Operator, on_delete=models.CASCADE, primary_key=True,
+                                    related_name='workload', verbose_name='Оператор')
+    open_orders = models.PositiveIntegerField(default=0, verbose_name='Открытых заказов')
+    is_online = models.BooleanField(default=False, verbose_name='На линии')
+    last_seen_at = models.DateTimeField(null=True, blank=True, verbose_name='Последняя активность')
+    last_assigned_at = models.DateTimeField(null=True, blank=True, verbose_name='Последнее назначение')
+
+    objects = models.Manager()
+
+    class Meta:
+        verbose_name = 'Нагрузка оператора'
+        verbose_name_plural = 'Нагрузка операторов'
+        indexes = [
+            models.Index(fields=['is_online', 'open_orders'], name='operator_workload_online_idx')
+        ]
+
+    def __str__(self):
+        return f"{self.operator}: {self.open_orders}"
+
+class Zone(CityModel):
+    KIND_CHOICES = [
+        ('district', 'Район'),
+        ('airport', 'Аэропорт'),
+        ('station', 'Вокзал'),
+        ('other', 'Другое'),
+    ]
+    name = models.CharField(max_length=100, verbose_name='Название')
+    kind = models.CharField(max_length=15, choices=KIND_CHOICES, default='district', verbose_name='Тип зоны')
+    # Вершины границы: [[широта, долгота], ...]
+    polygon = models.JSONField(verbose_name='Граница')
+    priority = models.PositiveSmallIntegerField(default=0, verbose_name='Приоритет',
+                                                help_text='При пересечении зон выбирается зона с большим приоритетом')
+    price_multiplier = models.DecimalField(max_digits=4, decimal_places=2, default=Decimal('1.00'),
+                                           verbose_name='Коэффициент цены')
+    is_active = models.BooleanField(default=True, verbose_name='Активна')
+
+    objects = models.Manager()
+
+    class Meta:
+        verbose_name = 'Зона'
+        verbose_name_plural = 'Зоны'
+        ordering = ['-priority', 'name']
+
+    def __str__(self):
+        return f"{self.name} ({self.get_kind_display()})"
+
+# В PostgreSQL первичный ключ заказов - (id, order_time) (секционирование,
+# миграция 0004), и база не гарантирует уникальность одного id. Ее дает
+# только последовательность Dispatch_taxi_order_id_part_seq, поэтому id
+# нельзя задавать вручную (loaddata, перенос заказов между городами).
+# На уникальности id держатся get(pk=...) в представлениях и API,
+# VehicleOffer.order_id и OrderEvent.order_id; проверка -
+# ensure_order_partitions --check-ids.
+class Order(CityModel):
     STATUS_CHOICES = [
+        ('scheduled', 'Запланирован'),
         ('in_progress', 'В процессе'),
         ('completed', 'Завершен'),
         ('cancelled', 'Отменен'),
@@ -148,9 +320,27 @@ class Order(models.Model):
     tariff = models.ForeignKey(Tariff,on_delete=models.CASCADE, related_name='orders',
                                null=True, blank=True,verbose_name='Тарифы')
     order_time = models.DateTimeField(verbose_name='Время заказа', auto_now_add=True)
-    range = models.DecimalField(max_digits=3, decimal_places=1,verbose_name='Дистанция поездки')
+    # Заказ на будущее время: до pickup_at - DISPATCH_LEAD_MINUTES он в статусе scheduled
+    pickup_at = models.DateTimeField(null=True, blank=True, verbose_name='Время подачи')
+    dispatched_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='Передан в работу')
+    range = models.DecimalField(max_digits=5, decimal_places=1,verbose_name='Дистанция поездки')
+    pickup_lat = models.FloatField(null=True, blank=True, verbose_name='Широта подачи')
+    pickup_lon = models.FloatField(null=True, blank=True, verbose_name='Долгота подачи')
+    dropoff_lat = models.FloatField(null=True, blank=True, verbose_name='Широта назначения')
+    dropoff_lon = models.FloatField(null=True, blank=True, verbose_name='Долгота назначения')
+    route_duration = models.PositiveIntegerField(null=True, blank=True, verbose_name='Время в пути, мин')
+    pickup_zone = models.ForeignKey(Zone, on_delete=models.SET_NULL, related_name='orders',
+                                    null=True, blank=True, verbose_name='Зона подачи')
     status = models.CharField(max_length=15,choices=STATUS_CHOICES,verbose_name='Статус')
-    operator = models.ForeignKey(Operator,on_delete=models.CASCADE,related_name='operator_order',verbose_name='Водитель')
+    operator = models.ForeignKey(Operator,on_delete=models.CASCADE,related_name='orders',verbose_name='Оператор')
+    # Водитель машины и стоимость поездки на момент назначения: показатели
+    # водителей считаются по ним, а не по текущей машине и тарифу
+    driver = models.ForeignKey(Driver, on_delete=models.SET_NULL, related_name='orders', null=True, blank=True,
+                               editable=False, verbose_name='Водитель')
+    price = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, editable=False,
+                                verbose_name='Стоимость')
+
+    PRICING_FIELDS = ('vehicle_id', 'tariff_id', 'range')
 
     @property
     def total_cost(self):
@@ -163,4 +353,284 @@ class Order(models.Model):
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
         ordering = ['-order_time']
+        indexes = [
+            # Загрузка ожидающих броней диспетчером отложенных заказов
+            models.Index(fields=['pickup_at'], name='order_scheduled_pickup_idx',
+                         condition=models.Q(status='scheduled')),
+            # Поиск зависших заказов: открытых заказов мало, индекс маленький
+            models.Index(fields=['status', 'order_time'], name='order_open_status_time_idx',
+                         condition=models.Q(status='in_progress')),
+        ]
+
+    def refresh_pricing(self, previous_state=None):
+        """Фиксирует водителя и стоимость при создании заказа и при смене машины,
+        тарифа или дистанции; previous_state - снимок заказа в базе."""
+        if previous_state is not None and all(
+                previous_state.get(field) == getattr(self, field) for field in self.PRICING_FIELDS):
+            return
+        self.driver_id = None
+        if self.vehicle_id:
+            self.driver_id = Vehicle.all_objects.filter(pk=self.vehicle_id).values_list(
+                'driver_id', flat=True).first()
+        self.price = None
+        if self.tariff_id and self.range is not None:
+            cost_for_km = Tariff.all_objects.filter(pk=self.tariff_id).values_list('cost_for_km', flat=True).first()
+            if cost_for_km is not None:
+                self.price = (Decimal(str(self.range)) * cost_for_km).quantize(Decimal('0.01'))
+
+    # Сигналы (журнал событий, показатели водителей) выполняются в той же транзакции
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'vehicle', 'tariff', 'range'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'driver', 'price'}
+        with atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with atomic():
+            return super().delete(*args, **kwargs)
+
+class DriverOffer(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Ожидает ответа'),
+        ('accepted', 'Принято'),
+        ('declined', 'Отклонено'),
+        ('expired', 'Истекло'),
+        ('withdrawn', 'Отозвано'),
+    ]
+    # Без внешнего ключа: первичный ключ секционированной таблицы заказов - (id, order_time)
+    order_id = models.BigIntegerField(verbose_name='Заказ')
+    vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE, related_name='offers', verbose_name='Автомобиль')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name='Статус')
+    offered_at = models.DateTimeField(default=timezone.now, verbose_name='Предложено')
+    expires_at = models.DateTimeField(verbose_name='Действует до')
+    responded_at = models.DateTimeField(null=True, blank=True, verbose_name='Ответ водителя')
 
+    objects = models.Manager()
+
+    class Meta:
+        verbose_name = 'Предложение заказа'
+        verbose_name_plural = 'Предложения заказов'
+        ordering = ['-offered_at']
+        constraints = [
+            # Принять заказ может только один водитель: это гарантирует база, а не код
+            models.UniqueConstraint(fields=['order_id'], condition=models.Q(status='accepted'),
+                                    name='offer_one_accepted_per_order'),
+            # Заказ предлагается одной машине за раз, машине - один заказ за раз
+            models.UniqueConstraint(fields=['order_id'], condition=models.Q(status='pending'),
+                                    name='offer_one_pending_per_order'),
+            models.UniqueConstraint(fields=['vehicle'], condition=models.Q(status='pending'),
+                                    name='offer_one_pending_per_vehicle'),
+        ]
+        indexes = [
+            models.Index(fields=['order_id', 'status'], name='offer_order_status_idx')
+        ]
+
+    def __str__(self):
+        return f"Заказ #{self.order_id} -> {self.vehicle}: {self.get_status_display()}"
+
+INVALIDATION_CHANNEL = 'api_invalidate'
+
+# Таблицы, версии которых нужно повысить после коммита, по базам текущего потока
+_pending_versions = threading.local()
+
+# На PostgreSQL версии этих таблиц (и статусов заказов) повышает триггер из
+# миграции 0023 - в том числе при записях Flask API. bump() для них там ничего
+# не делает; новые модели нужно добавлять и в триггер
+VERSIONED_BY_TRIGGER = {
+    'Dispatch_taxi_driver', 'Dispatch_taxi_driverinfo', 'Dispatch_taxi_shiftschedule',
+    'Dispatch_taxi_shiftoverride', 'Dispatch_taxi_vehicle', 'Dispatch_taxi_customer', 'Dispatch_taxi_tariff',
+    'Dispatch_taxi_operator', 'Dispatch_taxi_zone', 'Dispatch_taxi_order', 'Dispatch_taxi_driverstats',
+    'Dispatch_taxi_driverdailystats',
+}
+
+BUMP_VERSIONS_SQL = '''
+    INSERT INTO "Dispatch_taxi_tableversion" (table_name, version)
+    SELECT name, 1 FROM unnest(%s::varchar[]) AS name ORDER BY name
+    ON CONFLICT (table_name) DO UPDATE SET version = "Dispatch_taxi_tableversion".version + 1
+'''
+
+class TableVersion(models.Model):
+    table_name = models.CharField(max_length=100, primary_key=True, verbose_name='Таблица')
+    version = models.PositiveBigIntegerField(default=0, verbose_name='Версия данных')
+
+    objects = models.Manager()
+
+    class Meta:
+        verbose_name = 'Версия таблицы'
+        verbose_name_plural = 'Версии таблиц'
+
+    def __str__(self):
+        return f"{self.table_name}: {self.version}"
+
+    @classmethod
+    def bump(cls, *table_names):
+        """Повышает версии таблиц после коммита текущей транзакции.
+
+        Таблицы копятся за всю транзакцию и записываются одним запросом с
+        одним NOTIFY: горячие строки версий не блокируются на все время
+        записи заказа. Вне транзакции версии повышаются сразу.
+        """
+        alias = database_alias()
+        if connections[alias].vendor == 'postgresql':
+            table_names = [name for name in table_names if name.split(':')[0] not in VERSIONED_BY_TRIGGER]
+            if not table_names:
+                return
+        pending = _pending_versions.__dict__.setdefault(alias, set())
+        pending.update(table_names)
+        # Колбэк на каждый вызов: после отката транзакции ее колбэки пропадают,
+        # а накопленные таблицы уйдут со следующим коммитом
+        transaction.on_commit(lambda: cls.flush(alias), using=alias)
+
+    @classmethod
+    def flush(cls, alias):
+        tables = sorted(_pending_versions.__dict__.pop(alias, ()))
+        if not tables:
+            return
+        db = connections[alias]
+        with transaction.atomic(using=alias):
+            if db.vendor != 'postgresql':
+                for table_name in tables:
+                    updated = cls.objects.using(alias).filter(table_name=table_name).update(
+                        version=models.F('version') + 1
+                    )
+                    if not updated:
+                        cls.objects.using(alias).create(table_name=table_name, version=1)
+                return
+            # Воркеры Flask держат версии в памяти и сбрасывают их по этому сигналу
+            payload = json.dumps({'ns': 'table_versions', 'keys': tables})
+            with db.cursor() as cursor:
+                cursor.execute(BUMP_VERSIONS_SQL, [tables])
+                cursor.execute('SELECT pg_notify(%s, %s)', [INVALIDATION_CHANNEL, payload])
+
+class DriverStats(models.Model):
+    driver = models.OneToOneField(Driver, on_delete=models.CASCADE, primary_key=True,
+                                  related_name='stats', verbose_name='Водитель')
+    orders_total = models.PositiveIntegerField(default=0, verbose_name='Всего заказов')
+    orders_completed = models.PositiveIntegerField(default=0, verbose_name='Завершено заказов')
+    orders_cancelled = models.PositiveIntegerField(default=0, verbose_name='Отменено заказов')
+    km_driven = models.DecimalField(max_digits=12, decimal_places=1, default=0, verbose_name='Пробег по заказам')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Выручка')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Обновлено')
+
+    objects = models.Manager()
+
+    class Meta:
+        verbose_name = 'Показатели водителя'
+        verbose_name_plural = 'Показатели водителей'
+
+    @property
+    def cancellation_rate(self):
+        if not self.orders_total:
+            return 0
+        return round(self.orders_cancelled / self.orders_total, 4)
+
+class DriverDailyStats(models.Model):
+    driver = models.ForeignKey(Driver, on_delete=models.CASCADE, related_name='daily_stats', verbose_name='Водитель')
+    date = models.DateField(verbose_name='Дата')
+    orders_total = models.PositiveIntegerField(default=0, verbose_name='Всего заказов')
+    orders_completed = models.PositiveIntegerField(default=0, verbose_name='Завершено заказов')
+    orders_cancelled = models.PositiveIntegerField(default=0, verbose_name='Отменено заказов')
+    km_driven = models.DecimalField(max_digits=10, decimal_places=1, default=0, verbose_name='Пробег по заказам')
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='Выручка')
+
+    objects = models.Manager()
+
+    class Meta:
+        verbose_name = 'Показатели водителя за день'
+        verbose_name_plural = 'Показатели водителей по дням'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['driver', 'date'], name='unique_driver_daily_stats')
+        ]
+
+class Job(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('done', 'Выполнена'),
+        ('failed', 'Ошибка'),
+    ]
+    kind = models.CharField(max_length=50, verbose_name='Тип задачи')
+    payload = models.JSONField(default=dict, blank=True, verbose_name='Параметры')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued', verbose_name='Статус')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Попыток')
+    max_attempts = models.PositiveIntegerField(default=3, verbose_name='Максимум попыток')
+    run_after = models.DateTimeField(verbose_name='Не раньше')
+    locked_by = models.CharField(max_length=100, blank=True, default='', verbose_name='Обработчик')
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name='Взята в работу')
+    result = models.JSONField(null=True, blank=True, verbose_name='Результат')
+    error = models.TextField(blank=True, default='', verbose_name='Ошибка')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создана')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Обновлена')
+
+    objects = models.Manager()
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx')
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.kind} ({self.get_status_display()})"
+
+    def to_dict(self):
+        return {
+            'id': self.pk,
+            'kind': self.kind,
+            'status': self.status,
+            'status_display': self.get_status_display(),
+            'attempts': self.attempts,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+class OrderEvent(models.Model):
+    EVENT_CHOICES = [
+        (1, 'Создан'),
+        (2, 'Изменен'),
+        (3, 'Смена статуса'),
+        (4, 'Удален'),
+    ]
+    # Без внешнего ключа: история переживает удаление и архивацию заказа
+    order_id = models.BigIntegerField(verbose_name='Заказ')
+    event_type = models.PositiveSmallIntegerField(choices=EVENT_CHOICES, verbose_name='Событие')
+    occurred_at = models.DateTimeField(default=timezone.now, verbose_name='Время')
+    actor = models.CharField(max_length=150, blank=True, default='', verbose_name='Кто изменил')
+    changes = models.JSONField(default=dict, verbose_name='Изменения')
+
+    objects = models.Manager()
+
+    class Meta:
+        verbose_name = 'Событие заказа'
+        verbose_name_plural = 'События заказов'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['order_id', 'id'], name='order_event_order_idx')
+        ]
+
+    def __str__(self):
+        return f"Заказ #{self.order_id}: {self.get_event_type_display()}"
+
+    def save(self, *args, **kwargs):
+        if self.pk:
+            raise ValueError('Журнал событий заказов только дополняется')
+        super().save(*args, **kwargs)
+
+
+class SharedState(models.Model):
+    """Общее состояние воркеров Flask API (кэши, счетчики) при бэкенде postgres."""
+    key = models.CharField(max_length=250, primary_key=True, verbose_name='Ключ')
+    value = models.BinaryField(default=b'', verbose_name='Значение')
+    counter = models.BigIntegerField(default=0, verbose_name='Счетчик')
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True, verbose_name='Истекает')
+
+    objects = models.Manager()
+
+    class Meta:
+        verbose_name = 'Общее состояние API'
+        verbose_name_plural = 'Общее состояние API'
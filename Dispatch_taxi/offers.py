@@ -0,0 +1,259 @@
+"""Координатор предложений заказов водителям.
+
+Открытый заказ без машины и с точкой подачи предлагается одной свободной
+машине на смене, ближайшей по времени подачи. Водитель отвечает через
+Flask API (см. flask_app/offers.py); если ответа нет за
+OFFER_TIMEOUT_SECONDS или водитель отказался, заказ уходит следующей
+машине, но не больше OFFER_MAX_ATTEMPTS раз - дальше назначает оператор.
+
+Таймеры истечения живут в очереди срабатываний процесса, ответы водителей
+и изменения заказов приходят через LISTEN, поэтому таблицы не опрашиваются.
+Принятое предложение координатор применяет к заказу через ORM, чтобы
+сработали сигналы (журнал, показатели, уведомления). Что принять заказ
+может только один водитель, гарантируют ограничения таблицы DriverOffer.
+"""
+import json
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from taxi_shared import queries
+from taxi_shared.offers import (OFFERS_CHANNEL, OFFER_ACCEPTED, OFFER_DECLINED, OFFER_EXPIRED, OFFER_PENDING,
+                                OFFER_WITHDRAWN, offer_message)
+from taxi_shared.routing import haversine_m
+from taxi_shared.scheduling import DispatchQueue
+from .dispatcher import RECONNECT_SECONDS, open_listener, wait_for_notifies
+from .eta import nearest_vehicle_etas
+from .middleware import current_actor
+from .models import DriverOffer, Order, Vehicle
+from .sharding import atomic, connection
+from .shifts import on_shift_vehicles
+from .signals import ORDER_EVENTS_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+OFFER_COORDINATOR_LOCK_KEY = 4610048
+
+# Итог попытки предложить заказ
+OFFERED = 'offered'
+NO_CANDIDATES = 'no_candidates'
+SKIPPED = 'skipped'
+
+
+class OfferQueue(DispatchQueue):
+    """Таймеры координатора и неотвеченные предложения {заказ: предложение}.
+
+    Предложения создает только координатор, а об ответах водителей узнает
+    из уведомлений, поэтому по pending видно, есть ли что отзывать, без
+    запроса к базе на каждое изменение заказа.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.pending = {}
+
+
+def notify_offer(message):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_notify(%s, %s)', [OFFERS_CHANNEL, json.dumps(message)])
+
+
+def needs_offer(order):
+    return order.status == 'in_progress' and order.vehicle_id is None and order.pickup_lat is not None
+
+
+def best_candidate(order):
+    """Свободная машина на смене со свежими координатами, ближайшая к подаче."""
+    with connection.cursor() as cursor:
+        busy = queries.fetch_busy_vehicle_ids(cursor)
+    fresh_after = timezone.now() - timedelta(seconds=settings.OFFER_LOCATION_MAX_AGE_SECONDS)
+    vehicles = list(on_shift_vehicles(
+        Vehicle.objects.exclude(id__in=busy)
+        .exclude(id__in=DriverOffer.objects.filter(order_id=order.pk).values('vehicle_id'))
+        .exclude(id__in=DriverOffer.objects.filter(status=OFFER_PENDING).values('vehicle_id'))
+        .filter(lat__isnull=False, location_updated_at__gte=fresh_after)
+    ))
+    if not vehicles:
+        return None
+    ranked = nearest_vehicle_etas(order, vehicles, limit=1)
+    if ranked:
+        return ranked[0][0]
+    # Матрица ETA еще не собрана - по расстоянию по прямой
+    return min(vehicles, key=lambda v: haversine_m(v.lat, v.lon, order.pickup_lat, order.pickup_lon))
+
+
+def offer_order(order_id):
+    """Предлагает заказ следующей машине. Возвращает (итог, предложение)."""
+    with atomic():
+        order = Order.objects.select_for_update().filter(pk=order_id).first()
+        if order is None or not needs_offer(order):
+            return SKIPPED, None
+        offers = DriverOffer.objects.filter(order_id=order_id)
+        if offers.filter(status__in=(OFFER_PENDING, OFFER_ACCEPTED)).exists():
+            return SKIPPED, None
+        if offers.count() >= settings.OFFER_MAX_ATTEMPTS:
+            logger.info('Заказ %s: водители не ответили, назначение остается оператору', order_id)
+            return SKIPPED, None
+        vehicle = best_candidate(order)
+        if vehicle is None:
+            return NO_CANDIDATES, None
+        offer = DriverOffer.objects.create(
+            order_id=order_id, vehicle=vehicle,
+            expires_at=timezone.now() + timedelta(seconds=settings.OFFER_TIMEOUT_SECONDS)
+        )
+        notify_offer(offer_message('offered', offer, order))
+    return OFFERED, offer
+
+
+def expire_offer(offer_id):
+    """Истекшее предложение закрывается; возвращает заказ, который нужно предложить дальше."""
+    with atomic():
+        offer = DriverOffer.objects.select_for_update().filter(
+            pk=offer_id, status=OFFER_PENDING, expires_at__lte=timezone.now()
+        ).first()
+        if offer is None:
+            return None
+        offer.status = OFFER_EXPIRED
+        offer.save(update_fields=['status'])
+        notify_offer(offer_message(OFFER_EXPIRED, offer))
+    return offer.order_id
+
+
+def withdraw_offers(order_id):
+    """Отзывает неотвеченные предложения заказа, который назначен или закрыт без них."""
+    withdrawn = []
+    with atomic():
+        for offer in DriverOffer.objects.select_for_update().filter(order_id=order_id, status=OFFER_PENDING):
+            offer.status = OFFER_WITHDRAWN
+            offer.save(update_fields=['status'])
+            notify_offer(offer_message(OFFER_WITHDRAWN, offer))
+            withdrawn.append(offer.pk)
+    return withdrawn
+
+
+def apply_acceptance(offer_id):
+    """Назначает машину принятого предложения на заказ."""
+    with atomic():
+        offer = DriverOffer.objects.select_for_update().filter(pk=offer_id, status=OFFER_ACCEPTED).first()
+        if offer is None:
+            return False
+        order = Order.objects.select_for_update().filter(pk=offer.order_id).first()
+        if order is not None and order.vehicle_id == offer.vehicle_id:
+            return True
+        if order is None or order.status != 'in_progress' or order.vehicle_id is not None:
+            # Пока водитель отвечал, заказ отменили или назначили вручную
+            offer.status = OFFER_WITHDRAWN
+            offer.save(update_fields=['status'])
+            notify_offer(offer_message(OFFER_WITHDRAWN, offer))
+            return False
+        order.vehicle_id = offer.vehicle_id
+        order.save()
+        notify_offer(offer_message('assigned', offer, order))
+    logger.info('Заказ %s принят машиной %s', order.pk, offer.vehicle_id)
+    return True
+
+
+def load_state(queue):
+    """Восстанавливает таймеры и незавершенную работу после запуска."""
+    now = time.time()
+    pending = DriverOffer.objects.filter(status=OFFER_PENDING).values_list('id', 'order_id', 'expires_at')
+    for offer_id, order_id, expires_at in pending:
+        queue.schedule(('offer', offer_id), expires_at.timestamp())
+        queue.pending[order_id] = offer_id
+    unapplied = DriverOffer.objects.filter(status=OFFER_ACCEPTED).filter(Exists(
+        Order.objects.filter(pk=OuterRef('order_id'), status='in_progress', vehicle__isnull=True)
+    ))
+    for offer_id in unapplied.values_list('id', flat=True):
+        queue.schedule(('accepted', offer_id), now)
+    waiting = Order.objects.filter(status='in_progress', vehicle__isnull=True, pickup_lat__isnull=False)
+    for order_id in waiting.values_list('id', flat=True).iterator(chunk_size=2000):
+        queue.schedule(('order', order_id), now)
+    return len(queue)
+
+
+def run_task(queue, kind, key):
+    if kind == 'order':
+        outcome, offer = offer_order(key)
+        if outcome == OFFERED:
+            queue.schedule(('offer', offer.pk), offer.expires_at.timestamp())
+            queue.pending[key] = offer.pk
+        elif outcome == NO_CANDIDATES:
+            queue.schedule(('order', key), time.time() + settings.OFFER_RETRY_SECONDS)
+    elif kind == 'offer':
+        order_id = expire_offer(key)
+        if order_id is not None:
+            queue.pending.pop(order_id, None)
+            queue.schedule(('order', order_id), time.time())
+    elif kind == 'accepted':
+        apply_acceptance(key)
+
+
+def fire_due(queue):
+    for (kind, key), _ in queue.pop_due(time.time()):
+        try:
+            run_task(queue, kind, key)
+        except Exception as e:
+            logger.error('Ошибка обработки предложения (%s %s): %s', kind, key, e)
+            queue.schedule((kind, key), time.time() + settings.OFFER_RETRY_SECONDS)
+
+
+def apply_notify(queue, channel, payload):
+    now = time.time()
+    if channel == ORDER_EVENTS_CHANNEL:
+        order_id = payload['order_id']
+        if payload['event'] != 'deleted' and payload['status'] == 'in_progress' and not payload['vehicle_id']:
+            # Заказ уже предложен водителю - ждем ответа или истечения
+            if order_id not in queue.pending:
+                queue.schedule(('order', order_id), now)
+            return
+        queue.cancel(('order', order_id))
+        # Отзывать нужно, только если у заказа есть неотвеченное предложение:
+        # остальные изменения назначенных и закрытых заказов базу не трогают
+        if queue.pending.pop(order_id, None) is not None:
+            for offer_id in withdraw_offers(order_id):
+                queue.cancel(('offer', offer_id))
+    elif payload['event'] == OFFER_ACCEPTED:
+        queue.pending.pop(payload['order_id'], None)
+        queue.cancel(('offer', payload['offer_id']))
+        queue.schedule(('accepted', payload['offer_id']), now)
+    elif payload['event'] == OFFER_DECLINED:
+        queue.pending.pop(payload['order_id'], None)
+        queue.cancel(('offer', payload['offer_id']))
+        queue.schedule(('order', payload['order_id']), now)
+
+
+def serve(listener):
+    queue = OfferQueue()
+    logger.info('Координатор предложений запущен, задач: %s', load_state(queue))
+    while True:
+        fire_due(queue)
+        if not wait_for_notifies(listener, queue.next_fire()):
+            continue
+        while listener.notifies:
+            notify = listener.notifies.pop(0)
+            try:
+                apply_notify(queue, notify.channel, json.loads(notify.payload))
+            except (ValueError, KeyError):
+                logger.warning('Некорректное уведомление %s: %s', notify.channel, notify.payload)
+
+
+def run_offer_coordinator():
+    if connection.vendor != 'postgresql':
+        raise RuntimeError('Координатору предложений нужен PostgreSQL (LISTEN/NOTIFY)')
+    current_actor.set('offers')
+    while True:
+        listener = None
+        try:
+            listener = open_listener(OFFER_COORDINATOR_LOCK_KEY, ORDER_EVENTS_CHANNEL, OFFERS_CHANNEL)
+            serve(listener)
+        except Exception as e:
+            logger.error('Ошибка координатора предложений: %s', e)
+            time.sleep(RECONNECT_SECONDS)
+        finally:
+            if listener is not None:
+                listener.close()
+            connection.close()
@@ -0,0 +1,70 @@
+import json
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .sharding import connection
+
+PARTITION_PREFIX = 'Dispatch_taxi_order_'
+
+
+def ensure_order_partitions(months_ahead=3):
+    """Создает месячные секции заказов от текущего месяца на months_ahead вперед."""
+    if connection.vendor != 'postgresql':
+        return 0
+    today = timezone.now().date()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT dispatch_taxi_ensure_order_partitions(%s, %s)',
+            [today, today + timedelta(days=31 * months_ahead)]
+        )
+        return cursor.fetchone()[0]
+
+
+def list_order_partitions():
+    with connection.cursor() as cursor:
+        cursor.execute('''
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = 'Dispatch_taxi_order'
+            ORDER BY child.relname
+        ''')
+        return cursor.fetchall()
+
+
+def duplicate_order_ids(limit=20):
+    """id заказов, которые встречаются больше одного раза.
+
+    Первичный ключ секционированной таблицы - (id, order_time), так что
+    повтор id база не отклонит, а get(pk=...) на нем упадет.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT id FROM "Dispatch_taxi_order" GROUP BY id HAVING count(*) > 1 ORDER BY id LIMIT %s',
+            [limit]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def scanned_partitions(queryset):
+    """Имена секций, которые PostgreSQL читает для запроса (по EXPLAIN)."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    names = set()
+
+    def walk(node):
+        relation = node.get('Relation Name', '')
+        if relation.startswith(PARTITION_PREFIX):
+            names.add(relation)
+        for child in node.get('Plans', []):
+            walk(child)
+
+    walk(plan[0]['Plan'])
+    return sorted(names)
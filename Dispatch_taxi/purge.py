@@ -0,0 +1,105 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from taxi_shared.archive import STATUS_CODES, archive_rows
+from taxi_shared.queries import order_status_scope
+from .models import Customer, Driver, Operator, Order, TableVersion, Tariff, Vehicle
+from .sharding import atomic, city_file, connection
+
+PURGE_BATCH_SIZE = 1000
+
+ORDER_ARCHIVE_FIELDS = (
+    'id', 'order_time', 'status', 'customer_id', 'vehicle_id',
+    'tariff_id', 'operator_id', 'range', 'tariff__cost_for_km'
+)
+
+SOFT_DELETE_MODELS = {
+    'driver': Driver,
+    'vehicle': Vehicle,
+    'customer': Customer,
+    'tariff': Tariff,
+    'operator': Operator,
+}
+
+
+def fetch_order_rows(queryset, batch_size):
+    rows = list(queryset.order_by('id').values(*ORDER_ARCHIVE_FIELDS)[:batch_size])
+    for row in rows:
+        row['cost_for_km'] = row.pop('tariff__cost_for_km')
+    return rows
+
+
+def archive_and_delete_orders(rows):
+    """Пишет заказы в колоночный архив и удаляет их из таблицы.
+
+    Удаление идет напрямую, без сигналов: архивные заказы остаются в
+    показателях водителей и не должны попадать в ленту событий.
+    """
+    if not rows:
+        return 0
+    archive_rows(city_file(settings.ORDER_ARCHIVE_DIR), rows)
+    ids = [row['id'] for row in rows]
+    with atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{Order._meta.db_table}" WHERE id = ANY(%s)', [ids])
+        TableVersion.bump(Order._meta.db_table, *{order_status_scope(row['status']) for row in rows})
+    return len(ids)
+
+
+def purge_orders(queryset, batch_size=PURGE_BATCH_SIZE):
+    """Удаляет заказы пачками. Завершенные и отмененные сначала уходят в архив."""
+    archived = 0
+    deleted = 0
+    while True:
+        rows = fetch_order_rows(queryset, batch_size)
+        if not rows:
+            return archived, deleted
+        finished = [row for row in rows if row['status'] in STATUS_CODES]
+        archived += archive_and_delete_orders(finished)
+
+        active_ids = [row['id'] for row in rows if row['status'] not in STATUS_CODES]
+        if active_ids:
+            with atomic():
+                Order.objects.filter(pk__in=active_ids).delete()
+            deleted += len(active_ids)
+
+
+def dependent_orders(obj):
+    if isinstance(obj, Driver):
+        return Order.objects.filter(vehicle__driver_id=obj.pk)
+    if isinstance(obj, Vehicle):
+        return Order.objects.filter(vehicle_id=obj.pk)
+    if isinstance(obj, Customer):
+        return Order.objects.filter(customer_id=obj.pk)
+    if isinstance(obj, Tariff):
+        return Order.objects.filter(tariff_id=obj.pk)
+    return Order.objects.filter(operator_id=obj.pk)
+
+
+def purge_object(model_name, pk, batch_size=PURGE_BATCH_SIZE):
+    """Окончательно удаляет мягко удаленную запись вместе с зависимыми заказами."""
+    model = SOFT_DELETE_MODELS[model_name]
+    obj = model.all_objects.filter(pk=pk, deleted_at__isnull=False).first()
+    if obj is None:
+        return {'purged': False}
+
+    archived, deleted = purge_orders(dependent_orders(obj), batch_size)
+    # Автомобили водителя, его карточка и показатели удаляются каскадом
+    obj.delete()
+    return {'purged': True, 'archived_orders': archived, 'deleted_orders': deleted}
+
+
+def purge_expired(older_than=None, batch_size=PURGE_BATCH_SIZE):
+    """Удаляет все записи, помеченные удаленными раньше older_than."""
+    if older_than is None:
+        older_than = timedelta(days=settings.SOFT_DELETE_PURGE_DAYS)
+    cutoff = timezone.now() - older_than
+    purged = {}
+    for model_name, model in SOFT_DELETE_MODELS.items():
+        ids = model.all_objects.filter(deleted_at__lt=cutoff).values_list('pk', flat=True)
+        for pk in list(ids):
+            purge_object(model_name, pk, batch_size)
+            purged[model_name] = purged.get(model_name, 0) + 1
+    return purged
@@ -0,0 +1,14 @@
+from django.conf import settings
+
+from taxi_shared.routing import get_graph
+from .sharding import city_file
+
+ROUTE_POINT_FIELDS = ('pickup_lat', 'pickup_lon', 'dropoff_lat', 'dropoff_lon')
+
+
+def order_route(pickup_lat, pickup_lon, dropoff_lat, dropoff_lon):
+    """Маршрут по графу дорог или None, если граф не собран или точки не связаны."""
+    graph = get_graph(city_file(settings.ROAD_GRAPH_PATH), settings.ROUTE_CACHE_SIZE)
+    if graph is None:
+        return None
+    return graph.route(pickup_lat, pickup_lon, dropoff_lat, dropoff_lon)
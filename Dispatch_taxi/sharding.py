@@ -0,0 +1,123 @@
+"""Маршрутизация запросов к базе города (см. taxi_shared/sharding.py).
+
+Город запроса выбирает CityMiddleware, фоновых процессов - переменная
+TAXI_CITY. Модели приложения роутер направляет в базу текущего города;
+пользователи, сессии и остальные встроенные приложения Django живут
+в основной базе. Код, которому нужно сырое соединение или транзакция,
+берет их отсюда (connection, atomic, on_commit), а не из django.db,
+иначе запрос уйдет в основную базу.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from taxi_shared.sharding import city_name, city_path
+
+APP_LABEL = 'Dispatch_taxi'
+# Общие для всех городов таблицы (состояние API) живут в основной базе
+GLOBAL_MODELS = {'sharedstate'}
+
+current_city = ContextVar('current_city', default=None)
+
+
+def city_code():
+    return current_city.get() or settings.TAXI_CITY
+
+
+def database_alias(city=None):
+    city = city or city_code()
+    if city not in settings.CITIES:
+        raise KeyError(f'Неизвестный город: {city}')
+    return DEFAULT_DB_ALIAS if city == settings.DEFAULT_CITY else city
+
+
+def city_file(path):
+    """Путь файла или каталога текущего города."""
+    return city_path(path, city_code(), settings.DEFAULT_CITY)
+
+
+class CityConnection:
+    """Соединение с базой текущего города (аналог django.db.connection)."""
+
+    def __getattr__(self, item):
+        return getattr(connections[database_alias()], item)
+
+
+connection = CityConnection()
+
+
+def atomic(savepoint=True):
+    return transaction.atomic(using=database_alias(), savepoint=savepoint)
+
+
+def on_commit(func):
+    transaction.on_commit(func, using=database_alias())
+
+
+@contextmanager
+def use_city(city):
+    """Выполняет блок в базе города."""
+    database_alias(city)
+    token = current_city.set(city)
+    try:
+        yield
+    finally:
+        current_city.reset(token)
+
+
+class CityRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != APP_LABEL or model._meta.model_name in GLOBAL_MODELS:
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return database_alias()
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Связи между базами невозможны; встроенные модели (пользователи)
+        # лежат только в основной базе
+        return obj1._state.db == obj2._state.db
+
+    def allow_migrate(self, db, app_label, **hints):
+        return True
+
+
+def _run_in_city(city, func):
+    try:
+        with use_city(city):
+            return func()
+    finally:
+        # Соединения потока пула больше никому не понадобятся
+        connections.close_all()
+
+
+def fan_out(func, cities=None):
+    """{город: func()} - func выполняется параллельно в базе каждого города.
+
+    Запросы к разным базам не ждут друг друга, поэтому сводка по всем
+    городам занимает время самого медленного из них.
+    """
+    cities = list(cities or settings.CITIES)
+    with ThreadPoolExecutor(max_workers=len(cities), thread_name_prefix='city') as pool:
+        futures = {city: pool.submit(_run_in_city, city, func) for city in cities}
+        return {city: future.result() for city, future in futures.items()}
+
+
+def city_choices():
+    return [(city, city_name(city)) for city in settings.CITIES]
+
+
+def cities(request):
+    """Контекстный процессор: переключатель города в шапке."""
+    code = city_code()
+    return {
+        'current_city': code,
+        'current_city_name': city_name(code),
+        'cities': city_choices() if len(settings.CITIES) > 1 else [],
+    }
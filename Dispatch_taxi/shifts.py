@@ -0,0 +1,41 @@
+from datetime import timedelta
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.utils import timezone
+
+from taxi_shared.shifts import OVERRIDE_HISTORY_DAYS, Override, Schedule, get_calendar, time_to_minutes
+from .cache import data_version
+from .models import Driver, ShiftOverride, ShiftSchedule
+from .sharding import city_code
+
+
+def load_shifts():
+    schedules = [
+        Schedule(s.driver_id, s.weekday, time_to_minutes(s.start_time), time_to_minutes(s.end_time),
+                 s.valid_from, s.valid_until)
+        for s in ShiftSchedule.objects.filter(driver__deleted_at__isnull=True)
+    ]
+    since = timezone.localdate() - timedelta(days=OVERRIDE_HISTORY_DAYS)
+    overrides = [
+        Override(o.driver_id, o.date, o.kind, time_to_minutes(o.start_time), time_to_minutes(o.end_time))
+        for o in ShiftOverride.objects.filter(driver__deleted_at__isnull=True, date__gte=since)
+    ]
+    return schedules, overrides
+
+
+def shift_calendar():
+    """Календарь смен процесса; пересобирается при изменении смен или водителей."""
+    version = data_version(ShiftSchedule, ShiftOverride, Driver)
+    return get_calendar(version, load_shifts, ZoneInfo(settings.SHIFT_TIME_ZONE), city_code())
+
+
+def on_shift_vehicles(queryset, moment=None):
+    """Оставляет автомобили, чьи водители на смене.
+
+    Пока расписание не заведено ни для кого, фильтр не применяется.
+    """
+    calendar = shift_calendar()
+    if calendar.is_empty:
+        return queryset
+    return queryset.filter(driver_id__in=calendar.on_shift(moment or timezone.now()))
@@ -0,0 +1,107 @@
+import json
+
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from taxi_shared.order_history import TRACKED_FIELDS, diff_states, event_type_for
+from taxi_shared.queries import order_status_scope
+from . import driver_stats, workload
+from .middleware import current_actor
+from .models import DriverOffer, Job, Operator, OperatorWorkload, Order, OrderEvent, SharedState, TableVersion
+from .sharding import connection
+
+ORDER_EVENTS_CHANNEL = 'order_events'
+
+
+def notify_order_event(event, order, previous_status=None):
+    # NOTIFY транзакционный: слушатели получат событие только после коммита
+    payload = {
+        'event': event,
+        'order_id': order.pk,
+        'status': order.status,
+        'previous_status': previous_status,
+        'customer_id': order.customer_id,
+        'vehicle_id': order.vehicle_id,
+        'tariff_id': order.tariff_id,
+        'operator_id': order.operator_id,
+        'order_time': order.order_time.isoformat() if order.order_time else None,
+        'pickup_at': order.pickup_at.isoformat() if order.pickup_at else None,
+        'distance': float(order.range) if order.range is not None else 0,
+    }
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_notify(%s, %s)', [ORDER_EVENTS_CHANNEL, json.dumps(payload)])
+
+
+def record_order_event(order_id, previous_state, new_state):
+    """Дописывает событие в журнал. Вызывается внутри транзакции Order.save/delete."""
+    changes = diff_states(previous_state, new_state)
+    if previous_state is not None and new_state is not None and not changes:
+        return None
+    return OrderEvent.objects.create(
+        order_id=order_id,
+        event_type=event_type_for(previous_state, new_state, changes),
+        actor=current_actor.get(),
+        changes=changes
+    )
+
+
+def bump_status_scopes(*statuses):
+    TableVersion.bump(*{order_status_scope(status) for status in statuses if status})
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_status(sender, instance, **kwargs):
+    instance._previous_status = None
+    instance._previous_state = None
+    if instance.pk:
+        instance._previous_state = Order.objects.filter(pk=instance.pk).values(*TRACKED_FIELDS).first()
+        if instance._previous_state:
+            instance._previous_status = instance._previous_state['status']
+    instance.refresh_pricing(instance._previous_state)
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, **kwargs):
+    previous_state = getattr(instance, '_previous_state', None)
+    new_state = driver_stats.order_state(instance)
+    record_order_event(instance.pk, previous_state, new_state)
+    driver_stats.order_changed(previous_state, new_state)
+    workload.order_changed(previous_state, new_state)
+    bump_status_scopes(getattr(instance, '_previous_status', None), instance.status)
+    if created:
+        notify_order_event('created', instance)
+        return
+    previous_status = getattr(instance, '_previous_status', None)
+    if previous_status != instance.status:
+        notify_order_event('status_changed', instance, previous_status)
+    else:
+        notify_order_event('updated', instance, previous_status)
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    state = driver_stats.order_state(instance)
+    record_order_event(instance.pk, state, None)
+    driver_stats.order_changed(state, None)
+    workload.order_changed(state, None)
+    bump_status_scopes(instance.status)
+    notify_order_event('deleted', instance)
+
+
+@receiver(post_save, sender=Operator)
+def operator_saved(sender, instance, created, **kwargs):
+    if created:
+        OperatorWorkload.objects.get_or_create(operator=instance)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_table_version(sender, **kwargs):
+    # Версии таблиц используются для ETag и инвалидации кэшей во Flask API;
+    # на PostgreSQL их повышает триггер, и bump() для таких таблиц пропускается
+    if sender._meta.app_label != 'Dispatch_taxi' or sender in (TableVersion, Job, OrderEvent, SharedState, OperatorWorkload,
+                                                               DriverOffer):
+        return
+    TableVersion.bump(sender._meta.db_table)
@@ -0,0 +1,62 @@
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Avg
+from django.utils import timezone
+
+from taxi_shared.simulation import Scenario, synthetic_scenario
+from .models import Operator, Order, Tariff, Vehicle
+
+
+def day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def historical_scenario(day, vehicles=None, operators=None, seed=0, **kwargs):
+    """Сценарий по заказам дня с точкой подачи. Возвращает (сценарий, пропущено заказов).
+
+    Парк - машины с известными координатами; если их меньше vehicles,
+    недостающие ставятся в точки подачи случайных заказов дня.
+    """
+    start, end = day_bounds(day)
+    orders = Order.objects.filter(order_time__gte=start, order_time__lt=end)
+    rows = list(orders.filter(pickup_lat__isnull=False).values_list(
+        'order_time', 'pickup_lat', 'pickup_lon', 'dropoff_lat', 'dropoff_lon', 'range', 'tariff__cost_for_km'
+    ))
+    skipped = orders.count() - len(rows)
+    if not rows:
+        raise ValueError(f'За {day} нет заказов с точкой подачи')
+
+    default_cost = float(Tariff.objects.aggregate(cost=Avg('cost_for_km'))['cost'] or 0)
+    times = [(row[0] - start).total_seconds() for row in rows]
+    pickup_lat = np.array([row[1] for row in rows])
+    pickup_lon = np.array([row[2] for row in rows])
+    # Без точки назначения машина остается в точке подачи
+    dropoff_lat = np.array([row[3] if row[3] is not None else row[1] for row in rows])
+    dropoff_lon = np.array([row[4] if row[4] is not None else row[2] for row in rows])
+    distance_km = [float(row[5]) for row in rows]
+    cost_per_km = [float(row[6]) if row[6] is not None else default_cost for row in rows]
+
+    fleet = list(Vehicle.objects.filter(lat__isnull=False).values_list('lat', 'lon'))
+    vehicles = vehicles or len(fleet) or Vehicle.objects.count() or 1
+    fleet = fleet[:vehicles]
+    if len(fleet) < vehicles:
+        rng = np.random.default_rng(seed)
+        picks = rng.integers(len(rows), size=vehicles - len(fleet))
+        fleet += list(zip(pickup_lat[picks], pickup_lon[picks]))
+    vehicle_lat, vehicle_lon = (np.array(values) for values in zip(*fleet))
+
+    scenario = Scenario(
+        times, pickup_lat, pickup_lon, dropoff_lat, dropoff_lon, distance_km, cost_per_km,
+        vehicle_lat, vehicle_lon, operators or Operator.objects.count(), seed=seed, **kwargs
+    )
+    return scenario, skipped
+
+
+def city_scenario(orders, vehicles, operators, seed=0, **kwargs):
+    """Синтетические сутки в границах города из ETA_GRID_BBOX с текущими тарифами."""
+    costs = [float(cost) for cost in Tariff.objects.values_list('cost_for_km', flat=True)] or [30.0]
+    return synthetic_scenario(orders, vehicles, operators, settings.ETA_GRID_BBOX,
+                              cost_per_km=costs, seed=seed, **kwargs)
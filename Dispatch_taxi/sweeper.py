@@ -0,0 +1,118 @@
+"""Отмена зависших заказов.
+
+Заказ, который дольше STALE_ORDER_TIMEOUTS[статус] минут остается
+открытым, держит машину занятой и искажает счетчики. Зависшие заказы
+выбираются по частичному индексу order_open_status_time_idx и переводятся
+в STALE_ORDER_STATUS пачками: каждая пачка - один UPDATE ... RETURNING в
+своей короткой транзакции, строки, заблокированные другими транзакциями,
+пропускаются (SKIP LOCKED) и достанутся следующему проходу.
+
+Массовый UPDATE обходит сигналы модели, поэтому журнал событий,
+показатели водителей, нагрузка операторов, версии таблиц и NOTIFY
+обновляются здесь же, в транзакции пачки.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from taxi_shared.order_history import EVENT_STATUS_CHANGED, TRACKED_FIELDS, diff_states
+from . import driver_stats, workload
+from .models import Order, OrderEvent, TableVersion
+from .sharding import atomic, connection
+from .signals import bump_status_scopes, notify_order_event
+
+logger = logging.getLogger(__name__)
+
+SWEEPER_ACTOR = 'sweeper'
+SWEEP_BATCH_SIZE = 200
+
+RETURNED_FIELDS = [field for field in TRACKED_FIELDS if field != 'status']
+
+# Открытым считается время с создания, а для запланированного заказа - с передачи в работу
+SWEEP_BATCH_SQL = f'''
+    UPDATE "{Order._meta.db_table}" AS o
+    SET status = %(target)s
+    FROM (
+        SELECT id, order_time
+        FROM "{Order._meta.db_table}"
+        WHERE status = %(status)s
+          AND order_time < %(cutoff)s
+          AND (dispatched_at IS NULL OR dispatched_at < %(cutoff)s)
+        ORDER BY order_time
+        LIMIT %(limit)s
+        FOR UPDATE SKIP LOCKED
+    ) AS stale
+    WHERE o.id = stale.id AND o.order_time = stale.order_time
+    RETURNING o.id, {', '.join(f'o.{field}' for field in RETURNED_FIELDS)}
+'''
+
+
+def stale_cutoffs(now=None):
+    """Статус -> граница: открытые раньше нее заказы считаются зависшими."""
+    now = now or timezone.now()
+    return {status: now - timedelta(minutes=minutes)
+            for status, minutes in settings.STALE_ORDER_TIMEOUTS.items()}
+
+
+def stale_orders(status, cutoff):
+    return Order.objects.filter(status=status, order_time__lt=cutoff).filter(
+        Q(dispatched_at__isnull=True) | Q(dispatched_at__lt=cutoff)
+    )
+
+
+def sweep_batch(status, cutoff, target, batch_size):
+    """Переводит одну пачку зависших заказов. Возвращает число переведенных."""
+    with atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(SWEEP_BATCH_SQL, {
+                'target': target, 'status': status, 'cutoff': cutoff, 'limit': batch_size
+            })
+            rows = cursor.fetchall()
+        if not rows:
+            return 0
+        order_ids = [row[0] for row in rows]
+        transitions = []
+        for row in rows:
+            previous_state = dict(zip(RETURNED_FIELDS, row[1:]), status=status)
+            transitions.append((previous_state, dict(previous_state, status=target)))
+
+        now = timezone.now()
+        OrderEvent.objects.bulk_create([
+            OrderEvent(order_id=order_id, event_type=EVENT_STATUS_CHANGED, occurred_at=now,
+                       actor=SWEEPER_ACTOR, changes=diff_states(previous_state, new_state))
+            for order_id, (previous_state, new_state) in zip(order_ids, transitions)
+        ])
+        driver_stats.orders_changed(transitions)
+        workload.orders_changed(transitions)
+        TableVersion.bump(Order._meta.db_table)
+        bump_status_scopes(status, target)
+        for order_id, (_, new_state) in zip(order_ids, transitions):
+            notify_order_event('status_changed', Order(id=order_id, **new_state), status)
+    return len(rows)
+
+
+def sweep_stale_orders(batch_size=SWEEP_BATCH_SIZE, now=None):
+    """Отменяет все зависшие заказы. Возвращает отчет о проделанной работе."""
+    started = time.monotonic()
+    target = settings.STALE_ORDER_STATUS
+    report = {'orders': 0, 'batches': 0, 'by_status': {}}
+    for status, cutoff in stale_cutoffs(now).items():
+        swept = 0
+        while True:
+            count = sweep_batch(status, cutoff, target, batch_size)
+            if not count:
+                break
+            swept += count
+            report['batches'] += 1
+            if count < batch_size:
+                break
+        report['by_status'][status] = swept
+        report['orders'] += swept
+    report['seconds'] = round(time.monotonic() - started, 3)
+    if report['orders']:
+        logger.info('Отменено зависших заказов: %s за %s с', report['orders'], report['seconds'])
+    return report
@@ -3,6 +3,7 @@ from . import views
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('cities/', views.city_overview, name='city_overview'),
 
     path('drivers/', views.driver_list, name='driver_list'),
     path('drivers/<int:pk>/', views.driver_detail, name='driver_detail'),
@@ -21,6 +22,7 @@ urlpatterns = [
     path('orders/create/', views.order_create, name='order_create'),
     path('orders/<int:pk>/edit/', views.order_edit, name='order_edit'),
     path('orders/<int:pk>/delete/', views.order_delete, name='order_delete'),
+    path('orders/export/', views.order_export, name='order_export'),
 
     path('customers/', views.customer_list, name='customer_list'),
     path('customers/<int:pk>/', views.customer_detail, name='customer_detail'),
@@ -38,5 +40,18 @@ urlpatterns = [
     path('operators/<int:pk>/edit/', views.operator_edit, name='operator_edit'),
     path('operators/<int:pk>/delete/', views.operator_delete, name='operator_delete'),
 
+    path('zones/', views.zone_list, name='zone_list'),
+    path('zones/create/', views.zone_create, name='zone_create'),
+    path('zones/<int:pk>/edit/', views.zone_edit, name='zone_edit'),
+    path('zones/<int:pk>/delete/', views.zone_delete, name='zone_delete'),
+
+    path('shifts/', views.shift_list, name='shift_list'),
+    path('shifts/schedule/create/', views.shift_schedule_create, name='shift_schedule_create'),
+    path('shifts/schedule/<int:pk>/delete/', views.shift_schedule_delete, name='shift_schedule_delete'),
+    path('shifts/overrides/create/', views.shift_override_create, name='shift_override_create'),
+    path('shifts/overrides/<int:pk>/delete/', views.shift_override_delete, name='shift_override_delete'),
+
+    path('jobs/<int:pk>/', views.job_status, name='job_status'),
+
     path('api/proxy/', views.api_proxy, name='api_proxy'),
 ]
\ No newline at end of file
@@ -1,25 +1,42 @@
+from datetime import date, timedelta
+
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.db import models
 from django.db.models import Q
+from django.utils import timezone
 from .flask_client import FlaskAPIClient
+from .cache import cache_view_on_versions, data_version
+from .driver_stats import driver_scorecard
+from .eta import attach_pickup_etas, nearest_vehicle_etas
+from .sharding import city_choices, connection, fan_out
+from .shifts import on_shift_vehicles, shift_calendar
+from .workload import assign_operator
+from taxi_shared import queries
 
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
-from .models import Driver, Vehicle, Order, Customer, Tariff, Operator
-from .forms import DriverForm, DriverInfoForm, VehicleForm, OrderForm, CustomerForm, TariffForm, OperatorForm
+from .models import (Driver, Vehicle, Order, Customer, Tariff, Operator, Job, Zone, ShiftSchedule, ShiftOverride,
+                     DriverOffer)
+from . import jobs
+from .forms import (DriverForm, DriverInfoForm, VehicleForm, OrderForm, CustomerForm, TariffForm, OperatorForm, ZoneForm,
+                    ShiftScheduleForm, ShiftOverrideForm)
+
+def soft_delete(obj):
+    # Запись сразу скрывается, а заказы удаляются фоновой задачей небольшими пачками
+    obj.soft_delete()
+    jobs.enqueue(
+        'purge_deleted',
+        {'model': obj._meta.model_name, 'id': obj.pk},
+        delay=timedelta(days=settings.SOFT_DELETE_PURGE_DAYS)
+    )
 
 def index(request):
-    stats = {
-        'total_drivers': Driver.objects.count(),
-        'total_vehicles': Vehicle.objects.count(),
-        'active_orders': Order.objects.filter(status='in_progress').count(),
-        'total_orders': Order.objects.count(),
-        'total_customers' : Customer.objects.count(),
-        'total_tariffs' : Tariff.objects.count()
-    }
+    with connection.cursor() as cursor:
+        stats = queries.fetch_counts(cursor)
     flask_stats = FlaskAPIClient.get_statistics()
 
     return render(request, 'index.html', {
@@ -27,6 +44,22 @@ def index(request):
         'flask_stats': flask_stats if flask_stats.get('success') else None,
     })
 
+def city_summary():
+    with connection.cursor() as cursor:
+        stats = queries.fetch_counts(cursor)
+        stats['revenue'] = queries.fetch_revenue(cursor)
+    return stats
+
+def city_overview(request):
+    # Базы городов опрашиваются параллельно
+    summaries = fan_out(city_summary)
+    rows = [(city, name, summaries[city]) for city, name in city_choices()]
+    totals = {key: sum(stats[key] for stats in summaries.values())
+              for key in ('total_orders', 'active_orders', 'total_drivers', 'total_vehicles', 'revenue')}
+
+    return render(request, 'city_overview.html', {'rows': rows, 'totals': totals})
+
+@cache_view_on_versions(Driver)
 def driver_list(request):
     drivers_list = Driver.objects.all()
     search = request.GET.get('search', '')
@@ -37,7 +70,8 @@ def driver_list(request):
 
     return render(request, 'driver_list.html', {
         'search': search,
-        'drivers_list': drivers_list
+        'drivers_list': drivers_list,
+        'data_version': data_version(Driver)
     })
 
 def driver_detail(request, pk):
@@ -47,9 +81,13 @@ def driver_detail(request, pk):
     except:
         driver_info = None
 
+    driver_stats, daily_stats = driver_scorecard(driver.pk)
+
     return render(request, 'driver_detail.html', {
         'driver': driver,
         'driver_info': driver_info,
+        'driver_stats': driver_stats,
+        'daily_stats': daily_stats,
     })
 
 
@@ -121,11 +159,12 @@ def driver_edit(request, pk):
 def driver_delete(request, pk):
     driver = get_object_or_404(Driver, pk=pk)
     if request.method == 'POST':
-        driver.delete()
+        soft_delete(driver)
         messages.success(request, 'Водитель удален!')
         return redirect('driver_list')
     return render(request, 'driver_confirm_delete.html', {'driver': driver })
 
+@cache_view_on_versions(Vehicle)
 def vehicle_list(request):
     vehicles_list = Vehicle.objects.all()
     search = request.GET.get('search', '')
@@ -133,7 +172,8 @@ def vehicle_list(request):
     return render(request, 'vehicle_list.html', {
         'search': search,
         'vehicles_list': vehicles_list,
-        'colors': Vehicle.COLORS
+        'colors': Vehicle.COLORS,
+        'data_version': data_version(Vehicle)
     })
 
 
@@ -188,7 +228,7 @@ def vehicle_delete(request, pk):
             messages.error(request, 'Нельзя удалить автомобиль, у которого есть заказы!')
             return redirect('vehicle_detail', pk=vehicle.pk)
 
-        vehicle.delete()
+        soft_delete(vehicle)
         messages.success(request, 'Автомобиль удален!')
         return redirect('vehicle_list')
     return render(request, 'vehicle_confirm_delete.html', { 'vehicle': vehicle })
@@ -259,13 +299,14 @@ def customer_delete(request, pk):
             messages.error(request, 'Нельзя удалить клиента, у которого есть заказы!')
             return redirect('customer_detail', pk=customer.pk)
 
-        customer.delete()
+        soft_delete(customer)
         messages.success(request, 'Клиент удален!')
         return redirect('customer_list')
 
     return render(request, 'customer_confirm_delete.html', {'customer': customer})
 
 
+@cache_view_on_versions(Tariff)
 def tariff_list(request):
     tariffs_list = Tariff.objects.all().order_by('name')
     search = request.GET.get('search', '')
@@ -273,6 +314,7 @@ def tariff_list(request):
     return render(request, 'tariff_list.html', {
         'tariffs_list': tariffs_list,
         'search': search,
+        'data_version': data_version(Tariff),
     })
 
 def tariff_create(request):
@@ -313,19 +355,20 @@ def tariff_delete(request, pk):
     tariff = get_object_or_404(Tariff, pk=pk)
 
     if request.method == 'POST':
-
-        tariff.delete()
+        soft_delete(tariff)
         messages.success(request, 'Тариф удален!')
         return redirect('tariff_list')
 
     return render(request, 'tariff_confirm_delete.html', {'tariff': tariff})
 
 
+@cache_view_on_versions(Operator)
 def operator_detail(request):
     operators = Operator.objects.all()
 
     return render(request, 'operator_detail.html', {
         'operators': operators,
+        'data_version': data_version(Operator),
     })
 
 def operator_create(request):
@@ -368,16 +411,143 @@ def operator_delete(request, pk):
         if Order.objects.filter(operator=operator).exists():
             messages.error(request, 'Нельзя удалить оператора, который обслуживает заказы!')
             return redirect('operator_detail')
-        operator.delete()
+        soft_delete(operator)
         messages.success(request, 'Оператор удален!')
         return redirect('operator_detail')
 
     return render(request, 'operator_confirm_delete.html', {'operator': operator})
 
+# Число заказов зоны меняется записями заказов, поэтому ключ - обе таблицы
+@cache_view_on_versions(Zone, Order)
+def zone_list(request):
+    zones = Zone.objects.annotate(orders_count=models.Count('orders'))
+
+    return render(request, 'zone_list.html', {
+        'zones': zones,
+        'data_version': data_version(Zone, Order),
+    })
+
+def zone_create(request):
+    if request.method == 'POST':
+        form = ZoneForm(request.POST)
+        if form.is_valid():
+            form.save()
+            messages.success(request, 'Зона добавлена!')
+            return redirect('zone_list')
+    else:
+        form = ZoneForm()
+
+    return render(request, 'zone_form.html', {
+        'form': form,
+        'title': 'Добавить зону'
+    })
+
+def zone_edit(request, pk):
+    zone = get_object_or_404(Zone, pk=pk)
+
+    if request.method == 'POST':
+        form = ZoneForm(request.POST, instance=zone)
+        if form.is_valid():
+            form.save()
+            messages.success(request, 'Зона обновлена! Зоны старых заказов пересчитывает команда assign_order_zones.')
+            return redirect('zone_list')
+    else:
+        form = ZoneForm(instance=zone)
+
+    return render(request, 'zone_form.html', {
+        'form': form,
+        'title': 'Редактировать зону',
+        'zone': zone
+    })
+
+def zone_delete(request, pk):
+    zone = get_object_or_404(Zone, pk=pk)
+
+    if request.method == 'POST':
+        # У заказов зона подачи обнуляется (SET_NULL)
+        zone.delete()
+        messages.success(request, 'Зона удалена!')
+        return redirect('zone_list')
+
+    return render(request, 'zone_confirm_delete.html', {'zone': zone})
+
+def shift_list(request):
+    calendar = shift_calendar()
+    today = timezone.localdate(timezone=calendar.tz)
+    try:
+        week_start = date.fromisoformat(request.GET.get('week', ''))
+    except ValueError:
+        week_start = today
+    week_start -= timedelta(days=week_start.weekday())
+
+    coverage = calendar.coverage(week_start)
+    days = [(week_start + timedelta(days=offset), hours) for offset, hours in enumerate(coverage)]
+    on_duty = Driver.objects.filter(pk__in=calendar.on_shift(timezone.now())).order_by('full_name')
+
+    return render(request, 'shift_list.html', {
+        'days': days,
+        'hours': range(24),
+        'week_start': week_start,
+        'previous_week': week_start - timedelta(days=7),
+        'next_week': week_start + timedelta(days=7),
+        'on_duty': on_duty,
+        'schedules': ShiftSchedule.objects.select_related('driver').filter(driver__deleted_at__isnull=True),
+        'overrides': ShiftOverride.objects.select_related('driver').filter(date__gte=today),
+    })
+
+def shift_schedule_create(request):
+    if request.method == 'POST':
+        form = ShiftScheduleForm(request.POST)
+        if form.is_valid():
+            form.save()
+            messages.success(request, 'Смена добавлена в расписание!')
+            return redirect('shift_list')
+    else:
+        form = ShiftScheduleForm(initial={'driver': request.GET.get('driver')})
+
+    return render(request, 'shift_form.html', {
+        'form': form,
+        'title': 'Добавить смену в расписание'
+    })
+
+def shift_override_create(request):
+    if request.method == 'POST':
+        form = ShiftOverrideForm(request.POST)
+        if form.is_valid():
+            form.save()
+            messages.success(request, 'Исключение из расписания добавлено!')
+            return redirect('shift_list')
+    else:
+        form = ShiftOverrideForm(initial={'driver': request.GET.get('driver')})
+
+    return render(request, 'shift_form.html', {
+        'form': form,
+        'title': 'Добавить выходной или дополнительную смену'
+    })
+
+def shift_schedule_delete(request, pk):
+    schedule = get_object_or_404(ShiftSchedule, pk=pk)
+
+    if request.method == 'POST':
+        schedule.delete()
+        messages.success(request, 'Смена удалена из расписания!')
+        return redirect('shift_list')
+
+    return render(request, 'shift_confirm_delete.html', {'shift': schedule})
+
+def shift_override_delete(request, pk):
+    override = get_object_or_404(ShiftOverride, pk=pk)
+
+    if request.method == 'POST':
+        override.delete()
+        messages.success(request, 'Исключение из расписания удалено!')
+        return redirect('shift_list')
+
+    return render(request, 'shift_confirm_delete.html', {'shift': override})
+
 def get_busy_vehicles():
-    return Order.objects.filter(
-        status__in=['assigned', 'in_progress']
-    ).values_list('vehicle_id', flat=True)
+    with connection.cursor() as cursor:
+        return queries.fetch_busy_vehicle_ids(cursor)
 
 def order_list(request):
     orders_list = Order.objects.all().select_related('customer', 'vehicle', 'tariff')
@@ -413,6 +583,9 @@ def order_list(request):
         else:
             orders_list = orders_list.order_by(sort)
 
+    orders_list = list(orders_list)
+    attach_pickup_etas(orders_list)
+
     return render(request, 'order_list.html', {
         'orders_list': orders_list,
         'search': search,
@@ -422,13 +595,21 @@ def order_list(request):
         'sort': sort,
         'status_choices': Order.STATUS_CHOICES,
         'flask_orders': flask_orders if flask_orders.get('success') else None,
+        'order_events_url': FlaskAPIClient.order_events_url(),
     })
 
 
 def order_detail(request, pk):
     order = get_object_or_404(Order, pk=pk)
+    attach_pickup_etas([order])
+    nearest_vehicles = []
+    if order.status == 'in_progress' and order.vehicle is None:
+        free_vehicles = on_shift_vehicles(Vehicle.objects.exclude(id__in=get_busy_vehicles()).filter(lat__isnull=False))
+        nearest_vehicles = nearest_vehicle_etas(order, list(free_vehicles))
     return render(request, 'order_detail.html', {
-        'order': order
+        'order': order,
+        'nearest_vehicles': nearest_vehicles,
+        'offers': DriverOffer.objects.filter(order_id=order.pk).select_related('vehicle')
     })
 
 def order_create(request):
@@ -438,10 +619,15 @@ def order_create(request):
         form = OrderForm(request.POST)
         if form.is_valid():
             order = form.save(commit=False)
-            order.operator=Operator.objects.first()
-            order.save()
-            messages.success(request, 'Заказ успешно создан!')
-            return redirect('order_detail', pk=order.pk)
+            with assign_operator() as operator:
+                order.operator = operator
+                if operator is not None:
+                    order.save()
+            if order.operator is None:
+                messages.error(request, 'Нет операторов, которым можно передать заказ!')
+            else:
+                messages.success(request, f'Заказ успешно создан! Оператор: {order.operator}')
+                return redirect('order_detail', pk=order.pk)
     else:
         initial_data = {}
         if customer_id:
@@ -458,9 +644,9 @@ def order_create(request):
                 messages.warning(request, 'Оператор не найден!')
         form = OrderForm(initial=initial_data)
         busy_vehicles = get_busy_vehicles()
-        form.fields['vehicle'].queryset = Vehicle.objects.exclude(
+        form.fields['vehicle'].queryset = on_shift_vehicles(Vehicle.objects.exclude(
             id__in=busy_vehicles
-        ).order_by('license_plate')
+        )).order_by('license_plate')
 
     return render(request, 'order_form.html', {
         'form': form,
@@ -482,7 +668,7 @@ def order_edit(request, pk):
     else:
         form = OrderForm(instance=order)
         busy_vehicles = get_busy_vehicles()
-        available_vehicles = Vehicle.objects.exclude(id__in=busy_vehicles)
+        available_vehicles = on_shift_vehicles(Vehicle.objects.exclude(id__in=busy_vehicles))
         if order.vehicle:
             available_vehicles = available_vehicles | Vehicle.objects.filter(id=order.vehicle.id)
 
@@ -506,6 +692,18 @@ def order_delete(request, pk):
     })
 
 
+@require_http_methods(["POST"])
+def order_export(request):
+    job = jobs.enqueue('export_orders', {'status': request.POST.get('status', '')})
+    messages.success(request, f'Выгрузка заказов поставлена в очередь (задача #{job.pk})')
+    return redirect('order_list')
+
+
+def job_status(request, pk):
+    job = get_object_or_404(Job, pk=pk)
+    return JsonResponse({'success': True, 'job': job.to_dict()})
+
+
 @csrf_exempt
 @require_http_methods(["GET", "POST"])
 def api_proxy(request):
@@ -0,0 +1,142 @@
+from collections import Counter
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from taxi_shared.workload import OPEN_STATUSES, WorkloadBalancer, open_operator
+from .models import Operator, OperatorWorkload, Order
+from .sharding import atomic, city_code, on_commit
+
+
+def load_online():
+    cutoff = timezone.now() - timedelta(seconds=settings.OPERATOR_PRESENCE_TIMEOUT)
+    rows = OperatorWorkload.objects.filter(
+        is_online=True, last_seen_at__gte=cutoff, operator__deleted_at__isnull=True
+    ).values_list('operator_id', 'open_orders', 'last_assigned_at')
+    return [(pk, count, assigned.timestamp() if assigned else 0.0) for pk, count, assigned in rows]
+
+
+balancers = {}
+
+
+def balancer():
+    """Куча нагрузки операторов текущего города."""
+    city = city_code()
+    heap = balancers.get(city)
+    if heap is None:
+        heap = balancers.setdefault(city, WorkloadBalancer(load_online, settings.WORKLOAD_RESYNC_SECONDS))
+    return heap
+
+
+@contextmanager
+def assign_operator():
+    """Наименее загруженный оператор на линии; если на линии никого нет -
+    наименее загруженный из всех.
+
+    Блок должен сохранить заказ с этим оператором. До коммита заказ учтен
+    в куче процесса резервом, и параллельные запросы выберут другого
+    оператора. Резерв снимается после коммита, когда заказ уже учтен через
+    order_changed, или сразу, если блок завершился ошибкой.
+    """
+    heap = balancer()
+    reservation = heap.reserve(timezone.now().timestamp())
+    operator_id, token = reservation or (None, None)
+    try:
+        operator = Operator.objects.filter(pk=operator_id).first() if operator_id else None
+        yield operator or least_loaded_operator()
+    except BaseException:
+        if token:
+            heap.release(token)
+        raise
+    if token:
+        # Вне транзакции выполняется сразу; при откате резерв остается до
+        # следующей пересборки кучи
+        on_commit(lambda: heap.release(token))
+
+
+def least_loaded_operator():
+    return Operator.objects.order_by(
+        F('workload__open_orders').asc(nulls_first=True),
+        F('workload__last_assigned_at').asc(nulls_first=True),
+        'pk'
+    ).first()
+
+
+def change_workload(operator_id, delta, assigned_at=None):
+    updates = {'open_orders': Greatest(F('open_orders') + delta, 0)}
+    if assigned_at is not None:
+        updates['last_assigned_at'] = assigned_at
+    if not OperatorWorkload.objects.filter(operator_id=operator_id).update(**updates):
+        OperatorWorkload.objects.get_or_create(operator_id=operator_id)
+        OperatorWorkload.objects.filter(operator_id=operator_id).update(**updates)
+
+
+def order_changed(previous_state, new_state):
+    """Переносит открытый заказ между счетчиками операторов. Вызывается внутри
+    транзакции заказа; куча процесса обновляется после коммита."""
+    previous_operator = open_operator(previous_state)
+    new_operator = open_operator(new_state)
+    if previous_operator == new_operator:
+        return
+    now = timezone.now()
+    if previous_operator:
+        change_workload(previous_operator, -1)
+    if new_operator:
+        change_workload(new_operator, 1, now)
+
+    heap = balancer()
+
+    def update_heap():
+        if previous_operator:
+            heap.adjust(previous_operator, -1)
+        if new_operator:
+            heap.adjust(new_operator, 1, now.timestamp())
+    on_commit(update_heap)
+
+
+def orders_changed(transitions):
+    """То же, что order_changed, для пачки изменений [(старое, новое состояние)]."""
+    deltas = Counter()
+    for previous_state, new_state in transitions:
+        previous_operator = open_operator(previous_state)
+        new_operator = open_operator(new_state)
+        if previous_operator == new_operator:
+            continue
+        if previous_operator:
+            deltas[previous_operator] -= 1
+        if new_operator:
+            deltas[new_operator] += 1
+    deltas = {operator_id: delta for operator_id, delta in deltas.items() if delta}
+    now = timezone.now()
+    for operator_id, delta in deltas.items():
+        change_workload(operator_id, delta, now if delta > 0 else None)
+
+    heap = balancer()
+
+    def update_heap():
+        for operator_id, delta in deltas.items():
+            heap.adjust(operator_id, delta, now.timestamp() if delta > 0 else None)
+    on_commit(update_heap)
+
+
+def rebuild_operator_workload():
+    """Пересчитывает открытые заказы операторов по таблице заказов."""
+    counts = dict(
+        Order.objects.filter(status__in=OPEN_STATUSES).values('operator_id')
+        .annotate(count=Count('id')).values_list('operator_id', 'count')
+    )
+    with atomic():
+        existing = set(OperatorWorkload.objects.values_list('operator_id', flat=True))
+        OperatorWorkload.objects.bulk_create([
+            OperatorWorkload(operator_id=pk)
+            for pk in Operator.all_objects.values_list('pk', flat=True) if pk not in existing
+        ])
+        OperatorWorkload.objects.exclude(operator_id__in=counts).update(open_orders=0)
+        for operator_id, count in counts.items():
+            OperatorWorkload.objects.filter(operator_id=operator_id).update(open_orders=count)
+    on_commit(balancer().resync)
+    return {'operators': OperatorWorkload.objects.count(), 'open_orders': sum(counts.values())}
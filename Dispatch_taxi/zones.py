@@ -0,0 +1,52 @@
+
+from taxi_shared.zones import get_index
+from .cache import data_version
+from .models import Order, TableVersion, Zone
+from .sharding import atomic, city_code
+
+ZONE_FIELDS = ('id', 'name', 'kind', 'priority', 'price_multiplier', 'polygon')
+ASSIGN_BATCH_SIZE = 1000
+
+
+def load_zones():
+    return list(Zone.objects.filter(is_active=True).values(*ZONE_FIELDS))
+
+
+def zone_index():
+    """Индекс зон процесса; пересобирается, когда меняется таблица зон."""
+    return get_index(data_version(Zone), load_zones, city_code())
+
+
+def resolve_zone_id(lat, lon):
+    shape = zone_index().resolve_one(lat, lon)
+    return shape.id if shape else None
+
+
+def assign_pickup_zones(queryset, batch_size=ASSIGN_BATCH_SIZE):
+    """Проставляет зону подачи заказам (например, после импорта) пачками.
+
+    Зона подачи не входит в журнал событий, поэтому обновление идет
+    через bulk_update без сигналов, а версия таблицы заказов поднимается
+    один раз на пачку.
+    """
+    index = zone_index()
+    queryset = queryset.filter(pickup_lat__isnull=False, pickup_lon__isnull=False).order_by('id')
+    last_id = 0
+    updated = 0
+    while True:
+        orders = list(queryset.filter(id__gt=last_id).only('id', 'pickup_lat', 'pickup_lon', 'pickup_zone')[:batch_size])
+        if not orders:
+            return updated
+        last_id = orders[-1].id
+        shapes = index.resolve_many([(o.pickup_lat, o.pickup_lon) for o in orders])
+        changed = []
+        for order, shape in zip(orders, shapes):
+            zone_id = shape.id if shape else None
+            if order.pickup_zone_id != zone_id:
+                order.pickup_zone_id = zone_id
+                changed.append(order)
+        if changed:
+            with atomic():
+                Order.objects.bulk_update(changed, ['pickup_zone'])
+                TableVersion.bump(Order._meta.db_table)
+            updated += len(changed)
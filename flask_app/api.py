@@ -1,67 +1,83 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, current_app
 from models import *
-from sqlalchemy import func, or_
-from datetime import datetime, timedelta
+from events import brokers, stream_order_events
+from offers import offer_hubs, respond_to_offer
+from cache import cached_response, get_query_memo, get_table_versions, memoize_query, shared_query
+from limits import metrics, worker_metrics
+from serialization import list_response
+from sharding import city_config_path, city_engine, current_city, fan_out
+from forecasting import get_demand_model
+from sqlalchemy import or_
+from datetime import date, datetime, timedelta, timezone
+from taxi_shared import archive, queries
+from taxi_shared.offers import OFFER_ACCEPTED, OFFER_DECLINED, OFFER_PENDING, offer_message
+from taxi_shared.order_history import is_complete, state_at
+from taxi_shared.routing import get_graph
+from taxi_shared.eta import get_matrix
+from taxi_shared.zones import get_index, shape_to_dict
+from taxi_shared.shifts import OVERRIDE_HISTORY_DAYS, Override, Schedule, get_calendar, time_to_minutes
+from zoneinfo import ZoneInfo
+import numpy as np
 
 api_bp = Blueprint('api', __name__, url_prefix='/api/taxi')
 
+
+def db_cursor():
+    # DB-API курсор текущей сессии для общих запросов из taxi_shared.queries
+    return db.session.connection().connection.cursor()
+
+
+def busy_vehicle_ids():
+    """Машины на заказах: индекс в общем хранилище, сбрасывается записями
+    заказов со статусами из BUSY_STATUSES."""
+    scopes = [queries.order_status_scope(status) for status in queries.BUSY_STATUSES]
+    return set(shared_query('busy_vehicles', scopes, lambda: queries.fetch_busy_vehicle_ids(db_cursor())))
+
+
+def get_limit(default):
+    """Параметр limit, ограниченный сверху API_MAX_LIMIT."""
+    limit = request.args.get('limit', default, type=int)
+    return max(1, min(limit, current_app.config['API_MAX_LIMIT']))
+
+
+def city_statistics():
+    """Итоги города запроса вместе с архивом."""
+    cursor = db_cursor()
+    counts = queries.fetch_counts(cursor)
+    total_orders = counts['total_orders']
+    total_revenue = queries.fetch_revenue(cursor)
+
+    # Старые заказы перенесены в архив, учитываем их в общих итогах
+    archive_dir = city_config_path('ORDER_ARCHIVE_DIR')
+    archived_orders = sum(archive.status_counts(archive_dir).values())
+    total_orders += archived_orders
+    total_revenue += archive.totals(archive_dir, statuses=['completed'])['revenue']
+
+    return {
+        'total_orders': total_orders,
+        'archived_orders': archived_orders,
+        'active_orders': counts['active_orders'],
+        'total_drivers': counts['total_drivers'],
+        'total_customers': counts['total_customers'],
+        'total_vehicles': counts['total_vehicles'],
+        'total_tariffs': counts['total_tariffs'],
+        'total_operators': counts['total_operators'],
+        'revenue': round(total_revenue, 2),
+        'avg_order_value': round(total_revenue / total_orders, 2) if total_orders > 0 else 0
+    }
+
+
 @api_bp.route('/statistics', methods=['GET'])
 def get_statistics():
     try:
-        total_orders = Order.query.count()
-        active_orders = Order.query.filter(Order.status == 'in_progress').count()
-        total_drivers = Driver.query.count()
-        total_customers = Customer.query.count()
-        total_vehicles = Vehicle.query.count()
-        total_tariffs = Tariff.query.count()
-        total_operators = Operator.query.count()
-
-        # Расчет выручки
-        revenue_result = db.session.query(
-            func.sum(Order.range * Tariff.cost_for_km)
-        ).join(Tariff).filter(
-            Order.tariff_id == Tariff.id,
-            Order.status.in_(['completed', 'in_progress'])
-        ).first()
-
-        total_revenue = float(revenue_result[0]) if revenue_result[0] else 0.0
-
+        statistics = city_statistics()
         week_ago = datetime.utcnow() - timedelta(days=7)
-        daily_stats = db.session.query(
-            func.date(Order.order_time).label('date'),
-            func.count(Order.id).label('count'),
-            func.sum(Order.range * Tariff.cost_for_km).label('revenue')
-        ).join(Tariff).filter(
-            Order.order_time >= week_ago,
-            Order.tariff_id == Tariff.id
-        ).group_by(
-            func.date(Order.order_time)
-        ).order_by(
-            func.date(Order.order_time).desc()
-        ).all()
-
-        daily_data = [
-            {
-                'date': stat.date.isoformat(),
-                'orders': stat.count,
-                'revenue': float(stat.revenue) if stat.revenue else 0.0
-            }
-            for stat in daily_stats
-        ]
+        daily_data = queries.fetch_daily_stats(db_cursor(), week_ago)
 
         response_data = {
             'success': True,
-            'statistics': {
-                'total_orders': total_orders,
-                'active_orders': active_orders,
-                'total_drivers': total_drivers,
-                'total_customers': total_customers,
-                'total_vehicles': total_vehicles,
-                'total_tariffs': total_tariffs,
-                'total_operators': total_operators,
-                'revenue': round(total_revenue, 2),
-                'avg_order_value': round(total_revenue / total_orders, 2) if total_orders > 0 else 0
-            },
+            'city': current_city(),
+            'statistics': statistics,
             'daily_stats': daily_data,
             'timestamp': datetime.now().isoformat()
         }
@@ -72,6 +88,59 @@ def get_statistics():
         error_response = {'success': False, 'error': str(e)}
         return jsonify(error_response), 500
 
+
+@api_bp.route('/cities/statistics', methods=['GET'])
+def get_cities_statistics():
+    """Итоги всех городов: базы опрашиваются параллельно."""
+    try:
+        by_city = fan_out(city_statistics)
+        totals = {
+            key: sum(statistics[key] for statistics in by_city.values())
+            for key in ('total_orders', 'archived_orders', 'active_orders', 'total_drivers', 'total_customers',
+                        'total_vehicles', 'total_tariffs', 'total_operators', 'revenue')
+        }
+        totals['revenue'] = round(totals['revenue'], 2)
+        totals['avg_order_value'] = (round(totals['revenue'] / totals['total_orders'], 2)
+                                     if totals['total_orders'] > 0 else 0)
+        return jsonify({
+            'success': True,
+            'cities': by_city,
+            'totals': totals,
+            'timestamp': datetime.now().isoformat()
+        })
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api_bp.route('/archive/statistics', methods=['GET'])
+def get_archive_statistics():
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        group = request.args.get('group', 'day')
+        status = request.args.get('status')
+
+        start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00')) if start_date else None
+        end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00')) if end_date else None
+        statuses = [status] if status else None
+        archive_dir = city_config_path('ORDER_ARCHIVE_DIR')
+
+        response = {
+            'success': True,
+            'totals': archive.totals(archive_dir, start_dt, end_dt, statuses),
+            'by_status': archive.status_counts(archive_dir, start_dt, end_dt),
+            'stats': archive.grouped_stats(archive_dir, start_dt, end_dt, statuses,
+                                           group='month' if group == 'month' else 'day')
+        }
+
+        return jsonify(response)
+
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @api_bp.route('/orders', methods=['GET'])
 def get_orders():
     try:
@@ -80,32 +149,34 @@ def get_orders():
         vehicle_id = request.args.get('vehicle_id')
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
-        limit = request.args.get('limit', 100, type=int)
-        offset = request.args.get('offset', 0, type=int)
-
-        query = Order.query
+        limit = get_limit(100)
+        offset = max(0, request.args.get('offset', 0, type=int))
 
-        if status:
-            query = query.filter(Order.status == status)
-        if customer_id:
-            query = query.filter(Order.customer_id == customer_id)
-        if vehicle_id:
-            query = query.filter(Order.vehicle_id == vehicle_id)
+        start_dt = None
+        end_dt = None
         if start_date:
             try:
                 start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-                query = query.filter(Order.order_time >= start_dt)
             except:
                 pass
         if end_date:
             try:
                 end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-                query = query.filter(Order.order_time <= end_dt)
             except:
                 pass
 
-        total = query.count()
-        orders = query.order_by(Order.order_time.desc()).offset(offset).limit(limit).all()
+        try:
+            filters = queries.order_filters(status, customer_id, vehicle_id, start_dt, end_dt)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        # Выборка по статусу зависит только от записей заказов с этим статусом
+        order_scope = queries.order_status_scope(filters['status']) if filters['status'] else Order.__tablename__
+        orders, total = memoize_query(
+            ('orders', tuple(sorted(filters.items())), limit, offset),
+            (order_scope, Customer.__tablename__, Vehicle.__tablename__,
+             Tariff.__tablename__, Operator.__tablename__),
+            lambda: queries.fetch_orders(db_cursor(), filters, limit, offset)
+        )
 
         response_data = {
             'success': True,
@@ -123,24 +194,46 @@ def get_orders():
                 'offset': offset,
                 'has_more': offset + len(orders) < total
             },
-            'orders': [order.to_dict() for order in orders]
+            'orders': orders
         }
 
 
-        return jsonify(response_data)
+        return list_response(response_data, 'orders')
 
     except Exception as e:
         error_response = {'success': False, 'error': str(e)}
         return jsonify(error_response), 500
 
+def load_shifts():
+    active_drivers = db.session.query(Driver.id).filter(Driver.deleted_at.is_(None))
+    schedules = [
+        Schedule(s.driver_id, s.weekday, time_to_minutes(s.start_time), time_to_minutes(s.end_time),
+                 s.valid_from, s.valid_until)
+        for s in ShiftSchedule.query.filter(ShiftSchedule.driver_id.in_(active_drivers)).all()
+    ]
+    since = date.today() - timedelta(days=OVERRIDE_HISTORY_DAYS)
+    overrides = [
+        Override(o.driver_id, o.date, o.kind, time_to_minutes(o.start_time), time_to_minutes(o.end_time))
+        for o in ShiftOverride.query.filter(ShiftOverride.driver_id.in_(active_drivers),
+                                            ShiftOverride.date >= since).all()
+    ]
+    return schedules, overrides
+
+
+def shift_calendar():
+    """Календарь смен воркера; пересобирается после изменения смен или водителей."""
+    version = get_table_versions(ShiftSchedule.__tablename__, ShiftOverride.__tablename__, Driver.__tablename__)
+    return get_calendar(version, load_shifts, ZoneInfo(current_app.config['SHIFT_TIME_ZONE']), current_city())
+
+
 @api_bp.route('/drivers', methods=['GET'])
 def get_drivers():
     try:
         search = request.args.get('search', '')
         with_vehicles = request.args.get('with_vehicles', 'false').lower() == 'true'
-        limit = request.args.get('limit', 50, type=int)
+        limit = get_limit(50)
 
-        query = Driver.query
+        query = Driver.active()
 
         if search:
             query = query.filter(
@@ -156,7 +249,7 @@ def get_drivers():
         for driver in drivers:
             data = driver.to_dict()
             if with_vehicles:
-                data['vehicles'] = [v.to_dict() for v in driver.vehicles]
+                data['vehicles'] = [v.to_dict() for v in driver.vehicles.filter(Vehicle.deleted_at.is_(None))]
             driver_data.append(data)
 
         response = {
@@ -165,7 +258,7 @@ def get_drivers():
             'drivers': driver_data
         }
 
-        return jsonify(response)
+        return list_response(response, 'drivers')
 
     except Exception as e:
         error_response = {'success': False, 'error': str(e)}
@@ -176,9 +269,9 @@ def get_customers():
     try:
         search = request.args.get('search', '')
         with_orders = request.args.get('with_orders', 'false').lower() == 'true'
-        limit = request.args.get('limit', 50, type=int)
+        limit = get_limit(50)
 
-        query = Customer.query
+        query = Customer.active()
 
         if search:
             query = query.filter(
@@ -203,7 +296,7 @@ def get_customers():
             'customers': customer_data
         }
 
-        return jsonify(response)
+        return list_response(response, 'customers')
 
     except Exception as e:
         error_response = {'success': False, 'error': str(e)}
@@ -215,9 +308,9 @@ def get_vehicles():
         search = request.args.get('search', '')
         color = request.args.get('color')
         available_only = request.args.get('available_only', 'false').lower() == 'true'
-        limit = request.args.get('limit', 50, type=int)
+        limit = get_limit(50)
 
-        query = Vehicle.query
+        query = Vehicle.active()
 
         if search:
             query = query.filter(
@@ -232,11 +325,12 @@ def get_vehicles():
             query = query.filter(Vehicle.color == color)
 
         if available_only:
-            busy_vehicle_ids = db.session.query(Order.vehicle_id).filter(
-                Order.status == 'in_progress'
-            ).distinct().subquery()
-
-            query = query.filter(~Vehicle.id.in_(busy_vehicle_ids))
+            busy = busy_vehicle_ids()
+            if busy:
+                query = query.filter(~Vehicle.id.in_(busy))
+            calendar = shift_calendar()
+            if not calendar.is_empty:
+                query = query.filter(Vehicle.driver_id.in_(calendar.on_shift(datetime.now(timezone.utc))))
 
         vehicles = query.limit(limit).all()
 
@@ -246,16 +340,17 @@ def get_vehicles():
             'vehicles': [v.to_dict() for v in vehicles]
         }
 
-        return jsonify(response)
+        return list_response(response, 'vehicles')
 
     except Exception as e:
         error_response = {'success': False, 'error': str(e)}
         return jsonify(error_response), 500
 
 @api_bp.route('/tariffs', methods=['GET'])
+@cached_response(Tariff.__tablename__)
 def get_tariffs():
     try:
-        tariffs = Tariff.query.all()
+        tariffs = Tariff.active().all()
 
         response = {
             'success': True,
@@ -263,16 +358,17 @@ def get_tariffs():
             'tariffs': [t.to_dict() for t in tariffs]
         }
 
-        return jsonify(response)
+        return list_response(response, 'tariffs')
 
     except Exception as e:
         error_response = {'success': False, 'error': str(e)}
         return jsonify(error_response), 500
 
 @api_bp.route('/operators', methods=['GET'])
+@cached_response(Operator.__tablename__, Order.__tablename__)
 def get_operators():
     try:
-        operators = Operator.query.all()
+        operators = Operator.active().all()
 
         response = {
             'success': True,
@@ -280,12 +376,70 @@ def get_operators():
             'operators': [o.to_dict() for o in operators]
         }
 
-        return jsonify(response)
+        return list_response(response, 'operators')
 
     except Exception as e:
         error_response = {'success': False, 'error': str(e)}
         return jsonify(error_response), 500
 
+@api_bp.route('/operators/<int:operator_id>/presence', methods=['POST'])
+def update_operator_presence(operator_id):
+    """Отметка присутствия из рабочего места оператора: {"online": true|false}.
+
+    Оператор на линии, пока отметки приходят чаще OPERATOR_PRESENCE_TIMEOUT секунд.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        online = data.get('online', True)
+        if not isinstance(online, bool):
+            return jsonify({'success': False, 'error': 'Поле online должно быть true или false'}), 400
+        if Operator.active().filter(Operator.id == operator_id).first() is None:
+            return jsonify({'success': False, 'error': 'Оператор не найден'}), 404
+
+        workload = db.session.get(OperatorWorkload, operator_id)
+        if workload is None:
+            workload = OperatorWorkload(operator_id=operator_id, open_orders=0)
+            db.session.add(workload)
+        workload.is_online = online
+        workload.last_seen_at = datetime.now(timezone.utc)
+        db.session.commit()
+        return jsonify({'success': True, 'online': online,
+                        'timeout_seconds': current_app.config['OPERATOR_PRESENCE_TIMEOUT']})
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api_bp.route('/operators/workload', methods=['GET'])
+def get_operator_workload():
+    """Открытые заказы операторов и сводка по тем, кто на линии."""
+    try:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=current_app.config['OPERATOR_PRESENCE_TIMEOUT'])
+        rows = db.session.query(OperatorWorkload, Operator.full_name).join(
+            Operator, Operator.id == OperatorWorkload.operator_id
+        ).filter(Operator.deleted_at.is_(None)).order_by(OperatorWorkload.open_orders.desc()).all()
+
+        operators = [dict(workload.to_dict(cutoff), full_name=name) for workload, name in rows]
+        online_loads = [o['open_orders'] for o in operators if o['online']]
+        return jsonify({
+            'success': True,
+            'summary': {
+                'operators': len(operators),
+                'online': len(online_loads),
+                'open_orders': sum(o['open_orders'] for o in operators),
+                'online_min': min(online_loads, default=0),
+                'online_max': max(online_loads, default=0),
+                'online_mean': round(sum(online_loads) / len(online_loads), 2) if online_loads else 0,
+                'imbalance': max(online_loads, default=0) - min(online_loads, default=0)
+            },
+            'operators': operators
+        })
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @api_bp.route('/orders/<int:order_id>', methods=['GET'])
 def get_order_detail(order_id):
     try:
@@ -306,22 +460,463 @@ def get_order_detail(order_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@api_bp.route('/orders/<int:order_id>/history', methods=['GET'])
+def get_order_history(order_id):
+    """Журнал изменений заказа и его состояние на момент ?at= (ISO 8601)."""
+    try:
+        at = request.args.get('at')
+        moment = None
+        if at:
+            try:
+                moment = datetime.fromisoformat(at)
+            except ValueError:
+                return jsonify({'success': False, 'error': 'Параметр at должен быть в формате ISO 8601'}), 400
+            if moment.tzinfo is None:
+                moment = moment.replace(tzinfo=timezone.utc)
+
+        events = OrderEvent.query.filter(OrderEvent.order_id == order_id).order_by(OrderEvent.id).all()
+        if not events:
+            return jsonify({'success': False, 'error': 'История заказа не найдена'}), 404
+        # Без события создания состояние содержит только изменявшиеся поля
+        complete = is_complete([e.event_type for e in events[:1]])
+        if moment is not None:
+            events = [e for e in events if e.occurred_at <= moment]
+
+        state = state_at([(e.event_type, e.occurred_at, e.changes) for e in events])
+        response = {
+            'success': True,
+            'order_id': order_id,
+            'at': moment.isoformat() if moment else None,
+            'exists': state is not None,
+            'complete': complete,
+            'state': state,
+            'events': [e.to_dict() for e in events]
+        }
+
+        return jsonify(response)
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api_bp.route('/shifts/on-duty', methods=['GET'])
+def get_drivers_on_duty():
+    """Водители на смене и их автомобили: ?at=<ISO-время>, по умолчанию сейчас."""
+    try:
+        at = request.args.get('at')
+        try:
+            moment = datetime.fromisoformat(at) if at else datetime.now(timezone.utc)
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Параметр at должен быть в формате ISO 8601'}), 400
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=ZoneInfo(current_app.config['SHIFT_TIME_ZONE']))
+
+        calendar = shift_calendar()
+        driver_ids = sorted(calendar.on_shift(moment))
+        vehicles = Vehicle.active().filter(Vehicle.driver_id.in_(driver_ids)).all() if driver_ids else []
+
+        return jsonify({
+            'success': True,
+            'at': moment.isoformat(),
+            'schedule_defined': not calendar.is_empty,
+            'driver_ids': driver_ids,
+            'vehicle_ids': [v.id for v in vehicles]
+        })
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api_bp.route('/shifts/coverage', methods=['GET'])
+def get_shift_coverage():
+    """Число водителей на смене по часам за неделю: ?week=YYYY-MM-DD (любой день недели)."""
+    try:
+        calendar = shift_calendar()
+        try:
+            day = date.fromisoformat(request.args['week']) if 'week' in request.args \
+                else datetime.now(calendar.tz).date()
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Параметр week должен быть датой YYYY-MM-DD'}), 400
+        week_start = day - timedelta(days=day.weekday())
+
+        coverage = calendar.coverage(week_start)
+        return jsonify({
+            'success': True,
+            'week_start': week_start.isoformat(),
+            'time_zone': current_app.config['SHIFT_TIME_ZONE'],
+            'days': [
+                {'date': (week_start + timedelta(days=offset)).isoformat(), 'hours': hours}
+                for offset, hours in enumerate(coverage)
+            ]
+        })
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @api_bp.route('/drivers/<int:driver_id>', methods=['GET'])
 def get_driver_detail(driver_id):
     try:
-        driver = Driver.query.get_or_404(driver_id)
+        driver = Driver.active().filter(Driver.id == driver_id).first_or_404()
 
         response = {
             'success': True,
             'driver': driver.to_dict(),
             'info': driver.info.to_dict() if driver.info else None,
-            'vehicles': [v.to_dict() for v in driver.vehicles],
+            'vehicles': [v.to_dict() for v in driver.vehicles.filter(Vehicle.deleted_at.is_(None))],
+            'stats': driver.stats.to_dict() if driver.stats else None,
             'orders': [o.to_dict() for o in Order.query.filter(
-                Order.vehicle_id.in_([v.id for v in driver.vehicles])
-            ).limit(20)]
+                Order.driver_id == driver_id
+            ).order_by(Order.order_time.desc()).limit(20)]
+        }
+
+        return jsonify(response)
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api_bp.route('/orders/stream', methods=['GET'])
+def stream_orders():
+    broker = brokers.get()
+    broker.start(city_engine())
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+
+    return Response(
+        stream_order_events(broker, last_event_id),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+
+@api_bp.route('/drivers/<int:driver_id>/stats', methods=['GET'])
+def get_driver_stats(driver_id):
+    try:
+        driver = Driver.active().filter(Driver.id == driver_id).first_or_404()
+        days = min(request.args.get('days', 30, type=int), 366)
+        since = datetime.utcnow().date() - timedelta(days=days)
+
+        daily = DriverDailyStats.query.filter(
+            DriverDailyStats.driver_id == driver_id,
+            DriverDailyStats.date >= since
+        ).order_by(DriverDailyStats.date.desc()).all()
+
+        response = {
+            'success': True,
+            'driver_id': driver.id,
+            'stats': driver.stats.to_dict() if driver.stats else None,
+            'daily': [d.to_dict() for d in daily]
         }
 
         return jsonify(response)
 
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api_bp.route('/forecast', methods=['GET'])
+def get_forecast():
+    try:
+        hours = max(1, min(request.args.get('hours', 24, type=int), 168))
+        with_heatmap = request.args.get('heatmap', 'false').lower() == 'true'
+
+        model = get_demand_model()
+        now = datetime.now(timezone.utc)
+
+        response = {
+            'success': True,
+            'generated_at': now.isoformat(),
+            'last_order_id': model.last_id,
+            'forecast': model.forecast(now, hours)
+        }
+        if with_heatmap:
+            # Строки - дни недели с понедельника, столбцы - часы UTC
+            response['heatmap'] = [[round(float(v), 2) for v in row] for row in model.heatmap(now)]
+
+        return jsonify(response)
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api_bp.route('/jobs/<int:job_id>', methods=['GET'])
+def get_job_status(job_id):
+    try:
+        job = Job.query.get_or_404(job_id)
+        return jsonify({'success': True, 'job': job.to_dict()})
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api_bp.route('/orders/<int:order_id>/eta', methods=['GET'])
+def get_order_eta(order_id):
+    """Время подачи назначенной машины и ближайших свободных машин к точке подачи."""
+    try:
+        order = Order.query.get_or_404(order_id)
+        if order.pickup_lat is None:
+            return jsonify({'success': False, 'error': 'У заказа нет точки подачи'}), 400
+        matrix = get_matrix(city_config_path('ETA_MATRIX_PATH'))
+        if matrix is None:
+            return jsonify({'success': False, 'error': 'Матрица времени в пути еще не собрана'}), 503
+
+        limit = min(request.args.get('limit', 5, type=int), 50)
+        busy = busy_vehicle_ids()
+        vehicles = [v for v in Vehicle.active().filter(Vehicle.lat.isnot(None)).all()
+                    if v.id not in busy or v.id == order.vehicle_id]
+
+        response = {'success': True, 'order_id': order.id, 'assigned': None, 'nearest': []}
+        if vehicles:
+            minutes = matrix.eta_table(
+                np.array([v.lat for v in vehicles]), np.array([v.lon for v in vehicles]),
+                np.array([order.pickup_lat]), np.array([order.pickup_lon])
+            )[:, 0]
+            for vehicle, value in zip(vehicles, minutes):
+                if vehicle.id == order.vehicle_id:
+                    response['assigned'] = {'vehicle_id': vehicle.id, 'eta_min': round(float(value), 1)}
+            free = [i for i, v in enumerate(vehicles) if v.id != order.vehicle_id]
+            for i in sorted(free, key=lambda i: minutes[i])[:limit]:
+                response['nearest'].append({
+                    'vehicle_id': vehicles[i].id,
+                    'license_plate': vehicles[i].license_plate,
+                    'eta_min': round(float(minutes[i]), 1)
+                })
+
+        return jsonify(response)
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api_bp.route('/vehicles/<int:vehicle_id>/location', methods=['POST'])
+def update_vehicle_location(vehicle_id):
+    """Координаты от водительского приложения: {"lat": ..., "lon": ...}"""
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            lat, lon = float(data['lat']), float(data['lon'])
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'Нужны числовые поля lat и lon'}), 400
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            return jsonify({'success': False, 'error': 'Координаты вне допустимого диапазона'}), 400
+
+        updated = Vehicle.active().filter(Vehicle.id == vehicle_id).update(
+            {'lat': lat, 'lon': lon, 'location_updated_at': datetime.now(timezone.utc)},
+            synchronize_session=False
+        )
+        if not updated:
+            return jsonify({'success': False, 'error': 'Автомобиль не найден'}), 404
+        db.session.commit()
+        return jsonify({'success': True})
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api_bp.route('/vehicles/<int:vehicle_id>/offers', methods=['GET'])
+def poll_vehicle_offers(vehicle_id):
+    """Long-poll водительского приложения: предложения и их судьба, ожидание до ?wait= секунд."""
+    try:
+        offer_hub = offer_hubs.get()
+        offer_hub.start(city_engine())
+        wait = max(0.0, min(request.args.get('wait', 25, type=float), current_app.config['OFFER_POLL_MAX_WAIT']))
+        # Ожидание регистрируется до чтения из базы: предложение, созданное
+        # между чтением и ожиданием, не потеряется
+        with offer_hub.waiting(vehicle_id) as waiter:
+            pending = DriverOffer.query.filter(
+                DriverOffer.vehicle_id == vehicle_id,
+                DriverOffer.status == OFFER_PENDING,
+                DriverOffer.expires_at > datetime.now(timezone.utc)
+            ).all()
+            events = [offer_message('offered', offer, Order.query.get(offer.order_id)) for offer in pending]
+            # Ожидание не держит соединение из пула
+            db.session.close()
+            if not events and wait:
+                events = list(waiter.wait(wait))
+
+        return jsonify({'success': True, 'events': events})
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def answer_offer(vehicle_id, offer_id, status):
+    try:
+        order_id = respond_to_offer(offer_id, vehicle_id, status)
+        offer = DriverOffer.query.filter(DriverOffer.id == offer_id,
+                                         DriverOffer.vehicle_id == vehicle_id).first()
+        if offer is None:
+            return jsonify({'success': False, 'error': 'Предложение не найдено'}), 404
+        if order_id is None and offer.status != status:
+            return jsonify({'success': False, 'error': 'Предложение уже недействительно',
+                            'offer': offer.to_dict()}), 409
+        # Повтор того же ответа (например, после обрыва связи) не ошибка
+        return jsonify({'success': True, 'repeated': order_id is None, 'offer': offer.to_dict()})
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api_bp.route('/vehicles/<int:vehicle_id>/offers/<int:offer_id>/accept', methods=['POST'])
+def accept_offer(vehicle_id, offer_id):
+    return answer_offer(vehicle_id, offer_id, OFFER_ACCEPTED)
+
+
+@api_bp.route('/vehicles/<int:vehicle_id>/offers/<int:offer_id>/decline', methods=['POST'])
+def decline_offer(vehicle_id, offer_id):
+    return answer_offer(vehicle_id, offer_id, OFFER_DECLINED)
+
+
+@api_bp.route('/vehicles/<int:vehicle_id>/offers/<int:offer_id>', methods=['GET'])
+def get_offer(vehicle_id, offer_id):
+    try:
+        offer = DriverOffer.query.filter(DriverOffer.id == offer_id,
+                                         DriverOffer.vehicle_id == vehicle_id).first()
+        if offer is None:
+            return jsonify({'success': False, 'error': 'Предложение не найдено'}), 404
+        response = {'success': True, 'offer': offer.to_dict()}
+        if offer.status == OFFER_ACCEPTED:
+            # Назначение применяет координатор, обычно через доли секунды после ответа
+            order = Order.query.get(offer.order_id)
+            response['assigned'] = order is not None and order.vehicle_id == vehicle_id
+        return jsonify(response)
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def parse_point(value):
+    lat, lon = (float(part) for part in value.split(','))
+    return lat, lon
+
+
+def load_zones():
+    return [zone.to_dict(with_polygon=True) for zone in Zone.query.filter(Zone.is_active.is_(True)).all()]
+
+
+def zone_index():
+    """Индекс зон воркера; пересобирается после изменения таблицы зон в Django."""
+    version = get_table_versions(Zone.__tablename__)[0]
+    return get_index(version, load_zones, current_city())
+
+
+@api_bp.route('/zones', methods=['GET'])
+@cached_response(Zone.__tablename__)
+def get_zones():
+    try:
+        with_polygon = request.args.get('polygon') == '1'
+        zones = Zone.query.order_by(Zone.priority.desc(), Zone.name).all()
+
+        response = {
+            'success': True,
+            'count': len(zones),
+            'zones': [z.to_dict(with_polygon=with_polygon) for z in zones]
+        }
+
+        return list_response(response, 'zones')
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api_bp.route('/zones/resolve', methods=['GET', 'POST'])
+def resolve_zones():
+    """Зона точки: GET ?lat=&lon=. Пакетно для импорта: POST {"points": [[lat, lon], ...]}"""
+    try:
+        if request.method == 'GET':
+            try:
+                lat, lon = float(request.args['lat']), float(request.args['lon'])
+            except (KeyError, ValueError):
+                return jsonify({'success': False, 'error': 'Нужны числовые параметры lat и lon'}), 400
+            matches = zone_index().resolve(lat, lon)
+            return jsonify({
+                'success': True,
+                'zone': shape_to_dict(matches[0]) if matches else None,
+                'zones': [shape_to_dict(shape) for shape in matches]
+            })
+
+        points = (request.get_json(silent=True) or {}).get('points')
+        try:
+            points = [(float(lat), float(lon)) for lat, lon in points]
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'points задается списком пар [lat, lon]'}), 400
+        if len(points) > current_app.config['ZONE_RESOLVE_MAX_POINTS']:
+            return jsonify({
+                'success': False,
+                'error': f"Не больше {current_app.config['ZONE_RESOLVE_MAX_POINTS']} точек за запрос"
+            }), 400
+
+        shapes = zone_index().resolve_many(points)
+        return jsonify({
+            'success': True,
+            'count': len(shapes),
+            'zones': [shape_to_dict(shape) if shape else None for shape in shapes]
+        })
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api_bp.route('/route', methods=['GET'])
+def get_route():
+    """Дистанция и время по графу дорог: ?from=lat,lon&to=lat,lon"""
+    try:
+        try:
+            origin = parse_point(request.args['from'])
+            destination = parse_point(request.args['to'])
+        except (KeyError, ValueError):
+            return jsonify({'success': False, 'error': 'Параметры from и to задаются как lat,lon'}), 400
+
+        graph = get_graph(city_config_path('ROAD_GRAPH_PATH'), current_app.config['ROUTE_CACHE_SIZE'])
+        if graph is None:
+            return jsonify({'success': False, 'error': 'Граф дорог не загружен'}), 503
+        route = graph.route(*origin, *destination)
+        if route is None:
+            return jsonify({'success': False, 'error': 'Маршрут не найден'}), 404
+
+        # Коэффициент зоны подачи (аэропорт, вокзал) применяется к оценке стоимости
+        pickup_zone = zone_index().resolve_one(*origin)
+        multiplier = pickup_zone.price_multiplier if pickup_zone else 1.0
+
+        response = {
+            'success': True,
+            'distance_km': route.distance_km,
+            'duration_min': route.duration_min,
+            'pickup_zone': shape_to_dict(pickup_zone) if pickup_zone else None,
+            'costs': [
+                {
+                    'tariff_id': t.id,
+                    'tariff': t.name,
+                    'cost': round(float(t.cost_for_km) * route.distance_km * multiplier, 2)
+                }
+                for t in Tariff.active().all()
+            ]
+        }
+
+        return jsonify(response)
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    try:
+        return jsonify({
+            'success': True,
+            'totals': metrics.totals(),
+            'worker': worker_metrics(current_app),
+            'offer_waiters': sum(len(hub) for hub in offer_hubs.values()),
+            'query_memo': {
+                'hits': get_query_memo().hits,
+                'misses': get_query_memo().misses,
+                'entries': len(get_query_memo().data)
+            }
+        })
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -1,15 +1,25 @@
+import logging
+import os
+import sys
+from pathlib import Path
+
+# Общие модули проекта (taxi_shared) лежат в корне репозитория; они нужны
+# уже конфигурации
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.append(str(BASE_DIR))
+
 from flask import Flask, jsonify
 from flask_cors import CORS
 from config import config
 from extentions import db
 
-import logging
-
 def create_app(config_name='default'):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
     config[config_name].init_app(app)
-    CORS(app, resources={r"/api/*": {"origins": "*"}})
+    CORS(app, resources={r"/api/*": {"origins": app.config['CORS_ORIGINS']}},
+         expose_headers=['Retry-After'])
     logging.basicConfig(level=logging.INFO)
     db.init_app(app)
 
@@ -17,6 +27,21 @@ def create_app(config_name='default'):
         from api import api_bp
         app.register_blueprint(api_bp)
 
+    from invalidation import listener
+    from limits import init_limits
+    from pools import init_pools
+    from sharding import init_sharding
+
+    init_pools(app)
+    init_sharding(app)
+    init_limits(app)
+
+    @app.before_request
+    def start_invalidation_listener():
+        # Поток подписки создается в каждом воркере после fork. Подписка
+        # слушает базу основного города (см. get_table_versions)
+        listener.start(db.engine)
+
     @app.errorhandler(404)
     def not_found(error):
         return jsonify({
@@ -34,7 +59,7 @@ def create_app(config_name='default'):
         }), 500
 
     return app
-app = create_app()
+app = create_app(os.environ.get('FLASK_CONFIG', 'default'))
 
 if __name__ == '__main__':
     port = 5003
@@ -0,0 +1,97 @@
+"""Сравнение форматов ответа /orders: время сериализации и размер.
+
+Не требует базы: заказы генерируются в том же виде, что отдает API.
+
+    python bench_serialization.py --orders 5000 --repeat 20
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from flask import Flask, jsonify
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.append(str(BASE_DIR))
+
+from serialization import list_response, msgpack, zstandard  # noqa: E402
+from taxi_shared.queries import STATUS_DISPLAY, order_row_to_dict  # noqa: E402
+
+VARIANTS = [
+    ('jsonify (текущий)', None, {}),
+    ('json', '', {'Accept': 'application/json'}),
+    ('json + gzip', '', {'Accept': 'application/json', 'Accept-Encoding': 'gzip'}),
+    ('json колоночный', 'layout=columnar', {'Accept': 'application/json'}),
+    ('json колоночный + gzip', 'layout=columnar', {'Accept': 'application/json', 'Accept-Encoding': 'gzip'}),
+    ('msgpack', '', {'Accept': 'application/msgpack'}),
+    ('msgpack колоночный', 'layout=columnar', {'Accept': 'application/msgpack'}),
+    ('msgpack колоночный + zstd', 'layout=columnar', {'Accept': 'application/msgpack', 'Accept-Encoding': 'zstd'}),
+]
+
+
+def fake_orders(count):
+    rng = random.Random(42)
+    started = datetime(2026, 1, 1)
+    names = [f'Клиент {i}' for i in range(500)]
+    operators = [f'Оператор {i}' for i in range(20)]
+    tariffs = [('Эконом', Decimal('25.00')), ('Комфорт', Decimal('35.00')), ('Бизнес', Decimal('55.00'))]
+    rows = []
+    for order_id in range(1, count + 1):
+        tariff_id = rng.randrange(len(tariffs))
+        row = (
+            order_id, started + timedelta(minutes=order_id), Decimal(f'{rng.uniform(1, 60):.1f}'),
+            rng.choice(list(STATUS_DISPLAY)),
+            rng.randrange(500), rng.choice(names),
+            rng.randrange(1, 200), 'Toyota', 'Camry',
+            tariff_id + 1, tariffs[tariff_id][0], tariffs[tariff_id][1],
+            rng.randrange(20), rng.choice(operators),
+        )
+        rows.append(order_row_to_dict(row))
+    return rows
+
+
+def measure(app, payload, query, headers, repeat):
+    with app.test_request_context(f'/api/taxi/orders?{query or ""}', headers=headers):
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            if query is None:
+                response = jsonify(payload)
+            else:
+                response = list_response(payload, 'orders')
+            body = response.get_data()
+            best = min(best, time.perf_counter() - started)
+        return best, len(body), response.headers.get('Content-Encoding', '-')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    orders = fake_orders(args.orders)
+    payload = {'success': True, 'total': len(orders), 'count': len(orders), 'orders': orders}
+
+    print(f'Заказов: {args.orders}, лучшее из {args.repeat} повторов')
+    print(f'{"вариант":<28} {"мс":>8} {"КБ":>9} {"к jsonify":>10} {"сжатие":>7}')
+    baseline = None
+    for name, query, headers in VARIANTS:
+        if 'msgpack' in name and msgpack is None:
+            print(f'{name:<28} пропущено: нет пакета msgpack')
+            continue
+        if 'zstd' in name and zstandard is None:
+            print(f'{name:<28} пропущено: нет пакета zstandard')
+            continue
+        seconds, size, encoding = measure(app, payload, query, headers, args.repeat)
+        baseline = baseline or size
+        print(f'{name:<28} {seconds * 1000:>8.1f} {size / 1024:>9.1f} {size / baseline:>10.0%} {encoding:>7}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+import base64
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request, make_response
+
+from extentions import db
+from invalidation import listener
+from models import TableVersion
+from serialization import representation_key
+from sharding import current_city
+from shared_state import get_store
+from taxi_shared.queries import sum_versions, version_keys
+
+# Заголовки представления, которые сохраняются вместе с телом ответа
+CACHED_HEADERS = ('Content-Encoding', 'Vary')
+
+
+class TTLCache:
+    """LRU-кэш в памяти процесса с временем жизни записей."""
+
+    def __init__(self, max_entries=512, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self.data[key]
+                self.misses += 1
+                return None
+            self.data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (ttl or self.ttl)
+        with self.lock:
+            self.data[key] = (expires_at, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.max_entries:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+class FileCache:
+    """Кэш в каталоге на диске, общий для нескольких процессов на одной машине."""
+
+    def __init__(self, directory, max_entries=512, ttl=300):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + '.cache')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                expires_at, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires_at < time.time():
+            self.delete(key)
+            return None
+        os.utime(path)
+        return value
+
+    def set(self, key, value, ttl=None):
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((time.time() + (ttl or self.ttl), value), f)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.cache'):
+                os.remove(os.path.join(self.directory, name))
+
+    def _evict(self):
+        entries = [e for e in os.scandir(self.directory) if e.name.endswith('.cache')]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+class SharedStoreCache:
+    """Кэш ответов в общем хранилище: один на все воркеры и машины."""
+
+    def __init__(self, store, ttl=300, prefix='response:'):
+        self.store = store
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.store.get(self.prefix + key)
+        if value is None:
+            return None
+        body, mimetype, headers = value
+        return base64.b64decode(body), mimetype, headers
+
+    def set(self, key, value, ttl=None):
+        # Хранилище принимает только JSON: тело ответа кодируется в base64
+        body, mimetype, headers = value
+        self.store.set(self.prefix + key, [base64.b64encode(body).decode(), mimetype, headers], ttl or self.ttl)
+
+    def delete(self, key):
+        self.store.delete(self.prefix + key)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                cfg = current_app.config
+                if cfg.get('CACHE_BACKEND') == 'shared':
+                    _cache = SharedStoreCache(get_store(), cfg['CACHE_TTL'])
+                elif cfg.get('CACHE_BACKEND') == 'file':
+                    _cache = FileCache(cfg['CACHE_DIR'], cfg['CACHE_MAX_ENTRIES'], cfg['CACHE_TTL'])
+                else:
+                    _cache = TTLCache(cfg['CACHE_MAX_ENTRIES'], cfg['CACHE_TTL'])
+    return _cache
+
+
+_query_memo = None
+
+
+def get_query_memo():
+    global _query_memo
+    if _query_memo is None:
+        with _cache_lock:
+            if _query_memo is None:
+                cfg = current_app.config
+                _query_memo = TTLCache(cfg['QUERY_MEMO_MAX_ENTRIES'], cfg['QUERY_MEMO_TTL'])
+    return _query_memo
+
+
+def memoize_query(key, tables, compute):
+    """Результат compute() для ключа запроса, пока не изменились версии tables.
+
+    Версии входят в ключ, так что запись в зависимые таблицы делает старые
+    записи недостижимыми, а LRU и короткий TTL их вытесняют.
+    """
+    memo = get_query_memo()
+    full_key = (current_city(), key, get_table_versions(*tables))
+    value = memo.get(full_key)
+    if value is None:
+        value = compute()
+        memo.set(full_key, value)
+    return value
+
+
+def shared_query(key, tables, compute):
+    """Как memoize_query, но результат лежит в общем хранилище состояния.
+
+    Для индексов, которые нужны всем воркерам (например, занятые машины):
+    пока версии tables не изменились, выборку делает один воркер из всех.
+    Значение должно быть JSON-совместимым.
+    """
+    versions = '.'.join(map(str, get_table_versions(*tables)))
+    full_key = f'query:{current_city()}:{key}:{versions}'
+    store = get_store()
+    value = store.get(full_key)
+    if value is None:
+        value = compute()
+        store.set(full_key, value, current_app.config['SHARED_QUERY_TTL'])
+    return value
+
+
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def forget_table_version(table_name):
+    with _versions_lock:
+        if table_name is None:
+            _versions.clear()
+        else:
+            _versions.pop(table_name, None)
+
+
+listener.subscribe('table_versions', forget_table_version)
+
+
+def load_table_versions(tables):
+    rows = db.session.query(TableVersion.table_name, TableVersion.version).filter(
+        TableVersion.table_name.in_(version_keys(tables))
+    ).all()
+    return sum_versions(rows, tables)
+
+
+def get_table_versions(*tables):
+    """Версии таблиц. Пока подписка на сигналы сброса жива, версии берутся
+    из памяти воркера и перечитываются только после сигнала от Django.
+
+    Подписка слушает базу основного города, версии остальных городов
+    читаются из их баз на каждый вызов (один запрос по индексу).
+    """
+    if not listener.healthy or current_city() != current_app.config['DEFAULT_CITY']:
+        versions = load_table_versions(tables)
+        return tuple(versions[table] for table in tables)
+
+    with _versions_lock:
+        versions = {table: _versions[table] for table in tables if table in _versions}
+        generation = listener.generation
+    missing = [table for table in tables if table not in versions]
+    if missing:
+        loaded = load_table_versions(missing)
+        with _versions_lock:
+            if listener.generation == generation:
+                _versions.update(loaded)
+        versions.update(loaded)
+    return tuple(versions[table] for table in tables)
+
+
+def cached_response(*tables):
+    """Кэширует ответ эндпоинта и выставляет сильный ETag.
+
+    ETag строится из версий таблиц, от которых зависит ответ, поэтому
+    проверка If-None-Match стоит один запрос к таблице версий.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            versions = get_table_versions(*tables)
+            key_source = (f"{current_city()}|{request.path}?{request.query_string.decode()}|{versions}|"
+                          f"{representation_key()}")
+            etag = hashlib.sha1(key_source.encode()).hexdigest()
+
+            if etag in request.if_none_match:
+                response = make_response('', 304)
+                response.set_etag(etag)
+                return response
+
+            cache = get_cache()
+            cached = cache.get(etag)
+            if cached is not None:
+                body, mimetype, headers = cached
+                response = make_response(body)
+                response.mimetype = mimetype
+                response.headers.update(headers)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+                cache.set(etag, (response.get_data(), response.mimetype, headers))
+
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -1,9 +1,21 @@
 import os
 from pathlib import Path
 
+from taxi_shared.sharding import parse_cities
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
+def database_uri(db_config, database):
+    return f"postgresql://{db_config['user']}:{db_config['password']}@" \
+           f"{db_config['host']}:{db_config['port']}/{database}"
+
+
+def city_binds(db_config, cities, default_city):
+    """SQLALCHEMY_BINDS: базы городов, кроме основного."""
+    return {city: database_uri(db_config, database) for city, database in cities.items() if city != default_city}
+
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'your-secret-key-here'
     DB_CONFIG = {
@@ -14,13 +26,83 @@ class Config:
         'password': 'password'
     }
 
-    SQLALCHEMY_DATABASE_URI = f"postgresql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@" \
-                              f"{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
+    # Города и их базы, как у Django (TAXI_CITIES): основной город - база по
+    # умолчанию, остальные - SQLALCHEMY_BINDS с ключом-кодом города
+    CITIES = parse_cities(os.environ.get('TAXI_CITIES', ''), {'msk': DB_CONFIG['database']})
+    DEFAULT_CITY = next(iter(CITIES))
+    SQLALCHEMY_DATABASE_URI = database_uri(DB_CONFIG, CITIES[DEFAULT_CITY])
+    SQLALCHEMY_BINDS = city_binds(DB_CONFIG, CITIES, DEFAULT_CITY)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    DB_POOL_SIZE = 10
+    DB_MAX_OVERFLOW = 5
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': 10,
+        'pool_pre_ping': True
+    }
     SQLALCHEMY_ECHO = False
 
     LOG_FILE_PATH = os.path.join(BASE_DIR, 'output', 'api_logs.txt')
     API_PREFIX = '/api/taxi'
+    API_MAX_LIMIT = 500
+    CORS_ORIGINS = os.environ.get('API_CORS_ORIGINS', '*').split(',')
+
+    # Token bucket на клиента: запросов в секунду и размер всплеска.
+    # Доверенным ключам (X-API-Key) можно выдать свои лимиты: {ключ: (rate, burst)}
+    RATE_LIMIT_PER_SECOND = 10
+    RATE_LIMIT_BURST = 40
+    API_KEY_RATE_LIMITS = {}
+
+    # Где считаются лимиты и метрики: 'memory' - в каждом воркере отдельно,
+    # 'redis' - общие для всех воркеров (SHARED_STATE_URL). PostgreSQL для них
+    # не используется: это та база, которую защищают лимиты
+    LIMITS_BACKEND = os.environ.get('LIMITS_BACKEND', 'memory')
+
+    # Сброс нагрузки: 503, если слот для работы с БД не освободился за это время
+    LOAD_SHED_MAX_WAIT = 0.5
+    LOAD_SHED_RETRY_AFTER = 2
+
+    # 'memory' - кэш внутри процесса, 'file' - общий кэш для процессов на одной машине,
+    # 'shared' - общее хранилище SHARED_STATE_BACKEND для всех воркеров и машин
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+    CACHE_DIR = os.path.join(BASE_DIR, 'output', 'api_cache')
+    CACHE_TTL = 300
+    CACHE_MAX_ENTRIES = 512
+
+    # Мемоизация повторяющихся выборок заказов внутри воркера
+    QUERY_MEMO_TTL = 5
+    QUERY_MEMO_MAX_ENTRIES = 256
+
+    # Индексы в общем хранилище (занятые машины): ключ включает версии таблиц,
+    # TTL только убирает записи устаревших версий
+    SHARED_QUERY_TTL = 60
+
+    # 'memory', 'postgres' (таблица Dispatch_taxi_sharedstate) или 'redis'
+    SHARED_STATE_BACKEND = os.environ.get('SHARED_STATE_BACKEND', 'memory')
+    SHARED_STATE_URL = os.environ.get('SHARED_STATE_URL', 'redis://localhost:6379/0')
+
+    # Пути файлов основного города; у остальных к имени добавляется код города
+    ORDER_ARCHIVE_DIR = os.path.join(BASE_DIR, 'archive', 'orders')
+
+    ROAD_GRAPH_PATH = os.path.join(BASE_DIR, 'data', 'road_graph.npz')
+    ROUTE_CACHE_SIZE = 10000
+
+    ETA_MATRIX_PATH = os.path.join(BASE_DIR, 'output', 'eta_matrix.npy')
+
+    ZONE_RESOLVE_MAX_POINTS = 10000
+
+    SHIFT_TIME_ZONE = 'Europe/Moscow'
+    OPERATOR_PRESENCE_TIMEOUT = 120
+
+    # Предел ожидания long-poll водительского приложения, секунды
+    OFFER_POLL_MAX_WAIT = 30
+
+    # Пул воркеров (см. pools.py): 'all', 'main' или 'streaming'
+    API_POOL = os.environ.get('API_POOL', 'all')
+
+    FORECAST_STATE_PATH = os.path.join(BASE_DIR, 'output', 'demand_model.npz')
+    FORECAST_HISTORY_WEEKS = 8
 
     @staticmethod
     def init_app(app):
@@ -35,6 +117,9 @@ class DevelopmentConfig(Config):
 
 class ProductionConfig(Config):
     DEBUG = False
+    # Несколько воркеров gunicorn: состояние и кэш ответов должны быть общими
+    SHARED_STATE_BACKEND = os.environ.get('SHARED_STATE_BACKEND', 'postgres')
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'shared')
 
 config = {
     'development': DevelopmentConfig,
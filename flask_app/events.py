@@ -0,0 +1,132 @@
+import json
+import logging
+import select
+import threading
+import time
+from collections import deque
+
+from sharding import CityRegistry
+
+ORDER_EVENTS_CHANNEL = 'order_events'
+
+logger = logging.getLogger(__name__)
+
+
+class OrderEventBroker:
+    """Слушает LISTEN order_events и раздает события SSE-клиентам.
+
+    Последние события хранятся в кольцевом буфере, поэтому клиент может
+    переподключиться с заголовком Last-Event-ID и получить пропущенное.
+    """
+
+    def __init__(self, buffer_size=1000):
+        self.events = deque(maxlen=buffer_size)
+        self.last_id = 0
+        # Эпоха процесса: id событий после рестарта нельзя сравнивать со старыми
+        self.epoch = int(time.time())
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def start(self, engine):
+        with self.condition:
+            if self.thread and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self._listen, args=(engine,), daemon=True)
+            self.thread.start()
+
+    def publish(self, payload):
+        with self.condition:
+            self.last_id += 1
+            self.events.append((self.last_id, payload))
+            self.condition.notify_all()
+            return self.last_id
+
+    def events_after(self, last_event_id):
+        """Возвращает (события, need_reset). need_reset=True, если буфер уже
+        не содержит всего, что пропустил клиент."""
+        with self.condition:
+            if last_event_id is None:
+                return [], False
+            if last_event_id < 0 or last_event_id > self.last_id:
+                return [], True
+            if self.events and last_event_id < self.events[0][0] - 1:
+                return [], True
+            return [(event_id, payload) for event_id, payload in self.events
+                    if event_id > last_event_id], False
+
+    def wait(self, last_event_id, timeout):
+        with self.condition:
+            self.condition.wait_for(lambda: self.last_id > last_event_id, timeout=timeout)
+            return [(event_id, payload) for event_id, payload in self.events
+                    if event_id > last_event_id]
+
+    def format_id(self, event_id):
+        return f'{self.epoch}-{event_id}'
+
+    def parse_id(self, value):
+        if not value:
+            return None
+        try:
+            epoch, event_id = value.split('-', 1)
+            if int(epoch) != self.epoch:
+                return -1
+            return int(event_id)
+        except ValueError:
+            return -1
+
+    def _listen(self, engine):
+        while True:
+            try:
+                raw = engine.raw_connection()
+                connection = raw.driver_connection
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f'LISTEN {ORDER_EVENTS_CHANNEL}')
+                logger.info('Подписка на %s установлена', ORDER_EVENTS_CHANNEL)
+                while True:
+                    if select.select([connection], [], [], 30) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        notify = connection.notifies.pop(0)
+                        try:
+                            self.publish(json.loads(notify.payload))
+                        except ValueError:
+                            logger.warning('Некорректное событие заказа: %s', notify.payload)
+            except Exception as e:
+                logger.error('Ошибка подписки на события заказов: %s', e)
+                time.sleep(5)
+
+
+# У каждого города своя база и свой канал событий
+brokers = CityRegistry(OrderEventBroker)
+
+
+def format_sse(event_id, payload):
+    return f"id: {event_id}\nevent: {payload['event']}\ndata: {json.dumps(payload)}\n\n"
+
+
+def stream_order_events(broker, last_event_id, heartbeat=15):
+    cursor = broker.parse_id(last_event_id)
+    yield 'retry: 3000\n\n'
+
+    missed, need_reset = broker.events_after(cursor)
+    if need_reset:
+        # Клиент отстал сильнее буфера - пусть перечитает список целиком
+        yield f"id: {broker.format_id(broker.last_id)}\nevent: reset\ndata: {{}}\n\n"
+        cursor = broker.last_id
+    else:
+        for event_id, payload in missed:
+            yield format_sse(broker.format_id(event_id), payload)
+            cursor = event_id
+        if cursor is None:
+            cursor = broker.last_id
+
+    while True:
+        events = broker.wait(cursor, heartbeat)
+        if not events:
+            yield ': heartbeat\n\n'
+            continue
+        for event_id, payload in events:
+            yield format_sse(broker.format_id(event_id), payload)
+            cursor = event_id
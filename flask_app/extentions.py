@@ -1,6 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 
+from sharding import CitySession
+
 class Base(DeclarativeBase):
     pass
-db = SQLAlchemy()
\ No newline at end of file
+db = SQLAlchemy(session_options={'class_': CitySession})
\ No newline at end of file
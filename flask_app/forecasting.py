@@ -0,0 +1,12 @@
+from flask import current_app
+
+from sharding import city_config_path
+from taxi_shared.forecast import DemandModel, get_model
+
+
+def get_demand_model():
+    """Модель спроса города запроса. Ее обновляет фоновая задача Django
+    refresh_demand_model; пока файла нет, прогноз нулевой."""
+    history_weeks = current_app.config['FORECAST_HISTORY_WEEKS']
+    model = get_model(city_config_path('FORECAST_STATE_PATH'), history_weeks)
+    return model if model is not None else DemandModel(history_weeks)
@@ -0,0 +1,32 @@
+"""Конфигурация gunicorn для API.
+
+Запуск из каталога flask_app:
+    FLASK_CONFIG=production gunicorn -c gunicorn.conf.py app:app
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('API_BIND', '0.0.0.0:5003')
+
+# Потоковые воркеры для коротких запросов; SSE и long-poll, которые держат
+# соединение, обслуживает gevent-пул gunicorn_drivers.conf.py
+worker_class = 'gthread'
+workers = int(os.environ.get('API_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('API_THREADS', 8))
+
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+# Перезапуск воркеров ограничивает рост памяти от кэшей и модели прогноза
+max_requests = 10000
+max_requests_jitter = 1000
+
+# Приложение создается в каждом воркере: пул соединений с БД и потоки
+# подписок нельзя наследовать через fork
+preload_app = False
+
+# Долгие запросы обслуживает gunicorn_drivers.conf.py (см. pools.py)
+raw_env = ['FLASK_CONFIG=production', 'API_POOL=main']
+accesslog = '-'
+errorlog = '-'
@@ -0,0 +1,50 @@
+"""Конфигурация gunicorn для долгих запросов: long-poll водителей и SSE.
+
+Ожидающий запрос /vehicles/<id>/offers или подписка /orders/stream почти
+ничего не делают, поэтому вместо потока на запрос используется gevent.
+Балансировщик направляет сюда только эти пути (см. pools.py), остальное
+API обслуживает gunicorn.conf.py.
+
+Замер на одном ядре с локальным PostgreSQL, один воркер, ожидание 20 с:
+2000 одновременных запросов - все 200, прием пачки ~2 с; воркер
+принимает ~500 новых запросов в секунду (каждый сначала читает
+предложения из базы). При 10000 на воркер пачка принимается ~20 с, часть
+запросов получает 500 по таймауту пула соединений, память +180 МБ.
+Поэтому на воркер по умолчанию 2000 соединений, больше - больше воркеров.
+
+Запуск из каталога flask_app:
+    FLASK_CONFIG=production gunicorn -c gunicorn_drivers.conf.py app:app
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('DRIVER_API_BIND', '0.0.0.0:5004')
+
+worker_class = 'gevent'
+workers = int(os.environ.get('DRIVER_API_WORKERS', multiprocessing.cpu_count()))
+worker_connections = int(os.environ.get('DRIVER_API_CONNECTIONS', 2000))
+
+# Long-poll длится до OFFER_POLL_MAX_WAIT, таймаут воркера должен быть больше
+timeout = 90
+graceful_timeout = 30
+keepalive = 75
+
+max_requests = 100000
+max_requests_jitter = 10000
+
+preload_app = False
+
+raw_env = ['FLASK_CONFIG=production', 'API_POOL=streaming']
+accesslog = None
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    # psycopg2 блокирует весь воркер на время запроса к БД; psycogreen делает
+    # ожидание ответа базы кооперативным. Без него воркер gevent обслуживает
+    # по запросу за раз, поэтому не запускаемся вовсе
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError as e:
+        raise RuntimeError('Для воркеров gevent нужен psycogreen (pip install psycogreen)') from e
+    patch_psycopg()
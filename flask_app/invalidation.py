@@ -0,0 +1,101 @@
+import json
+import logging
+import select
+import threading
+import time
+
+from sqlalchemy import text
+
+INVALIDATION_CHANNEL = 'api_invalidate'
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidationListener:
+    """Рассылает сигналы сброса локальных кэшей между воркерами через LISTEN/NOTIFY.
+
+    Сообщение - JSON ``{"ns": пространство, "key": ключ}`` или
+    ``{"ns": пространство, "keys": [ключи]}`` (Django сообщает так обо всех
+    таблицах транзакции разом). Обработчики пространства вызываются с
+    каждым ключом; key=None означает "сбросить все".
+    После переподключения все обработчики получают None: сигналы, пришедшие
+    во время обрыва, потеряны. Пока подписки нет, healthy=False и локальным
+    кэшам доверять нельзя.
+    """
+
+    def __init__(self):
+        self.handlers = {}
+        self.lock = threading.Lock()
+        self.thread = None
+        self.healthy = False
+        # Растет при каждом сбросе: защищает от записи в кэш значения,
+        # прочитанного до пришедшего сигнала
+        self.generation = 0
+
+    def subscribe(self, namespace, handler):
+        with self.lock:
+            self.handlers.setdefault(namespace, []).append(handler)
+
+    def start(self, engine):
+        with self.lock:
+            if self.thread and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self._listen, args=(engine,), daemon=True)
+            self.thread.start()
+
+    def publish(self, engine, namespace, key=None):
+        with engine.begin() as conn:
+            conn.execute(text('SELECT pg_notify(:channel, :payload)'), {
+                'channel': INVALIDATION_CHANNEL,
+                'payload': json.dumps({'ns': namespace, 'key': key})
+            })
+
+    def dispatch(self, namespace, key):
+        with self.lock:
+            self.generation += 1
+            handlers = list(self.handlers.get(namespace, ()))
+        for handler in handlers:
+            handler(key)
+
+    def dispatch_all(self):
+        with self.lock:
+            namespaces = list(self.handlers)
+        for namespace in namespaces:
+            self.dispatch(namespace, None)
+
+    def _listen(self, engine):
+        while True:
+            try:
+                raw = engine.raw_connection()
+                try:
+                    self._receive(raw.driver_connection)
+                finally:
+                    # Соединение с LISTEN и autocommit не возвращается в пул,
+                    # а закрывается; разорванное закрывается без отката
+                    raw.invalidate()
+            except Exception as e:
+                self.healthy = False
+                logger.error('Ошибка подписки на сигналы сброса кэша: %s', e)
+                time.sleep(5)
+
+    def _receive(self, connection):
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f'LISTEN {INVALIDATION_CHANNEL}')
+        self.dispatch_all()
+        self.healthy = True
+        logger.info('Подписка на %s установлена', INVALIDATION_CHANNEL)
+        while True:
+            if select.select([connection], [], [], 30) == ([], [], []):
+                continue
+            connection.poll()
+            while connection.notifies:
+                notify = connection.notifies.pop(0)
+                try:
+                    message = json.loads(notify.payload)
+                    for key in message['keys'] if 'keys' in message else [message.get('key')]:
+                        self.dispatch(message['ns'], key)
+                except (ValueError, KeyError):
+                    logger.warning('Некорректный сигнал сброса: %s', notify.payload)
+
+listener = InvalidationListener()
@@ -0,0 +1,173 @@
+import hashlib
+import math
+import os
+import threading
+import time
+
+from flask import current_app, g, jsonify, request
+
+from shared_state import MemoryStore, RedisStore
+
+# Долгие подключения не держат соединение с БД и не должны занимать слот
+SHED_EXEMPT_ENDPOINTS = {'api.stream_orders', 'api.get_metrics', 'api.poll_vehicle_offers'}
+
+# Суммируются по всем воркерам, если лимиты хранятся в Redis
+SHARED_METRICS = ('rate_limited', 'shed')
+
+# Лимиты и метрики никогда не хранятся в PostgreSQL: под нагрузкой каждый
+# запрос делал бы запись в ту самую базу, которую они защищают
+_limits_store = None
+_local_store = MemoryStore()
+_limits_store_lock = threading.Lock()
+
+
+def get_limits_store():
+    """Хранилище лимитов из LIMITS_BACKEND: memory (на воркер) или redis."""
+    global _limits_store
+    if _limits_store is None:
+        with _limits_store_lock:
+            if _limits_store is None:
+                if current_app.config['LIMITS_BACKEND'] == 'redis':
+                    _limits_store = RedisStore(current_app.config['SHARED_STATE_URL'])
+                else:
+                    _limits_store = _local_store
+    return _limits_store
+
+
+def take_token(key, rate, burst):
+    try:
+        return get_limits_store().take_token(key, rate, burst)
+    except Exception:
+        # Redis недоступен: лимит считается внутри воркера, а не снимается
+        return _local_store.take_token(key, rate, burst)
+
+
+def client_id():
+    """Клиент для лимитов: API-ключ из заголовка X-API-Key или адрес."""
+    api_key = request.headers.get('X-API-Key')
+    if api_key:
+        return 'key:' + hashlib.sha1(api_key.encode()).hexdigest()[:16], api_key
+    return f'ip:{request.remote_addr}', None
+
+
+def client_limits(api_key):
+    cfg = current_app.config
+    if api_key and api_key in cfg['API_KEY_RATE_LIMITS']:
+        return cfg['API_KEY_RATE_LIMITS'][api_key]
+    return cfg['RATE_LIMIT_PER_SECOND'], cfg['RATE_LIMIT_BURST']
+
+
+class LoadShedder:
+    """Ограничивает число запросов, одновременно работающих с БД в воркере.
+
+    Емкость равна размеру пула соединений. Если слот не освободился за
+    max_wait секунд, ждать соединения из пула пришлось бы еще дольше -
+    запрос сразу получает 503, а не копится в очереди.
+    """
+
+    def __init__(self, capacity, max_wait):
+        self.capacity = capacity
+        self.max_wait = max_wait
+        self.semaphore = threading.BoundedSemaphore(capacity)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.wait_ewma = 0.0
+
+    def acquire(self):
+        started = time.monotonic()
+        acquired = self.semaphore.acquire(timeout=self.max_wait)
+        waited = time.monotonic() - started
+        with self.lock:
+            self.wait_ewma = 0.9 * self.wait_ewma + 0.1 * waited
+            if acquired:
+                self.in_flight += 1
+        return acquired
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+        self.semaphore.release()
+
+
+class Metrics:
+    """Счетчики запросов: локальные для воркера и суммарные в общем хранилище."""
+
+    def __init__(self):
+        self.local = dict.fromkeys(SHARED_METRICS + ('served',), 0)
+        self.lock = threading.Lock()
+
+    def incr(self, name):
+        with self.lock:
+            self.local[name] += 1
+        if name not in SHARED_METRICS:
+            return
+        try:
+            store = get_limits_store()
+            if store is not _local_store:
+                store.incr(f'metrics:{name}')
+        except Exception:
+            # Метрики не должны ронять запрос
+            pass
+
+    def totals(self):
+        store = get_limits_store()
+        if store is _local_store:
+            with self.lock:
+                return {name: self.local[name] for name in SHARED_METRICS}
+        return {name: store.incr(f'metrics:{name}', 0) for name in SHARED_METRICS}
+
+
+metrics = Metrics()
+
+
+def too_many_requests(status, error, retry_after):
+    response = jsonify({'success': False, 'error': error})
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def init_limits(app):
+    cfg = app.config
+    shedder = LoadShedder(cfg['DB_POOL_SIZE'] + cfg['DB_MAX_OVERFLOW'], cfg['LOAD_SHED_MAX_WAIT'])
+    app.extensions['load_shedder'] = shedder
+
+    @app.before_request
+    def enforce_limits():
+        if not request.path.startswith(cfg['API_PREFIX']):
+            return None
+
+        # Сначала сброс нагрузки: он не обращается ни к каким хранилищам.
+        # Слот освобождается в release_slot, даже если дальше ответ 429
+        if request.endpoint not in SHED_EXEMPT_ENDPOINTS:
+            if not shedder.acquire():
+                metrics.incr('shed')
+                return too_many_requests(503, 'Сервис перегружен, повторите позже', cfg['LOAD_SHED_RETRY_AFTER'])
+            g.shed_slot = True
+
+        key, api_key = client_id()
+        rate, burst = client_limits(api_key)
+        allowed, retry_after = take_token(f'ratelimit:{key}', rate, burst)
+        if not allowed:
+            metrics.incr('rate_limited')
+            return too_many_requests(429, 'Слишком много запросов', retry_after)
+        metrics.incr('served')
+        return None
+
+    @app.teardown_request
+    def release_slot(exc):
+        if g.pop('shed_slot', False):
+            shedder.release()
+
+
+def worker_metrics(app):
+    shedder = app.extensions['load_shedder']
+    with metrics.lock:
+        local = dict(metrics.local)
+    return {
+        'pid': os.getpid(),
+        'in_flight': shedder.in_flight,
+        'capacity': shedder.capacity,
+        'pool_wait_ewma_ms': round(shedder.wait_ewma * 1000, 2),
+        **local
+    }
@@ -0,0 +1,138 @@
+"""Нагрузочный тест масштабирования API по числу воркеров gunicorn.
+
+Для каждого числа воркеров поднимает gunicorn, нагружает эндпоинт
+параллельными клиентами и печатает пропускную способность и эффективность
+относительно линейного роста:
+
+    python loadtest.py --workers 1 2 4 8 --path /api/taxi/tariffs --duration 20
+
+С --url нагружает уже запущенный сервер без перезапусков.
+
+Рост с числом воркеров ограничен числом ядер: клиенты, воркеры и
+PostgreSQL делят одну машину. Замер на одной виртуальной машине с одним
+ядром (CACHE_BACKEND=shared, SHARED_STATE_BACKEND=postgres, 10 с,
+4 клиента на воркер), запр/с:
+
+    воркеры   /tariffs   /vehicles?available_only=true
+    1         626        178
+    2         453        177
+    4         537        164
+
+Прироста на одном ядре нет, p99 растет с числом процессов, ошибок нет.
+Линейность масштабирования этим замером не показана: ее нужно проверять
+на машине с несколькими ядрами и отдельным сервером БД.
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def client(url, duration, result_queue):
+    parts = urlsplit(url)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+    done = errors = 0
+    latencies = []
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 500 or response.status == 429:
+                errors += 1
+            else:
+                done += 1
+                latencies.append(time.monotonic() - started)
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+    connection.close()
+    result_queue.put((done, errors, latencies))
+
+
+def run_load(url, clients, duration):
+    queue = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=client, args=(url, duration, queue)) for _ in range(clients)]
+    for process in processes:
+        process.start()
+    results = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    done = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
+    latencies = sorted(latency for r in results for latency in r[2])
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0
+    return done / duration, errors, p99
+
+
+def wait_for_port(host, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Сервер не поднялся на {host}:{port}')
+
+
+def start_server(workers, port, backend):
+    env = dict(os.environ, API_WORKERS=str(workers), API_BIND=f'127.0.0.1:{port}',
+               SHARED_STATE_BACKEND=backend)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--access-logfile', '', 'app:app'],
+        cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    wait_for_port('127.0.0.1', port)
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--path', default='/api/taxi/tariffs')
+    parser.add_argument('--url', help='Нагрузить уже запущенный сервер')
+    parser.add_argument('--clients-per-worker', type=int, default=4)
+    parser.add_argument('--duration', type=int, default=15)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--port', type=int, default=5103)
+    parser.add_argument('--backend', default='postgres', help='SHARED_STATE_BACKEND для воркеров')
+    args = parser.parse_args()
+
+    if args.url:
+        rps, errors, p99 = run_load(args.url, args.clients_per_worker, args.duration)
+        print(f'{rps:.1f} запр/с, ошибок {errors}, p99 {p99:.1f} мс')
+        return
+
+    url = f'http://127.0.0.1:{args.port}{args.path}'
+    print(f'{"воркеры":>8} {"запр/с":>10} {"ускорение":>10} {"эффективность":>14} {"p99, мс":>9} {"ошибки":>7}')
+    baseline = None
+    for workers in args.workers:
+        server = start_server(workers, args.port, args.backend)
+        try:
+            clients = workers * args.clients_per_worker
+            run_load(url, clients, args.warmup)
+            rps, errors, p99 = run_load(url, clients, args.duration)
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait()
+        baseline = baseline or rps / workers
+        speedup = rps / baseline if baseline else 0
+        print(f'{workers:>8} {rps:>10.1f} {speedup:>10.2f} {speedup / workers:>14.0%} {p99:>9.1f} {errors:>7}')
+
+
+if __name__ == '__main__':
+    main()
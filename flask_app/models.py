@@ -1,7 +1,23 @@
 from datetime import datetime
 from extentions import db
+from taxi_shared.offers import offer_status
+from taxi_shared.order_history import EVENT_NAMES
 
-class Driver(db.Model):
+
+class CityMixin:
+    # Код города строки; заполняет Django (см. Dispatch_taxi/sharding.py)
+    city = db.Column(db.String(20), nullable=False)
+
+
+class SoftDeleteMixin:
+    deleted_at = db.Column(db.DateTime(timezone=True), nullable=True, index=True)
+
+    @classmethod
+    def active(cls):
+        return cls.query.filter(cls.deleted_at.is_(None))
+
+
+class Driver(CityMixin, SoftDeleteMixin, db.Model):
     __tablename__ = 'Dispatch_taxi_driver'
 
     id = db.Column(db.Integer, primary_key=True)
@@ -9,25 +25,26 @@ class Driver(db.Model):
     phone = db.Column(db.String(12), nullable=False)
     vehicles = db.relationship('Vehicle', back_populates='driver', lazy='dynamic')
     info = db.relationship('DriverInfo', back_populates='driver', uselist=False)
+    stats = db.relationship('DriverStats', uselist=False)
 
     def to_dict(self):
         return {
             'id': self.id,
             'full_name': self.full_name,
             'phone': self.phone,
-            'vehicles_count': self.vehicles.count()
+            'vehicles_count': self.vehicles.filter(Vehicle.deleted_at.is_(None)).count()
         }
 
 class DriverInfo(db.Model):
     __tablename__ = 'Dispatch_taxi_driverinfo'
 
     id = db.Column(db.Integer, primary_key=True)
-    driver_id = db.Column(db.Integer, db.ForeignKey('Dispatch_taxi_driver.id'), unique=True)
+    driver_id = db.Column(db.Integer, db.ForeignKey('Dispatch_taxi_driver.id'), unique=True, nullable=False)
     birth_date = db.Column(db.Date, nullable=True)
     driver_license = db.Column(db.String(10), unique=True, nullable=False)
     photo = db.Column(db.String(500), nullable=True)
-    experience_years = db.Column(db.Integer, default=0)
-    gender = db.Column(db.String(7))
+    experience_years = db.Column(db.Integer, default=0, nullable=False)
+    gender = db.Column(db.String(7), nullable=False)
 
     driver = db.relationship('Driver', back_populates='info')
 
@@ -42,17 +59,45 @@ class DriverInfo(db.Model):
         }
 
 
-class Vehicle(db.Model):
+class ShiftSchedule(db.Model):
+    __tablename__ = 'Dispatch_taxi_shiftschedule'
+
+    id = db.Column(db.BigInteger, primary_key=True)
+    driver_id = db.Column(db.Integer, db.ForeignKey('Dispatch_taxi_driver.id'), nullable=False)
+    weekday = db.Column(db.SmallInteger, nullable=False)
+    start_time = db.Column(db.Time, nullable=False)
+    end_time = db.Column(db.Time, nullable=False)
+    valid_from = db.Column(db.Date, nullable=True)
+    valid_until = db.Column(db.Date, nullable=True)
+
+
+class ShiftOverride(db.Model):
+    __tablename__ = 'Dispatch_taxi_shiftoverride'
+
+    id = db.Column(db.BigInteger, primary_key=True)
+    driver_id = db.Column(db.Integer, db.ForeignKey('Dispatch_taxi_driver.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False, index=True)
+    kind = db.Column(db.String(10), nullable=False)
+    start_time = db.Column(db.Time, nullable=True)
+    end_time = db.Column(db.Time, nullable=True)
+    comment = db.Column(db.String(200), nullable=False, default='')
+
+
+class Vehicle(CityMixin, SoftDeleteMixin, db.Model):
     __tablename__ = 'Dispatch_taxi_vehicle'
 
     id = db.Column(db.Integer, primary_key=True)
     driver_id = db.Column(db.Integer, db.ForeignKey('Dispatch_taxi_driver.id'), nullable=True)
     brand = db.Column(db.String(50), nullable=False)
     model = db.Column(db.String(50), nullable=False)
-    license_plate = db.Column(db.String(15), unique=True, nullable=False)
-    color = db.Column(db.String(20))
-    year = db.Column(db.Integer)
-    mileage = db.Column(db.Integer)
+    # Уникален среди неудаленных машин (частичный индекс vehicle_active_license_plate)
+    license_plate = db.Column(db.String(15), nullable=False)
+    color = db.Column(db.String(20), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    mileage = db.Column(db.Integer, nullable=False)
+    lat = db.Column(db.Float, nullable=True)
+    lon = db.Column(db.Float, nullable=True)
+    location_updated_at = db.Column(db.DateTime(timezone=True), nullable=True)
 
     driver = db.relationship('Driver', back_populates='vehicles')
     orders = db.relationship('Order', back_populates='vehicle', lazy='dynamic')
@@ -71,7 +116,7 @@ class Vehicle(db.Model):
         }
 
 
-class Customer(db.Model):
+class Customer(CityMixin, SoftDeleteMixin, db.Model):
     __tablename__ = 'Dispatch_taxi_customer'
 
     id = db.Column(db.Integer, primary_key=True)
@@ -90,7 +135,7 @@ class Customer(db.Model):
         }
 
 
-class Tariff(db.Model):
+class Tariff(CityMixin, SoftDeleteMixin, db.Model):
     __tablename__ = 'Dispatch_taxi_tariff'
 
     id = db.Column(db.Integer, primary_key=True)
@@ -107,7 +152,7 @@ class Tariff(db.Model):
         }
 
 
-class Operator(db.Model):
+class Operator(CityMixin, SoftDeleteMixin, db.Model):
     __tablename__ = 'Dispatch_taxi_operator'
 
     id = db.Column(db.Integer, primary_key=True)
@@ -115,32 +160,94 @@ class Operator(db.Model):
     phone = db.Column(db.String(12), nullable=False)
 
     orders = db.relationship('Order', back_populates='operator', lazy='dynamic')
+    workload = db.relationship('OperatorWorkload', uselist=False)
 
     def to_dict(self):
         return {
             'id': self.id,
             'full_name': self.full_name,
             'phone': self.phone,
-            'orders_count': self.orders.count()
+            'orders_count': self.orders.count(),
+            'open_orders': self.workload.open_orders if self.workload else 0
+        }
+
+
+class OperatorWorkload(db.Model):
+    __tablename__ = 'Dispatch_taxi_operatorworkload'
+
+    operator_id = db.Column(db.Integer, db.ForeignKey('Dispatch_taxi_operator.id'), primary_key=True)
+    open_orders = db.Column(db.Integer, nullable=False, default=0)
+    is_online = db.Column(db.Boolean, nullable=False, default=False)
+    last_seen_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    last_assigned_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    def online(self, cutoff):
+        return self.is_online and self.last_seen_at is not None and self.last_seen_at >= cutoff
+
+    def to_dict(self, cutoff):
+        return {
+            'operator_id': self.operator_id,
+            'open_orders': self.open_orders,
+            'online': self.online(cutoff),
+            'last_seen_at': self.last_seen_at.isoformat() if self.last_seen_at else None,
+            'last_assigned_at': self.last_assigned_at.isoformat() if self.last_assigned_at else None
+        }
+
+
+class Zone(CityMixin, db.Model):
+    __tablename__ = 'Dispatch_taxi_zone'
+
+    id = db.Column(db.BigInteger, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    kind = db.Column(db.String(15), nullable=False, default='district')
+    polygon = db.Column(db.JSON, nullable=False)
+    priority = db.Column(db.SmallInteger, nullable=False, default=0)
+    price_multiplier = db.Column(db.Numeric(4, 2), nullable=False, default=1)
+    is_active = db.Column(db.Boolean, nullable=False, default=True)
+
+    def to_dict(self, with_polygon=False):
+        data = {
+            'id': self.id,
+            'name': self.name,
+            'kind': self.kind,
+            'priority': self.priority,
+            'price_multiplier': float(self.price_multiplier),
+            'is_active': self.is_active
         }
+        if with_polygon:
+            data['polygon'] = self.polygon
+        return data
 
 
-class Order(db.Model):
+class Order(CityMixin, db.Model):
     __tablename__ = 'Dispatch_taxi_order'
 
+    # В базе первичный ключ - (id, order_time); id уникален за счет
+    # последовательности (см. Order в Dispatch_taxi/models.py)
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('Dispatch_taxi_customer.id'), nullable=True)
     vehicle_id = db.Column(db.Integer, db.ForeignKey('Dispatch_taxi_vehicle.id'), nullable=True)
     tariff_id = db.Column(db.Integer, db.ForeignKey('Dispatch_taxi_tariff.id'), nullable=True)
     operator_id = db.Column(db.Integer, db.ForeignKey('Dispatch_taxi_operator.id'), nullable=False)
-    order_time = db.Column(db.DateTime, default=datetime.utcnow)
-    range = db.Column(db.Numeric(3, 1))
-    status = db.Column(db.String(15))
+    order_time = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+    pickup_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    dispatched_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    range = db.Column(db.Numeric(5, 1), nullable=False)
+    status = db.Column(db.String(15), nullable=False)
+    pickup_lat = db.Column(db.Float, nullable=True)
+    pickup_lon = db.Column(db.Float, nullable=True)
+    dropoff_lat = db.Column(db.Float, nullable=True)
+    dropoff_lon = db.Column(db.Float, nullable=True)
+    route_duration = db.Column(db.Integer, nullable=True)
+    pickup_zone_id = db.Column(db.BigInteger, db.ForeignKey('Dispatch_taxi_zone.id'), nullable=True)
+    driver_id = db.Column(db.Integer, db.ForeignKey('Dispatch_taxi_driver.id'), nullable=True)
+    price = db.Column(db.Numeric(12, 2), nullable=True)
 
     customer = db.relationship('Customer', back_populates='orders')
     vehicle = db.relationship('Vehicle', back_populates='orders')
     tariff = db.relationship('Tariff', back_populates='orders')
     operator = db.relationship('Operator', back_populates='orders')
+    pickup_zone = db.relationship('Zone')
 
     def to_dict(self):
         total_cost = None
@@ -158,6 +265,7 @@ class Order(db.Model):
             'operator': self.operator.full_name if self.operator else None,
             'operator_id': self.operator_id,
             'order_time': self.order_time.isoformat() if self.order_time else None,
+            'pickup_at': self.pickup_at.isoformat() if self.pickup_at else None,
             'distance': float(self.range) if self.range else 0,
             'status': self.status,
             'total_cost': total_cost,
@@ -166,8 +274,153 @@ class Order(db.Model):
 
     def get_status_display(self):
         status_map = {
+            'scheduled': 'Запланирован',
             'in_progress': 'В процессе',
             'completed': 'Завершен',
             'cancelled': 'Отменен'
         }
-        return status_map.get(self.status, self.status)
\ No newline at end of file
+        return status_map.get(self.status, self.status)
+
+
+class TableVersion(db.Model):
+    __tablename__ = 'Dispatch_taxi_tableversion'
+
+    table_name = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class SharedState(db.Model):
+    __tablename__ = 'Dispatch_taxi_sharedstate'
+
+    key = db.Column(db.String(250), primary_key=True)
+    value = db.Column(db.LargeBinary, nullable=False, default=b'')
+    counter = db.Column(db.BigInteger, nullable=False, default=0)
+    expires_at = db.Column(db.DateTime(timezone=True), nullable=True, index=True)
+
+
+class DriverOffer(db.Model):
+    __tablename__ = 'Dispatch_taxi_driveroffer'
+
+    id = db.Column(db.BigInteger, primary_key=True)
+    order_id = db.Column(db.BigInteger, nullable=False)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('Dispatch_taxi_vehicle.id'), nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='pending')
+    offered_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    expires_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    responded_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'order_id': self.order_id,
+            'vehicle_id': self.vehicle_id,
+            'status': offer_status(self),
+            'offered_at': self.offered_at.isoformat(),
+            'expires_at': self.expires_at.isoformat(),
+            'responded_at': self.responded_at.isoformat() if self.responded_at else None
+        }
+
+
+class DriverStats(db.Model):
+    __tablename__ = 'Dispatch_taxi_driverstats'
+
+    driver_id = db.Column(db.Integer, db.ForeignKey('Dispatch_taxi_driver.id'), primary_key=True)
+    orders_total = db.Column(db.Integer, nullable=False, default=0)
+    orders_completed = db.Column(db.Integer, nullable=False, default=0)
+    orders_cancelled = db.Column(db.Integer, nullable=False, default=0)
+    km_driven = db.Column(db.Numeric(12, 1), nullable=False, default=0)
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False)
+
+    def to_dict(self):
+        return {
+            'driver_id': self.driver_id,
+            'orders_total': self.orders_total,
+            'orders_completed': self.orders_completed,
+            'orders_cancelled': self.orders_cancelled,
+            'cancellation_rate': round(self.orders_cancelled / self.orders_total, 4) if self.orders_total else 0,
+            'km_driven': float(self.km_driven),
+            'revenue': float(self.revenue),
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class DriverDailyStats(db.Model):
+    __tablename__ = 'Dispatch_taxi_driverdailystats'
+
+    id = db.Column(db.Integer, primary_key=True)
+    driver_id = db.Column(db.Integer, db.ForeignKey('Dispatch_taxi_driver.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    orders_total = db.Column(db.Integer, nullable=False, default=0)
+    orders_completed = db.Column(db.Integer, nullable=False, default=0)
+    orders_cancelled = db.Column(db.Integer, nullable=False, default=0)
+    km_driven = db.Column(db.Numeric(10, 1), nullable=False, default=0)
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'date': self.date.isoformat(),
+            'orders_total': self.orders_total,
+            'orders_completed': self.orders_completed,
+            'orders_cancelled': self.orders_cancelled,
+            'km_driven': float(self.km_driven),
+            'revenue': float(self.revenue)
+        }
+
+
+class Job(db.Model):
+    __tablename__ = 'Dispatch_taxi_job'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+    status = db.Column(db.String(10), nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_after = db.Column(db.DateTime(timezone=True), nullable=False)
+    locked_by = db.Column(db.String(100), nullable=False, default='')
+    locked_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    result = db.Column(db.JSON, nullable=True)
+    error = db.Column(db.Text, nullable=False, default='')
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False)
+
+    def to_dict(self):
+        status_map = {
+            'queued': 'В очереди',
+            'running': 'Выполняется',
+            'done': 'Выполнена',
+            'failed': 'Ошибка'
+        }
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'status_display': status_map.get(self.status, self.status),
+            'attempts': self.attempts,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class OrderEvent(db.Model):
+    __tablename__ = 'Dispatch_taxi_orderevent'
+
+    id = db.Column(db.BigInteger, primary_key=True)
+    order_id = db.Column(db.BigInteger, nullable=False)
+    event_type = db.Column(db.SmallInteger, nullable=False)
+    occurred_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    actor = db.Column(db.String(150), nullable=False, default='')
+    changes = db.Column(db.JSON, nullable=False)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'order_id': self.order_id,
+            'event': EVENT_NAMES.get(self.event_type, self.event_type),
+            'occurred_at': self.occurred_at.isoformat(),
+            'actor': self.actor,
+            'changes': self.changes
+        }
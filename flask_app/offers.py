@@ -0,0 +1,92 @@
+import json
+import logging
+import select
+import threading
+import time
+
+from sqlalchemy import text
+
+from extentions import db
+from sharding import CityRegistry
+from taxi_shared.offers import OFFERS_CHANNEL, OFFER_PENDING, OfferHub
+
+logger = logging.getLogger(__name__)
+
+# Ответ принимается только на свое, еще не истекшее и не отвеченное предложение.
+# UPDATE блокирует строку, поэтому из двух одновременных ответов второй уже
+# не найдет ее в статусе pending; неотвеченное предложение у заказа одно
+# (offer_one_pending_per_order), так что второго принятия заказа не бывает
+RESPOND_SQL = text(f'''
+    UPDATE "Dispatch_taxi_driveroffer"
+    SET status = :status, responded_at = now()
+    WHERE id = :offer_id AND vehicle_id = :vehicle_id
+      AND status = '{OFFER_PENDING}' AND expires_at > now()
+    RETURNING order_id
+''')
+
+
+class OfferListener(OfferHub):
+    """OfferHub воркера, который наполняется из LISTEN driver_offers.
+
+    После переподключения все ожидающие получают событие resync: сообщения,
+    пришедшие во время обрыва, потеряны, и приложение должно перечитать
+    свои предложения.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.thread = None
+        self.thread_lock = threading.Lock()
+
+    def start(self, engine):
+        with self.thread_lock:
+            if self.thread and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self._listen, args=(engine,), daemon=True)
+            self.thread.start()
+
+    def _listen(self, engine):
+        while True:
+            try:
+                raw = engine.raw_connection()
+                connection = raw.driver_connection
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f'LISTEN {OFFERS_CHANNEL}')
+                self.publish_all({'event': 'resync'})
+                logger.info('Подписка на %s установлена', OFFERS_CHANNEL)
+                while True:
+                    if select.select([connection], [], [], 30) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        notify = connection.notifies.pop(0)
+                        try:
+                            self.publish(json.loads(notify.payload))
+                        except ValueError:
+                            logger.warning('Некорректное сообщение о предложении: %s', notify.payload)
+            except Exception as e:
+                logger.error('Ошибка подписки на предложения: %s', e)
+                time.sleep(5)
+
+
+offer_hubs = CityRegistry(OfferListener)
+
+
+def respond_to_offer(offer_id, vehicle_id, status):
+    """Записывает ответ водителя и сообщает координатору. order_id или None,
+    если ответить уже нельзя."""
+    row = db.session.execute(RESPOND_SQL, {
+        'status': status, 'offer_id': offer_id, 'vehicle_id': vehicle_id
+    }).first()
+    if row is None:
+        db.session.rollback()
+        return None
+    # NOTIFY транзакционный: координатор узнает об ответе только после коммита
+    db.session.execute(text('SELECT pg_notify(:channel, :payload)'), {
+        'channel': OFFERS_CHANNEL,
+        'payload': json.dumps({'event': status, 'offer_id': offer_id, 'order_id': row.order_id,
+                               'vehicle_id': vehicle_id})
+    })
+    db.session.commit()
+    return row.order_id
@@ -0,0 +1,39 @@
+"""Разделение API между пулами воркеров gunicorn.
+
+Долгие запросы (long-poll водительского приложения и SSE-подписка на
+заказы) обслуживает отдельный пул на gevent (gunicorn_drivers.conf.py):
+в потоковом пуле каждое такое соединение занимало бы поток gthread на все
+время ожидания. Остальное API - потоковый пул (gunicorn.conf.py).
+
+Балансировщик направляет в пул gevent только пути долгих эндпоинтов
+(пример - nginx.example.conf); API_POOL воркера ('streaming' или 'main')
+отклоняет чужие запросы кодом 421, чтобы ошибка в маршрутах
+балансировщика была видна сразу, а не как исчерпание потоков. При
+API_POOL='all' (один пул, разработка) проверки нет.
+"""
+from flask import jsonify, request
+
+POOL_ALL = 'all'
+POOL_MAIN = 'main'
+POOL_STREAMING = 'streaming'
+
+STREAMING_ENDPOINTS = {'api.poll_vehicle_offers', 'api.stream_orders'}
+
+
+def endpoint_pool(endpoint):
+    return POOL_STREAMING if endpoint in STREAMING_ENDPOINTS else POOL_MAIN
+
+
+def init_pools(app):
+    pool = app.config['API_POOL']
+    if pool not in (POOL_ALL, POOL_MAIN, POOL_STREAMING):
+        raise ValueError(f'Неизвестный пул API_POOL: {pool}')
+    if pool == POOL_ALL:
+        return
+
+    @app.before_request
+    def check_pool():
+        # Несуществующие пути (endpoint None) отвечают 404 в любом пуле
+        if request.endpoint is None or endpoint_pool(request.endpoint) == pool:
+            return None
+        return jsonify({'success': False, 'error': 'Запрос направлен не в тот пул воркеров'}), 421
@@ -0,0 +1,86 @@
+"""Согласование формата ответов списочных эндпоинтов.
+
+Формат выбирается по заголовку Accept (или ?format=json|msgpack), колоночный
+вид - параметром ?layout=columnar: вместо объекта на строку отдается массив
+значений на каждое поле. Сжатие gzip или zstd - по Accept-Encoding.
+"""
+import gzip
+
+from flask import current_app, request
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+
+# Маленькие ответы сжимать невыгодно
+MIN_COMPRESS_SIZE = 1024
+
+
+def available_encodings():
+    return ['zstd', 'gzip'] if zstandard is not None else ['gzip']
+
+
+def negotiate():
+    """(формат, колоночный вид, сжатие) для текущего запроса."""
+    fmt = request.args.get('format')
+    if fmt not in ('json', 'msgpack'):
+        best = request.accept_mimetypes.best_match((JSON_MIMETYPE,) + MSGPACK_MIMETYPES, default=JSON_MIMETYPE)
+        fmt = 'msgpack' if best in MSGPACK_MIMETYPES else 'json'
+    if fmt == 'msgpack' and msgpack is None:
+        fmt = 'json'
+    columnar = request.args.get('layout') == 'columnar'
+    encoding = request.accept_encodings.best_match(available_encodings())
+    return fmt, columnar, encoding
+
+
+def representation_key():
+    """Часть ключа кэша, различающая представления одного ресурса."""
+    fmt, columnar, encoding = negotiate()
+    return f"{fmt}|{'columnar' if columnar else 'rows'}|{encoding or 'identity'}"
+
+
+def to_columns(rows):
+    fields = []
+    for row in rows:
+        for field in row:
+            if field not in fields:
+                fields.append(field)
+    return {field: [row.get(field) for row in rows] for field in fields}
+
+
+def encode(payload, fmt):
+    if fmt == 'msgpack':
+        return msgpack.packb(payload, default=str, use_bin_type=True), MSGPACK_MIMETYPES[0]
+    return current_app.json.dumps(payload).encode(), JSON_MIMETYPE
+
+
+def compress(body, encoding):
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    return gzip.compress(body, compresslevel=5)
+
+
+def list_response(payload, rows_key):
+    """Ответ списочного эндпоинта в согласованном с клиентом представлении."""
+    fmt, columnar, encoding = negotiate()
+    if columnar:
+        payload = dict(payload, layout='columnar')
+        payload[rows_key] = to_columns(payload[rows_key])
+
+    body, mimetype = encode(payload, fmt)
+    response = current_app.response_class(mimetype=mimetype)
+    if encoding and len(body) >= MIN_COMPRESS_SIZE:
+        body = compress(body, encoding)
+        response.headers['Content-Encoding'] = encoding
+    response.set_data(body)
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    return response
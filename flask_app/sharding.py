@@ -0,0 +1,90 @@
+"""Маршрутизация API к базе города (см. taxi_shared/sharding.py).
+
+Город запроса задается заголовком X-City или параметром ?city=, по
+умолчанию - основной город. База основного города - движок по умолчанию,
+остальных - SQLALCHEMY_BINDS с ключом-кодом города. CitySession
+направляет в базу города все запросы сессии, поэтому эндпоинты и модели
+о городах не знают.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, g, has_app_context, jsonify, request
+from flask_sqlalchemy.session import Session
+
+from taxi_shared.sharding import city_path
+
+
+def current_city():
+    if has_app_context() and 'city' in g:
+        return g.city
+    return current_app.config['DEFAULT_CITY']
+
+
+def bind_key(city=None):
+    city = city or current_city()
+    return None if city == current_app.config['DEFAULT_CITY'] else city
+
+
+def city_engine(city=None):
+    return current_app.extensions['sqlalchemy'].engines[bind_key(city)]
+
+
+def city_config_path(name):
+    """Путь из конфигурации (файл или каталог) для города запроса."""
+    return city_path(current_app.config[name], current_city(), current_app.config['DEFAULT_CITY'])
+
+
+class CitySession(Session):
+    """Сессия Flask-SQLAlchemy, которая работает с базой города запроса."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is not None:
+            return bind
+        return self._db.engines[bind_key()]
+
+
+class CityRegistry:
+    """Экземпляр на город (подписки LISTEN и т.п.), создается при первом обращении."""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.items = {}
+        self.lock = threading.Lock()
+
+    def get(self, city=None):
+        city = city or current_city()
+        with self.lock:
+            item = self.items.get(city)
+            if item is None:
+                item = self.items[city] = self.factory()
+            return item
+
+    def values(self):
+        with self.lock:
+            return list(self.items.values())
+
+
+def _run_in_city(app, city, func):
+    with app.app_context():
+        g.city = city
+        return func()
+
+
+def fan_out(func, cities=None):
+    """{город: func()} - func выполняется параллельно в контексте приложения
+    каждого города; контекста запроса у нее нет."""
+    app = current_app._get_current_object()
+    cities = list(cities or app.config['CITIES'])
+    with ThreadPoolExecutor(max_workers=len(cities), thread_name_prefix='city') as pool:
+        futures = {city: pool.submit(_run_in_city, app, city, func) for city in cities}
+        return {city: future.result() for city, future in futures.items()}
+
+
+def init_sharding(app):
+    @app.before_request
+    def select_city():
+        city = request.headers.get('X-City') or request.args.get('city') or app.config['DEFAULT_CITY']
+        if city not in app.config['CITIES']:
+            return jsonify({'success': False, 'error': f'Неизвестный город: {city}'}), 400
+        g.city = city
@@ -0,0 +1,234 @@
+import json
+import random
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import text
+
+from extentions import db
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Значения в общих хранилищах - JSON, а не pickle: строку из общей таблицы
+# или Redis может записать любой процесс с доступом к ним, и распаковка
+# pickle выполнила бы чужой код. Хранить можно только JSON-совместимые
+# значения (байты кодирует вызывающий код)
+def dump_value(value):
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def load_value(data):
+    """Значение из хранилища; нечитаемая запись (например, старая в pickle) - промах."""
+    try:
+        return orjson.loads(data) if orjson is not None else json.loads(data)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+# Token bucket в форме GCRA: вместо числа токенов хранится одно значение -
+# теоретическое время прихода следующего запроса (TAT), что позволяет
+# проверять и списывать токен одной атомарной операцией в любом хранилище
+def gcra_params(rate, burst):
+    """(сейчас, интервал между токенами, допуск) в микросекундах."""
+    interval = int(1e6 / rate)
+    return int(time.time() * 1e6), interval, interval * burst
+
+
+GCRA_LUA = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local tolerance = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or ARGV[1])
+tat = math.max(tat, now) + interval
+if tat - now > tolerance then
+    return {0, tat - now - tolerance}
+end
+redis.call('SET', KEYS[1], string.format('%d', tat), 'PX', math.ceil((tat - now) / 1000))
+return {1, 0}
+"""
+
+
+class MemoryStore:
+    """Состояние внутри процесса. Годится для разработки и одного воркера."""
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def _alive(self, key):
+        item = self.data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at is not None and expires_at < time.monotonic():
+            del self.data[key]
+            return None
+        return item
+
+    def get(self, key):
+        with self.lock:
+            item = self._alive(key)
+            return item[1] if item else None
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self.lock:
+            self.data[key] = (expires_at, value)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def incr(self, key, amount=1, ttl=None):
+        with self.lock:
+            item = self._alive(key)
+            if item is None:
+                item = (time.monotonic() + ttl if ttl else None, 0)
+            value = item[1] + amount
+            self.data[key] = (item[0], value)
+            return value
+
+    def take_token(self, key, rate, burst):
+        now, interval, tolerance = gcra_params(rate, burst)
+        with self.lock:
+            item = self._alive(key)
+            tat = max(item[1] if item else now, now) + interval
+            if tat - now > tolerance:
+                return False, (tat - now - tolerance) / 1e6
+            self.data[key] = (time.monotonic() + (tat - now) / 1e6, tat)
+            return True, 0
+
+
+class PostgresStore:
+    """Состояние в нежурналируемой таблице Dispatch_taxi_sharedstate.
+
+    Не требует отдельного сервиса: все воркеры на всех машинах видят одни
+    и те же ключи. Просроченные строки удаляются попутно при записи.
+    """
+
+    table = 'Dispatch_taxi_sharedstate'
+    purge_probability = 0.01
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def get(self, key):
+        with self.engine.connect() as conn:
+            value = conn.execute(text(
+                f'SELECT value FROM "{self.table}" '
+                'WHERE key = :key AND (expires_at IS NULL OR expires_at > now())'
+            ), {'key': key}).scalar()
+        return load_value(bytes(value)) if value else None
+
+    def set(self, key, value, ttl=None):
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                f'INSERT INTO "{self.table}" (key, value, counter, expires_at) '
+                "VALUES (:key, :value, 0, now() + make_interval(secs => :ttl)) "
+                'ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, expires_at = EXCLUDED.expires_at'
+            ), {'key': key, 'value': dump_value(value), 'ttl': ttl})
+            self._maybe_purge(conn)
+
+    def delete(self, key):
+        with self.engine.begin() as conn:
+            conn.execute(text(f'DELETE FROM "{self.table}" WHERE key = :key'), {'key': key})
+
+    def incr(self, key, amount=1, ttl=None):
+        # Просроченный счетчик начинается заново в том же запросе
+        with self.engine.begin() as conn:
+            return conn.execute(text(
+                f'INSERT INTO "{self.table}" AS s (key, value, counter, expires_at) '
+                "VALUES (:key, '', :amount, now() + make_interval(secs => :ttl)) "
+                'ON CONFLICT (key) DO UPDATE SET '
+                'counter = CASE WHEN s.expires_at <= now() THEN :amount ELSE s.counter + :amount END, '
+                'expires_at = CASE WHEN s.expires_at <= now() THEN EXCLUDED.expires_at ELSE s.expires_at END '
+                'RETURNING counter'
+            ), {'key': key, 'amount': amount, 'ttl': ttl}).scalar()
+
+    def take_token(self, key, rate, burst):
+        now, interval, tolerance = gcra_params(rate, burst)
+        params = {'key': key, 'now': now, 'interval': interval, 'tolerance': tolerance,
+                  'ttl': (tolerance + interval) / 1e6}
+        with self.engine.begin() as conn:
+            # counter хранит теоретическое время прихода (TAT) в микросекундах;
+            # строка меняется только если запрос укладывается в допуск
+            tat = conn.execute(text(
+                f'INSERT INTO "{self.table}" AS s (key, value, counter, expires_at) '
+                "VALUES (:key, '', :now + :interval, now() + make_interval(secs => :ttl)) "
+                'ON CONFLICT (key) DO UPDATE SET '
+                'counter = GREATEST(s.counter, :now) + :interval, expires_at = EXCLUDED.expires_at '
+                'WHERE GREATEST(s.counter, :now) + :interval - :now <= :tolerance '
+                'RETURNING counter'
+            ), params).scalar()
+            if tat is not None:
+                self._maybe_purge(conn)
+                return True, 0
+            tat = conn.execute(text(f'SELECT counter FROM "{self.table}" WHERE key = :key'), params).scalar()
+        return False, max(0, (tat or now) + interval - now - tolerance) / 1e6
+
+    def _maybe_purge(self, conn):
+        if random.random() < self.purge_probability:
+            conn.execute(text(f'DELETE FROM "{self.table}" WHERE expires_at <= now()'))
+
+
+class RedisStore:
+    """Состояние в Redis или совместимом сервере (KeyDB, Dragonfly, Valkey)."""
+
+    def __init__(self, url):
+        if redis is None:
+            raise RuntimeError('Для SHARED_STATE_BACKEND=redis нужен пакет redis')
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self.client.get(key)
+        return load_value(value) if value is not None else None
+
+    def set(self, key, value, ttl=None):
+        self.client.set(key, dump_value(value), ex=ttl)
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def incr(self, key, amount=1, ttl=None):
+        pipe = self.client.pipeline()
+        pipe.incrby(key, amount)
+        if ttl:
+            pipe.expire(key, ttl, nx=True)
+        return pipe.execute()[0]
+
+    def take_token(self, key, rate, burst):
+        now, interval, tolerance = gcra_params(rate, burst)
+        allowed, retry_after = self.client.eval(GCRA_LUA, 1, key, now, interval, tolerance)
+        return bool(allowed), int(retry_after) / 1e6
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Хранилище, выбранное в SHARED_STATE_BACKEND: memory, postgres или redis."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                backend = current_app.config['SHARED_STATE_BACKEND']
+                if backend == 'postgres':
+                    _store = PostgresStore(db.engine)
+                elif backend == 'redis':
+                    _store = RedisStore(current_app.config['SHARED_STATE_URL'])
+                else:
+                    _store = MemoryStore()
+    return _store
@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 import os
 
+from taxi_shared.sharding import parse_cities
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -47,6 +49,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'Dispatch_taxi.middleware.CityMiddleware',
+    'Dispatch_taxi.middleware.CurrentActorMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -64,6 +68,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'Dispatch_taxi.sharding.cities',
             ],
         },
     },
@@ -75,15 +80,41 @@ WSGI_APPLICATION = 'taxi_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Каждый город - отдельная база (см. taxi_shared/sharding.py). База основного
+# города - 'default', остальные доступны под псевдонимом, равным коду города.
+# Фоновые процессы работают с городом из переменной окружения TAXI_CITY.
+CITIES = parse_cities(os.environ.get('TAXI_CITIES', ''), {'msk': 'taxi_dispatch_k'})
+DEFAULT_CITY = next(iter(CITIES))
+TAXI_CITY = os.environ.get('TAXI_CITY', DEFAULT_CITY)
+if TAXI_CITY not in CITIES:
+    raise ValueError(f'Город TAXI_CITY={TAXI_CITY} не указан в TAXI_CITIES')
+
 DATABASES = {
-    'default': {
+    ('default' if city == DEFAULT_CITY else city): {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'taxi_dispatch_k',
+        'NAME': database,
         'USER': 'postgres',
         'PASSWORD': 'password',
         'HOST': 'localhost',
         'PORT': '5432'
     }
+    for city, database in CITIES.items()
+}
+DATABASE_ROUTERS = ['Dispatch_taxi.sharding.CityRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'taxi-dispatch',
+        'TIMEOUT': 600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000
+        }
+    }
 }
 
 
@@ -125,6 +156,66 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR,'Dispatch_taxi','static','images')]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Файлы и каталоги ниже у каждого города свои: к имени добавляется код
+# города (см. city_path), у основного города пути прежние.
+
+# Колоночный архив старых заказов (см. команду archive_orders)
+ORDER_ARCHIVE_DIR = os.path.join(BASE_DIR, 'archive', 'orders')
+
+# Через сколько дней мягко удаленные записи удаляются окончательно
+SOFT_DELETE_PURGE_DAYS = 7
+
+# Адрес SSE-ленты заказов для браузера. Лента обслуживается gevent-пулом
+# Flask (gunicorn_drivers.conf.py), а не потоковым пулом API: при
+# раздельных пулах здесь указывается адрес балансировщика или пула gevent
+# (см. flask_app/nginx.example.conf). Пусто - тот же адрес, что у API
+# (один процесс Flask при разработке)
+FLASK_STREAM_URL = os.environ.get('FLASK_STREAM_URL', '')
+
+# Граф дорог для расчета дистанции заказа (см. команду build_road_graph)
+ROAD_GRAPH_PATH = os.path.join(BASE_DIR, 'data', 'road_graph.npz')
+ROUTE_CACHE_SIZE = 10000
+
+# Матрица времени в пути между зонами для ETA подачи (задача refresh_eta_matrix).
+# Сетка: границы города (мин. широта, мин. долгота, макс. широта, макс. долгота) и размер зоны
+ETA_MATRIX_PATH = os.path.join(BASE_DIR, 'output', 'eta_matrix.npy')
+ETA_GRID_BBOX = (55.55, 37.35, 55.95, 37.85)
+ETA_GRID_CELL_KM = 2.0
+ETA_BUCKET_HOURS = 3
+ETA_HISTORY_DAYS = 60
+ETA_REFRESH_MINUTES = 60
+
+# Модель прогноза спроса (задача refresh_demand_model); API читает тот же файл
+FORECAST_STATE_PATH = os.path.join(BASE_DIR, 'output', 'demand_model.npz')
+FORECAST_HISTORY_WEEKS = 8
+FORECAST_REFRESH_MINUTES = 10
+
+# Часовой пояс, в котором заданы смены водителей
+SHIFT_TIME_ZONE = 'Europe/Moscow'
+
+# Оператор считается на линии, пока шлет отметки присутствия чаще этого (секунды).
+# Куча нагрузки операторов в процессе пересобирается из базы раз в WORKLOAD_RESYNC_SECONDS
+OPERATOR_PRESENCE_TIMEOUT = 120
+WORKLOAD_RESYNC_SECONDS = 5
+
+# Запланированный заказ передается в работу за столько минут до подачи
+DISPATCH_LEAD_MINUTES = 15
+
+# Заказ, пробывший в статусе дольше указанного числа минут (от создания или
+# передачи в работу), отменяется фоновой задачей sweep_stale_orders
+STALE_ORDER_TIMEOUTS = {
+    'in_progress': 6 * 60,
+}
+STALE_ORDER_STATUS = 'cancelled'
+STALE_SWEEP_MINUTES = 10
+
+# Предложение заказа водителю: время на ответ, сколько машин пробовать,
+# пауза перед повтором, если свободных машин нет, и свежесть координат машины
+OFFER_TIMEOUT_SECONDS = 20
+OFFER_MAX_ATTEMPTS = 5
+OFFER_RETRY_SECONDS = 30
+OFFER_LOCATION_MAX_AGE_SECONDS = 300
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
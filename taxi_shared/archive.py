@@ -0,0 +1,255 @@
+"""Колоночный архив завершенных и отмененных заказов.
+
+Каждый месяц хранится отдельным сжатым файлом ``YYYY-MM.npz`` с массивом
+на каждое поле. Пачки архивации пишутся отдельными частями
+``YYYY-MM.<часть>.npz``: они объединяются при чтении, а compact_partitions
+сливает их в файл месяца. Цена тарифа фиксируется в момент архивации,
+поэтому для аналитики архиву не нужны таблицы тарифов.
+"""
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+STATUS_CODES = {'completed': 0, 'cancelled': 1}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+COLUMNS = {
+    'id': np.int64,
+    'order_time': np.int64,  # секунды с начала эпохи, UTC
+    'status': np.uint8,
+    'customer_id': np.int64,  # -1 вместо NULL
+    'vehicle_id': np.int64,
+    'tariff_id': np.int64,
+    'operator_id': np.int64,
+    'range': np.float32,
+    'cost_for_km': np.float64,
+    'total_cost': np.float64,
+}
+
+SECONDS_PER_DAY = 86400
+
+
+def partition_name(month, chunk=None):
+    prefix = f'{month[0]:04d}-{month[1]:02d}'
+    return f'{prefix}.{chunk}.npz' if chunk else f'{prefix}.npz'
+
+
+def parse_partition_name(name):
+    """(месяц, часть) по имени файла или None; у сжатого файла месяца часть ''."""
+    if not name.endswith('.npz') or '.tmp' in name:
+        return None
+    parts = name[:-4].split('.')
+    if len(parts) > 2:
+        return None
+    year, month = parts[0].split('-')
+    return (int(year), int(month)), parts[1] if len(parts) == 2 else ''
+
+
+def to_timestamp(value):
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def rows_to_columns(rows):
+    """rows - словари с полями заказа и cost_for_km тарифа."""
+    columns = {name: np.empty(len(rows), dtype=dtype) for name, dtype in COLUMNS.items()}
+    for i, row in enumerate(rows):
+        cost_for_km = float(row['cost_for_km'] or 0)
+        distance = float(row['range'] or 0)
+        columns['id'][i] = row['id']
+        columns['order_time'][i] = to_timestamp(row['order_time'])
+        columns['status'][i] = STATUS_CODES[row['status']]
+        columns['customer_id'][i] = row['customer_id'] if row['customer_id'] is not None else -1
+        columns['vehicle_id'][i] = row['vehicle_id'] if row['vehicle_id'] is not None else -1
+        columns['tariff_id'][i] = row['tariff_id'] if row['tariff_id'] is not None else -1
+        columns['operator_id'][i] = row['operator_id']
+        columns['range'][i] = distance
+        columns['cost_for_km'][i] = cost_for_km
+        columns['total_cost'][i] = distance * cost_for_km
+    return columns
+
+
+def split_by_month(columns):
+    times = columns['order_time'].astype('datetime64[s]')
+    months = times.astype('datetime64[M]')
+    result = {}
+    for month in np.unique(months):
+        mask = months == month
+        year, month_number = str(month).split('-')
+        result[(int(year), int(month_number))] = {name: values[mask] for name, values in columns.items()}
+    return result
+
+
+def load_partition(path, names=COLUMNS):
+    with np.load(path) as data:
+        return {name: data[name] for name in names}
+
+
+def latest_rows(columns):
+    """Последняя версия строки для каждого id, по возрастанию order_time."""
+    reversed_ids = columns['id'][::-1]
+    _, first_index = np.unique(reversed_ids, return_index=True)
+    keep = len(reversed_ids) - 1 - first_index
+    order = np.argsort(columns['order_time'][keep], kind='stable')
+    keep = keep[order]
+    return {name: values[keep] for name, values in columns.items()}
+
+
+def save_partition(path, columns):
+    tmp_path = f'{path}.{os.getpid()}.tmp.npz'
+    np.savez_compressed(tmp_path, **columns)
+    os.replace(tmp_path, path)
+
+
+def write_partition(directory, month, columns):
+    """Пишет пачку заказов месяца отдельным файлом-частью.
+
+    Существующие файлы месяца не перечитываются, так что запись стоит
+    O(размер пачки). Части объединяются при чтении и сжимаются в один файл
+    compact_partitions; повторная архивация тех же id безопасна - при
+    чтении остается версия из более поздней части.
+    """
+    os.makedirs(directory, exist_ok=True)
+    # Имя части растет со временем записи: порядок имен - порядок пачек
+    chunk = f'{time.time_ns():020d}-{os.getpid()}'
+    columns = latest_rows(columns)
+    save_partition(os.path.join(directory, partition_name(month, chunk)), columns)
+    return len(columns['id'])
+
+
+def archive_rows(directory, rows):
+    if not rows:
+        return {}
+    written = {}
+    for month, columns in split_by_month(rows_to_columns(rows)).items():
+        write_partition(directory, month, columns)
+        written[month] = len(columns['id'])
+    return written
+
+
+def list_partitions(directory, start=None, end=None):
+    """[(месяц, [пути])]: сжатый файл месяца идет первым, за ним части по порядку записи."""
+    if not os.path.isdir(directory):
+        return []
+    start_month = (start.year, start.month) if start else None
+    end_month = (end.year, end.month) if end else None
+    months = {}
+    for name in os.listdir(directory):
+        parsed = parse_partition_name(name)
+        if parsed is None:
+            continue
+        month, chunk = parsed
+        if start_month and month < start_month:
+            continue
+        if end_month and month > end_month:
+            continue
+        months.setdefault(month, []).append((chunk, os.path.join(directory, name)))
+    return [(month, [path for _, path in sorted(files)]) for month, files in sorted(months.items())]
+
+
+def load_month(directory, month, paths, names=COLUMNS):
+    """Колонки месяца из всех его файлов, по одной строке на id."""
+    names = set(names) | {'id', 'order_time'}
+    for _ in range(3):
+        try:
+            parts = [load_partition(path, names) for path in paths]
+            break
+        except FileNotFoundError:
+            # Части удалило сжатие: их строки уже в файле месяца
+            moment = datetime(month[0], month[1], 1, tzinfo=timezone.utc)
+            paths = dict(list_partitions(directory, moment, moment)).get(month, [])
+    else:
+        raise RuntimeError(f'Файлы архива за {month} меняются во время чтения')
+    if len(parts) == 1:
+        return parts[0]
+    return latest_rows({name: np.concatenate([part[name] for part in parts]) for name in names})
+
+
+def compact_partitions(directory):
+    """Сливает части каждого месяца в один файл. Возвращает число сжатых месяцев.
+
+    Сначала атомарно заменяется файл месяца, потом удаляются части: читатель
+    в промежутке видит строки дважды, и load_month отбрасывает повтор по id.
+    Запускается одним процессом (командой архивации).
+    """
+    compacted = 0
+    for month, paths in list_partitions(directory):
+        if len(paths) == 1 and parse_partition_name(os.path.basename(paths[0]))[1] == '':
+            continue
+        columns = load_month(directory, month, paths)
+        save_partition(os.path.join(directory, partition_name(month)), columns)
+        for path in paths:
+            if parse_partition_name(os.path.basename(path))[1]:
+                os.remove(path)
+        compacted += 1
+    return compacted
+
+
+def scan(directory, start=None, end=None, statuses=None, columns=('order_time', 'status', 'total_cost')):
+    """Генератор отфильтрованных колонок по каждому подходящему месяцу."""
+    start_ts = to_timestamp(start)
+    end_ts = to_timestamp(end)
+    status_codes = [STATUS_CODES[s] for s in statuses if s in STATUS_CODES] if statuses else None
+    needed = set(columns) | {'order_time', 'status'}
+
+    for month, paths in list_partitions(directory, start, end):
+        part = load_month(directory, month, paths, needed)
+        mask = np.ones(len(part['order_time']), dtype=bool)
+        if start_ts is not None:
+            mask &= part['order_time'] >= start_ts
+        if end_ts is not None:
+            mask &= part['order_time'] <= end_ts
+        if status_codes is not None:
+            mask &= np.isin(part['status'], status_codes)
+        if mask.any():
+            yield {name: part[name][mask] for name in columns}
+
+
+def totals(directory, start=None, end=None, statuses=None):
+    orders = 0
+    revenue = 0.0
+    distance = 0.0
+    for part in scan(directory, start, end, statuses, columns=('total_cost', 'range')):
+        orders += len(part['total_cost'])
+        revenue += float(part['total_cost'].sum())
+        distance += float(part['range'].sum())
+    return {'orders': orders, 'revenue': round(revenue, 2), 'distance': round(distance, 1)}
+
+
+def grouped_stats(directory, start=None, end=None, statuses=None, group='day'):
+    days = []
+    costs = []
+    for part in scan(directory, start, end, statuses, columns=('order_time', 'total_cost')):
+        days.append(part['order_time'] // SECONDS_PER_DAY)
+        costs.append(part['total_cost'])
+    if not days:
+        return []
+
+    days = np.concatenate(days)
+    costs = np.concatenate(costs)
+    if group == 'month':
+        keys = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    else:
+        keys = days
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    counts = np.bincount(inverse)
+    revenue = np.bincount(inverse, weights=costs)
+
+    unit = 'M' if group == 'month' else 'D'
+    labels = unique_keys.astype(f'datetime64[{unit}]').astype(str)
+    return [
+        {'date': label, 'orders': int(count), 'revenue': round(float(total), 2)}
+        for label, count, total in zip(labels, counts, revenue)
+    ]
+
+
+def status_counts(directory, start=None, end=None):
+    counts = np.zeros(len(STATUS_CODES), dtype=np.int64)
+    for part in scan(directory, start, end, columns=('status',)):
+        counts += np.bincount(part['status'], minlength=len(STATUS_CODES))
+    return {STATUS_NAMES[code]: int(count) for code, count in enumerate(counts)}
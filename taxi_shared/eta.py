@@ -0,0 +1,200 @@
+"""Матрица времени в пути между зонами для оценки времени подачи.
+
+Город делится на квадратные зоны сеткой, сутки - на интервалы по
+``bucket_hours`` часов (UTC). Матрица ``интервалы × зоны × зоны`` в минутах
+собирается из истории завершенных поездок и хранится в .npy, который
+читается через memmap: все процессы делят одни страницы файла, а поиск
+ETA для тысяч пар машина/заказ - одна операция индексирования NumPy.
+
+Там, где поездок мало, значение стягивается к априорной оценке: расстояние
+между центрами зон, умноженное на коэффициент извилистости, при средней
+скорости этого интервала.
+"""
+import json
+import math
+import os
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+
+from .routing import haversine_m
+
+DETOUR_FACTOR = 1.3
+DEFAULT_SPEED_KMH = 25
+# Вес априорной оценки в поездках: при n поездках доля факта n / (n + PRIOR_WEIGHT)
+PRIOR_WEIGHT = 3
+MIN_TRIP_MINUTES = 1
+MAX_TRIP_MINUTES = 240
+
+TRIP_HISTORY_SQL = '''
+    SELECT pickup_lat, pickup_lon, dropoff_lat, dropoff_lon,
+           extract(hour FROM started_at AT TIME ZONE 'UTC') AS hour,
+           COALESCE(extract(epoch FROM completed_at - started_at) / 60, route_duration) AS minutes
+    FROM (
+        SELECT o.pickup_lat, o.pickup_lon, o.dropoff_lat, o.dropoff_lon, o.route_duration, e.completed_at,
+               -- Поездка начинается не раньше назначения машины, передачи
+               -- в работу и времени подачи запланированного заказа
+               GREATEST(o.order_time, o.dispatched_at, o.pickup_at, e.assigned_at) AS started_at
+        FROM "Dispatch_taxi_order" o
+        LEFT JOIN LATERAL (
+            SELECT min(ev.occurred_at) FILTER (WHERE ev.changes -> 'status' ->> 1 = 'completed') AS completed_at,
+                   max(ev.occurred_at) FILTER (WHERE ev.changes -> 'vehicle_id' ->> 1 IS NOT NULL) AS assigned_at
+            FROM "Dispatch_taxi_orderevent" ev
+            WHERE ev.order_id = o.id
+        ) e ON true
+        WHERE o.status = 'completed'
+          AND o.order_time >= %(since)s
+          AND o.pickup_lat IS NOT NULL AND o.dropoff_lat IS NOT NULL
+    ) trips
+'''
+
+
+def fetch_trip_history(cursor, since):
+    """Поездки как массив (N, 6): координаты подачи и назначения, час UTC, минуты.
+
+    Длительность - от начала поездки (последнее из: создание заказа,
+    назначение машины, передача в работу, время подачи) до события
+    завершения в журнале, для заказов без журнала - время по графу дорог.
+    Значения вне [MIN_TRIP_MINUTES, MAX_TRIP_MINUTES] отбрасываются.
+    """
+    cursor.execute(TRIP_HISTORY_SQL, {'since': since})
+    rows = [row for row in cursor.fetchall() if row[5] is not None]
+    trips = np.array(rows, dtype=np.float64).reshape(-1, 6)
+    minutes = trips[:, 5]
+    return trips[(minutes >= MIN_TRIP_MINUTES) & (minutes <= MAX_TRIP_MINUTES)]
+
+
+class ZoneGrid:
+    def __init__(self, min_lat, min_lon, max_lat, max_lon, cell_km=2.0):
+        self.bbox = (min_lat, min_lon, max_lat, max_lon)
+        self.cell_km = cell_km
+        self.dlat = cell_km / 111.32
+        self.dlon = cell_km / (111.32 * math.cos(math.radians((min_lat + max_lat) / 2)))
+        self.rows = max(1, math.ceil((max_lat - min_lat) / self.dlat))
+        self.cols = max(1, math.ceil((max_lon - min_lon) / self.dlon))
+
+    @property
+    def zone_count(self):
+        return self.rows * self.cols
+
+    def zone_of(self, lat, lon):
+        """Номера зон для массивов координат. Точки за границей - в крайние зоны."""
+        min_lat, min_lon = self.bbox[0], self.bbox[1]
+        rows = np.clip(((np.asarray(lat) - min_lat) / self.dlat).astype(np.int64), 0, self.rows - 1)
+        cols = np.clip(((np.asarray(lon) - min_lon) / self.dlon).astype(np.int64), 0, self.cols - 1)
+        return rows * self.cols + cols
+
+    def centers(self):
+        zones = np.arange(self.zone_count)
+        lat = self.bbox[0] + (zones // self.cols + 0.5) * self.dlat
+        lon = self.bbox[1] + (zones % self.cols + 0.5) * self.dlon
+        return lat, lon
+
+    def to_dict(self):
+        return {'bbox': list(self.bbox), 'cell_km': self.cell_km}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(*data['bbox'], cell_km=data['cell_km'])
+
+
+def build_matrix(trips, grid, bucket_hours=3):
+    """Матрица минут (интервалы, зоны, зоны) по массиву поездок из fetch_trip_history."""
+    buckets = 24 // bucket_hours
+    zones = grid.zone_count
+    from_zone = grid.zone_of(trips[:, 0], trips[:, 1])
+    to_zone = grid.zone_of(trips[:, 2], trips[:, 3])
+    bucket = trips[:, 4].astype(np.int64) // bucket_hours
+    minutes = trips[:, 5]
+
+    sums = np.zeros((buckets, zones, zones), dtype=np.float64)
+    counts = np.zeros((buckets, zones, zones), dtype=np.float64)
+    np.add.at(sums, (bucket, from_zone, to_zone), minutes)
+    np.add.at(counts, (bucket, from_zone, to_zone), 1)
+
+    # Средняя скорость интервала по прямым расстояниям поездок
+    straight_km = haversine_m(trips[:, 0], trips[:, 1], trips[:, 2], trips[:, 3]) / 1000 * DETOUR_FACTOR
+    km_per_bucket = np.bincount(bucket, weights=straight_km, minlength=buckets)
+    hours_per_bucket = np.bincount(bucket, weights=minutes, minlength=buckets) / 60
+    speeds = np.full(buckets, float(DEFAULT_SPEED_KMH))
+    known = hours_per_bucket > 0
+    speeds[known] = np.clip(km_per_bucket[known] / hours_per_bucket[known], 5, 90)
+
+    center_lat, center_lon = grid.centers()
+    center_km = haversine_m(center_lat[:, None], center_lon[:, None], center_lat[None, :], center_lon[None, :]) / 1000
+    # Внутри зоны едем в среднем полклетки
+    np.fill_diagonal(center_km, grid.cell_km / 2)
+    prior = (center_km * DETOUR_FACTOR)[None, :, :] / speeds[:, None, None] * 60
+
+    return ((sums + PRIOR_WEIGHT * prior) / (counts + PRIOR_WEIGHT)).astype(np.float32), int(len(trips))
+
+
+def save_matrix(path, matrix, grid, bucket_hours, trips):
+    """Пишет матрицу во временный файл и атомарно подменяет старую."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp.npy'
+    out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=matrix.shape)
+    out[:] = matrix
+    out.flush()
+    del out
+    meta = {
+        'grid': grid.to_dict(),
+        'bucket_hours': bucket_hours,
+        'trips': trips,
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+    }
+    tmp_meta = f'{path}.{os.getpid()}.tmp.json'
+    with open(tmp_meta, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    # Метаданные первыми: читатель сверяет размер матрицы с сеткой
+    os.replace(tmp_meta, f'{path}.json')
+    os.replace(tmp_path, path)
+
+
+class TravelTimeMatrix:
+    def __init__(self, path):
+        with open(f'{path}.json', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.grid = ZoneGrid.from_dict(self.meta['grid'])
+        self.bucket_hours = self.meta['bucket_hours']
+        self.minutes = np.load(path, mmap_mode='r')
+        if self.minutes.shape[1] != self.grid.zone_count:
+            raise ValueError('Матрица ETA не соответствует сетке зон')
+
+    def _bucket(self, when=None):
+        when = when or datetime.now(timezone.utc)
+        return when.astimezone(timezone.utc).hour // self.bucket_hours
+
+    def eta_pairs(self, from_lat, from_lon, to_lat, to_lon, when=None):
+        """Минуты для пар точек (массивы одной длины)."""
+        table = self.minutes[self._bucket(when)]
+        return table[self.grid.zone_of(from_lat, from_lon), self.grid.zone_of(to_lat, to_lon)]
+
+    def eta_table(self, from_lat, from_lon, to_lat, to_lon, when=None):
+        """Минуты от каждой точки from до каждой точки to: матрица (len(from), len(to))."""
+        table = self.minutes[self._bucket(when)]
+        from_zone = self.grid.zone_of(from_lat, from_lon)
+        to_zone = self.grid.zone_of(to_lat, to_lon)
+        return table[from_zone[:, None], to_zone[None, :]]
+
+
+_matrices = {}
+_matrices_lock = threading.Lock()
+
+
+def get_matrix(path):
+    """Загруженная матрица (перечитывается после пересборки) или None."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _matrices_lock:
+        loaded = _matrices.get(path)
+        if loaded is None or loaded[0] != mtime:
+            try:
+                loaded = (mtime, TravelTimeMatrix(path))
+            except (OSError, ValueError):
+                return loaded[1] if loaded else None
+            _matrices[path] = loaded
+        return loaded[1]
@@ -0,0 +1,202 @@
+"""Прогноз спроса по дням недели и часам.
+
+История хранится матрицей ``недели × 7 × 24`` с числом заказов. Модель
+сезонная: профиль спроса - взвешенное среднее прошлых недель (свежие
+недели весят больше), умноженное на уровень последних суток. Новые заказы
+добавляются инкрементально по водяному знаку ``last_id``.
+
+Модель обновляет одна фоновая задача (refresh_demand_model) и сохраняет
+ее в файл; процессы API только читают файл и перечитывают его после
+каждого обновления.
+"""
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+SECONDS_PER_HOUR = 3600
+HOURS_PER_DAY = 24
+DAYS_PER_WEEK = 7
+REFRESH_BATCH = 50000
+
+NEW_ORDERS_SQL = '''
+    SELECT id, extract(epoch FROM order_time)::bigint
+    FROM "Dispatch_taxi_order"
+    WHERE id > %(last_id)s AND order_time >= %(since)s
+    ORDER BY id
+    LIMIT %(limit)s
+'''
+
+
+def week_coordinates(timestamps):
+    """(абсолютная неделя с понедельника, день недели 0=Пн, час) для UTC-секунд."""
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    hours = timestamps // SECONDS_PER_HOUR
+    days = hours // HOURS_PER_DAY
+    # 1970-01-01 - четверг, сдвигаем на 3 дня, чтобы неделя начиналась с понедельника
+    shifted = days + 3
+    return shifted // DAYS_PER_WEEK, shifted % DAYS_PER_WEEK, hours % HOURS_PER_DAY
+
+
+class DemandModel:
+    def __init__(self, history_weeks=8, decay=0.3):
+        self.history_weeks = history_weeks
+        self.decay = decay
+        self.start_week = None
+        self.counts = np.zeros((0, DAYS_PER_WEEK, HOURS_PER_DAY), dtype=np.float64)
+        self.last_id = 0
+        self.lock = threading.Lock()
+
+    def add_orders(self, ids, timestamps):
+        """Учитывает новые заказы. Заказы с id не больше last_id уже учтены
+        и пропускаются: проверка и сдвиг водяного знака идут под одной блокировкой."""
+        ids = np.asarray(ids, dtype=np.int64)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        with self.lock:
+            fresh = ids > self.last_id
+            if not fresh.any():
+                return 0
+            ids = ids[fresh]
+            weeks, dows, hours = week_coordinates(timestamps[fresh])
+            self._extend_to(int(weeks.max()))
+            keep = weeks >= self.start_week
+            np.add.at(self.counts, (weeks[keep] - self.start_week, dows[keep], hours[keep]), 1)
+            self.last_id = max(self.last_id, int(ids.max()))
+        return int(keep.sum())
+
+    def _extend_to(self, last_week):
+        if self.start_week is None:
+            self.start_week = last_week - self.history_weeks
+        current_last = self.start_week + len(self.counts) - 1
+        if last_week > current_last:
+            extra = np.zeros((last_week - current_last, DAYS_PER_WEEK, HOURS_PER_DAY))
+            self.counts = np.concatenate([self.counts, extra])
+        # Держим не больше history_weeks полных недель плюс текущую
+        overflow = len(self.counts) - (self.history_weeks + 1)
+        if overflow > 0:
+            self.counts = self.counts[overflow:]
+            self.start_week += overflow
+
+    def profile(self, current_week):
+        """Сезонный профиль 7×24: ожидаемое число заказов в час."""
+        past = current_week - self.start_week if self.start_week is not None else 0
+        past = max(0, min(past, len(self.counts)))
+        if past == 0:
+            return np.zeros((DAYS_PER_WEEK, HOURS_PER_DAY))
+        ages = np.arange(past, 0, -1) - 1
+        weights = (1 - self.decay) ** ages
+        return np.tensordot(weights, self.counts[:past], axes=1) / weights.sum()
+
+    def forecast(self, now, hours=24):
+        now_ts = int(now.timestamp())
+        current_week, _, _ = week_coordinates([now_ts])
+        current_week = int(current_week[0])
+        with self.lock:
+            profile = self.profile(current_week)
+            level = self._level(profile, now_ts)
+
+        start = (now_ts // SECONDS_PER_HOUR + 1) * SECONDS_PER_HOUR
+        hour_starts = start + np.arange(hours, dtype=np.int64) * SECONDS_PER_HOUR
+        _, dows, hour_of_day = week_coordinates(hour_starts)
+        expected = profile[dows, hour_of_day] * level
+        return [
+            {
+                'hour': datetime.fromtimestamp(int(ts), tz=timezone.utc).isoformat(),
+                'expected_orders': round(float(value), 2)
+            }
+            for ts, value in zip(hour_starts, expected)
+        ]
+
+    def _level(self, profile, now_ts):
+        """Отношение фактического спроса за последние сутки к профилю."""
+        hour_starts = (now_ts // SECONDS_PER_HOUR - np.arange(1, HOURS_PER_DAY + 1)) * SECONDS_PER_HOUR
+        weeks, dows, hours = week_coordinates(hour_starts)
+        index = weeks - self.start_week if self.start_week is not None else weeks
+        valid = (index >= 0) & (index < len(self.counts))
+        if not valid.any():
+            return 1.0
+        actual = self.counts[index[valid], dows[valid], hours[valid]].sum()
+        expected = profile[dows[valid], hours[valid]].sum()
+        if expected <= 0:
+            return 1.0
+        return float(np.clip(actual / expected, 0.5, 2.0))
+
+    def heatmap(self, now):
+        current_week, _, _ = week_coordinates([int(now.timestamp())])
+        with self.lock:
+            return self.profile(int(current_week[0]))
+
+    def history_start(self, now):
+        return now - timedelta(weeks=self.history_weeks + 1)
+
+    def save(self, path):
+        """Атомарная запись: читатели видят либо старый файл, либо новый целиком."""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp.npz')
+        try:
+            with os.fdopen(fd, 'wb') as f, self.lock:
+                np.savez_compressed(
+                    f, counts=self.counts,
+                    meta=np.array([self.start_week if self.start_week is not None else -1, self.last_id],
+                                  dtype=np.int64)
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path, history_weeks=8, decay=0.3):
+        model = cls(history_weeks, decay)
+        if os.path.exists(path):
+            with np.load(path) as data:
+                model.counts = data['counts']
+                start_week, last_id = (int(v) for v in data['meta'])
+            model.start_week = start_week if start_week >= 0 else None
+            model.last_id = last_id
+        return model
+
+
+def fetch_new_orders(cursor, last_id, since, limit=REFRESH_BATCH):
+    """(ids, UTC-секунды) заказов после водяного знака, по возрастанию id."""
+    cursor.execute(NEW_ORDERS_SQL, {'last_id': last_id, 'since': since, 'limit': limit})
+    rows = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 2)
+    return rows[:, 0], rows[:, 1]
+
+
+def refresh_model(model, cursor, now, batch_size=REFRESH_BATCH):
+    """Дочитывает в модель заказы с id больше last_id. Возвращает число учтенных."""
+    since = model.history_start(now)
+    added = 0
+    while True:
+        ids, timestamps = fetch_new_orders(cursor, model.last_id, since, batch_size)
+        if len(ids) == 0:
+            break
+        added += model.add_orders(ids, timestamps)
+        if len(ids) < batch_size:
+            break
+    return added
+
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_model(path, history_weeks=8):
+    """Модель из файла (перечитывается после обновления) или None."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _models_lock:
+        loaded = _models.get(path)
+        if loaded is None or loaded[0] != mtime:
+            try:
+                loaded = (mtime, DemandModel.load(path, history_weeks))
+            except (OSError, ValueError, KeyError):
+                return loaded[1] if loaded else None
+            _models[path] = loaded
+        return loaded[1]
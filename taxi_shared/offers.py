@@ -0,0 +1,102 @@
+"""Предложения заказов водителям: формат сообщений и ожидание в long-poll.
+
+Координатор (Django, команда run_offer_coordinator) предлагает заказ одной
+машине за раз и сообщает об этом в канал driver_offers. Водительское
+приложение держит long-poll запрос к Flask API; запрос ждет в OfferHub,
+пока LISTEN-поток не передаст сообщение для его машины. Ожидающий запрос
+не держит соединение с БД, а пробуждение - O(1) на сообщение, сколько бы
+машин ни ждало одновременно.
+"""
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from taxi_shared.order_history import to_json_value
+
+OFFERS_CHANNEL = 'driver_offers'
+
+OFFER_PENDING = 'pending'
+OFFER_ACCEPTED = 'accepted'
+OFFER_DECLINED = 'declined'
+OFFER_EXPIRED = 'expired'
+OFFER_WITHDRAWN = 'withdrawn'
+
+OFFER_ORDER_FIELDS = ('pickup_lat', 'pickup_lon', 'dropoff_lat', 'dropoff_lon', 'range', 'pickup_at',
+                      'pickup_zone_id')
+
+
+def offer_status(offer, now=None):
+    """Статус с учетом времени: неотвеченное просроченное предложение уже истекло."""
+    now = now or datetime.now(timezone.utc)
+    if offer.status == OFFER_PENDING and offer.expires_at <= now:
+        return OFFER_EXPIRED
+    return offer.status
+
+
+def offer_message(event, offer, order=None):
+    """Сообщение о предложении; offer и order - модели Django или SQLAlchemy."""
+    message = {
+        'event': event,
+        'offer_id': offer.id,
+        'order_id': offer.order_id,
+        'vehicle_id': offer.vehicle_id,
+        'status': offer_status(offer),
+        'expires_at': offer.expires_at.isoformat(),
+    }
+    if order is not None:
+        message['order'] = {field: to_json_value(getattr(order, field)) for field in OFFER_ORDER_FIELDS}
+    return message
+
+
+class Waiter:
+    def __init__(self, vehicle_id):
+        self.vehicle_id = vehicle_id
+        self.messages = []
+        self.ready = threading.Event()
+
+    def deliver(self, message):
+        self.messages.append(message)
+        self.ready.set()
+
+    def wait(self, timeout):
+        self.ready.wait(timeout)
+        return self.messages
+
+
+class OfferHub:
+    """Ожидающие long-poll запросы по машинам."""
+
+    def __init__(self):
+        self.waiters = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        with self.lock:
+            return sum(len(waiters) for waiters in self.waiters.values())
+
+    @contextmanager
+    def waiting(self, vehicle_id):
+        waiter = Waiter(vehicle_id)
+        with self.lock:
+            self.waiters.setdefault(vehicle_id, set()).add(waiter)
+        try:
+            yield waiter
+        finally:
+            with self.lock:
+                waiters = self.waiters.get(vehicle_id)
+                waiters.discard(waiter)
+                if not waiters:
+                    del self.waiters[vehicle_id]
+
+    def publish(self, message):
+        with self.lock:
+            waiters = list(self.waiters.get(message.get('vehicle_id'), ()))
+        for waiter in waiters:
+            waiter.deliver(message)
+        return len(waiters)
+
+    def publish_all(self, message):
+        with self.lock:
+            waiters = [waiter for group in self.waiters.values() for waiter in group]
+        for waiter in waiters:
+            waiter.deliver(message)
@@ -0,0 +1,108 @@
+"""Формат журнала изменений заказов и восстановление состояния по нему.
+
+Событие хранит только изменившиеся поля: ``{поле: [старое, новое]}``.
+Состояние заказа на любой момент получается последовательным применением
+событий, поэтому журнал одинаково читают Django и Flask.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+
+TRACKED_FIELDS = ('customer_id', 'vehicle_id', 'tariff_id', 'operator_id', 'status', 'range', 'order_time',
+                  'pickup_at', 'driver_id', 'price')
+
+EVENT_CREATED = 1
+EVENT_UPDATED = 2
+EVENT_STATUS_CHANGED = 3
+EVENT_DELETED = 4
+
+EVENT_NAMES = {
+    EVENT_CREATED: 'created',
+    EVENT_UPDATED: 'updated',
+    EVENT_STATUS_CHANGED: 'status_changed',
+    EVENT_DELETED: 'deleted',
+}
+
+
+def to_json_value(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def diff_states(previous, current):
+    """Изменения между двумя снимками заказа (None - заказа не было)."""
+    previous = previous or {}
+    current = current or {}
+    changes = {}
+    for field in TRACKED_FIELDS:
+        old = to_json_value(previous.get(field))
+        new = to_json_value(current.get(field))
+        if old != new:
+            changes[field] = [old, new]
+    return changes
+
+
+def event_type_for(previous, current, changes):
+    if previous is None:
+        return EVENT_CREATED
+    if current is None:
+        return EVENT_DELETED
+    if 'status' in changes:
+        return EVENT_STATUS_CHANGED
+    return EVENT_UPDATED
+
+
+def apply_event(state, event_type, changes):
+    """Применяет событие к состоянию. Возвращает None для удаленного заказа."""
+    if event_type == EVENT_DELETED:
+        return None
+    state = dict(state or {})
+    for field, (_, new) in changes.items():
+        state[field] = new
+    return state
+
+
+def state_at(events, moment=None):
+    """Состояние заказа на момент moment. events - (тип, время, изменения) по порядку."""
+    state = None
+    for event_type, occurred_at, changes in events:
+        if moment is not None and occurred_at > moment:
+            break
+        state = apply_event(state, event_type, changes)
+    return state
+
+
+def is_complete(event_types):
+    """История полная, если начинается с создания заказа: иначе исходного
+    снимка нет и состояние содержит только поля из изменений."""
+    return bool(event_types) and event_types[0] == EVENT_CREATED
+
+
+def replay(events, partial=None):
+    """Итоговые состояния заказов по потоку (order_id, тип, изменения),
+    упорядоченному по order_id и порядку записи. Удаленные заказы - None.
+
+    Заказы без события создания пропускаются; их id добавляются в partial,
+    если передан список.
+    """
+    current_id = None
+    state = None
+    complete = False
+    for order_id, event_type, changes in events:
+        if order_id != current_id:
+            if current_id is not None:
+                if complete:
+                    yield current_id, state
+                elif partial is not None:
+                    partial.append(current_id)
+            current_id = order_id
+            state = None
+            complete = event_type == EVENT_CREATED
+        state = apply_event(state, event_type, changes)
+    if current_id is not None:
+        if complete:
+            yield current_id, state
+        elif partial is not None:
+            partial.append(current_id)
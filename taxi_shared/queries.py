@@ -0,0 +1,220 @@
+"""Общие запросы для горячих чтений Django-приложения и Flask API.
+
+SQL собран один раз при импорте (список заказов - один раз на набор
+фильтров) и параметризован в стиле pyformat, поэтому функции принимают
+любой DB-API курсор PostgreSQL: ``connection.cursor()`` в Django или
+курсор соединения SQLAlchemy во Flask.
+"""
+from functools import lru_cache
+
+STATUS_DISPLAY = {
+    'scheduled': 'Запланирован',
+    'in_progress': 'В процессе',
+    'completed': 'Завершен',
+    'cancelled': 'Отменен',
+}
+
+BUSY_STATUSES = ('assigned', 'in_progress')
+REVENUE_STATUSES = ('completed', 'in_progress')
+
+COUNTS_SQL = '''
+    SELECT
+        (SELECT count(*) FROM "Dispatch_taxi_order") AS total_orders,
+        (SELECT count(*) FROM "Dispatch_taxi_order" WHERE status = 'in_progress') AS active_orders,
+        (SELECT count(*) FROM "Dispatch_taxi_driver" WHERE deleted_at IS NULL) AS total_drivers,
+        (SELECT count(*) FROM "Dispatch_taxi_customer" WHERE deleted_at IS NULL) AS total_customers,
+        (SELECT count(*) FROM "Dispatch_taxi_vehicle" WHERE deleted_at IS NULL) AS total_vehicles,
+        (SELECT count(*) FROM "Dispatch_taxi_tariff" WHERE deleted_at IS NULL) AS total_tariffs,
+        (SELECT count(*) FROM "Dispatch_taxi_operator" WHERE deleted_at IS NULL) AS total_operators
+'''
+
+REVENUE_SQL = '''
+    SELECT COALESCE(sum(o.range * t.cost_for_km), 0)
+    FROM "Dispatch_taxi_order" o
+    JOIN "Dispatch_taxi_tariff" t ON t.id = o.tariff_id
+    WHERE o.status IN %(statuses)s
+'''
+
+DAILY_STATS_SQL = '''
+    SELECT date(o.order_time) AS day,
+           count(o.id) AS orders,
+           COALESCE(sum(o.range * t.cost_for_km), 0) AS revenue
+    FROM "Dispatch_taxi_order" o
+    JOIN "Dispatch_taxi_tariff" t ON t.id = o.tariff_id
+    WHERE o.order_time >= %(since)s
+    GROUP BY date(o.order_time)
+    ORDER BY day DESC
+'''
+
+# Условие WHERE собирается только из заданных фильтров: предикаты вида
+# "(%(x)s IS NULL OR ...)" планировщик не может заранее отбросить, и план
+# (выбор индекса, отсечение секций) получался одинаково плохим для всех
+ORDER_FILTER_SQL = {
+    'status': 'o.status = %(status)s',
+    'customer_id': 'o.customer_id = %(customer_id)s',
+    'vehicle_id': 'o.vehicle_id = %(vehicle_id)s',
+    'start': 'o.order_time >= %(start)s',
+    'end': 'o.order_time <= %(end)s',
+}
+
+ORDER_LIST_SQL = '''
+    SELECT o.id, o.order_time, o.range, o.status,
+           o.customer_id, c.full_name,
+           o.vehicle_id, v.brand, v.model,
+           o.tariff_id, t.name, t.cost_for_km,
+           o.operator_id, op.full_name
+    FROM "Dispatch_taxi_order" o
+    LEFT JOIN "Dispatch_taxi_customer" c ON c.id = o.customer_id
+    LEFT JOIN "Dispatch_taxi_vehicle" v ON v.id = o.vehicle_id
+    LEFT JOIN "Dispatch_taxi_tariff" t ON t.id = o.tariff_id
+    LEFT JOIN "Dispatch_taxi_operator" op ON op.id = o.operator_id
+    {where}
+    ORDER BY o.order_time DESC
+    LIMIT %(limit)s OFFSET %(offset)s
+'''
+
+ORDER_COUNT_SQL = '''
+    SELECT count(*)
+    FROM "Dispatch_taxi_order" o
+    {where}
+'''
+
+BUSY_VEHICLES_SQL = '''
+    SELECT DISTINCT vehicle_id
+    FROM "Dispatch_taxi_order"
+    WHERE status IN %(statuses)s AND vehicle_id IS NOT NULL
+'''
+
+
+def fetch_counts(cursor):
+    cursor.execute(COUNTS_SQL)
+    columns = [col[0] for col in cursor.description]
+    return dict(zip(columns, cursor.fetchone()))
+
+
+def fetch_revenue(cursor, statuses=REVENUE_STATUSES):
+    cursor.execute(REVENUE_SQL, {'statuses': tuple(statuses)})
+    return float(cursor.fetchone()[0])
+
+
+def fetch_daily_stats(cursor, since):
+    cursor.execute(DAILY_STATS_SQL, {'since': since})
+    return [
+        {'date': day.isoformat(), 'orders': orders, 'revenue': float(revenue)}
+        for day, orders, revenue in cursor.fetchall()
+    ]
+
+
+def parse_id(value, name):
+    """Положительный id из параметра запроса; ValueError для некорректного."""
+    if not value:
+        return None
+    try:
+        parsed = int(value)
+    except (TypeError, ValueError):
+        parsed = 0
+    if parsed <= 0:
+        raise ValueError(f'Параметр {name} должен быть положительным целым числом')
+    return parsed
+
+
+def order_filters(status=None, customer_id=None, vehicle_id=None, start=None, end=None):
+    """Фильтры списка заказов. ValueError, если id заданы некорректно."""
+    return {
+        'status': status or None,
+        'customer_id': parse_id(customer_id, 'customer_id'),
+        'vehicle_id': parse_id(vehicle_id, 'vehicle_id'),
+        'start': start,
+        'end': end,
+    }
+
+
+@lru_cache(maxsize=None)
+def order_query(template, names):
+    """SQL списка или счетчика заказов для набора заданных фильтров."""
+    where = ' AND '.join(ORDER_FILTER_SQL[name] for name in names)
+    return template.format(where=f'WHERE {where}' if where else '')
+
+
+def active_filters(filters):
+    return tuple(name for name in ORDER_FILTER_SQL if filters.get(name) is not None)
+
+
+def order_status_scope(status):
+    """Ключ версии в TableVersion для заказов одного статуса.
+
+    Версия повышается при любой записи заказа со старым или новым статусом,
+    поэтому выборки с фильтром по статусу сбрасываются только своими записями.
+    """
+    return f'Dispatch_taxi_order:status={status}'
+
+
+# Триггер версий (миграция 0023) пишет в одну из VERSION_SLOTS строк
+# "<ключ>#<слот>" по номеру процесса сервера, чтобы параллельные записи
+# не ждали одну строку. Версия ключа - сумма его строк
+VERSION_SLOTS = 8
+
+
+def version_keys(keys):
+    """Все строки TableVersion, из которых складываются версии keys."""
+    return list(keys) + [f'{key}#{slot}' for key in keys for slot in range(VERSION_SLOTS)]
+
+
+def sum_versions(rows, keys):
+    """{ключ: версия} по строкам (table_name, version) из version_keys."""
+    versions = dict.fromkeys(keys, 0)
+    for name, version in rows:
+        key = name.rsplit('#', 1)[0] if '#' in name else name
+        if key in versions:
+            versions[key] += version
+    return versions
+
+
+def order_row_to_dict(row):
+    (order_id, order_time, distance, status,
+     customer_id, customer_name,
+     vehicle_id, brand, model,
+     tariff_id, tariff_name, cost_for_km,
+     operator_id, operator_name) = row[:14]
+    total_cost = None
+    if cost_for_km is not None and distance:
+        total_cost = float(cost_for_km) * float(distance)
+    return {
+        'id': order_id,
+        'customer': customer_name,
+        'customer_id': customer_id,
+        'vehicle': f"{brand} {model}" if vehicle_id else None,
+        'vehicle_id': vehicle_id,
+        'tariff': tariff_name,
+        'tariff_id': tariff_id,
+        'operator': operator_name,
+        'operator_id': operator_id,
+        'order_time': order_time.isoformat() if order_time else None,
+        'distance': float(distance) if distance else 0,
+        'status': status,
+        'total_cost': total_cost,
+        'status_display': STATUS_DISPLAY.get(status, status),
+    }
+
+
+def fetch_orders(cursor, filters, limit=100, offset=0):
+    """Страница заказов и общее число подходящих заказов.
+
+    Число считается отдельным запросом без соединений и сортировки: с
+    count(*) OVER () базе приходилось собирать всю выборку ради одной страницы.
+    """
+    names = active_filters(filters)
+    params = {name: filters[name] for name in names}
+    cursor.execute(order_query(ORDER_LIST_SQL, names), dict(params, limit=limit, offset=offset))
+    rows = cursor.fetchall()
+    if not offset and len(rows) < limit:
+        total = len(rows)
+    else:
+        cursor.execute(order_query(ORDER_COUNT_SQL, names), params)
+        total = cursor.fetchone()[0]
+    return [order_row_to_dict(row) for row in rows], total
+
+
+def fetch_busy_vehicle_ids(cursor, statuses=BUSY_STATUSES):
+    cursor.execute(BUSY_VEHICLES_SQL, {'statuses': tuple(statuses)})
+    return [row[0] for row in cursor.fetchall()]
@@ -0,0 +1,271 @@
+"""Маршрутизация по локальному графу дорог без внешних сервисов.
+
+Граф хранится в .npz в формате CSR: исходящие ребра вершины v лежат в
+``indices/lengths/times[indptr[v]:indptr[v + 1]]``. Быстрейший путь ищется
+A* с эвристикой ALT: при сборке графа для нескольких ориентиров (landmarks)
+считаются времена до всех вершин и от них, и по неравенству треугольника
+это дает нижнюю оценку оставшегося пути. Готовые маршруты между парами
+вершин хранятся в LRU-кэше.
+
+Граф собирается офлайн из выгрузки OSM, сконвертированной в два CSV:
+``nodes.csv`` (id, lat, lon) и ``edges.csv`` (source, target, length_m,
+speed_kmh, oneway).
+"""
+import csv
+import heapq
+import math
+import os
+import random
+import threading
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+Route = namedtuple('Route', 'distance_km duration_min')
+
+EARTH_RADIUS_M = 6371000
+# Ячейка сетки для поиска ближайшей вершины, ~500 м по широте
+GRID_CELL_DEG = 0.005
+MAX_GRID_RING = 6
+# Скорость на отрезках от точки до ближайшей вершины графа
+ACCESS_SPEED_KMH = 20
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def build_csr(node_count, sources, targets, *weights):
+    order = np.argsort(sources, kind='stable')
+    indptr = np.zeros(node_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=node_count), out=indptr[1:])
+    return (indptr, targets[order].astype(np.int32)) + tuple(w[order].astype(np.float32) for w in weights)
+
+
+def dijkstra(indptr, indices, weights, source):
+    """Времена от source до всех вершин (inf для недостижимых)."""
+    dist = [math.inf] * (len(indptr) - 1)
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        d, v = heapq.heappop(heap)
+        if d > dist[v]:
+            continue
+        start, end = indptr[v], indptr[v + 1]
+        for u, w in zip(indices[start:end].tolist(), weights[start:end].tolist()):
+            nd = d + w
+            if nd < dist[u]:
+                dist[u] = nd
+                heapq.heappush(heap, (nd, u))
+    return np.array(dist, dtype=np.float32)
+
+
+def select_landmarks(indptr, indices, weights, count, seed=0):
+    """Ориентиры выбираются по очереди как самые удаленные от уже выбранных."""
+    node_count = len(indptr) - 1
+    start = random.Random(seed).randrange(node_count)
+    from_start = dijkstra(indptr, indices, weights, start)
+    candidate = int(np.argmax(np.where(np.isfinite(from_start), from_start, -1)))
+
+    landmarks = []
+    distances = []
+    nearest = np.full(node_count, np.inf, dtype=np.float32)
+    for _ in range(min(count, node_count)):
+        landmarks.append(candidate)
+        dist = dijkstra(indptr, indices, weights, candidate)
+        distances.append(dist)
+        nearest = np.minimum(nearest, dist)
+        candidate = int(np.argmax(np.where(np.isfinite(nearest), nearest, -1)))
+        if candidate in landmarks:
+            break
+    return landmarks, distances
+
+
+def build_graph(nodes_path, edges_path, output_path, landmark_count=16):
+    """Собирает CSR-граф с таблицами ориентиров и сохраняет его в .npz."""
+    node_ids = {}
+    lat, lon = [], []
+    with open(nodes_path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            node_ids[row['id']] = len(lat)
+            lat.append(float(row['lat']))
+            lon.append(float(row['lon']))
+
+    sources, targets, lengths, times = [], [], [], []
+    with open(edges_path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if row['source'] not in node_ids or row['target'] not in node_ids:
+                continue
+            source, target = node_ids[row['source']], node_ids[row['target']]
+            length = float(row['length_m'])
+            seconds = length / (float(row['speed_kmh']) / 3.6)
+            sources.append(source)
+            targets.append(target)
+            lengths.append(length)
+            times.append(seconds)
+            if row.get('oneway', '0') not in ('1', 'yes', 'true'):
+                sources.append(target)
+                targets.append(source)
+                lengths.append(length)
+                times.append(seconds)
+
+    node_count = len(lat)
+    sources = np.array(sources, dtype=np.int64)
+    targets = np.array(targets, dtype=np.int64)
+    lengths = np.array(lengths)
+    times = np.array(times)
+    indptr, indices, edge_lengths, edge_times = build_csr(node_count, sources, targets, lengths, times)
+    rev_indptr, rev_indices, rev_times = build_csr(node_count, targets, sources, times)
+
+    landmarks, from_landmarks = select_landmarks(indptr, indices, edge_times, landmark_count)
+    to_landmarks = [dijkstra(rev_indptr, rev_indices, rev_times, landmark) for landmark in landmarks]
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    np.savez(
+        output_path,
+        lat=np.array(lat), lon=np.array(lon),
+        indptr=indptr, indices=indices, lengths=edge_lengths, times=edge_times,
+        landmarks=np.array(landmarks, dtype=np.int32),
+        lm_from=np.stack(from_landmarks, axis=1), lm_to=np.stack(to_landmarks, axis=1)
+    )
+    return node_count, len(indices), len(landmarks)
+
+
+def grid_keys(lat, lon):
+    rows = np.floor(np.asarray(lat) / GRID_CELL_DEG).astype(np.int64) + 20000
+    cols = np.floor(np.asarray(lon) / GRID_CELL_DEG).astype(np.int64) + 40000
+    return rows * 100000 + cols
+
+
+class RoadGraph:
+    def __init__(self, data, cache_size=10000):
+        self.lat = data['lat']
+        self.lon = data['lon']
+        self.indptr = data['indptr'].tolist()
+        self.indices = data['indices']
+        self.lengths = data['lengths']
+        self.times = data['times']
+        # Строка на ориентир: оценка до цели считается сразу для всех вершин
+        self.lm_from = np.ascontiguousarray(data['lm_from'].T)
+        self.lm_to = np.ascontiguousarray(data['lm_to'].T)
+
+        keys = grid_keys(self.lat, self.lon)
+        self.grid_order = np.argsort(keys, kind='stable')
+        self.grid_keys = keys[self.grid_order]
+        self.route_nodes = lru_cache(maxsize=cache_size)(self._route_nodes)
+
+    @classmethod
+    def load(cls, path, cache_size=10000):
+        with np.load(path) as data:
+            return cls({name: data[name] for name in data.files}, cache_size)
+
+    @property
+    def node_count(self):
+        return len(self.lat)
+
+    def _cell_nodes(self, key):
+        lo = np.searchsorted(self.grid_keys, key, side='left')
+        hi = np.searchsorted(self.grid_keys, key, side='right')
+        return self.grid_order[lo:hi]
+
+    def nearest_node(self, lat, lon):
+        """(вершина, расстояние в метрах) или None, если рядом нет дорог."""
+        center = int(grid_keys(lat, lon))
+        candidates = []
+        found_at = None
+        for ring in range(MAX_GRID_RING + 1):
+            for dr in range(-ring, ring + 1):
+                for dc in range(-ring, ring + 1):
+                    if max(abs(dr), abs(dc)) == ring:
+                        candidates.append(self._cell_nodes(center + dr * 100000 + dc))
+            if found_at is None and any(len(c) for c in candidates):
+                found_at = ring
+            # Еще одно кольцо после первой находки: ближайшая вершина может
+            # лежать в соседней ячейке дальше по сетке, но ближе по расстоянию
+            if found_at is not None and ring > found_at:
+                break
+        if found_at is None:
+            return None
+        nodes = np.concatenate(candidates)
+        distances = haversine_m(lat, lon, self.lat[nodes], self.lon[nodes])
+        best = int(np.argmin(distances))
+        return int(nodes[best]), float(distances[best])
+
+    def heuristic_to(self, target):
+        """Нижние оценки времени от каждой вершины до target, секунды.
+
+        Считаются для всех вершин сразу операциями над таблицами ориентиров.
+        inf - вершина не может доехать до target. Ориентир, недостижимый и
+        для вершины, и для цели, дает nan и не учитывается (fmax).
+        """
+        with np.errstate(invalid='ignore'):
+            bounds = np.fmax.reduce(self.lm_from[:, target, None] - self.lm_from, axis=0)
+            np.fmax(bounds, np.fmax.reduce(self.lm_to - self.lm_to[:, target, None], axis=0), out=bounds)
+            np.fmax(bounds, 0, out=bounds)
+        return bounds.tolist()
+
+    def _route_nodes(self, source, target):
+        """(метры, секунды) быстрейшего пути между вершинами или None."""
+        if source == target:
+            return 0.0, 0.0
+        heuristic = self.heuristic_to(target)
+        if heuristic[source] == math.inf:
+            return None
+        best = [math.inf] * self.node_count
+        length = [0.0] * self.node_count
+        settled = bytearray(self.node_count)
+        best[source] = 0.0
+        heap = [(heuristic[source], 0.0, source)]
+        while heap:
+            _, elapsed, v = heapq.heappop(heap)
+            if v == target:
+                return length[v], elapsed
+            if settled[v]:
+                continue
+            settled[v] = 1
+            start, end = self.indptr[v], self.indptr[v + 1]
+            for u, seconds, meters in zip(self.indices[start:end].tolist(),
+                                          self.times[start:end].tolist(),
+                                          self.lengths[start:end].tolist()):
+                arrival = elapsed + seconds
+                if arrival < best[u]:
+                    best[u] = arrival
+                    length[u] = length[v] + meters
+                    heapq.heappush(heap, (arrival + heuristic[u], arrival, u))
+        return None
+
+    def route(self, from_lat, from_lon, to_lat, to_lon):
+        """Маршрут между координатами или None, если точки не связаны дорогами."""
+        start = self.nearest_node(from_lat, from_lon)
+        finish = self.nearest_node(to_lat, to_lon)
+        if start is None or finish is None:
+            return None
+        path = self.route_nodes(start[0], finish[0])
+        if path is None:
+            return None
+        meters, seconds = path
+        access = start[1] + finish[1]
+        meters += access
+        seconds += access / (ACCESS_SPEED_KMH / 3.6)
+        return Route(round(meters / 1000, 2), round(seconds / 60, 1))
+
+
+_graphs = {}
+_graphs_lock = threading.Lock()
+
+
+def get_graph(path, cache_size=10000):
+    """Загруженный граф (перечитывается при замене файла) или None, если файла нет."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _graphs_lock:
+        loaded = _graphs.get(path)
+        if loaded is None or loaded[0] != mtime:
+            loaded = (mtime, RoadGraph.load(path, cache_size))
+            _graphs[path] = loaded
+        return loaded[1]
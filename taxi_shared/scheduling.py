@@ -0,0 +1,55 @@
+"""Очередь срабатываний для отложенной отправки заказов.
+
+Min-куча (момент срабатывания, заказ) с ленивым удалением: перенос или
+отмена заказа только обновляет словарь актуальных моментов, а устаревшие
+элементы кучи отбрасываются при извлечении. Планирование - O(log n),
+ближайшее срабатывание - O(1); десятки тысяч броней занимают несколько
+мегабайт.
+"""
+import heapq
+
+
+class DispatchQueue:
+    def __init__(self):
+        self.heap = []
+        self.fire_at = {}
+
+    def __len__(self):
+        return len(self.fire_at)
+
+    def __contains__(self, order_id):
+        return order_id in self.fire_at
+
+    def schedule(self, order_id, fire_at):
+        """Ставит или переносит срабатывание заказа (fire_at - число, например timestamp)."""
+        if self.fire_at.get(order_id) == fire_at:
+            return
+        self.fire_at[order_id] = fire_at
+        heapq.heappush(self.heap, (fire_at, order_id))
+        # Копится много устаревших элементов - пересобираем кучу
+        if len(self.heap) > 2 * len(self.fire_at) + 1024:
+            self.heap = [(at, order_id) for order_id, at in self.fire_at.items()]
+            heapq.heapify(self.heap)
+
+    def cancel(self, order_id):
+        self.fire_at.pop(order_id, None)
+
+    def _drop_stale(self):
+        while self.heap and self.fire_at.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+
+    def next_fire(self):
+        """Момент ближайшего срабатывания или None."""
+        self._drop_stale()
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, now):
+        """[(заказ, момент)] для всех срабатываний не позже now, по порядку."""
+        due = []
+        while True:
+            self._drop_stale()
+            if not self.heap or self.heap[0][0] > now:
+                return due
+            fire_at, order_id = heapq.heappop(self.heap)
+            del self.fire_at[order_id]
+            due.append((order_id, fire_at))
@@ -0,0 +1,106 @@
+"""Проверка того, что модели Django и SQLAlchemy описывают одну и ту же схему.
+
+Каждая сторона приводится к словарю ``{таблица: {колонка: описание}}``,
+после чего описания сравниваются поколоночно.
+"""
+
+DJANGO_TYPE_FAMILIES = {
+    'AutoField': 'integer',
+    'BigAutoField': 'integer',
+    'IntegerField': 'integer',
+    'BigIntegerField': 'integer',
+    'PositiveIntegerField': 'integer',
+    'PositiveBigIntegerField': 'integer',
+    'PositiveSmallIntegerField': 'integer',
+    'SmallIntegerField': 'integer',
+    'ForeignKey': 'integer',
+    'OneToOneField': 'integer',
+    'CharField': 'string',
+    'URLField': 'string',
+    'TextField': 'string',
+    'DecimalField': 'decimal',
+    'FloatField': 'float',
+    'DateTimeField': 'datetime',
+    'DateField': 'date',
+    'TimeField': 'time',
+    'BooleanField': 'boolean',
+    'JSONField': 'json',
+    'BinaryField': 'binary',
+}
+
+SQLALCHEMY_TYPE_FAMILIES = {
+    'Integer': 'integer',
+    'BigInteger': 'integer',
+    'SmallInteger': 'integer',
+    'String': 'string',
+    'Text': 'string',
+    'Numeric': 'decimal',
+    'Float': 'float',
+    'DateTime': 'datetime',
+    'Date': 'date',
+    'Time': 'time',
+    'Boolean': 'boolean',
+    'JSON': 'json',
+    'LargeBinary': 'binary',
+}
+
+
+def django_schema(models):
+    tables = {}
+    for model in models:
+        columns = {}
+        for field in model._meta.concrete_fields:
+            internal_type = field.get_internal_type()
+            related = field.related_model._meta.db_table if field.is_relation else None
+            columns[field.column] = {
+                'type': DJANGO_TYPE_FAMILIES.get(internal_type, internal_type),
+                'nullable': bool(field.null) and not field.primary_key,
+                'length': field.max_length if internal_type in ('CharField', 'URLField') else None,
+                'references': related,
+            }
+        tables[model._meta.db_table] = columns
+    return tables
+
+
+def sqlalchemy_schema(tables):
+    schema = {}
+    for table in tables:
+        columns = {}
+        for column in table.columns:
+            type_name = type(column.type).__name__
+            references = None
+            if column.foreign_keys:
+                references = next(iter(column.foreign_keys)).column.table.name
+            columns[column.name] = {
+                'type': SQLALCHEMY_TYPE_FAMILIES.get(type_name, type_name),
+                'nullable': bool(column.nullable) and not column.primary_key,
+                'length': getattr(column.type, 'length', None),
+                'references': references,
+            }
+        schema[table.name] = columns
+    return schema
+
+
+def compare_schemas(django_tables, sqlalchemy_tables):
+    problems = []
+    for table in sorted(set(django_tables) | set(sqlalchemy_tables)):
+        if table not in sqlalchemy_tables:
+            problems.append(f'{table}: нет модели SQLAlchemy')
+            continue
+        if table not in django_tables:
+            problems.append(f'{table}: нет модели Django')
+            continue
+        left, right = django_tables[table], sqlalchemy_tables[table]
+        for column in sorted(set(left) | set(right)):
+            if column not in right:
+                problems.append(f'{table}.{column}: нет колонки в SQLAlchemy')
+            elif column not in left:
+                problems.append(f'{table}.{column}: нет колонки в Django')
+            else:
+                for key in ('type', 'nullable', 'length', 'references'):
+                    if left[column][key] != right[column][key]:
+                        problems.append(
+                            f'{table}.{column}: {key} Django={left[column][key]!r} '
+                            f'SQLAlchemy={right[column][key]!r}'
+                        )
+    return problems
@@ -0,0 +1,48 @@
+"""Города и их базы данных.
+
+Каждый город живет в своей базе PostgreSQL с одинаковой схемой: заказы,
+машины, смены и служебные таблицы (версии, задачи, журнал) разных городов
+не пересекаются, а фоновые процессы (диспетчер, координатор предложений,
+воркер задач) запускаются отдельно на каждый город. Список городов задается
+переменной окружения TAXI_CITIES в виде 'msk=taxi_dispatch_k,spb=taxi_dispatch_spb';
+первый город - основной, его база совпадает с прежней единственной.
+"""
+import os
+import re
+
+CITY_CODE_RE = re.compile(r'^[a-z][a-z0-9_]{0,19}$')
+
+CITY_NAMES = {
+    'msk': 'Москва',
+    'spb': 'Санкт-Петербург',
+}
+
+
+def parse_cities(spec, default):
+    """{код города: имя базы} в порядке перечисления; пустая строка - default."""
+    if not spec or not spec.strip():
+        return dict(default)
+    cities = {}
+    for item in spec.split(','):
+        code, sep, database = item.strip().partition('=')
+        code, database = code.strip(), database.strip()
+        # 'default' - псевдоним базы основного города в Django
+        if not sep or not database or not CITY_CODE_RE.match(code) or code == 'default':
+            raise ValueError(f'Некорректный город в TAXI_CITIES: {item!r}')
+        if code in cities:
+            raise ValueError(f'Город {code} указан в TAXI_CITIES дважды')
+        cities[code] = database
+    return cities
+
+
+def city_name(code):
+    return CITY_NAMES.get(code, code)
+
+
+def city_path(path, city, default_city):
+    """Путь файла или каталога города: у основного города прежний,
+    у остальных код города добавляется к имени (eta_matrix_spb.npy)."""
+    if city == default_city:
+        return path
+    root, ext = os.path.splitext(path)
+    return f'{root}_{city}{ext}'
@@ -0,0 +1,202 @@
+"""Смены водителей: недельное расписание, исключения на даты и поиск смен.
+
+Расписание задается по дням недели в местном времени (SHIFT_TIME_ZONE),
+смена с концом раньше начала заканчивается на следующий день. Исключение
+на дату - выходной (отменяет смены расписания, начинающиеся в этот день)
+или дополнительная смена.
+
+Для каждой даты смены раскрываются в интервалы минут от начала суток и
+складываются в центрированное дерево интервалов, так что "кто на смене в
+момент T" и "кто работал в течение часа" - это O(log n + k) без перебора
+всех смен. Деревья строятся лениво и живут, пока не изменились таблицы смен.
+"""
+import threading
+from collections import namedtuple
+from datetime import timedelta
+
+MINUTES_PER_DAY = 24 * 60
+MAX_CACHED_DAYS = 64
+# Исключения старше этого в календарь не загружаются
+OVERRIDE_HISTORY_DAYS = 14
+
+OVERRIDE_OFF = 'off'
+OVERRIDE_EXTRA = 'extra'
+
+# start и end - минуты от начала суток; end <= start - смена через полночь
+Schedule = namedtuple('Schedule', 'driver_id weekday start end valid_from valid_until')
+Override = namedtuple('Override', 'driver_id date kind start end')
+
+
+def time_to_minutes(value):
+    return value.hour * 60 + value.minute if value is not None else None
+
+
+def shift_end(start, end):
+    return end if end > start else end + MINUTES_PER_DAY
+
+
+class IntervalTree:
+    """Статическое центрированное дерево полуоткрытых интервалов [start, end)."""
+
+    def __init__(self, intervals):
+        intervals = [interval for interval in intervals if interval[0] < interval[1]]
+        self.size = len(intervals)
+        self.root = self._build(intervals)
+
+    def _build(self, intervals):
+        if not intervals:
+            return None
+        # Центр - медиана середин: интервал с этой серединой всегда остается
+        # в узле, поэтому каждый уровень строго меньше предыдущего
+        middles = sorted((start + end) / 2 for start, end, _ in intervals)
+        center = middles[len(middles) // 2]
+        left, right, here = [], [], []
+        for interval in intervals:
+            if interval[1] <= center:
+                left.append(interval)
+            elif interval[0] > center:
+                right.append(interval)
+            else:
+                here.append(interval)
+        by_start = sorted(here, key=lambda interval: interval[0])
+        by_end = sorted(here, key=lambda interval: interval[1], reverse=True)
+        return center, by_start, by_end, self._build(left), self._build(right)
+
+    def stab(self, point):
+        """Значения интервалов, содержащих точку."""
+        found = []
+        node = self.root
+        while node is not None:
+            center, by_start, by_end, left, right = node
+            if point < center:
+                for start, _, value in by_start:
+                    if start > point:
+                        break
+                    found.append(value)
+                node = left
+            else:
+                for _, end, value in by_end:
+                    if end <= point:
+                        break
+                    found.append(value)
+                node = right
+        return found
+
+    def overlap(self, lo, hi):
+        """Значения интервалов, пересекающихся с [lo, hi)."""
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            center, by_start, by_end, left, right = node
+            if hi <= center:
+                for start, _, value in by_start:
+                    if start >= hi:
+                        break
+                    found.append(value)
+                stack.append(left)
+            elif lo > center:
+                for _, end, value in by_end:
+                    if end <= lo:
+                        break
+                    found.append(value)
+                stack.append(right)
+            else:
+                found.extend(value for _, _, value in by_start)
+                stack.append(left)
+                stack.append(right)
+        return found
+
+
+class ShiftCalendar:
+    def __init__(self, schedules, overrides, tz):
+        self.tz = tz
+        self.by_weekday = {weekday: [] for weekday in range(7)}
+        for schedule in schedules:
+            self.by_weekday[schedule.weekday].append(schedule)
+        self.days_off = {}
+        self.extras = {}
+        for override in overrides:
+            if override.kind == OVERRIDE_OFF:
+                self.days_off.setdefault(override.date, set()).add(override.driver_id)
+            elif override.start is not None and override.end is not None:
+                self.extras.setdefault(override.date, []).append(override)
+        self.is_empty = not schedules and not self.extras
+        self._trees = {}
+        self._coverage = {}
+        self._lock = threading.Lock()
+
+    def shifts_starting(self, day):
+        """(водитель, начало, конец) смен, начинающихся в этот день; конец может быть > суток."""
+        days_off = self.days_off.get(day, ())
+        for schedule in self.by_weekday[day.weekday()]:
+            if schedule.driver_id in days_off:
+                continue
+            if schedule.valid_from and day < schedule.valid_from:
+                continue
+            if schedule.valid_until and day > schedule.valid_until:
+                continue
+            yield schedule.driver_id, schedule.start, shift_end(schedule.start, schedule.end)
+        for extra in self.extras.get(day, ()):
+            yield extra.driver_id, extra.start, shift_end(extra.start, extra.end)
+
+    def _cached(self, cache, day, build):
+        with self._lock:
+            value = cache.get(day)
+        if value is not None:
+            return value
+        value = build(day)
+        with self._lock:
+            if len(cache) >= MAX_CACHED_DAYS:
+                cache.clear()
+            cache[day] = value
+        return value
+
+    def tree(self, day):
+        return self._cached(self._trees, day, self._build_tree)
+
+    def _build_tree(self, day):
+        intervals = [(start, min(end, MINUTES_PER_DAY), driver_id)
+                     for driver_id, start, end in self.shifts_starting(day)]
+        # Хвосты ночных смен предыдущего дня
+        intervals.extend((0, end - MINUTES_PER_DAY, driver_id)
+                         for driver_id, _, end in self.shifts_starting(day - timedelta(days=1))
+                         if end > MINUTES_PER_DAY)
+        return IntervalTree(intervals)
+
+    def day_coverage(self, day):
+        return self._cached(self._coverage, day, self._build_day_coverage)
+
+    def _build_day_coverage(self, day):
+        tree = self.tree(day)
+        return [len(set(tree.overlap(hour * 60, hour * 60 + 60))) for hour in range(24)]
+
+    def on_shift(self, moment):
+        """Водители на смене в момент moment (aware datetime)."""
+        local = moment.astimezone(self.tz)
+        minute = local.hour * 60 + local.minute + local.second / 60
+        return set(self.tree(local.date()).stab(minute))
+
+    def coverage(self, week_start):
+        """Число водителей на смене в течение каждого часа: 7 списков по 24 значения."""
+        return [self.day_coverage(week_start + timedelta(days=offset)) for offset in range(7)]
+
+
+_calendars = {}
+_calendar_lock = threading.Lock()
+
+
+def get_calendar(version, load_shifts, tz, key=None):
+    """Календарь для текущей версии таблиц смен.
+
+    load_shifts() возвращает (расписания, исключения) и вызывается, только
+    когда версия сменилась. key разделяет календари разных баз (городов).
+    """
+    with _calendar_lock:
+        cached = _calendars.get(key)
+        if cached is None or cached[0] != version:
+            cached = (version, ShiftCalendar(*load_shifts(), tz))
+            _calendars[key] = cached
+        return cached[1]
@@ -0,0 +1,414 @@
+"""Имитация диспетчеризации для сравнения политик без риска для работы.
+
+Сценарий - поток заказов за сутки (исторический или синтетический), парк
+машин и операторы. Ядро - дискретно-событийная модель: прибытия заказов
+идут отсортированным потоком, а окончания поездок лежат в min-куче;
+следующее событие - меньшее из двух. Положения и занятость машин хранятся
+в массивах numpy, так что выбор машины - несколько векторных операций по
+всему парку, а сутки города (100 тыс. заказов, 5 тыс. машин) считаются за
+секунды.
+
+Политики подключаются по имени из реестров VEHICLE_POLICIES,
+OPERATOR_POLICIES и SURGE_POLICIES; набор задается строкой
+"машина:оператор:наценка", например "nearest:least_loaded:none". Случайные
+величины клиентов (согласие на наценку) общие для всех политик сценария,
+поэтому разница в отчетах - следствие политик, а не шума.
+"""
+import heapq
+import math
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from taxi_shared.eta import DEFAULT_SPEED_KMH, DETOUR_FACTOR
+from taxi_shared.workload import LoadHeap
+
+KM_PER_DEGREE = 111.2
+DEFAULT_PATIENCE_MINUTES = 10
+# Дальше этого машину к клиенту не посылают - заказ ждет машину поближе
+DEFAULT_MAX_APPROACH_KM = 8.0
+
+SERVED = 1
+NO_VEHICLE = 2
+DECLINED = 3
+
+# Доля заказов по часам суток для синтетического сценария
+HOURLY_PROFILE = (2, 1, 1, 1, 1, 2, 4, 7, 9, 7, 5, 5, 5, 5, 5, 6, 7, 9, 9, 8, 6, 5, 4, 3)
+
+PolicySet = namedtuple('PolicySet', 'vehicle operator surge')
+
+
+class Scenario:
+    """Заказы (время в секундах от начала суток, точки, дистанция, цена км),
+    начальные положения машин и число операторов."""
+
+    def __init__(self, times, pickup_lat, pickup_lon, dropoff_lat, dropoff_lon, distance_km, cost_per_km,
+                 vehicle_lat, vehicle_lon, operators, patience_minutes=DEFAULT_PATIENCE_MINUTES,
+                 max_approach_km=DEFAULT_MAX_APPROACH_KM, speed_kmh=DEFAULT_SPEED_KMH, elasticity=1.0, seed=0):
+        order = np.argsort(np.asarray(times, dtype=np.float64), kind='stable')
+        self.times = np.asarray(times, dtype=np.float64)[order]
+        self.pickup_lat = np.asarray(pickup_lat, dtype=np.float64)[order]
+        self.pickup_lon = np.asarray(pickup_lon, dtype=np.float64)[order]
+        self.dropoff_lat = np.asarray(dropoff_lat, dtype=np.float64)[order]
+        self.dropoff_lon = np.asarray(dropoff_lon, dtype=np.float64)[order]
+        self.distance_km = np.asarray(distance_km, dtype=np.float64)[order]
+        self.cost_per_km = np.asarray(cost_per_km, dtype=np.float64)[order]
+        self.vehicle_lat = np.asarray(vehicle_lat, dtype=np.float64)
+        self.vehicle_lon = np.asarray(vehicle_lon, dtype=np.float64)
+        if not len(self.vehicle_lat):
+            raise ValueError('В сценарии нет машин')
+        self.operators = max(1, int(operators))
+        self.patience = patience_minutes * 60
+        self.max_approach_km = max_approach_km
+        self.speed_kmh = speed_kmh
+        self.elasticity = elasticity
+        self.seed = seed
+        # Долгота сжимается к полюсам; для города хватает косинуса средней широты
+        self.lon_scale = math.cos(math.radians(float(np.mean(self.vehicle_lat))))
+        self.customer_draws = np.random.default_rng(seed).random(len(self.times))
+
+    def __len__(self):
+        return len(self.times)
+
+
+class Simulation:
+    def __init__(self, scenario, policies):
+        self.scenario = scenario
+        self.rng = np.random.default_rng(scenario.seed + 1)
+        count = len(scenario.vehicle_lat)
+        self.lat = scenario.vehicle_lat.copy()
+        self.lon = scenario.vehicle_lon.copy()
+        self.free = np.ones(count, dtype=bool)
+        self.free_count = count
+        self.idle_since = np.zeros(count)
+        self.busy_seconds = np.zeros(count)
+        self.outcome = np.zeros(len(scenario), dtype=np.int8)
+        self.wait = np.full(len(scenario), np.nan)
+        self.multiplier = np.ones(len(scenario))
+        self.order_operator = np.full(len(scenario), -1, dtype=np.int32)
+        self.revenue = 0.0
+        self.waiting = deque()
+        self.trips = []
+        # Секунды пути на километр: по прямой - с поправкой на извилистость дорог
+        self.seconds_per_km = 3600 / scenario.speed_kmh
+        self.vehicle_policy = VEHICLE_POLICIES[policies.vehicle](self)
+        self.operator_policy = OPERATOR_POLICIES[policies.operator](self)
+        self.surge_policy = SURGE_POLICIES[policies.surge](self)
+
+    def distances_km(self, lat, lon):
+        """Расстояние по прямой от каждой машины до точки."""
+        dy = self.lat - lat
+        dx = (self.lon - lon) * self.scenario.lon_scale
+        return np.sqrt(dx * dx + dy * dy) * KM_PER_DEGREE
+
+    def approach_km(self, vehicle, order):
+        s = self.scenario
+        dy = self.lat[vehicle] - s.pickup_lat[order]
+        dx = (self.lon[vehicle] - s.pickup_lon[order]) * s.lon_scale
+        return math.sqrt(dx * dx + dy * dy) * KM_PER_DEGREE
+
+    def run(self):
+        times = self.scenario.times
+        count = len(times)
+        i = 0
+        while i < count or self.trips:
+            if self.trips and (i >= count or self.trips[0][0] <= times[i]):
+                end, vehicle, order = heapq.heappop(self.trips)
+                self.trip_finished(end, vehicle, order)
+            else:
+                self.order_arrived(times[i], i)
+                i += 1
+        while self.waiting:
+            self.drop(self.waiting.popleft())
+        return self
+
+    def order_arrived(self, now, order):
+        s = self.scenario
+        multiplier = self.surge_policy.multiplier(now, order)
+        if multiplier > 1 and s.customer_draws[order] >= math.exp(-s.elasticity * (multiplier - 1)):
+            self.outcome[order] = DECLINED
+            return
+        self.multiplier[order] = multiplier
+        self.order_operator[order] = self.operator_policy.assign(now, order)
+        vehicle = self.vehicle_policy.choose(now, order) if self.free_count else -1
+        if vehicle < 0 or self.approach_km(vehicle, order) > s.max_approach_km:
+            self.waiting.append(order)
+            return
+        self.dispatch(now, vehicle, order)
+
+    def dispatch(self, now, vehicle, order):
+        s = self.scenario
+        pickup = now + self.approach_km(vehicle, order) * DETOUR_FACTOR * self.seconds_per_km
+        end = pickup + s.distance_km[order] * self.seconds_per_km
+        self.wait[order] = pickup - s.times[order]
+        self.busy_seconds[vehicle] += end - now
+        self.free[vehicle] = False
+        self.free_count -= 1
+        self.lat[vehicle] = s.dropoff_lat[order]
+        self.lon[vehicle] = s.dropoff_lon[order]
+        self.revenue += s.distance_km[order] * s.cost_per_km[order] * self.multiplier[order]
+        heapq.heappush(self.trips, (end, vehicle, order))
+
+    def trip_finished(self, now, vehicle, order):
+        self.outcome[order] = SERVED
+        self.operator_policy.release(self.order_operator[order])
+        self.free[vehicle] = True
+        self.free_count += 1
+        self.idle_since[vehicle] = now
+        # Ожидающие дольше терпения клиента ушли; очередь упорядочена по времени заказа
+        deadline = now - self.scenario.patience
+        while self.waiting and self.scenario.times[self.waiting[0]] < deadline:
+            self.drop(self.waiting.popleft())
+        if self.waiting:
+            # Освободившаяся машина берет ближайший ожидающий заказ в пределах подачи
+            s = self.scenario
+            waiting = np.fromiter(self.waiting, dtype=np.int64, count=len(self.waiting))
+            dy = s.pickup_lat[waiting] - self.lat[vehicle]
+            dx = (s.pickup_lon[waiting] - self.lon[vehicle]) * s.lon_scale
+            nearest = int(np.argmin(dx * dx + dy * dy))
+            order = int(waiting[nearest])
+            if self.approach_km(vehicle, order) <= s.max_approach_km:
+                del self.waiting[nearest]
+                self.dispatch(now, vehicle, order)
+
+    def drop(self, order):
+        self.outcome[order] = NO_VEHICLE
+        self.operator_policy.release(self.order_operator[order])
+
+    def report(self):
+        s = self.scenario
+        served = self.outcome == SERVED
+        waits = self.wait[served] / 60
+        horizon = max(float(s.times[-1]) - float(s.times[0]), 1.0) if len(s) else 1.0
+        percentiles = np.percentile(waits, [50, 90, 99]) if len(waits) else [0.0, 0.0, 0.0]
+        return {
+            'orders': len(s),
+            'served': int(served.sum()),
+            'no_vehicle': int((self.outcome == NO_VEHICLE).sum()),
+            'declined': int((self.outcome == DECLINED).sum()),
+            'wait_mean_min': round(float(waits.mean()), 2) if len(waits) else 0.0,
+            'wait_p50_min': round(float(percentiles[0]), 2),
+            'wait_p90_min': round(float(percentiles[1]), 2),
+            'wait_p99_min': round(float(percentiles[2]), 2),
+            # Доля времени машины в пути к клиенту или с клиентом
+            'utilization': round(float(self.busy_seconds.sum()) / (len(self.lat) * horizon), 4),
+            'revenue': round(float(self.revenue), 2),
+            'avg_multiplier': round(float(self.multiplier[served].mean()), 3) if served.any() else 1.0,
+            **self.operator_policy.report(),
+        }
+
+
+class NearestVehicle:
+    """Ближайшая свободная машина."""
+
+    def __init__(self, sim):
+        self.sim = sim
+
+    def nearest(self, order):
+        s = self.sim.scenario
+        distances = self.sim.distances_km(s.pickup_lat[order], s.pickup_lon[order])
+        distances[~self.sim.free] = np.inf
+        return distances
+
+    def choose(self, now, order):
+        return int(np.argmin(self.nearest(order)))
+
+
+class LongestIdleVehicle(NearestVehicle):
+    """Дольше всех простаивающая машина в радиусе; если таких нет - ближайшая."""
+
+    radius_km = 3.0
+
+    def choose(self, now, order):
+        distances = self.nearest(order)
+        nearby = np.flatnonzero(distances <= self.radius_km)
+        if not len(nearby):
+            return int(np.argmin(distances))
+        return int(nearby[np.argmin(self.sim.idle_since[nearby])])
+
+
+class RandomVehicle:
+    def __init__(self, sim):
+        self.sim = sim
+
+    def choose(self, now, order):
+        return int(self.sim.rng.choice(np.flatnonzero(self.sim.free)))
+
+
+class OperatorPolicy:
+    """Учет нагрузки операторов; подклассы выбирают оператора."""
+
+    def __init__(self, sim):
+        self.sim = sim
+        self.load = np.zeros(sim.scenario.operators, dtype=np.int64)
+        self.assigned = np.zeros(sim.scenario.operators, dtype=np.int64)
+        self.peak = 0
+
+    def assign(self, now, order):
+        operator = self.pick(now)
+        self.load[operator] += 1
+        self.assigned[operator] += 1
+        self.peak = max(self.peak, int(self.load[operator]))
+        return operator
+
+    def release(self, operator):
+        self.load[operator] -= 1
+
+    def report(self):
+        mean = float(self.assigned.mean())
+        return {
+            'operator_peak_load': self.peak,
+            # Неравномерность распределения заказов между операторами
+            'operator_assigned_cv': round(float(self.assigned.std()) / mean, 4) if mean else 0.0,
+        }
+
+
+class LeastLoadedOperator(OperatorPolicy):
+    """Как WorkloadBalancer: меньше открытых заказов, при равенстве - давнее назначение."""
+
+    def __init__(self, sim):
+        super().__init__(sim)
+        self.heap = LoadHeap((operator, 0, 0.0) for operator in range(len(self.load)))
+
+    def assign(self, now, order):
+        operator = super().assign(now, order)
+        self.heap.set(operator, int(self.load[operator]), now)
+        return operator
+
+    def pick(self, now):
+        return self.heap.peek()[2]
+
+    def release(self, operator):
+        super().release(operator)
+        self.heap.set(operator, int(self.load[operator]), self.heap.get(operator)[1])
+
+
+class RoundRobinOperator(OperatorPolicy):
+    def __init__(self, sim):
+        super().__init__(sim)
+        self.next = 0
+
+    def pick(self, now):
+        operator = self.next
+        self.next = (self.next + 1) % len(self.load)
+        return operator
+
+
+class RandomOperator(OperatorPolicy):
+    def pick(self, now):
+        return int(self.sim.rng.integers(len(self.load)))
+
+
+class NoSurge:
+    def __init__(self, sim):
+        self.sim = sim
+
+    def multiplier(self, now, order):
+        return 1.0
+
+
+class FreeShareSurge(NoSurge):
+    """Наценка растет до cap, когда свободных машин меньше threshold от парка."""
+
+    threshold = 0.1
+    cap = 2.0
+
+    def multiplier(self, now, order):
+        free_share = self.sim.free_count / len(self.sim.free)
+        if free_share >= self.threshold:
+            return 1.0
+        return round(1 + (self.cap - 1) * (1 - free_share / self.threshold), 2)
+
+
+VEHICLE_POLICIES = {
+    'nearest': NearestVehicle,
+    'longest_idle': LongestIdleVehicle,
+    'random': RandomVehicle,
+}
+
+OPERATOR_POLICIES = {
+    'least_loaded': LeastLoadedOperator,
+    'round_robin': RoundRobinOperator,
+    'random': RandomOperator,
+}
+
+SURGE_POLICIES = {
+    'none': NoSurge,
+    'free_share': FreeShareSurge,
+}
+
+
+def parse_policies(spec):
+    """PolicySet из строки "машина:оператор:наценка"; пропущенные части - по умолчанию."""
+    parts = spec.split(':')
+    defaults = ('nearest', 'least_loaded', 'none')
+    if len(parts) > 3:
+        raise ValueError(f'Набор политик задается как машина:оператор:наценка, получено {spec!r}')
+    policies = PolicySet(*(parts[i] if i < len(parts) and parts[i] else defaults[i] for i in range(3)))
+    for name, registry in zip(policies, (VEHICLE_POLICIES, OPERATOR_POLICIES, SURGE_POLICIES)):
+        if name not in registry:
+            raise ValueError(f'Неизвестная политика {name!r}, доступны: {", ".join(registry)}')
+    return policies
+
+
+def simulate(scenario, spec):
+    started = time.perf_counter()
+    report = Simulation(scenario, parse_policies(spec)).run().report()
+    return dict(report, policy=spec, seconds=round(time.perf_counter() - started, 2))
+
+
+_worker_scenario = None
+
+
+def _init_worker(scenario):
+    global _worker_scenario
+    _worker_scenario = scenario
+
+
+def _simulate_in_worker(spec):
+    return simulate(_worker_scenario, spec)
+
+
+def simulate_many(scenario, specs, workers=None):
+    """Отчеты по наборам политик; наборы считаются параллельно в пуле процессов.
+    Сценарий передается каждому процессу один раз."""
+    for spec in specs:
+        parse_policies(spec)
+    if workers == 1 or len(specs) == 1:
+        return [simulate(scenario, spec) for spec in specs]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(scenario,)) as pool:
+        return list(pool.map(_simulate_in_worker, specs))
+
+
+def synthetic_scenario(orders, vehicles, operators, bbox, cost_per_km=(30.0,), hotspots=12, seed=0, **kwargs):
+    """Синтетические сутки: суточный профиль спроса, заказы вокруг случайных
+    центров притяжения внутри bbox (lat_min, lon_min, lat_max, lon_max)."""
+    rng = np.random.default_rng(seed)
+    lat_min, lon_min, lat_max, lon_max = bbox
+    profile = np.asarray(HOURLY_PROFILE, dtype=np.float64)
+    hours = rng.choice(24, size=orders, p=profile / profile.sum())
+    times = hours * 3600 + rng.random(orders) * 3600
+
+    centers_lat = rng.uniform(lat_min, lat_max, hotspots)
+    centers_lon = rng.uniform(lon_min, lon_max, hotspots)
+    spread = 0.08 * min(lat_max - lat_min, lon_max - lon_min) + 1e-9
+
+    def around_hotspots(count):
+        center = rng.integers(hotspots, size=count)
+        lat = np.clip(centers_lat[center] + rng.normal(0, spread, count), lat_min, lat_max)
+        lon = np.clip(centers_lon[center] + rng.normal(0, spread, count), lon_min, lon_max)
+        return lat, lon
+
+    pickup_lat, pickup_lon = around_hotspots(orders)
+    dropoff_lat, dropoff_lon = around_hotspots(orders)
+    lon_scale = math.cos(math.radians((lat_min + lat_max) / 2))
+    straight_km = np.hypot(dropoff_lat - pickup_lat, (dropoff_lon - pickup_lon) * lon_scale) * KM_PER_DEGREE
+    distance_km = np.maximum(straight_km * DETOUR_FACTOR, 1.0).round(1)
+    vehicle_lat, vehicle_lon = around_hotspots(vehicles)
+    return Scenario(
+        times, pickup_lat, pickup_lon, dropoff_lat, dropoff_lon, distance_km,
+        rng.choice(np.asarray(cost_per_km, dtype=np.float64), size=orders),
+        vehicle_lat, vehicle_lon, operators, seed=seed, **kwargs
+    )
@@ -0,0 +1,100 @@
+"""Колоночный архив против словаря последних версий заказов."""
+import os
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from taxi_shared.archive import (STATUS_CODES, archive_rows, compact_partitions, grouped_stats, list_partitions,
+                                 partition_name, rows_to_columns, save_partition, scan, status_counts, totals)
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def random_row(rng, order_id):
+    # Время заказа не меняется между архивациями: повтор id попадает в тот же месяц
+    return {
+        'id': order_id,
+        'order_time': START + timedelta(seconds=random.Random(order_id).randrange(120 * 86400)),
+        'status': rng.choice(list(STATUS_CODES)),
+        'customer_id': rng.choice((None, rng.randint(1, 50))),
+        'vehicle_id': rng.choice((None, rng.randint(1, 20))),
+        'tariff_id': rng.randint(1, 3),
+        'operator_id': rng.randint(1, 5),
+        'range': rng.choice((None, rng.randint(1, 400) / 10)),
+        'cost_for_km': rng.choice((None, 25, 40)),
+    }
+
+
+def archive_batches(rng, directory, batches):
+    """Пишет пачки с повторами id; возвращает последнюю версию каждого заказа."""
+    latest = {}
+    for _ in range(batches):
+        rows = [random_row(rng, rng.randint(1, 600)) for _ in range(rng.randint(1, 80))]
+        archive_rows(directory, rows)
+        for row in rows:
+            latest[row['id']] = row
+    return latest
+
+
+def reference_totals(latest, start=None, end=None, statuses=None):
+    rows = [row for row in latest.values()
+            if (start is None or row['order_time'] >= start) and (end is None or row['order_time'] <= end)
+            and (statuses is None or row['status'] in statuses)]
+    revenue = sum(float(row['range'] or 0) * float(row['cost_for_km'] or 0) for row in rows)
+    distance = sum(float(row['range'] or 0) for row in rows)
+    return rows, {'orders': len(rows), 'revenue': round(revenue, 2), 'distance': round(distance, 1)}
+
+
+def check_archive(directory, latest):
+    ids = sorted(int(i) for part in scan(directory, columns=('id',)) for i in part['id'])
+    assert ids == sorted(latest)
+    for start, end, statuses in [(None, None, None), (START + timedelta(days=20), START + timedelta(days=70), None),
+                                 (START + timedelta(days=45), None, ['completed'])]:
+        rows, expected = reference_totals(latest, start, end, statuses)
+        result = totals(directory, start, end, statuses)
+        assert result['orders'] == expected['orders']
+        assert result['revenue'] == pytest.approx(expected['revenue'], abs=0.05)
+        assert result['distance'] == pytest.approx(expected['distance'], abs=0.5)
+        by_day = {}
+        for row in rows:
+            day = row['order_time'].date().isoformat()
+            by_day[day] = by_day.get(day, 0) + 1
+        assert {item['date']: item['orders'] for item in grouped_stats(directory, start, end, statuses)} == by_day
+    assert status_counts(directory) == {status: sum(row['status'] == status for row in latest.values())
+                                        for status in STATUS_CODES}
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_batches_match_latest_versions(tmp_path, seed):
+    rng = random.Random(seed)
+    directory = str(tmp_path / 'archive')
+    latest = archive_batches(rng, directory, 30)
+    # Пачка пишется своим файлом, уже записанные не переписываются
+    chunks = sum(len(paths) for _, paths in list_partitions(directory))
+    assert chunks > len(list_partitions(directory))
+    check_archive(directory, latest)
+
+    assert compact_partitions(directory) == len(list_partitions(directory))
+    assert all(len(paths) == 1 for _, paths in list_partitions(directory))
+    check_archive(directory, latest)
+    assert compact_partitions(directory) == 0
+
+    # Новые пачки после сжатия поверх файла месяца
+    for order_id, row in archive_batches(rng, directory, 10).items():
+        latest[order_id] = row
+    check_archive(directory, latest)
+
+
+def test_reads_month_file_of_previous_format(tmp_path):
+    rng = random.Random(9)
+    february = datetime(2026, 2, 1, tzinfo=timezone.utc)
+    rows = [dict(random_row(rng, order_id), order_time=february + timedelta(seconds=rng.randrange(28 * 86400)))
+            for order_id in range(1, 50)]
+    directory = str(tmp_path)
+    save_partition(os.path.join(directory, partition_name((2026, 2))), rows_to_columns(rows))
+    newer = [dict(rows[0], status='cancelled', range=1.0)]
+    archive_rows(directory, newer)
+    latest = {row['id']: row for row in rows + newer}
+    assert [month for month, _ in list_partitions(directory)] == [(2026, 2)]
+    check_archive(directory, latest)
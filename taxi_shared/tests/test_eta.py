@@ -0,0 +1,119 @@
+"""Матрица ETA против подсчета по каждой паре зон в цикле."""
+import random
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from taxi_shared.eta import (DEFAULT_SPEED_KMH, DETOUR_FACTOR, MAX_TRIP_MINUTES, MIN_TRIP_MINUTES, PRIOR_WEIGHT,
+                             ZoneGrid, build_matrix, fetch_trip_history, get_matrix, save_matrix)
+from taxi_shared.routing import haversine_m
+
+GRID = ZoneGrid(55.6, 37.4, 55.9, 37.8, cell_km=5.0)
+
+
+def random_trips(rng, count):
+    trips = []
+    for _ in range(count):
+        trips.append([rng.uniform(55.55, 55.95), rng.uniform(37.35, 37.85),
+                      rng.uniform(55.55, 55.95), rng.uniform(37.35, 37.85),
+                      rng.randrange(24), rng.uniform(MIN_TRIP_MINUTES, 90)])
+    return np.array(trips).reshape(-1, 6)
+
+
+def reference_zone(grid, lat, lon):
+    row = min(max(int((lat - grid.bbox[0]) / grid.dlat), 0), grid.rows - 1)
+    col = min(max(int((lon - grid.bbox[1]) / grid.dlon), 0), grid.cols - 1)
+    return row * grid.cols + col
+
+
+def test_zone_of_matches_loop():
+    rng = random.Random(1)
+    points = [(rng.uniform(55.5, 56.0), rng.uniform(37.3, 37.9)) for _ in range(500)]
+    lat, lon = np.array(points).T
+    assert GRID.zone_of(lat, lon).tolist() == [reference_zone(GRID, *point) for point in points]
+
+
+@pytest.mark.parametrize('count', [0, 40, 3000])
+def test_matrix_matches_per_pair_average(count):
+    rng = random.Random(count)
+    trips = random_trips(rng, count)
+    bucket_hours = 3
+    matrix, used = build_matrix(trips, GRID, bucket_hours)
+    assert used == count
+    buckets = 24 // bucket_hours
+    assert matrix.shape == (buckets, GRID.zone_count, GRID.zone_count)
+
+    cells = {}
+    distance = [0.0] * buckets
+    duration = [0.0] * buckets
+    for from_lat, from_lon, to_lat, to_lon, hour, minutes in trips:
+        bucket = int(hour) // bucket_hours
+        key = (bucket, reference_zone(GRID, from_lat, from_lon), reference_zone(GRID, to_lat, to_lon))
+        cells.setdefault(key, []).append(minutes)
+        distance[bucket] += float(haversine_m(from_lat, from_lon, to_lat, to_lon)) / 1000 * DETOUR_FACTOR
+        duration[bucket] += minutes / 60
+
+    center_lat, center_lon = GRID.centers()
+    rng_pairs = random.Random(count + 1)
+    pairs = [(b, f, t) for b, f, t in cells] + [
+        (rng_pairs.randrange(buckets), rng_pairs.randrange(GRID.zone_count), rng_pairs.randrange(GRID.zone_count))
+        for _ in range(200)
+    ]
+    for bucket, from_zone, to_zone in pairs:
+        speed = min(max(distance[bucket] / duration[bucket], 5), 90) if duration[bucket] else DEFAULT_SPEED_KMH
+        if from_zone == to_zone:
+            km = GRID.cell_km / 2
+        else:
+            km = float(haversine_m(center_lat[from_zone], center_lon[from_zone],
+                                   center_lat[to_zone], center_lon[to_zone])) / 1000
+        prior = km * DETOUR_FACTOR / speed * 60
+        observed = cells.get((bucket, from_zone, to_zone), [])
+        expected = (sum(observed) + PRIOR_WEIGHT * prior) / (len(observed) + PRIOR_WEIGHT)
+        assert matrix[bucket, from_zone, to_zone] == pytest.approx(expected, rel=1e-4)
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, sql, params):
+        self.params = params
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_fetch_drops_missing_and_outlier_durations():
+    rows = [
+        (55.7, 37.5, 55.8, 37.6, 10, 12.5),
+        (55.7, 37.5, 55.8, 37.6, 11, None),
+        (55.7, 37.5, 55.8, 37.6, 12, MIN_TRIP_MINUTES - 0.5),
+        (55.7, 37.5, 55.8, 37.6, 13, MAX_TRIP_MINUTES + 1),
+        (55.7, 37.5, 55.8, 37.6, 14, MAX_TRIP_MINUTES),
+    ]
+    trips = fetch_trip_history(FakeCursor(rows), datetime(2026, 10, 1, tzinfo=timezone.utc))
+    assert trips[:, 4].tolist() == [10, 14]
+    assert fetch_trip_history(FakeCursor([]), None).shape == (0, 6)
+
+
+def test_saved_matrix_lookups(tmp_path):
+    rng = random.Random(5)
+    trips = random_trips(rng, 500)
+    matrix, used = build_matrix(trips, GRID, 6)
+    path = str(tmp_path / 'eta' / 'eta_matrix.npy')
+    save_matrix(path, matrix, GRID, 6, used)
+    loaded = get_matrix(path)
+    assert get_matrix(path) is loaded
+    assert loaded.meta['trips'] == 500
+
+    when = datetime(2026, 10, 19, 13, 30, tzinfo=timezone.utc)
+    from_lat, from_lon, to_lat, to_lon = (trips[:50, i] for i in range(4))
+    table = loaded.eta_table(from_lat, from_lon, to_lat, to_lon, when)
+    for i in range(50):
+        for j in range(50):
+            zone_from = reference_zone(GRID, from_lat[i], from_lon[i])
+            zone_to = reference_zone(GRID, to_lat[j], to_lon[j])
+            assert table[i, j] == matrix[13 // 6, zone_from, zone_to]
+    pairs = loaded.eta_pairs(from_lat, from_lon, to_lat, to_lon, when)
+    assert pairs.tolist() == np.diagonal(table).tolist()
@@ -0,0 +1,106 @@
+"""Модель спроса против гистограммы, посчитанной через datetime."""
+import random
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from taxi_shared.forecast import DemandModel, get_model, refresh_model, week_coordinates
+
+EPOCH_MONDAY = date(1969, 12, 29)
+
+
+def week_of(ts):
+    moment = datetime.fromtimestamp(ts, tz=timezone.utc)
+    monday = moment.date() - timedelta(days=moment.weekday())
+    return (monday - EPOCH_MONDAY).days // 7, moment.weekday(), moment.hour
+
+
+def random_orders(rng, count, start, weeks):
+    span = weeks * 7 * 24 * 3600
+    timestamps = [start + rng.randrange(span) for _ in range(count)]
+    return list(range(1, count + 1)), timestamps
+
+
+def test_week_coordinates_match_datetime():
+    rng = random.Random(1)
+    timestamps = [rng.randrange(0, 2 * 10 ** 9) for _ in range(2000)] + [0, 3 * 86400, 4 * 86400 - 1]
+    weeks, dows, hours = week_coordinates(timestamps)
+    assert list(zip(weeks.tolist(), dows.tolist(), hours.tolist())) == [week_of(ts) for ts in timestamps]
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_counts_match_histogram(seed):
+    rng = random.Random(seed)
+    start = int(datetime(2026, 6, 1, tzinfo=timezone.utc).timestamp())
+    ids, timestamps = random_orders(rng, 5000, start, 14)
+    model = DemandModel(history_weeks=8)
+    # Пачки с перекрытием: уже учтенные id не считаются повторно
+    position = 0
+    while position < len(ids):
+        size = rng.randint(1, 700)
+        lo = max(0, position - rng.randint(0, 50))
+        model.add_orders(ids[lo:position + size], timestamps[lo:position + size])
+        position += size
+    assert model.last_id == len(ids)
+
+    histogram = Counter(week_of(ts) for ts in timestamps)
+    assert len(model.counts) <= model.history_weeks + 1
+    for index in range(len(model.counts)):
+        week = model.start_week + index
+        expected = np.zeros((7, 24))
+        for (w, dow, hour), count in histogram.items():
+            if w == week:
+                expected[dow, hour] = count
+        assert np.array_equal(model.counts[index], expected)
+
+
+def test_profile_is_decayed_mean_of_past_weeks():
+    rng = np.random.default_rng(4)
+    model = DemandModel(history_weeks=5, decay=0.25)
+    model.start_week = 2900
+    model.counts = rng.integers(0, 20, size=(6, 7, 24)).astype(np.float64)
+    for current_week in range(2899, 2908):
+        # Полные прошлые недели из истории; самая свежая весит 1
+        past = [week - model.start_week for week in range(model.start_week, current_week)
+                if week - model.start_week < len(model.counts)]
+        if not past:
+            assert not model.profile(current_week).any()
+            continue
+        weights = [(1 - model.decay) ** (past[-1] - index) for index in past]
+        expected = sum(w * model.counts[index] for w, index in zip(weights, past)) / sum(weights)
+        assert model.profile(current_week) == pytest.approx(expected)
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.result = []
+
+    def execute(self, sql, params):
+        matching = [row for row in sorted(self.rows)
+                    if row[0] > params['last_id'] and row[1] >= params['since'].timestamp()]
+        self.result = matching[:params['limit']]
+
+    def fetchall(self):
+        return self.result
+
+
+def test_refresh_reads_in_batches_and_reloads_file(tmp_path):
+    rng = random.Random(7)
+    now = datetime(2026, 10, 19, 12, tzinfo=timezone.utc)
+    ids, timestamps = random_orders(rng, 1234, int((now - timedelta(weeks=8)).timestamp()), 8)
+    rows = list(zip(ids, timestamps))
+    model = DemandModel(history_weeks=8)
+    assert refresh_model(model, FakeCursor(rows), now, batch_size=100) == len(rows)
+    assert refresh_model(model, FakeCursor(rows), now, batch_size=100) == 0
+    assert model.counts.sum() == len(rows)
+
+    path = str(tmp_path / 'forecast.npz')
+    model.save(path)
+    loaded = get_model(path)
+    assert loaded.last_id == model.last_id and loaded.start_week == model.start_week
+    assert np.array_equal(loaded.counts, model.counts)
+    assert get_model(path) is loaded
+    assert get_model(str(tmp_path / 'missing.npz')) is None
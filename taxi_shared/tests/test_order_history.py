@@ -0,0 +1,102 @@
+"""Журнал заказов: восстановление состояний против сохраненных снимков."""
+import random
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from taxi_shared.order_history import (EVENT_CREATED, EVENT_DELETED, EVENT_STATUS_CHANGED, TRACKED_FIELDS,
+                                       diff_states, event_type_for, is_complete, replay, state_at,
+                                       to_json_value)
+
+STATUSES = ('in_progress', 'completed', 'cancelled')
+START = datetime(2026, 10, 1, tzinfo=timezone.utc)
+
+
+def random_snapshot(rng, previous=None):
+    state = dict(previous) if previous else {
+        'customer_id': rng.randint(1, 50), 'order_time': START + timedelta(minutes=rng.randint(0, 9999)),
+        'pickup_at': None, 'driver_id': None, 'price': None,
+    }
+    for field in rng.sample(TRACKED_FIELDS, rng.randint(1, 4)):
+        if field == 'status':
+            state[field] = rng.choice(STATUSES)
+        elif field == 'range':
+            state[field] = Decimal(rng.randint(10, 500)) / 10
+        elif field == 'price':
+            state[field] = Decimal(rng.randint(100, 9999)) / 100
+        elif field in ('order_time', 'pickup_at'):
+            state[field] = START + timedelta(minutes=rng.randint(0, 9999))
+        else:
+            state[field] = rng.choice((None, rng.randint(1, 30)))
+    state.setdefault('status', 'in_progress')
+    return state
+
+
+def as_json(state):
+    if state is None:
+        return None
+    return {field: to_json_value(state.get(field)) for field in TRACKED_FIELDS}
+
+
+def random_history(rng, order_id):
+    """(события, снимки): снимки - то, что лежало в таблице после каждого события."""
+    events, snapshots = [], []
+    moment = START
+    previous = None
+    for _ in range(rng.randint(1, 12)):
+        if previous is not None and rng.random() < 0.08:
+            current = None
+        else:
+            current = random_snapshot(rng, previous)
+        changes = diff_states(previous, current)
+        if previous is not None and current is not None and not changes:
+            continue
+        moment += timedelta(seconds=rng.randint(1, 600))
+        events.append((order_id, event_type_for(previous, current, changes), moment, changes))
+        snapshots.append((moment, as_json(current)))
+        previous = current
+        if current is None:
+            break
+    return events, snapshots
+
+
+def test_state_at_matches_snapshots():
+    rng = random.Random(3)
+    for order_id in range(300):
+        events, snapshots = random_history(rng, order_id)
+        assert events[0][1] == EVENT_CREATED
+        timeline = [(event_type, moment, changes) for _, event_type, moment, changes in events]
+        assert state_at(timeline, START) is None
+        for moment, snapshot in snapshots:
+            restored = state_at(timeline, moment)
+            assert (as_json(restored) if restored else None) == snapshot
+            # Между событиями состояние не меняется
+            restored = state_at(timeline, moment + timedelta(milliseconds=500))
+            assert (as_json(restored) if restored else None) == snapshot
+        final = state_at(timeline)
+        assert (as_json(final) if final else None) == snapshots[-1][1]
+        statuses = [snapshot['status'] for _, snapshot in snapshots if snapshot]
+        changed = [event_type == EVENT_STATUS_CHANGED for _, event_type, _, _ in events[1:]
+                   if event_type != EVENT_DELETED]
+        assert changed == [a != b for a, b in zip(statuses, statuses[1:])]
+
+
+def test_replay_matches_final_snapshots_and_reports_partial():
+    rng = random.Random(4)
+    stream, expected, truncated = [], {}, []
+    for order_id in range(1, 400):
+        events, snapshots = random_history(rng, order_id)
+        if len(events) > 1 and rng.random() < 0.1:
+            # Журнал начат после создания заказа: первого события нет
+            events = events[1:]
+            truncated.append(order_id)
+        else:
+            expected[order_id] = snapshots[-1][1]
+        stream.extend((pk, event_type, changes) for pk, event_type, _, changes in events)
+
+    partial = []
+    restored = {order_id: as_json(state) if state else None for order_id, state in replay(stream, partial)}
+    assert restored == expected
+    assert partial == truncated
+    assert is_complete([EVENT_CREATED, EVENT_DELETED])
+    assert not is_complete([])
+    assert not is_complete([EVENT_STATUS_CHANGED])
@@ -0,0 +1,102 @@
+"""ALT-маршрутизация против полного перебора (Беллман-Форд) на случайных графах."""
+import csv
+import math
+import random
+
+import numpy as np
+import pytest
+
+from taxi_shared.routing import RoadGraph, build_graph, haversine_m
+
+
+def write_graph(directory, node_count, edge_count, seed, connected=True):
+    rng = random.Random(seed)
+    nodes = [(i, 55.7 + rng.random() * 0.1, 37.5 + rng.random() * 0.1) for i in range(node_count)]
+    edges = []
+    # Цепочка гарантирует связность, остальные ребра - случайные, часть односторонние
+    for i in range(1, node_count if connected else 0):
+        edges.append((i - 1, i, rng.uniform(50, 2000), rng.choice([20, 40, 60]), '0'))
+    for _ in range(edge_count):
+        a, b = rng.randrange(node_count), rng.randrange(node_count)
+        if a != b:
+            edges.append((a, b, rng.uniform(50, 2000), rng.choice([20, 40, 60, 90]), rng.choice(['0', '1'])))
+
+    nodes_path, edges_path = directory / 'nodes.csv', directory / 'edges.csv'
+    with open(nodes_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'lat', 'lon'])
+        writer.writerows(nodes)
+    with open(edges_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['source', 'target', 'length_m', 'speed_kmh', 'oneway'])
+        writer.writerows(edges)
+    return nodes_path, edges_path, edges
+
+
+def reference_times(node_count, edges, source):
+    """Беллман-Форд по списку ребер: (секунды, метры) быстрейшего пути до каждой вершины."""
+    arcs = []
+    for a, b, length, speed, oneway in edges:
+        seconds = length / (speed / 3.6)
+        arcs.append((a, b, seconds, length))
+        if oneway == '0':
+            arcs.append((b, a, seconds, length))
+    best = [(math.inf, math.inf)] * node_count
+    best[source] = (0.0, 0.0)
+    for _ in range(node_count):
+        changed = False
+        for a, b, seconds, length in arcs:
+            if best[a][0] + seconds < best[b][0]:
+                best[b] = (best[a][0] + seconds, best[a][1] + length)
+                changed = True
+        if not changed:
+            break
+    return best
+
+
+# Последний граф без цепочки: есть недостижимые пары и ориентиры
+@pytest.fixture(scope='module', params=[(60, 120, 1, True), (150, 200, 2, True), (120, 150, 3, False)])
+def graph(request, tmp_path_factory):
+    node_count, edge_count, seed, connected = request.param
+    directory = tmp_path_factory.mktemp('graph')
+    nodes_path, edges_path, edges = write_graph(directory, node_count, edge_count, seed, connected)
+    output = directory / 'graph.npz'
+    build_graph(nodes_path, edges_path, output, landmark_count=4)
+    return RoadGraph.load(output), node_count, edges
+
+
+def test_route_matches_shortest_path(graph):
+    road_graph, node_count, edges = graph
+    rng = random.Random(7)
+    for source in rng.sample(range(node_count), 8):
+        reference = reference_times(node_count, edges, source)
+        for target in range(node_count):
+            found = road_graph.route_nodes(source, target)
+            expected_seconds, _ = reference[target]
+            if math.isinf(expected_seconds):
+                assert found is None
+                continue
+            assert found is not None
+            assert found[1] == pytest.approx(expected_seconds, rel=1e-4, abs=1e-3)
+
+
+def test_route_length_belongs_to_fastest_path(graph):
+    road_graph, node_count, edges = graph
+    reference = reference_times(node_count, edges, 0)
+    target = max(range(node_count), key=lambda v: reference[v][0] if math.isfinite(reference[v][0]) else -1)
+    meters, seconds = road_graph.route_nodes(0, target)
+    # Длины ребер случайные, поэтому равных по времени путей нет и длина однозначна
+    expected_seconds, expected_meters = reference[target]
+    assert seconds == pytest.approx(expected_seconds, rel=1e-4)
+    assert meters == pytest.approx(expected_meters, rel=1e-3)
+
+
+def test_nearest_node_matches_linear_scan(graph):
+    road_graph, _, _ = graph
+    rng = random.Random(3)
+    for _ in range(50):
+        lat, lon = 55.7 + rng.random() * 0.1, 37.5 + rng.random() * 0.1
+        node, distance = road_graph.nearest_node(lat, lon)
+        distances = haversine_m(lat, lon, road_graph.lat, road_graph.lon)
+        assert distance == pytest.approx(float(np.min(distances)))
+        assert distances[node] == pytest.approx(float(np.min(distances)))
@@ -0,0 +1,48 @@
+"""Очередь отложенной отправки против сортировки актуальных срабатываний."""
+import random
+
+import pytest
+
+from taxi_shared.scheduling import DispatchQueue
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_dispatch_queue_matches_sorted_scan(seed):
+    rng = random.Random(seed)
+    queue = DispatchQueue()
+    reference = {}
+    now = 0
+    for _ in range(5000):
+        action = rng.random()
+        order_id = rng.randint(1, 200)
+        if action < 0.6:
+            # Целые моменты, чтобы встречались совпадения и повторные переносы
+            fire_at = now + rng.randint(0, 50)
+            queue.schedule(order_id, fire_at)
+            reference[order_id] = fire_at
+        elif action < 0.8:
+            queue.cancel(order_id)
+            reference.pop(order_id, None)
+        else:
+            now += rng.randint(0, 10)
+            expected = sorted((at, pk) for pk, at in reference.items() if at <= now)
+            assert sorted((at, pk) for pk, at in queue.pop_due(now)) == expected
+            for _, pk in expected:
+                del reference[pk]
+
+        assert len(queue) == len(reference)
+        assert (order_id in queue) == (order_id in reference)
+        assert queue.next_fire() == min(reference.values(), default=None)
+
+
+def test_pop_due_is_ordered_and_rebuild_keeps_entries():
+    queue = DispatchQueue()
+    # Многократные переносы копят устаревшие элементы и вызывают пересборку кучи
+    for step in range(3000):
+        queue.schedule(step % 10, 1000 - step)
+    assert len(queue) == 10
+    assert len(queue.heap) <= 2 * len(queue) + 1024
+    due = queue.pop_due(10 ** 6)
+    assert [at for _, at in due] == sorted(at for _, at in due)
+    assert sorted(pk for pk, _ in due) == list(range(10))
+    assert queue.next_fire() is None and len(queue) == 0
@@ -0,0 +1,104 @@
+"""Дерево интервалов и календарь смен против перебора всех смен."""
+import random
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from taxi_shared.shifts import (OVERRIDE_EXTRA, OVERRIDE_OFF, IntervalTree, Override, Schedule,
+                                ShiftCalendar)
+
+TZ = ZoneInfo('Europe/Moscow')
+
+
+def random_intervals(rng, count):
+    intervals = []
+    for value in range(count):
+        start = rng.randint(0, 1000)
+        intervals.append((start, start + rng.randint(0, 200), value))
+    return intervals
+
+
+@pytest.mark.parametrize('count', [0, 1, 5, 300])
+def test_interval_tree_matches_scan(count):
+    rng = random.Random(count)
+    intervals = random_intervals(rng, count)
+    tree = IntervalTree(intervals)
+    for _ in range(300):
+        point = rng.uniform(-10, 1210) if rng.random() < 0.5 else rng.randint(0, 1200)
+        expected = sorted(v for start, end, v in intervals if start <= point < end)
+        assert sorted(tree.stab(point)) == expected
+
+        lo = rng.randint(-10, 1200)
+        hi = lo + rng.randint(1, 150)
+        # Пустые интервалы дерево отбрасывает
+        expected = sorted(v for start, end, v in intervals if start < end and start < hi and lo < end)
+        assert sorted(tree.overlap(lo, hi)) == expected
+
+
+def random_calendar_data(rng, drivers=40, start=date(2026, 10, 5)):
+    schedules, overrides = [], []
+    for driver_id in range(1, drivers + 1):
+        for weekday in rng.sample(range(7), rng.randint(1, 5)):
+            shift_start = rng.randrange(0, 24 * 60, 30)
+            shift_end = rng.randrange(0, 24 * 60, 30)
+            valid_from = start + timedelta(days=rng.randint(-5, 5)) if rng.random() < 0.3 else None
+            valid_until = start + timedelta(days=rng.randint(5, 20)) if rng.random() < 0.3 else None
+            schedules.append(Schedule(driver_id, weekday, shift_start, shift_end, valid_from, valid_until))
+        for _ in range(rng.randint(0, 2)):
+            day = start + timedelta(days=rng.randint(0, 14))
+            if rng.random() < 0.5:
+                overrides.append(Override(driver_id, day, OVERRIDE_OFF, None, None))
+            else:
+                overrides.append(Override(driver_id, day, OVERRIDE_EXTRA,
+                                          rng.randrange(0, 1440, 15), rng.randrange(0, 1440, 15)))
+    return schedules, overrides
+
+
+def reference_shifts(schedules, overrides, day):
+    """Абсолютные интервалы (начало, конец, водитель) смен, начинающихся в день day."""
+    days_off = {(o.driver_id, o.date) for o in overrides if o.kind == OVERRIDE_OFF}
+    midnight = datetime.combine(day, time())
+    shifts = []
+    for s in schedules:
+        if s.weekday != day.weekday() or (s.driver_id, day) in days_off:
+            continue
+        if (s.valid_from and day < s.valid_from) or (s.valid_until and day > s.valid_until):
+            continue
+        end = s.end if s.end > s.start else s.end + 24 * 60
+        shifts.append((midnight + timedelta(minutes=s.start), midnight + timedelta(minutes=end), s.driver_id))
+    for o in overrides:
+        if o.kind == OVERRIDE_EXTRA and o.date == day:
+            end = o.end if o.end > o.start else o.end + 24 * 60
+            shifts.append((midnight + timedelta(minutes=o.start), midnight + timedelta(minutes=end), o.driver_id))
+    return shifts
+
+
+def test_on_shift_matches_scan():
+    rng = random.Random(11)
+    schedules, overrides = random_calendar_data(rng)
+    calendar = ShiftCalendar(schedules, overrides, TZ)
+    for _ in range(400):
+        local = datetime(2026, 10, 5) + timedelta(minutes=rng.uniform(0, 14 * 24 * 60))
+        day = local.date()
+        candidates = reference_shifts(schedules, overrides, day) + \
+            reference_shifts(schedules, overrides, day - timedelta(days=1))
+        expected = {driver for start, end, driver in candidates if start <= local < end}
+        assert calendar.on_shift(local.replace(tzinfo=TZ)) == expected
+
+
+def test_coverage_matches_scan():
+    rng = random.Random(12)
+    schedules, overrides = random_calendar_data(rng)
+    calendar = ShiftCalendar(schedules, overrides, TZ)
+    week_start = date(2026, 10, 12)
+    coverage = calendar.coverage(week_start)
+    for offset in range(7):
+        day = week_start + timedelta(days=offset)
+        candidates = reference_shifts(schedules, overrides, day) + \
+            reference_shifts(schedules, overrides, day - timedelta(days=1))
+        for hour in range(24):
+            lo = datetime.combine(day, time()) + timedelta(hours=hour)
+            hi = lo + timedelta(hours=1)
+            expected = {driver for start, end, driver in candidates if start < hi and lo < end}
+            assert coverage[offset][hour] == len(expected)
@@ -0,0 +1,136 @@
+"""Имитатор диспетчеризации против прямолинейной модели на списках."""
+import math
+
+import numpy as np
+import pytest
+
+from taxi_shared.eta import DETOUR_FACTOR
+from taxi_shared.simulation import (DECLINED, KM_PER_DEGREE, NO_VEHICLE, SERVED, FreeShareSurge, Simulation,
+                                    parse_policies, simulate, simulate_many, synthetic_scenario)
+
+BBOX = (55.6, 37.4, 55.9, 37.8)
+
+
+def reference_run(s, surge):
+    """Та же модель без кучи и массивов: на каждом шаге перебираются все
+    поездки, машины и операторы. Политики - nearest:least_loaded:<surge>."""
+    vehicles = len(s.vehicle_lat)
+    lat, lon = list(s.vehicle_lat), list(s.vehicle_lon)
+    free = [True] * vehicles
+    seconds_per_km = 3600 / s.speed_kmh
+    load = [0] * s.operators
+    assigned_at = [0.0] * s.operators
+    outcome = [0] * len(s)
+    wait = [None] * len(s)
+    order_operator = [None] * len(s)
+    trips, waiting = [], []
+    revenue = 0.0
+
+    def approach(vehicle, order):
+        dy = lat[vehicle] - s.pickup_lat[order]
+        dx = (lon[vehicle] - s.pickup_lon[order]) * s.lon_scale
+        return math.sqrt(dx * dx + dy * dy) * KM_PER_DEGREE
+
+    def dispatch(now, vehicle, order, multiplier):
+        nonlocal revenue
+        pickup = now + approach(vehicle, order) * DETOUR_FACTOR * seconds_per_km
+        end = pickup + s.distance_km[order] * seconds_per_km
+        wait[order] = pickup - s.times[order]
+        free[vehicle] = False
+        lat[vehicle], lon[vehicle] = s.dropoff_lat[order], s.dropoff_lon[order]
+        revenue += s.distance_km[order] * s.cost_per_km[order] * multiplier
+        trips.append((end, vehicle, order, multiplier))
+
+    def drop(order):
+        outcome[order] = NO_VEHICLE
+        load[order_operator[order]] -= 1
+
+    i = 0
+    while i < len(s) or trips:
+        first_trip = min(trips) if trips else None
+        if first_trip and (i >= len(s) or first_trip[0] <= s.times[i]):
+            trips.remove(first_trip)
+            now, vehicle, order, _ = first_trip
+            outcome[order] = SERVED
+            load[order_operator[order]] -= 1
+            free[vehicle] = True
+            waiting = [w for w in waiting if s.times[w[0]] >= now - s.patience or drop(w[0])]
+            if waiting:
+                squared = []
+                for n, (w, _) in enumerate(waiting):
+                    dy = s.pickup_lat[w] - lat[vehicle]
+                    dx = (s.pickup_lon[w] - lon[vehicle]) * s.lon_scale
+                    squared.append((dx * dx + dy * dy, n))
+                nearest = min(squared)[1]
+                candidate, multiplier = waiting[nearest]
+                if approach(vehicle, candidate) <= s.max_approach_km:
+                    del waiting[nearest]
+                    dispatch(now, vehicle, candidate, multiplier)
+            continue
+
+        now, order = s.times[i], i
+        i += 1
+        multiplier = 1.0
+        if surge:
+            free_share = sum(free) / vehicles
+            if free_share < FreeShareSurge.threshold:
+                multiplier = round(1 + (FreeShareSurge.cap - 1) * (1 - free_share / FreeShareSurge.threshold), 2)
+        if multiplier > 1 and s.customer_draws[order] >= math.exp(-s.elasticity * (multiplier - 1)):
+            outcome[order] = DECLINED
+            continue
+        operator = min(range(s.operators), key=lambda pk: (load[pk], assigned_at[pk], pk))
+        load[operator] += 1
+        assigned_at[operator] = now
+        order_operator[order] = operator
+        candidates = [(approach(v, order), v) for v in range(vehicles) if free[v]]
+        if not candidates or min(candidates)[0] > s.max_approach_km:
+            waiting.append((order, multiplier))
+            continue
+        dispatch(now, min(candidates)[1], order, multiplier)
+    for order, _ in waiting:
+        drop(order)
+    return outcome, wait, order_operator, revenue, load
+
+
+@pytest.mark.parametrize('surge', ['none', 'free_share'])
+@pytest.mark.parametrize('seed', [1, 2])
+def test_simulation_matches_reference(seed, surge):
+    # Машин мало, чтобы заказы ждали, уходили по терпению и получали наценку
+    scenario = synthetic_scenario(600, 25, 4, BBOX, cost_per_km=(25.0, 40.0), seed=seed, patience_minutes=15)
+    sim = Simulation(scenario, parse_policies(f'nearest:least_loaded:{surge}')).run()
+    outcome, wait, order_operator, revenue, load = reference_run(scenario, surge == 'free_share')
+
+    assert sim.outcome.tolist() == outcome
+    served = sim.outcome == SERVED
+    assert sim.wait[served] == pytest.approx([w for w, o in zip(wait, outcome) if o == SERVED])
+    assigned = sim.outcome != DECLINED
+    assert sim.order_operator[assigned].tolist() == [op for op, o in zip(order_operator, outcome) if o != DECLINED]
+    assert sim.revenue == pytest.approx(revenue)
+    assert load == [0] * scenario.operators
+    assert sim.operator_policy.load.tolist() == load
+    assert set(outcome) <= {SERVED, NO_VEHICLE, DECLINED}
+    if surge == 'none':
+        assert DECLINED not in outcome
+
+
+def test_report_counts_and_common_draws():
+    scenario = synthetic_scenario(400, 15, 3, BBOX, seed=5)
+    specs = ['nearest:least_loaded:free_share', 'random:round_robin:free_share', 'longest_idle:random:none']
+    reports = simulate_many(scenario, specs, workers=1)
+    for report in reports:
+        assert report['served'] + report['no_vehicle'] + report['declined'] == report['orders'] == 400
+        assert 0 <= report['utilization'] <= 1
+        assert report['wait_p50_min'] <= report['wait_p90_min'] <= report['wait_p99_min']
+    # Сценарий и его случайные величины не меняются от прогона к прогону
+    again = simulate(scenario, specs[1])
+    assert {k: v for k, v in again.items() if k != 'seconds'} == \
+        {k: v for k, v in reports[1].items() if k != 'seconds'}
+    assert np.array_equal(scenario.customer_draws, synthetic_scenario(400, 15, 3, BBOX, seed=5).customer_draws)
+
+
+def test_parse_policies_rejects_unknown():
+    assert parse_policies('') == ('nearest', 'least_loaded', 'none')
+    assert parse_policies('random::free_share') == ('random', 'least_loaded', 'free_share')
+    for spec in ('teleport', 'nearest:a:b:c', 'nearest:least_loaded:always'):
+        with pytest.raises(ValueError):
+            parse_policies(spec)
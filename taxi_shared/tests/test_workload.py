@@ -0,0 +1,167 @@
+"""Куча нагрузки операторов против сортировки всех операторов."""
+import random
+
+import pytest
+
+from taxi_shared.workload import LoadHeap, WorkloadBalancer
+
+
+def check_heap(heap, reference):
+    assert len(heap) == len(reference)
+    for i, entry in enumerate(heap.heap):
+        assert heap.position[entry[2]] == i
+        for child in (2 * i + 1, 2 * i + 2):
+            if child < len(heap.heap):
+                assert entry <= heap.heap[child]
+    expected = min(((load, assigned, pk) for pk, (load, assigned) in reference.items()), default=None)
+    assert heap.peek() == expected
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_load_heap_matches_scan(seed):
+    rng = random.Random(seed)
+    reference = {pk: (rng.randint(0, 5), rng.random()) for pk in range(1, rng.randint(1, 30))}
+    heap = LoadHeap((pk, load, assigned) for pk, (load, assigned) in reference.items())
+    check_heap(heap, reference)
+    for _ in range(2000):
+        pk = rng.randint(1, 40)
+        if rng.random() < 0.25:
+            heap.remove(pk)
+            reference.pop(pk, None)
+        else:
+            reference[pk] = (rng.randint(0, 8), rng.random())
+            heap.set(pk, *reference[pk])
+        check_heap(heap, reference)
+        for other in (pk, rng.randint(1, 40)):
+            entry = reference.get(other)
+            assert heap.get(other) == (entry + (other,) if entry else None)
+            assert (other in heap) == (other in reference)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_balancer_matches_scan(seed):
+    rng = random.Random(seed)
+    database = {pk: [rng.randint(0, 5), float(pk)] for pk in range(1, 20)}
+    online = set(rng.sample(sorted(database), 10))
+    clock = FakeClock()
+    balancer = WorkloadBalancer(
+        lambda: [(pk, database[pk][0], database[pk][1]) for pk in online],
+        resync_seconds=5, clock=clock
+    )
+    for step in range(1000):
+        clock.now += rng.random()
+        action = rng.random()
+        pk = rng.randint(1, 19)
+        if action < 0.5:
+            delta = rng.choice((-1, 1, 2))
+            assigned = clock.now + 100 if delta > 0 else None
+            database[pk][0] = max(0, database[pk][0] + delta)
+            if assigned is not None:
+                database[pk][1] = assigned
+            balancer.adjust(pk, delta, assigned)
+        elif action < 0.7:
+            if pk in online:
+                online.discard(pk)
+                balancer.set_online(pk, False)
+            else:
+                online.add(pk)
+                balancer.set_online(pk, True, *database[pk])
+
+        ordered = sorted((database[pk][0], database[pk][1], pk) for pk in online)
+        expected = (ordered[0][2], ordered[0][0]) if ordered else None
+        assert balancer.least_loaded() == expected
+        assert balancer.snapshot() == [(pk, load) for load, _, pk in ordered]
+
+
+def test_reserve_counts_until_commit_or_release():
+    database = {1: [0, 1.0], 2: [0, 2.0], 3: [1, 0.5]}
+    clock = FakeClock()
+    balancer = WorkloadBalancer(lambda: [(pk, load, assigned) for pk, (load, assigned) in database.items()],
+                                resync_seconds=5, clock=clock)
+    # Параллельные выборы до коммита не получают одного оператора
+    first = balancer.reserve(10.0)
+    second = balancer.reserve(11.0)
+    third = balancer.reserve(12.0)
+    assert [first[0], second[0], third[0]] == [1, 2, 3]
+    assert balancer.least_loaded() == (1, 1)
+
+    # Коммит первого заказа: увеличение после коммита, затем снятие резерва
+    balancer.adjust(1, 1, 10.0)
+    balancer.release(first[1])
+    balancer.release(first[1])
+    # Второй заказ откатился: резерв снят
+    balancer.release(second[1])
+    assert dict(balancer.snapshot()) == {1: 1, 2: 0, 3: 2}
+
+    # Пересборка берет нагрузку из таблицы и забывает резервы
+    database[1][0] = 1
+    clock.now += 5
+    assert balancer.least_loaded() == (2, 0)
+    balancer.release(third[1])
+    assert dict(balancer.snapshot()) == {1: 1, 2: 0, 3: 1}
+
+
+def test_release_keeps_other_reservation_of_same_operator():
+    database = {1: [0, 1.0]}
+    balancer = WorkloadBalancer(lambda: [(1, database[1][0], database[1][1])], resync_seconds=5, clock=FakeClock())
+    first = balancer.reserve(10.0)
+    second = balancer.reserve(11.0)
+    assert first[0] == second[0] == 1 and first[1] != second[1]
+    # Первый закоммичен, второй еще в транзакции и должен остаться учтен
+    database[1][0] += 1
+    balancer.adjust(1, 1, 10.0)
+    balancer.release(first[1])
+    assert balancer.least_loaded() == (1, 2)
+    balancer.release(second[1])
+    assert balancer.least_loaded() == (1, 1)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_interleaved_reservations_match_scan(seed):
+    rng = random.Random(seed)
+    database = {pk: [rng.randint(0, 3), float(pk)] for pk in (1, 2)}
+    clock = FakeClock()
+    balancer = WorkloadBalancer(lambda: [(pk, load, assigned) for pk, (load, assigned) in database.items()],
+                                resync_seconds=50, clock=clock)
+    balancer.resync()
+    live = {}
+    finished = []
+
+    def expire():
+        # Следующее обращение пересоберет кучу и забудет резервы
+        if clock.now - balancer.synced_at >= 50:
+            live.clear()
+
+    for _ in range(2000):
+        clock.now += rng.random()
+        expire()
+        action = rng.random()
+        if action < 0.4:
+            loads = {pk: load + sum(op == pk for op in live.values()) for pk, (load, _) in database.items()}
+            operator_id, token = balancer.reserve(clock.now)
+            assert loads[operator_id] == min(loads.values())
+            live[token] = operator_id
+        elif action < 0.8 and live:
+            token = rng.choice(sorted(live))
+            operator_id = live.pop(token)
+            if rng.random() < 0.6:
+                database[operator_id][0] += 1
+                database[operator_id][1] = clock.now
+                balancer.adjust(operator_id, 1, clock.now)
+            balancer.release(token)
+            finished.append(token)
+        elif finished:
+            # Повторное снятие уже погашенного резерва ничего не меняет
+            balancer.release(rng.choice(finished))
+
+        expire()
+        expected = {pk: load + sum(op == pk for op in live.values()) for pk, (load, _) in database.items()}
+        assert dict(balancer.snapshot()) == expected
@@ -0,0 +1,86 @@
+"""R-дерево зон против линейного перебора всех многоугольников."""
+import math
+import random
+
+import pytest
+
+from taxi_shared.zones import ZoneIndex, polygon_contains, validate_polygon
+
+
+def star_polygon(rng, lat, lon, radius):
+    """Невыпуклый многоугольник вокруг центра: вершины по кругу со случайным радиусом."""
+    count = rng.randint(3, 12)
+    angles = sorted(rng.uniform(0, 2 * math.pi) for _ in range(count))
+    return [[lat + rng.uniform(0.3, 1.0) * radius * math.sin(a),
+             lon + rng.uniform(0.3, 1.0) * radius * math.cos(a)] for a in angles]
+
+
+def random_zones(count, seed):
+    rng = random.Random(seed)
+    return [
+        {
+            'id': i, 'name': f'zone {i}', 'kind': 'district', 'priority': rng.randint(0, 3),
+            'price_multiplier': 1.0,
+            'polygon': star_polygon(rng, 55.6 + rng.random() * 0.3, 37.4 + rng.random() * 0.4,
+                                    rng.uniform(0.005, 0.08)),
+        }
+        for i in range(count)
+    ]
+
+
+def reference_contains(polygon, lat, lon):
+    """Классический луч по ребрам в чистом Python."""
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        lat_i, lon_i = polygon[i]
+        lat_j, lon_j = polygon[j]
+        if (lat_i > lat) != (lat_j > lat):
+            cross_lon = lon_i + (lon_j - lon_i) * (lat - lat_i) / (lat_j - lat_i)
+            if lon < cross_lon:
+                inside = not inside
+        j = i
+    return inside
+
+
+@pytest.mark.parametrize('count', [1, 15, 17, 400])
+def test_resolve_matches_linear_scan(count):
+    zones = random_zones(count, seed=count)
+    index = ZoneIndex(zones)
+    rng = random.Random(1)
+    for _ in range(500):
+        lat, lon = 55.55 + rng.random() * 0.4, 37.35 + rng.random() * 0.5
+        expected = [z for z in zones if reference_contains(z['polygon'], lat, lon)]
+        found = index.resolve(lat, lon)
+        assert sorted(shape.id for shape in found) == sorted(z['id'] for z in expected)
+        # Порядок: приоритет по убыванию, затем площадь по возрастанию
+        keys = [(-shape.priority, shape.area) for shape in found]
+        assert keys == sorted(keys)
+
+
+def test_candidates_match_bbox_scan():
+    zones = random_zones(300, seed=5)
+    index = ZoneIndex(zones)
+    rng = random.Random(2)
+    for _ in range(300):
+        lat, lon = 55.55 + rng.random() * 0.4, 37.35 + rng.random() * 0.5
+        expected = {shape.id for shape in index.zones
+                    if shape.bbox[0] <= lat <= shape.bbox[2] and shape.bbox[1] <= lon <= shape.bbox[3]}
+        assert {shape.id for shape in index.candidates(lat, lon)} == expected
+
+
+def test_polygon_contains_matches_reference():
+    rng = random.Random(9)
+    for _ in range(50):
+        polygon = validate_polygon(star_polygon(rng, 55.75, 37.6, 0.05))
+        index = ZoneIndex([{'id': 1, 'name': 'z', 'kind': 'district', 'priority': 0,
+                            'price_multiplier': 1, 'polygon': polygon}])
+        shape = index.zones[0]
+        for _ in range(50):
+            lat, lon = 55.75 + rng.uniform(-0.06, 0.06), 37.6 + rng.uniform(-0.06, 0.06)
+            assert polygon_contains(shape.lats, shape.lons, lat, lon) == reference_contains(polygon, lat, lon)
+
+
+def test_empty_index():
+    index = ZoneIndex([])
+    assert index.resolve_one(55.75, 37.6) is None
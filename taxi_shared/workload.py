@@ -0,0 +1,198 @@
+"""Распределение новых заказов между операторами по нагрузке.
+
+Нагрузка оператора - число его открытых заказов. Точные значения хранятся
+в таблице OperatorWorkload и меняются сигналами заказа в той же
+транзакции. Каждый процесс держит копию для онлайн-операторов в
+индексированной куче: выбор наименее загруженного - O(1), изменение
+нагрузки одного оператора - O(log n). Куча собирается из таблицы при
+первом обращении и полностью пересобирается раз в resync_seconds, чтобы
+подхватить назначения других процессов и смену присутствия.
+
+Выбранному оператору нагрузка увеличивается сразу, под той же блокировкой
+(reserve), иначе параллельные запросы процесса до коммита получат одного и
+того же оператора. reserve возвращает резерв с номером; release снимает
+именно его и только один раз: после коммита - когда заказ уже учтен через
+adjust, при ошибке - сразу. Резервы разных запросов к одному оператору
+друг друга не гасят.
+"""
+import itertools
+import threading
+import time
+
+OPEN_STATUSES = ('in_progress',)
+
+
+def open_operator(state):
+    """Оператор, на котором висит заказ в этом состоянии, или None."""
+    if state and state['operator_id'] and state['status'] in OPEN_STATUSES:
+        return state['operator_id']
+    return None
+
+
+class LoadHeap:
+    """Двоичная min-куча ключей (нагрузка, время последнего назначения, оператор)
+    с индексом позиций для изменения и удаления произвольного оператора."""
+
+    def __init__(self, entries=()):
+        self.heap = [(load, assigned, operator_id) for operator_id, load, assigned in entries]
+        self.heap.sort()
+        self.position = {entry[2]: i for i, entry in enumerate(self.heap)}
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, operator_id):
+        return operator_id in self.position
+
+    def peek(self):
+        return self.heap[0] if self.heap else None
+
+    def get(self, operator_id):
+        i = self.position.get(operator_id)
+        return self.heap[i] if i is not None else None
+
+    def set(self, operator_id, load, assigned):
+        entry = (load, assigned, operator_id)
+        i = self.position.get(operator_id)
+        if i is None:
+            self.heap.append(entry)
+            self.position[operator_id] = len(self.heap) - 1
+            self._sift_up(len(self.heap) - 1)
+            return
+        old = self.heap[i]
+        self.heap[i] = entry
+        if entry < old:
+            self._sift_up(i)
+        else:
+            self._sift_down(i)
+
+    def remove(self, operator_id):
+        i = self.position.pop(operator_id, None)
+        if i is None:
+            return
+        last = self.heap.pop()
+        if i == len(self.heap):
+            return
+        self.heap[i] = last
+        self.position[last[2]] = i
+        self._sift_up(i)
+        self._sift_down(self.position[last[2]])
+
+    def _swap(self, i, j):
+        self.heap[i], self.heap[j] = self.heap[j], self.heap[i]
+        self.position[self.heap[i][2]] = i
+        self.position[self.heap[j][2]] = j
+
+    def _sift_up(self, i):
+        while i > 0:
+            parent = (i - 1) // 2
+            if self.heap[i] >= self.heap[parent]:
+                return
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i):
+        size = len(self.heap)
+        while True:
+            smallest = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < size and self.heap[child] < self.heap[smallest]:
+                    smallest = child
+            if smallest == i:
+                return
+            self._swap(i, smallest)
+            i = smallest
+
+
+class WorkloadBalancer:
+    """Куча нагрузки онлайн-операторов процесса.
+
+    load_online() возвращает [(operator_id, открытых заказов, время
+    последнего назначения как число)] для операторов, которые сейчас онлайн.
+    """
+
+    def __init__(self, load_online, resync_seconds=5, clock=time.monotonic):
+        self.load_online = load_online
+        self.resync_seconds = resync_seconds
+        self.clock = clock
+        self.heap = None
+        self.synced_at = None
+        # Непогашенные резервы: номер -> operator_id
+        self.reservations = {}
+        self.tokens = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def resync(self):
+        with self.lock:
+            self._resync()
+
+    def _resync(self):
+        self.heap = LoadHeap(self.load_online())
+        self.synced_at = self.clock()
+        # Таблица уже учитывает закоммиченные заказы. Резервы откаченных
+        # транзакций никто не снимет, поэтому они сбрасываются здесь, а
+        # release по старому номеру ничего не делает
+        self.reservations.clear()
+
+    def _ensure_fresh(self):
+        if self.heap is None or self.clock() - self.synced_at >= self.resync_seconds:
+            self._resync()
+
+    def least_loaded(self):
+        """(operator_id, нагрузка) наименее загруженного онлайн-оператора или None."""
+        with self.lock:
+            self._ensure_fresh()
+            top = self.heap.peek()
+        return (top[2], top[0]) if top else None
+
+    def reserve(self, assigned):
+        """(operator_id, номер резерва) наименее загруженного онлайн-оператора
+        или None; его нагрузка сразу увеличивается на передаваемый заказ."""
+        with self.lock:
+            self._ensure_fresh()
+            top = self.heap.peek()
+            if top is None:
+                return None
+            load, _, operator_id = top
+            self.heap.set(operator_id, load + 1, assigned)
+            token = next(self.tokens)
+            self.reservations[token] = operator_id
+            return operator_id, token
+
+    def release(self, token):
+        """Снимает резерв token; повторный вызов ничего не делает."""
+        with self.lock:
+            operator_id = self.reservations.pop(token, None)
+            if operator_id is not None:
+                self._change(operator_id, -1, None)
+
+    def adjust(self, operator_id, delta, assigned=None):
+        """Изменение нагрузки после коммита; операторы не в сети игнорируются."""
+        with self.lock:
+            self._change(operator_id, delta, assigned)
+
+    def _change(self, operator_id, delta, assigned):
+        if self.heap is None:
+            return
+        entry = self.heap.get(operator_id)
+        if entry is None:
+            return
+        load, previous_assigned, _ = entry
+        self.heap.set(operator_id, max(0, load + delta),
+                      previous_assigned if assigned is None else assigned)
+
+    def set_online(self, operator_id, online, load=0, assigned=0.0):
+        with self.lock:
+            if self.heap is None:
+                return
+            if online:
+                if operator_id not in self.heap:
+                    self.heap.set(operator_id, load, assigned)
+            else:
+                self.heap.remove(operator_id)
+
+    def snapshot(self):
+        """Онлайн-операторы по возрастанию нагрузки (для метрик)."""
+        with self.lock:
+            self._ensure_fresh()
+            return [(operator_id, load) for load, _, operator_id in sorted(self.heap.heap)]
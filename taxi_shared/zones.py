@@ -0,0 +1,172 @@
+"""Геозоны (районы, аэропорты) и поиск зоны по точке.
+
+Зоны хранятся как многоугольники из вершин [lat, lon]. Для поиска строится
+R-дерево по ограничивающим прямоугольникам, упакованное методом STR
+(Sort-Tile-Recursive): зоны сортируются по широте центра, режутся на
+полосы, внутри полосы сортируются по долготе и собираются в узлы по
+NODE_CAPACITY. Поиск спускается только в узлы, чей прямоугольник содержит
+точку, - O(log n) вместо проверки каждого многоугольника. Точная проверка
+(луч через многоугольник) выполняется только для найденных кандидатов.
+
+Индекс строится один раз на процесс и пересобирается при смене версии
+таблицы зон (см. get_index).
+"""
+import math
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+NODE_CAPACITY = 16
+MAX_POLYGON_VERTICES = 5000
+
+ZoneShape = namedtuple('ZoneShape', 'id name kind priority price_multiplier lats lons bbox area')
+Node = namedtuple('Node', 'bbox children leaf')
+
+
+def validate_polygon(points):
+    """Список вершин [[lat, lon], ...] без повтора первой вершины в конце.
+
+    ValueError, если это не многоугольник.
+    """
+    if not isinstance(points, (list, tuple)):
+        raise ValueError('Граница зоны задается списком точек [широта, долгота]')
+    try:
+        polygon = [[float(lat), float(lon)] for lat, lon in points]
+    except (TypeError, ValueError):
+        raise ValueError('Каждая точка границы - пара чисел [широта, долгота]')
+    if len(polygon) > 1 and polygon[0] == polygon[-1]:
+        polygon.pop()
+    if len(polygon) < 3:
+        raise ValueError('Граница зоны должна содержать хотя бы три точки')
+    if len(polygon) > MAX_POLYGON_VERTICES:
+        raise ValueError(f'Граница зоны должна содержать не больше {MAX_POLYGON_VERTICES} точек')
+    if any(not (-90 <= lat <= 90 and -180 <= lon <= 180) for lat, lon in polygon):
+        raise ValueError('Координаты границы вне допустимого диапазона')
+    return polygon
+
+
+def polygon_contains(lats, lons, lat, lon):
+    """Точка внутри многоугольника (четное-нечетное правило)."""
+    prev_lats = np.roll(lats, 1)
+    prev_lons = np.roll(lons, 1)
+    crosses = (lats > lat) != (prev_lats > lat)
+    # Долгота пересечения ребра с параллелью точки; для ребер без пересечения не важна
+    span = np.where(crosses, prev_lats - lats, 1.0)
+    cross_lon = lons + (prev_lons - lons) * (lat - lats) / span
+    return bool(np.count_nonzero(crosses & (lon < cross_lon)) % 2)
+
+
+def make_shape(zone):
+    polygon = np.asarray(zone['polygon'], dtype=np.float64)
+    lats, lons = polygon[:, 0].copy(), polygon[:, 1].copy()
+    # Площадь в квадратных градусах: из вложенных зон с равным приоритетом
+    # побеждает меньшая (аэропорт внутри района)
+    area = abs(np.dot(lats, np.roll(lons, 1)) - np.dot(lons, np.roll(lats, 1))) / 2
+    return ZoneShape(
+        zone['id'], zone['name'], zone['kind'], zone['priority'], float(zone['price_multiplier']),
+        lats, lons, (float(lats.min()), float(lons.min()), float(lats.max()), float(lons.max())), float(area)
+    )
+
+
+def union_bbox(boxes):
+    return (min(b[0] for b in boxes), min(b[1] for b in boxes),
+            max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+
+def str_pack(items, boxes):
+    """Один уровень упаковки STR: группы по NODE_CAPACITY соседних прямоугольников."""
+    count = len(items)
+    node_count = math.ceil(count / NODE_CAPACITY)
+    slab_size = math.ceil(count / math.ceil(math.sqrt(node_count))) if count else 0
+    order = sorted(range(count), key=lambda i: boxes[i][0] + boxes[i][2])
+    groups = []
+    for start in range(0, count, slab_size or 1):
+        slab = sorted(order[start:start + slab_size], key=lambda i: boxes[i][1] + boxes[i][3])
+        for node_start in range(0, len(slab), NODE_CAPACITY):
+            groups.append(slab[node_start:node_start + NODE_CAPACITY])
+    return groups
+
+
+def box_contains(box, lat, lon):
+    return box[0] <= lat <= box[2] and box[1] <= lon <= box[3]
+
+
+class ZoneIndex:
+    def __init__(self, zones):
+        self.zones = [make_shape(zone) for zone in zones]
+        self.root = self._build()
+
+    def _build(self):
+        if not self.zones:
+            return None
+        level = [Node(shape.bbox, shape, True) for shape in self.zones]
+        while True:
+            groups = str_pack(level, [node.bbox for node in level])
+            level = [Node(union_bbox([level[i].bbox for i in group]), [level[i] for i in group], False)
+                     for group in groups]
+            if len(level) == 1:
+                return level[0]
+
+    def __len__(self):
+        return len(self.zones)
+
+    def candidates(self, lat, lon):
+        """Зоны, в прямоугольник которых попадает точка."""
+        if self.root is None or not box_contains(self.root.bbox, lat, lon):
+            return []
+        found = []
+        stack = [self.root]
+        while stack:
+            for child in stack.pop().children:
+                if not box_contains(child.bbox, lat, lon):
+                    continue
+                if child.leaf:
+                    found.append(child.children)
+                else:
+                    stack.append(child)
+        return found
+
+    def resolve(self, lat, lon):
+        """Все зоны, содержащие точку: сначала с большим приоритетом, затем меньшие по площади."""
+        matches = [shape for shape in self.candidates(lat, lon)
+                   if polygon_contains(shape.lats, shape.lons, lat, lon)]
+        matches.sort(key=lambda shape: (-shape.priority, shape.area))
+        return matches
+
+    def resolve_one(self, lat, lon):
+        matches = self.resolve(lat, lon)
+        return matches[0] if matches else None
+
+    def resolve_many(self, points):
+        """Главная зона (или None) для каждой точки [lat, lon] из списка."""
+        return [self.resolve_one(lat, lon) for lat, lon in points]
+
+
+def shape_to_dict(shape):
+    return {
+        'id': shape.id,
+        'name': shape.name,
+        'kind': shape.kind,
+        'priority': shape.priority,
+        'price_multiplier': shape.price_multiplier,
+    }
+
+
+_indexes = {}
+_index_lock = threading.Lock()
+
+
+def get_index(version, load_zones, key=None):
+    """Индекс для текущей версии таблицы зон.
+
+    load_zones() возвращает словари зон (id, name, kind, priority,
+    price_multiplier, polygon) и вызывается, только когда версия сменилась.
+    key разделяет индексы разных баз (городов) в одном процессе.
+    """
+    with _index_lock:
+        cached = _indexes.get(key)
+        if cached is None or cached[0] != version:
+            cached = (version, ZoneIndex(load_zones()))
+            _indexes[key] = cached
+        return cached[1]